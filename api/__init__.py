@@ -0,0 +1,7 @@
+# HTTP API package
+from .asgi import BookingAPI, app
+
+__all__ = [
+    'BookingAPI',
+    'app'
+]
@@ -0,0 +1,531 @@
+# ============================================================================
+# ASGI HTTP API - JSON endpoints on top of BookingService
+# ============================================================================
+#
+# Dependency-free ASGI 3 application. Run it with any ASGI server, e.g.
+#   uvicorn api.asgi:app --workers 1 --port 8000
+#
+# Service calls are blocking (file persistence) so they run in the default
+# thread pool; BookingService serializes mutations with DatabaseManager.lock.
+#
+#   GET  /health
+#   GET  /bookings/{id}
+#   POST /bookings                  {customer_id, base_service, addons, booking_date, booking_time, barber_id}
+#   POST /bookings/{id}/cancel      {expected_version}
+#   POST /bookings/{id}/start       {expected_version}
+#   POST /bookings/{id}/complete    {expected_version}
+#   POST /bookings/{id}/payment     {payment_method}   -> 202, pending until the gateway answers
+#   GET  /bookings/{id}/payment
+#   POST /bookings/{id}/feedback    {customer_id, rating, comment}
+#   GET  /schedules?barber_id=B001&date=2025-01-31
+#   POST /bookings/complete         {booking_ids, expected_versions: {id: version}}     [owner, barber]
+#   POST /schedules/reassign        {from_barber_id, to_barber_id, date}                [owner]
+#   POST /schedules/cancel          {date, barber_id}   (the shop closes; barber_id optional)  [owner]
+#   GET  /calendars/shop.ics        iCalendar feed of every booking
+#   GET  /calendars/{barber_id}.ics iCalendar feed of one barber
+#   GET  /walk-ins                  every barber's walk-in line with estimated waits
+#   POST /walk-ins                  {customer_name, barber_id, base_service, addons, customer_id}
+#   GET  /walk-ins/{id}             position and estimated wait while waiting
+#   POST /walk-ins/{id}/start · /finish · /leave   {expected_version}
+#
+# Endpoints marked with roles need "Authorization: Bearer <token>". Tokens and
+# their roles come from BARBERSHOP_API_TOKENS ("token:owner,token2:barber");
+# without a token the answer is 401, with another role's token 403. With no
+# tokens configured those endpoints refuse every request.
+#
+# Bulk endpoints apply to every booking or, with an error, to none. Calendar
+# feeds are streamed and carry ETag/Last-Modified; a matching If-None-Match
+# (or If-Modified-Since) gets 304 Not Modified without a body.
+#
+# A stale expected_version returns 409 with "retryable": true. Too many writes
+# from one customer (or from everyone at once) return 429 with "retryable":
+# true and a Retry-After header. Unexpected errors return 500 with a JSON
+# error and are logged. Payments are charged by a background
+# PaymentProcessor; poll the payment to see the result.
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, time
+from email.utils import formatdate, parsedate_to_datetime
+from math import ceil
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+from core.booking_service import BookingService
+from core.calendar_feed import feeds_for
+from core.payments import PaymentProcessor
+from core.walk_in import BarberLine, walk_ins_for
+from models.booking import Booking
+from models.payment import Payment
+from models.feedback import Feedback
+from models.walk_in import WalkIn
+from utils.enums import PaymentMethod, UserRole
+from utils.exceptions import (BarbershopError, NotFoundError, ValidationError, InvalidStateError,
+                              ConcurrencyError, RateLimitedError)
+
+MAX_BODY_BYTES = 64 * 1024
+API_TOKENS_ENV = "BARBERSHOP_API_TOKENS"
+# Handler name -> roles allowed to call it (every other endpoint is public)
+PROTECTED = {
+    'complete_bookings': (UserRole.OWNER, UserRole.BARBER),
+    'reassign_day': (UserRole.OWNER,),
+    'cancel_day': (UserRole.OWNER,),
+}
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+
+class StreamResponse:
+    """Non-JSON handler result, sent chunk by chunk, with optional cache validators"""
+
+    def __init__(self, content_type: str, chunks: Iterable[bytes], etag: Optional[str] = None,
+                 last_modified: Optional[datetime] = None):
+        self.content_type = content_type
+        self.chunks = chunks
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def headers(self) -> List[Tuple[bytes, bytes]]:
+        # Clients may cache the feed but must revalidate it on every poll
+        headers = [(b'content-type', self.content_type.encode()), (b'cache-control', b'no-cache')]
+        if self.etag:
+            headers.append((b'etag', self.etag.encode()))
+        if self.last_modified:
+            headers.append((b'last-modified', formatdate(self.last_modified.timestamp(), usegmt=True).encode()))
+        return headers
+
+    def not_modified(self, request_headers: dict) -> bool:
+        """Whether the client's copy is current (If-None-Match wins over If-Modified-Since)"""
+        if_none_match = request_headers.get(b'if-none-match')
+        if if_none_match is not None:
+            tags = {tag.strip().replace('W/', '', 1) for tag in if_none_match.decode('latin-1').split(',')}
+            return '*' in tags or self.etag in tags
+        if_modified_since = request_headers.get(b'if-modified-since')
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            return self.last_modified <= parsedate_to_datetime(if_modified_since.decode('latin-1'))
+        except (TypeError, ValueError):
+            return False
+
+
+def booking_to_json(booking: Booking) -> dict:
+    return {
+        'booking_id': booking.booking_id,
+        'customer_id': booking.customer_id,
+        'barber_id': booking.barber_id,
+        'booking_date': booking.booking_date.isoformat(),
+        'booking_time': booking.booking_time.isoformat(),
+        'status': booking.status.value,
+        'service': booking.service.get_description(),
+        'price': booking.service.get_price(),
+        'duration': booking.duration,
+        'planned_minutes': booking.planned_minutes,
+        'started_at': booking.started_at.isoformat() if booking.started_at else None,
+        'completed_at': booking.completed_at.isoformat() if booking.completed_at else None,
+        'created_at': booking.created_at.isoformat(),
+        'version': booking.version
+    }
+
+
+def payment_to_json(payment: Payment) -> dict:
+    return {
+        'payment_id': payment.payment_id,
+        'booking_id': payment.booking_id,
+        'amount': payment.amount,
+        'payment_method': payment.payment_method.value,
+        'payment_status': payment.payment_status.value,
+        'transaction_id': payment.transaction_id,
+        'payment_date': payment.payment_date.isoformat() if payment.payment_date else None,
+        'attempts': payment.attempts,
+        'failure_reason': payment.failure_reason
+    }
+
+
+def feedback_to_json(feedback: Feedback) -> dict:
+    return {
+        'feedback_id': feedback.feedback_id,
+        'booking_id': feedback.booking_id,
+        'customer_id': feedback.customer_id,
+        'barber_id': feedback.barber_id,
+        'rating': feedback.rating,
+        'comment': feedback.comment,
+        'created_at': feedback.created_at.isoformat()
+    }
+
+
+def walk_in_to_json(walk_in: WalkIn) -> dict:
+    return {
+        'entry_id': walk_in.entry_id,
+        'customer_name': walk_in.customer_name,
+        'customer_id': walk_in.customer_id,
+        'barber_id': walk_in.barber_id,
+        'base_service': walk_in.base_service,
+        'addons': walk_in.addons,
+        'duration': walk_in.duration,
+        'joined_at': walk_in.joined_at.isoformat(),
+        'status': walk_in.status.value,
+        'started_at': walk_in.started_at.isoformat() if walk_in.started_at else None,
+        'finished_at': walk_in.finished_at.isoformat() if walk_in.finished_at else None,
+        'version': walk_in.version
+    }
+
+
+def line_to_json(line: BarberLine) -> dict:
+    return {
+        'barber_id': line.barber_id,
+        'barber_name': line.barber_name,
+        'busy_minutes': line.busy_minutes,
+        'next_wait_minutes': line.next_wait_minutes,
+        'waiting': [dict(walk_in_to_json(entry.walk_in), position=entry.position, wait_minutes=entry.wait_minutes)
+                    for entry in line.waiting]
+    }
+
+
+def _require(body: dict, key: str):
+    if key not in body or body[key] in (None, ""):
+        raise HTTPError(400, f"Missing field: {key}")
+    return body[key]
+
+
+def _expected_version(body: dict) -> Optional[int]:
+    value = body.get('expected_version')
+    return None if value is None else _parse(int, value, 'expected_version')
+
+
+def _parse(parser: Callable, value, field_name: str):
+    try:
+        return parser(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"Invalid {field_name}: {value!r}")
+
+
+def tokens_from_env(value: Optional[str] = None) -> Dict[str, UserRole]:
+    """token -> role from "token:role,token:role" (BARBERSHOP_API_TOKENS by default)"""
+    value = os.environ.get(API_TOKENS_ENV, "") if value is None else value
+    tokens = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        token, _, role = item.rpartition(":")
+        if not token:
+            raise ValueError(f"{API_TOKENS_ENV}: expected token:role, got {item!r}")
+        tokens[token] = UserRole(role)
+    return tokens
+
+
+def default_service() -> BookingService:
+    """BookingService whose payment intents are charged by a background PaymentProcessor"""
+    processor = PaymentProcessor(BookingService())
+    processor.start()
+    return BookingService(observers=[processor])
+
+
+class BookingAPI:
+    """ASGI application exposing BookingService over HTTP/JSON"""
+
+    def __init__(self, service_factory: Callable[[], BookingService] = default_service,
+                 tokens: Optional[Dict[str, UserRole]] = None):
+        self._service_factory = service_factory
+        self._service: Optional[BookingService] = None
+        self.tokens = tokens_from_env() if tokens is None else tokens
+        self.routes: List[Tuple[str, re.Pattern, Callable]] = [
+            ("GET", re.compile(r"^/health$"), self.health),
+            ("GET", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)$"), self.get_booking),
+            ("POST", re.compile(r"^/bookings$"), self.create_booking),
+            ("POST", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/cancel$"), self.cancel_booking),
+            ("POST", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/start$"), self.start_booking),
+            ("POST", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/complete$"), self.complete_booking),
+            ("POST", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/payment$"), self.pay_booking),
+            ("GET", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/payment$"), self.get_payment),
+            ("POST", re.compile(r"^/bookings/(?P<booking_id>[\w-]+)/feedback$"), self.submit_feedback),
+            ("GET", re.compile(r"^/schedules$"), self.list_schedule),
+            ("POST", re.compile(r"^/bookings/complete$"), self.complete_bookings),
+            ("POST", re.compile(r"^/schedules/reassign$"), self.reassign_day),
+            ("POST", re.compile(r"^/schedules/cancel$"), self.cancel_day),
+            ("GET", re.compile(r"^/calendars/shop\.ics$"), self.shop_calendar),
+            ("GET", re.compile(r"^/calendars/(?P<barber_id>[\w-]+)\.ics$"), self.barber_calendar),
+            ("GET", re.compile(r"^/walk-ins$"), self.walk_in_lobby),
+            ("POST", re.compile(r"^/walk-ins$"), self.join_walk_in),
+            ("GET", re.compile(r"^/walk-ins/(?P<entry_id>[\w-]+)$"), self.get_walk_in),
+            ("POST", re.compile(r"^/walk-ins/(?P<entry_id>[\w-]+)/(?P<action>start|finish|leave)$"),
+             self.update_walk_in),
+        ]
+
+    @property
+    def service(self) -> BookingService:
+        # Created lazily so importing the module never touches the data file
+        if self._service is None:
+            self._service = self._service_factory()
+        return self._service
+
+    def _authorize(self, scope, roles: Tuple[UserRole, ...]):
+        """Raise 401 without a known bearer token, 403 if its role is not in roles"""
+        header = dict(scope.get('headers', [])).get(b'authorization', b'').decode('latin-1')
+        scheme, _, token = header.partition(" ")
+        role = None
+        if scheme.lower() == "bearer" and token:
+            # Compare against every token so the time taken does not reveal a match
+            for known, known_role in self.tokens.items():
+                if hmac.compare_digest(known.encode(), token.strip().encode()):
+                    role = known_role
+        if role is None:
+            raise HTTPError(401, "A valid bearer token is required", [(b'www-authenticate', b'Bearer')])
+        if role not in roles:
+            raise HTTPError(403, f"Not allowed for role {role.value}")
+
+    async def _call(self, func: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(func, *args))
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    async def health(self, query: dict, body: dict):
+        return 200, {'status': 'ok'}
+
+    async def get_booking(self, query: dict, body: dict, booking_id: str):
+        booking = await self._call(self.service.find_booking, booking_id)
+        return 200, booking_to_json(booking)
+
+    async def create_booking(self, query: dict, body: dict):
+        addons = body.get('addons') or []
+        if not isinstance(addons, list):
+            raise HTTPError(400, "addons must be a list")
+        booking = await self._call(
+            self.service.create_booking,
+            _require(body, 'customer_id'),
+            _require(body, 'base_service'),
+            addons,
+            _parse(date.fromisoformat, _require(body, 'booking_date'), 'booking_date'),
+            _parse(time.fromisoformat, _require(body, 'booking_time'), 'booking_time'),
+            body.get('barber_id')
+        )
+        return 201, booking_to_json(booking)
+
+    async def cancel_booking(self, query: dict, body: dict, booking_id: str):
+        booking = await self._call(self.service.cancel_booking, booking_id, _expected_version(body))
+        return 200, booking_to_json(booking)
+
+    async def start_booking(self, query: dict, body: dict, booking_id: str):
+        booking = await self._call(self.service.start_booking, booking_id, _expected_version(body))
+        return 200, booking_to_json(booking)
+
+    async def complete_booking(self, query: dict, body: dict, booking_id: str):
+        booking = await self._call(self.service.complete_booking, booking_id, _expected_version(body))
+        return 200, booking_to_json(booking)
+
+    async def pay_booking(self, query: dict, body: dict, booking_id: str):
+        method = _parse(PaymentMethod, body.get('payment_method', PaymentMethod.E_WALLET.value),
+                        'payment_method')
+        payment = await self._call(self.service.pay_booking, booking_id, method)
+        return 202, payment_to_json(payment)
+
+    async def get_payment(self, query: dict, body: dict, booking_id: str):
+        payment = await self._call(self.service.get_payment_for_booking, booking_id)
+        if payment is None:
+            raise HTTPError(404, f"No payment for booking {booking_id}")
+        return 200, payment_to_json(payment)
+
+    async def submit_feedback(self, query: dict, body: dict, booking_id: str):
+        rating = _parse(int, _require(body, 'rating'), 'rating')
+        feedback = await self._call(self.service.submit_feedback, booking_id,
+                                    _require(body, 'customer_id'), rating, body.get('comment', ""))
+        return 201, feedback_to_json(feedback)
+
+    async def list_schedule(self, query: dict, body: dict):
+        day = query.get('date')
+        bookings = await self._call(
+            self.service.list_schedule,
+            query.get('barber_id'),
+            _parse(date.fromisoformat, day, 'date') if day else None,
+            query.get('include_canceled') == 'true'
+        )
+        return 200, {'bookings': [booking_to_json(b) for b in bookings]}
+
+    async def complete_bookings(self, query: dict, body: dict):
+        booking_ids = _require(body, 'booking_ids')
+        expected_versions = body.get('expected_versions') or {}
+        if not isinstance(booking_ids, list) or not isinstance(expected_versions, dict):
+            raise HTTPError(400, "booking_ids must be a list and expected_versions an object")
+        expected_versions = {booking_id: _parse(int, version, 'expected_versions')
+                             for booking_id, version in expected_versions.items()}
+        bookings = await self._call(self.service.complete_bookings, booking_ids, expected_versions)
+        return 200, {'bookings': [booking_to_json(b) for b in bookings]}
+
+    async def reassign_day(self, query: dict, body: dict):
+        bookings = await self._call(
+            self.service.reassign_day,
+            _require(body, 'from_barber_id'),
+            _require(body, 'to_barber_id'),
+            _parse(date.fromisoformat, _require(body, 'date'), 'date')
+        )
+        return 200, {'bookings': [booking_to_json(b) for b in bookings]}
+
+    async def cancel_day(self, query: dict, body: dict):
+        bookings = await self._call(self.service.cancel_day,
+                                    _parse(date.fromisoformat, _require(body, 'date'), 'date'),
+                                    body.get('barber_id'))
+        return 200, {'bookings': [booking_to_json(b) for b in bookings]}
+
+    async def _calendar(self, barber_id: Optional[str]):
+        feed = await self._call(feeds_for(self.service.db).feed, barber_id)
+        return 200, StreamResponse('text/calendar; charset=utf-8', feed.chunks(), feed.etag, feed.last_modified)
+
+    async def shop_calendar(self, query: dict, body: dict):
+        return await self._calendar(None)
+
+    async def barber_calendar(self, query: dict, body: dict, barber_id: str):
+        return await self._calendar(barber_id)
+
+    async def walk_in_lobby(self, query: dict, body: dict):
+        lines = await self._call(walk_ins_for(self.service.db).lobby)
+        return 200, {'lines': [line_to_json(line) for line in lines]}
+
+    async def _walk_in_json(self, walk_in: WalkIn) -> dict:
+        data = walk_in_to_json(walk_in)
+        if walk_in.line_key() is not None:
+            data['position'], data['wait_minutes'] = await self._call(
+                walk_ins_for(self.service.db).estimate, walk_in.entry_id)
+        return data
+
+    async def join_walk_in(self, query: dict, body: dict):
+        addons = body.get('addons') or []
+        if not isinstance(addons, list):
+            raise HTTPError(400, "addons must be a list")
+        walk_in = await self._call(self.service.join_walk_in, _require(body, 'customer_name'),
+                                   _require(body, 'barber_id'), _require(body, 'base_service'), addons,
+                                   body.get('customer_id'))
+        return 201, await self._walk_in_json(walk_in)
+
+    async def get_walk_in(self, query: dict, body: dict, entry_id: str):
+        # Polled by waiting customers: pick up lines changed by other processes
+        await self._call(self.service.db.refresh)
+        walk_in = self.service.db.walk_ins.get(entry_id)
+        if walk_in is None:
+            raise HTTPError(404, f"Unknown walk-in: {entry_id}")
+        return 200, await self._walk_in_json(walk_in)
+
+    async def update_walk_in(self, query: dict, body: dict, entry_id: str, action: str):
+        update = getattr(self.service, f"{action}_walk_in")
+        walk_in = await self._call(update, entry_id, _expected_version(body))
+        return 200, walk_in_to_json(walk_in)
+
+    # ------------------------------------------------------------------
+    # ASGI plumbing
+    # ------------------------------------------------------------------
+
+    async def _read_body(self, receive) -> dict:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        raw = b''.join(chunks)
+        if not raw:
+            return {}
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise HTTPError(400, "Body must be valid JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return body
+
+    async def _dispatch(self, scope, receive) -> Tuple[int, dict]:
+        method = scope['method']
+        path = scope['path'].rstrip('/') or '/'
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            roles = PROTECTED.get(handler.__name__)
+            if roles is not None:
+                self._authorize(scope, roles)
+            query = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+            body = await self._read_body(receive) if method == "POST" else {}
+            return await handler(query, body, **match.groupdict())
+        raise HTTPError(405 if allowed else 404, "Method not allowed" if allowed else "Not found")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        headers = []
+        try:
+            status, payload = await self._dispatch(scope, receive)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message}
+            headers.extend(e.headers)
+        except NotFoundError as e:
+            status, payload = 404, {'error': str(e)}
+        except ConcurrencyError as e:
+            status, payload = 409, {'error': str(e), 'retryable': True}
+        except RateLimitedError as e:
+            retry_after = max(1, ceil(e.retry_after))
+            status, payload = 429, {'error': str(e), 'retryable': True, 'retry_after': retry_after}
+            headers.append((b'retry-after', str(retry_after).encode()))
+        except ValidationError as e:
+            status, payload = 422, {'error': str(e)}
+        except InvalidStateError as e:
+            status, payload = 409, {'error': str(e)}
+        except BarbershopError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception:
+            logger.exception("Unhandled error in %s %s", scope.get('method'), scope.get('path'))
+            status, payload = 500, {'error': "Internal server error"}
+
+        if isinstance(payload, StreamResponse):
+            await self._send_stream(scope, send, status, payload)
+            return
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())] + headers
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _send_stream(self, scope, send, status: int, response: StreamResponse):
+        headers = response.headers()
+        if status == 200 and response.not_modified(dict(scope.get('headers', []))):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        for chunk in response.chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+app = BookingAPI()
@@ -0,0 +1,7 @@
+# Benchmarks package
+from .data_generator import generate_dataset, write_dataset
+
+__all__ = [
+    'generate_dataset',
+    'write_dataset'
+]
@@ -0,0 +1,154 @@
+# ============================================================================
+# API LOAD TEST - Concurrent booking workflows against the ASGI API
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.api_load --spawn --workers 20 --flows 500
+#   python -m benchmarks.api_load --url http://127.0.0.1:8000 --customers 500
+#
+# Each flow creates a booking, pays it, starts and completes it and leaves
+# feedback, then polls the payment until the background worker settled it
+# ("payment_settled" is the time from the pay request to that answer).
+# --spawn starts uvicorn in-process on a generated dataset.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.data_generator import write_dataset
+
+
+async def request(host: str, port: int, method: str, path: str, payload: dict = None) -> Tuple[int, dict]:
+    """Minimal HTTP/1.1 client, one connection per request"""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, content = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(content) if content else {}
+
+
+async def run_load(host: str, port: int, customers: int, barbers: int, workers: int, flows: int,
+                   seed: int) -> dict:
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[int, int] = {}
+    rng = random.Random(seed)
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(flows):
+        queue.put_nowait(i)
+
+    async def timed_request(name: str, method: str, path: str, payload: dict = None):
+        start = time.perf_counter()
+        status, data = await request(host, port, method, path, payload)
+        latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+        return status, data
+
+    async def worker():
+        while True:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            customer_id = f"C{rng.randint(1, customers):03d}"
+            status, booking = await timed_request("create", "POST", "/bookings", {
+                'customer_id': customer_id,
+                'base_service': rng.choice(["Haircut", "Shave", "Styling", "Coloring"]),
+                'addons': rng.sample(["Hair Wash", "Hot Towel", "Massage"], rng.randint(0, 2)),
+                'booking_date': (date.today() + timedelta(days=rng.randint(1, 30))).isoformat(),
+                'booking_time': f"{rng.randint(9, 19):02d}:{rng.choice(['00', '30'])}",
+                'barber_id': f"B{rng.randint(1, barbers):03d}"
+            })
+            if status != 201:
+                continue
+            booking_id = booking['booking_id']
+            paid_at = time.perf_counter()
+            await timed_request("pay", "POST", f"/bookings/{booking_id}/payment", {'payment_method': 'cash'})
+            await timed_request("start", "POST", f"/bookings/{booking_id}/start")
+            await timed_request("complete", "POST", f"/bookings/{booking_id}/complete")
+            await timed_request("feedback", "POST", f"/bookings/{booking_id}/feedback",
+                                {'customer_id': customer_id, 'rating': rng.randint(3, 5), 'comment': "Load test"})
+            while True:
+                status, payment = await timed_request("payment_poll", "GET", f"/bookings/{booking_id}/payment")
+                if status != 200 or payment['payment_status'] != 'pending':
+                    break
+                await asyncio.sleep(0.1)
+            latencies.setdefault("payment_settled", []).append((time.perf_counter() - paid_at) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    total_requests = sum(statuses.values())
+    report = {'elapsed_s': round(elapsed, 3), 'requests': total_requests,
+              'throughput_rps': round(total_requests / elapsed, 1) if elapsed else 0.0,
+              'statuses': statuses, 'endpoints': {}}
+    for name, values in latencies.items():
+        values.sort()
+        report['endpoints'][name] = {
+            'count': len(values),
+            'p50_ms': round(statistics.median(values), 3),
+            'p95_ms': round(values[int(0.95 * (len(values) - 1))], 3),
+            'max_ms': round(values[-1], 3)
+        }
+    return report
+
+
+def _spawn_server(data_file: str, port: int):
+    """Serve a BookingAPI bound to data_file with uvicorn in a daemon thread"""
+    import uvicorn
+    from api.asgi import BookingAPI
+    from patterns.singleton import DatabaseManager
+
+    DatabaseManager._instance = None
+    DatabaseManager.DATA_FILE = data_file
+    server = uvicorn.Server(uvicorn.Config(BookingAPI(), host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the booking HTTP API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn on a generated dataset")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--barbers", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=2000, help="Pre-existing bookings when spawning")
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--flows", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.spawn:
+            data_file = os.path.join(tmp, "barbershop_data.json")
+            write_dataset(data_file, customers=args.customers, barbers=args.barbers,
+                          bookings=args.bookings, seed=args.seed)
+            server = _spawn_server(data_file, port)
+        report = asyncio.run(run_load(host, port, args.customers, args.barbers,
+                                      args.workers, args.flows, args.seed))
+        if args.spawn:
+            server.should_exit = True
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
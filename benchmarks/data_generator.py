@@ -0,0 +1,259 @@
+# ============================================================================
+# SYNTHETIC DATA GENERATOR - Deterministic datasets for benchmarks
+# ============================================================================
+
+import argparse
+import json
+import random
+from datetime import datetime, date, time, timedelta
+from typing import Optional
+from patterns.factory import ServiceFactory
+
+SPECIALIZATIONS = ["Hair Specialist", "Beard Expert", "Color Specialist", "Styling Expert"]
+
+FIRST_NAMES = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fajar", "Gita", "Hadi", "Indra", "Joko",
+               "Kurnia", "Lestari", "Made", "Nanda", "Oki", "Putri", "Rizki", "Sari", "Tono", "Wulan"]
+LAST_NAMES = ["Pratama", "Saputra", "Wijaya", "Hidayat", "Nugroho", "Santoso", "Lubis", "Siregar",
+              "Halim", "Kusuma", "Rahman", "Putra", "Utami", "Gunawan", "Setiawan"]
+
+# Base service popularity and independent add-on probabilities
+BASE_SERVICE_WEIGHTS = {"Haircut": 55, "Shave": 20, "Styling": 15, "Coloring": 10}
+ADDON_PROBABILITIES = {
+    "Hair Wash": 0.35,
+    "Hair Spa": 0.10,
+    "Massage": 0.15,
+    "Hot Towel": 0.20,
+    "Premium Products": 0.10,
+}
+
+# Monday=0 ... Sunday=6, weekends are busier
+WEEKDAY_WEIGHTS = [0.6, 0.6, 0.7, 0.7, 0.9, 1.0, 0.9]
+
+# Opening hours 09:00 - 19:30 in 30 minute slots, with lunch and after-work peaks
+SLOT_TIMES = [time(h, m) for h in range(9, 20) for m in (0, 30)]
+SLOT_WEIGHTS = [1, 1, 2, 2, 3, 3, 4, 4, 3, 2, 2, 2, 2, 3, 4, 5, 5, 4, 3, 2, 1, 1]
+
+RATING_WEIGHTS = {5: 50, 4: 30, 3: 12, 2: 5, 1: 3}
+COMMENTS = [
+    "Great fade, very clean",
+    "Barber was friendly and on time",
+    "Waited too long before my appointment",
+    "Best haircut I've had in months",
+    "The hot towel was relaxing",
+    "Beard trim was a bit uneven",
+    "Nice place, will come back",
+    "Coloring came out exactly as I wanted",
+    "Massage was too short",
+    "Good service but a little pricey",
+]
+PAYMENT_METHOD_WEIGHTS = {"e-wallet": 45, "cash": 30, "debit_card": 15, "credit_card": 10}
+
+
+def _weighted(rng: random.Random, weights: dict):
+    return rng.choices(list(weights.keys()), weights=list(weights.values()))[0]
+
+
+def _random_date(rng: random.Random, anchor: date, past_days: int, future_days: int,
+                 future_share: float) -> date:
+    """Pick a booking date, busier on weekends (rejection sampling)"""
+    max_weight = max(WEEKDAY_WEIGHTS)
+    while True:
+        if rng.random() < future_share:
+            offset = rng.randint(0, future_days)
+        else:
+            offset = -rng.randint(1, past_days)
+        day = anchor + timedelta(days=offset)
+        if rng.random() * max_weight <= WEEKDAY_WEIGHTS[day.weekday()]:
+            return day
+
+
+def _booking_status(rng: random.Random, booking_dt: datetime, now: datetime) -> str:
+    if booking_dt.date() < now.date():
+        return rng.choices(["completed", "canceled", "scheduled"], weights=[85, 12, 3])[0]
+    if booking_dt.date() > now.date():
+        return rng.choices(["scheduled", "canceled"], weights=[92, 8])[0]
+    # Today: earlier slots are mostly done, later ones still waiting
+    if booking_dt <= now - timedelta(hours=1):
+        return rng.choices(["completed", "canceled"], weights=[90, 10])[0]
+    if booking_dt <= now:
+        return "in-progress"
+    return "scheduled"
+
+
+def generate_dataset(customers: int = 500, barbers: int = 6, bookings: int = 5000,
+                     payments: Optional[int] = None, feedbacks: Optional[int] = None,
+                     seed: int = 42, anchor: Optional[datetime] = None,
+                     past_days: int = 180, future_days: int = 30) -> dict:
+    """Generate a dataset in the barbershop_data.json schema.
+
+    The same arguments always produce the same dataset. ``payments`` and
+    ``feedbacks`` default to roughly 70% and 40% of the bookings and are
+    capped by the number of bookings eligible for them.
+    """
+    rng = random.Random(seed)
+    now = (anchor or datetime.now()).replace(microsecond=0)
+    if payments is None:
+        payments = int(bookings * 0.7)
+    if feedbacks is None:
+        feedbacks = int(bookings * 0.4)
+
+    users = {}
+    owner_created = now - timedelta(days=past_days + 30)
+    users["O001"] = {
+        "user_id": "O001",
+        "name": "Admin Boss",
+        "email": "admin@barber.com",
+        "password": "admin",
+        "phone": "081234567892",
+        "role": "owner",
+        "created_at": owner_created.isoformat(),
+        "type": "owner"
+    }
+
+    barber_ids = []
+    for i in range(1, barbers + 1):
+        user_id = f"B{i:03d}"
+        barber_ids.append(user_id)
+        users[user_id] = {
+            "user_id": user_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"barber{i}@barber.com",
+            "password": "1234",
+            "phone": f"0812{i:08d}",
+            "role": "barber",
+            "created_at": owner_created.isoformat(),
+            "type": "barber",
+            "specialization": SPECIALIZATIONS[(i - 1) % len(SPECIALIZATIONS)],
+            "is_available": rng.random() > 0.1,
+            "rating": 5.0
+        }
+
+    customer_ids = []
+    for i in range(1, customers + 1):
+        user_id = f"C{i:03d}"
+        customer_ids.append(user_id)
+        created = now - timedelta(days=rng.randint(0, past_days + 30), minutes=rng.randint(0, 1439))
+        users[user_id] = {
+            "user_id": user_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"customer{i}@example.com",
+            "password": "1234",
+            "phone": f"0853{i:08d}",
+            "role": "customer",
+            "created_at": created.isoformat(),
+            "type": "customer",
+            "address": "",
+            "loyalty_points": 0
+        }
+
+    # Cache one service per (base, add-ons) combination, the factory is the source of truth
+    service_cache = {}
+    booking_records = {}
+    for i in range(1, bookings + 1):
+        booking_id = f"BK{i:04d}"
+        base_service = _weighted(rng, BASE_SERVICE_WEIGHTS)
+        addons = tuple(name for name, p in ADDON_PROBABILITIES.items() if rng.random() < p)
+        key = (base_service, addons)
+        if key not in service_cache:
+            service_cache[key] = ServiceFactory.create_service(base_service, list(addons))
+        service = service_cache[key]
+
+        booking_date = _random_date(rng, now.date(), past_days, future_days, 0.15)
+        booking_time = rng.choices(SLOT_TIMES, weights=SLOT_WEIGHTS)[0]
+        booking_dt = datetime.combine(booking_date, booking_time)
+        lead = timedelta(days=rng.randint(0, 14), minutes=rng.randint(0, 1439))
+        created_at = min(booking_dt - lead, now)
+
+        booking_records[booking_id] = {
+            "booking_id": booking_id,
+            "customer_id": rng.choice(customer_ids) if customer_ids else "",
+            "barber_id": rng.choice(barber_ids) if barber_ids and rng.random() < 0.85 else None,
+            "booking_date": booking_date.isoformat(),
+            "booking_time": booking_time.isoformat(),
+            "status": _booking_status(rng, booking_dt, now),
+            "created_at": created_at.isoformat(),
+            "service_description": service.get_description(),
+            "service_price": service.get_price(),
+            "service_duration": service.get_duration()
+        }
+
+    # Payments: completed bookings first, then prepaid upcoming ones
+    completed = [b for b in booking_records.values() if b["status"] == "completed"]
+    open_bookings = [b for b in booking_records.values() if b["status"] in ("scheduled", "in-progress")]
+    rng.shuffle(completed)
+    rng.shuffle(open_bookings)
+    payable = completed + open_bookings
+
+    payment_records = {}
+    for i, booking in enumerate(payable[:payments], start=1):
+        payment_id = f"PAY{i:04d}"
+        booking_dt = datetime.combine(date.fromisoformat(booking["booking_date"]),
+                                      time.fromisoformat(booking["booking_time"]))
+        if booking["status"] == "completed":
+            paid_at = booking_dt + timedelta(minutes=booking["service_duration"])
+        else:
+            paid_at = datetime.fromisoformat(booking["created_at"]) + timedelta(minutes=rng.randint(1, 30))
+        payment_records[payment_id] = {
+            "payment_id": payment_id,
+            "booking_id": booking["booking_id"],
+            "amount": booking["service_price"],
+            "payment_method": _weighted(rng, PAYMENT_METHOD_WEIGHTS),
+            "payment_status": "paid",
+            "transaction_id": f"TXN-{rng.getrandbits(32):08X}",
+            "payment_date": min(paid_at, now).isoformat()
+        }
+
+    feedback_records = {}
+    reviewable = [b for b in completed if b["barber_id"]]
+    for i, booking in enumerate(reviewable[:feedbacks], start=1):
+        feedback_id = f"FB{i:04d}"
+        booking_dt = datetime.combine(date.fromisoformat(booking["booking_date"]),
+                                      time.fromisoformat(booking["booking_time"]))
+        created_at = booking_dt + timedelta(minutes=booking["service_duration"], hours=rng.randint(1, 48))
+        feedback_records[feedback_id] = {
+            "feedback_id": feedback_id,
+            "booking_id": booking["booking_id"],
+            "customer_id": booking["customer_id"],
+            "barber_id": booking["barber_id"],
+            "rating": _weighted(rng, RATING_WEIGHTS),
+            "comment": rng.choice(COMMENTS) if rng.random() < 0.7 else "",
+            "created_at": min(created_at, now).isoformat()
+        }
+
+    return {
+        "users": users,
+        "bookings": booking_records,
+        "payments": payment_records,
+        "feedbacks": feedback_records
+    }
+
+
+def write_dataset(path: str, **kwargs) -> dict:
+    """Generate a dataset and write it to ``path``"""
+    data = generate_dataset(**kwargs)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic barbershop dataset")
+    parser.add_argument("output", help="Path of the JSON file to write")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--barbers", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--payments", type=int, default=None)
+    parser.add_argument("--feedbacks", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=datetime.fromisoformat, default=None,
+                        help="Reference 'now' (ISO format), defaults to the current time")
+    args = parser.parse_args()
+
+    data = write_dataset(args.output, customers=args.customers, barbers=args.barbers,
+                         bookings=args.bookings, payments=args.payments,
+                         feedbacks=args.feedbacks, seed=args.seed, anchor=args.anchor)
+    print(f"✅ Wrote {args.output}: " + ", ".join(f"{len(v)} {k}" for k, v in data.items()))
+
+
+if __name__ == "__main__":
+    main()
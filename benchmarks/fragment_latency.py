@@ -0,0 +1,89 @@
+# ============================================================================
+# FRAGMENT LATENCY - Cost of one per-booking action: full rerun vs fragment
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.fragment_latency --bookings 20000 --repeat 10
+#
+# Before fragments, clicking Start/Done/Cancel/Pay Now reran the whole
+# dashboard (every tab). Now only the clicked card's fragment reruns. Both are
+# executed in Streamlit bare mode like run_benchmarks, so the numbers are the
+# script execution cost of each rerun, excluding browser and network time.
+
+import argparse
+import importlib
+import logging
+import os
+import tempfile
+from datetime import date
+
+import streamlit as st
+
+from benchmarks.data_generator import write_dataset
+from benchmarks.run_benchmarks import _fresh_db, _measure, _busiest, inline_fragments
+from core import BookingService
+
+
+def run(data_file: str, repeat: int) -> dict:
+    inline_fragments()
+    customer_ui = importlib.import_module("ui.customer_dashboard")
+    barber_ui = importlib.import_module("ui.barber_dashboard")
+    owner_ui = importlib.import_module("ui.owner_dashboard")
+    db = _fresh_db(data_file)
+    st.session_state.db = db
+    st.session_state.booking_service = BookingService(db)
+    service = st.session_state.booking_service
+
+    customer = _busiest(db, "customer", "customer_id")
+    barber = _busiest(db, "barber", "barber_id")
+    owner = next(u for u in db.users.values() if u.role.value == "owner")
+    customer_booking = db.recent_bookings(customer_id=customer.user_id, limit=1)[0]
+    # The schedule views show today's bookings by default
+    barber_today = service.list_schedule(barber_id=barber.user_id, day=date.today())
+    owner_today = service.list_schedule(day=date.today())
+
+    cases = [
+        ("customer", customer, customer_ui.customer_dashboard,
+         lambda: customer_ui.booking_card(customer_booking.booking_id)),
+        ("barber", barber, barber_ui.barber_dashboard,
+         (lambda: barber_ui.barber_schedule_row(barber_today[0].booking_id))
+         if barber_today else None),
+        ("owner", owner, owner_ui.owner_dashboard,
+         (lambda: owner_ui.daily_schedule_row(owner_today[0].booking_id)) if owner_today else None),
+    ]
+    results = {}
+    for role, user, full_rerun, fragment_rerun in cases:
+        st.session_state.current_user = user
+        results[f"{role}.full_rerun"] = _measure(full_rerun, repeat)
+        if fragment_rerun is not None:
+            results[f"{role}.fragment_rerun"] = _measure(fragment_rerun, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-booking action rerun latency")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--barbers", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "barbershop_data.json")
+        write_dataset(data_file, customers=args.customers, barbers=args.barbers,
+                      bookings=args.bookings, seed=args.seed)
+        results = run(data_file, args.repeat)
+
+    print(f"{'rerun':<28} {'median':>12} {'p95':>12}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['median_ms']:>10.3f}ms {result['p95_ms']:>10.3f}ms")
+    for role in ("customer", "barber", "owner"):
+        full, fragment = results.get(f"{role}.full_rerun"), results.get(f"{role}.fragment_rerun")
+        if full and fragment:
+            print(f"{role}: one action reruns {full['median_ms'] / fragment['median_ms']:.0f}x less script")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# ============================================================================
+# IMPORT TIME - Cold import cost of the headless (non-UI) packages
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.import_time --repeat 5 --budget-ms 150
+#
+# Each module is imported in a fresh interpreter with -X importtime and the
+# cumulative time of its top-level entry is reported (median of --repeat
+# runs). The API, background workers and scripts only need these packages,
+# so none of them may pull in streamlit; that is checked as well. Exits with
+# code 1 when a module imports streamlit or exceeds the budget.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# patterns resolves its exports lazily, so measure the module behind DatabaseManager
+HEADLESS_MODULES = ("utils", "models", "patterns.singleton", "services", "core", "api.asgi")
+FORBIDDEN = ("streamlit",)
+
+
+def measure_once(module: str) -> Tuple[float, List[str]]:
+    """Cumulative import time of module in ms, and forbidden packages it loaded"""
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {FORBIDDEN!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if parts[2] == module and parts[1].isdigit():
+            cumulative_us = int(parts[1])
+    if cumulative_us is None:
+        raise RuntimeError(f"no importtime entry for {module}")
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us / 1000, loaded
+
+
+def run(modules, repeat: int) -> Dict[str, dict]:
+    results = {}
+    for module in modules:
+        samples, loaded = [], []
+        for _ in range(repeat):
+            elapsed, loaded = measure_once(module)
+            samples.append(elapsed)
+        results[module] = {"median_ms": statistics.median(samples), "min_ms": min(samples),
+                           "forbidden": loaded}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import time of headless packages")
+    parser.add_argument("modules", nargs="*", default=list(HEADLESS_MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="fail if any module's median import time exceeds this")
+    args = parser.parse_args()
+
+    results = run(args.modules, args.repeat)
+    failed = False
+    print(f"{'module':<20} {'median':>10} {'min':>10}  forbidden imports")
+    for module, result in results.items():
+        over = args.budget_ms is not None and result["median_ms"] > args.budget_ms
+        failed = failed or over or bool(result["forbidden"])
+        print(f"{module:<20} {result['median_ms']:>8.1f}ms {result['min_ms']:>8.1f}ms  "
+              f"{', '.join(result['forbidden']) or '-'}{'  OVER BUDGET' if over else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# ============================================================================
+# MULTI-PROCESS HARNESS - Replicas sharing one data file, no lost updates
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.multiprocess_harness --processes 4 --operations 50
+#
+# Each worker process owns its own DatabaseManager singleton on the same
+# data file, like Streamlit replicas behind a load balancer, and concurrently:
+#   * creates bookings through BookingService (ids are allocated under the lock),
+#   * increments one shared customer's loyalty points with a compare-and-set loop,
+#   * starts random bookings created by any worker, retrying on ConcurrencyError.
+# Afterwards the parent reloads the file and checks that every write survived
+# and that the shared booking event log replays to the same final state.
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, time as dt_time, timedelta
+
+from benchmarks.data_generator import write_dataset
+
+SHARED_CUSTOMER = "C001"
+
+
+def _open_db(data_file: str):
+    from patterns.singleton import DatabaseManager
+    DatabaseManager._instance = None
+    DatabaseManager.DATA_FILE = data_file
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DatabaseManager()
+
+
+def worker(data_file: str, worker_id: int, operations: int, customers: int, barbers: int, seed: int) -> dict:
+    import core.admission
+    from core.booking_service import BookingService
+    from utils.exceptions import BarbershopError, ConcurrencyError
+
+    # The worker stands in for many users at once: no per-user rate limits
+    core.admission.admission = core.admission.AdmissionController(limits={}, overall={})
+    db = _open_db(data_file)
+    service = BookingService(db)
+    rng = random.Random(seed + worker_id)
+    created, increments, starts, retries = [], 0, [], 0
+
+    for i in range(operations):
+        action = i % 3
+        if action == 0:
+            customer_id = f"C{rng.randint(2, customers):03d}"
+            # Unique slot per worker/operation so conflicts come only from races
+            slot, barber = divmod(i // 3, barbers)
+            booking_date = date.today() + timedelta(days=400 + worker_id * 10 + slot // 24)
+            booking_time = dt_time(9 + slot % 24 // 2, 30 * (slot % 2))
+            barber_id = f"B{barber + 1:03d}"
+            booking = service.create_booking(customer_id, "Shave", [], booking_date, booking_time, barber_id)
+            created.append({'booking_id': booking.booking_id, 'customer_id': customer_id,
+                            'booking_date': booking_date.isoformat(),
+                            'booking_time': booking_time.isoformat()})
+        elif action == 1:
+            while True:
+                db.refresh()
+                customer = db.users[SHARED_CUSTOMER]
+                seen = customer.version
+                try:
+                    with db.transaction():
+                        db.bump_version(customer, seen)
+                        customer.loyalty_points += 1
+                    increments += 1
+                    break
+                except ConcurrencyError:
+                    retries += 1
+        else:
+            db.refresh()
+            candidates = [b for b in db.bookings.values()
+                          if b.status.value == "scheduled" and b.booking_date.year > date.today().year]
+            if not candidates:
+                continue
+            booking = rng.choice(candidates)
+            try:
+                service.start_booking(booking.booking_id, booking.version)
+                starts.append(booking.booking_id)
+            except ConcurrencyError:
+                retries += 1
+            except BarbershopError:
+                pass
+
+    return {'worker': worker_id, 'created': created, 'increments': increments,
+            'starts': starts, 'retries': retries}
+
+
+def _run_worker(args):
+    return worker(*args)
+
+
+def verify(data_file: str, results: list, initial_bookings: int, initial_points: int) -> list:
+    """Return a list of problems found in the final data file"""
+    with open(data_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    problems = []
+
+    created = [c for r in results for c in r['created']]
+    ids = [c['booking_id'] for c in created]
+    if len(ids) != len(set(ids)):
+        problems.append(f"duplicate booking ids handed out: {len(ids) - len(set(ids))}")
+    for c in created:
+        stored = data['bookings'].get(c['booking_id'])
+        if stored is None:
+            problems.append(f"lost booking {c['booking_id']}")
+        elif (stored['customer_id'], stored['booking_date'], stored['booking_time']) != \
+                (c['customer_id'], c['booking_date'], c['booking_time']):
+            problems.append(f"booking {c['booking_id']} was overwritten by another process")
+    expected_total = initial_bookings + len(created)
+    if len(data['bookings']) != expected_total:
+        problems.append(f"expected {expected_total} bookings, found {len(data['bookings'])}")
+
+    expected_points = initial_points + sum(r['increments'] for r in results)
+    actual_points = data['users'][SHARED_CUSTOMER]['loyalty_points']
+    if actual_points != expected_points:
+        problems.append(f"lost loyalty point updates: expected {expected_points}, found {actual_points}")
+
+    starts = [s for r in results for s in r['starts']]
+    if len(starts) != len(set(starts)):
+        problems.append("the same booking was started by two processes")
+    for booking_id in starts:
+        if data['bookings'][booking_id]['status'] != "in-progress":
+            problems.append(f"start of {booking_id} was lost")
+    problems.extend(verify_history(data_file, data, starts))
+    return problems
+
+
+def verify_history(data_file: str, data: dict, starts: list) -> list:
+    """The shared event log must be gap-free and replay to the final bookings"""
+    from core.history import EVENTS_SUFFIX, Projections, _to_event
+    from utils.event_log import EventLog
+
+    problems = []
+    projections = Projections()
+    started = {}
+    for offset, end, raw in EventLog(os.path.splitext(data_file)[0] + EVENTS_SUFFIX).read():
+        if raw['seq'] != projections.seq + 1:
+            problems.append(f"event sequence jumps from {projections.seq} to {raw['seq']}")
+        event = _to_event(raw)
+        projections.apply(event, offset, end)
+        if event.kind == 'status_changed' and event.data['to'] == "in-progress":
+            started[event.entity_id] = started.get(event.entity_id, 0) + 1
+    for booking_id, stored in data['bookings'].items():
+        state = projections.current.get(f"booking:{booking_id}")
+        if state is None or state['status'] != stored['status']:
+            problems.append(f"history of {booking_id} does not replay to its stored status")
+    for booking_id in starts:
+        if started.get(booking_id) != 1:
+            problems.append(f"start of {booking_id} recorded {started.get(booking_id, 0)} times")
+    return problems
+
+
+def run(processes: int, operations: int, customers: int = 200, barbers: int = 4,
+        bookings: int = 1000, seed: int = 42) -> tuple:
+    """Run the workers on a fresh temporary dataset; returns (results, problems, seconds)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "barbershop_data.json")
+        data = write_dataset(data_file, customers=customers, barbers=barbers,
+                             bookings=bookings, seed=seed)
+        for user in data['users'].values():
+            if user['type'] == 'barber':
+                user['is_available'] = True
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        initial_points = data['users'][SHARED_CUSTOMER]['loyalty_points']
+
+        jobs = [(data_file, i, operations, customers, barbers, seed) for i in range(processes)]
+        started = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.map(_run_worker, jobs)
+        elapsed = time.perf_counter() - started
+
+        problems = verify(data_file, results, len(data['bookings']), initial_points)
+    return results, problems, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process lost update harness")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=60, help="Operations per process")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--barbers", type=int, default=4)
+    parser.add_argument("--bookings", type=int, default=1000, help="Bookings in the initial dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results, problems, elapsed = run(args.processes, args.operations, args.customers, args.barbers,
+                                     args.bookings, args.seed)
+
+    print(f"{args.processes} processes x {args.operations} operations in {elapsed:.2f}s")
+    print(f"  bookings created:  {sum(len(r['created']) for r in results)}")
+    print(f"  loyalty increments: {sum(r['increments'] for r in results)}")
+    print(f"  bookings started:  {sum(len(r['starts']) for r in results)}")
+    print(f"  conflicts retried: {sum(r['retries'] for r in results)}")
+    if problems:
+        print("❌ Lost updates detected:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("✅ No lost updates")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+# ============================================================================
+# BENCHMARK RUNNER - Hot path timings stored as JSON
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.run_benchmarks --bookings 20000 --repeat 10
+#   python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+#
+# Dashboard functions are executed in Streamlit "bare mode" (no script run
+# context), so widgets return their defaults and only the data access and
+# element construction cost is measured. st.fragment functions do nothing in
+# bare mode, so they are replaced by their undecorated bodies first.
+
+import argparse
+import contextlib
+import io
+import importlib
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import streamlit as st
+
+from benchmarks.data_generator import write_dataset
+from core import BookingService
+from core.admission import AdmissionController
+from utils.queue_index import QueueIndex
+from utils.stream_stats import DurationStats
+from core.calendar_feed import CalendarFeeds
+from core.history import Projections
+from core.reconciliation import Reconciler
+from patterns import DatabaseManager, ServiceFactory
+from ui.auth import login_page
+from ui.customer_dashboard import create_booking_form, show_customer_bookings, show_feedback_form
+from ui.barber_dashboard import show_barber_schedule, show_barber_stats, show_barber_reviews
+from ui.owner_dashboard import (show_overview, show_daily_schedule, show_revenue_report, show_all_feedbacks,
+                                show_history)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# "Now" of the generated dataset: fixed, so runs on different days (and their
+# --compare) measure the same data
+DATASET_ANCHOR = datetime(2025, 1, 6, 12, 0)
+
+
+def _fresh_db(data_file: str) -> DatabaseManager:
+    """Drop the singleton and load a new DatabaseManager from data_file"""
+    DatabaseManager._instance = None
+    DatabaseManager.DATA_FILE = data_file
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DatabaseManager()
+
+
+DASHBOARD_MODULES = ("ui.customer_dashboard", "ui.barber_dashboard", "ui.owner_dashboard")
+
+
+def inline_fragments():
+    """Replace st.fragment functions with their bodies so bare mode executes them"""
+    # ui/__init__ re-exports functions named like the modules, so import by path
+    for module in map(importlib.import_module, DASHBOARD_MODULES):
+        for name, obj in list(vars(module).items()):
+            code = getattr(obj, '__code__', None)
+            if hasattr(obj, '__wrapped__') and code is not None and 'streamlit' in code.co_filename:
+                setattr(module, name, obj.__wrapped__)
+
+
+def _measure(func: Callable, repeat: int, warmup: int = 1) -> dict:
+    """Run func repeatedly and summarize wall time in milliseconds"""
+    for _ in range(warmup):
+        func()
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+    return {
+        "repeat": repeat,
+        "min_ms": round(timings[0], 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p95_ms": round(timings[p95_index], 4),
+        "max_ms": round(timings[-1], 4)
+    }
+
+
+def _busiest(db: DatabaseManager, role: str, attr: str):
+    """User of the given role that owns the most bookings"""
+    counts: Dict[str, int] = {}
+    for booking in db.bookings.values():
+        key = getattr(booking, attr)
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+    candidates = [u for u in db.users.values() if u.role.value == role]
+    return max(candidates, key=lambda u: (counts.get(u.user_id, 0), u.user_id))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(data_file: str, repeat: int = 10, seed: int = 42) -> Dict[str, dict]:
+    """Run every benchmark against data_file and return results by name"""
+    results: Dict[str, dict] = {}
+    db = _fresh_db(data_file)
+
+    # Persistence
+    results["db.load"] = _measure(lambda: _fresh_db(data_file), repeat)
+    db = DatabaseManager()
+    results["db.save"] = _measure(db.save, repeat)
+
+    # Login lookup: worst case is the last registered customer
+    last_customer = max((u for u in db.users.values() if u.role.value == "customer"),
+                        key=lambda u: u.created_at, default=None)
+    if last_customer is not None:
+        results["auth.login_lookup"] = _measure(
+            lambda: db.find_user_by_credentials(last_customer.email, last_customer.password),
+            repeat * 10)
+    results["auth.login_lookup_miss"] = _measure(
+        lambda: db.find_user_by_credentials("nobody@example.com", "wrong"), repeat * 10)
+
+    # Feedback search; the warm-up call builds the indexes. Cached term scores are
+    # dropped before every call so each one scores from the postings.
+    def search(query: str, **filters):
+        for indexes in db._indexes.values():
+            for index in indexes.values():
+                getattr(index, '_cache', {}).clear()
+        return db.search_feedbacks(query, **filters)
+    results["search.feedbacks_keyword"] = _measure(lambda: search("fade"), repeat)
+    results["search.feedbacks_prefix_filtered"] = _measure(lambda: search("clea*", max_rating=3), repeat)
+    if last_customer is not None:
+        results["search.feedbacks_customer"] = _measure(lambda: search(last_customer.email), repeat)
+    results["search.feedbacks_cached"] = _measure(lambda: db.search_feedbacks("fade"), repeat)
+    
+    # Service factory with a realistic add-on mix
+    rng = random.Random(seed)
+    addon_names = list(ServiceFactory.DECORATORS.keys())
+    combos = [(rng.choice(list(ServiceFactory.BASE_SERVICES.keys())),
+               rng.sample(addon_names, rng.randint(0, len(addon_names))))
+              for _ in range(1000)]
+    results["factory.create_service_x1000"] = _measure(
+        lambda: [ServiceFactory.create_service(base, addons) for base, addons in combos], repeat)
+
+    # Dashboards
+    inline_fragments()
+    st.session_state.db = db
+    st.session_state.booking_service = BookingService(db)
+    customer = _busiest(db, "customer", "customer_id")
+    barber = _busiest(db, "barber", "barber_id")
+    owner = next(u for u in db.users.values() if u.role.value == "owner")
+
+    dashboard_benchmarks = [
+        (customer, "customer.create_booking_form", lambda: create_booking_form(customer)),
+        (customer, "customer.show_customer_bookings", lambda: show_customer_bookings(customer)),
+        (customer, "customer.show_feedback_form", lambda: show_feedback_form(customer)),
+        (barber, "barber.show_barber_schedule", lambda: show_barber_schedule(barber)),
+        (barber, "barber.show_barber_stats", lambda: show_barber_stats(barber)),
+        (barber, "barber.show_barber_reviews", lambda: show_barber_reviews(barber)),
+        (owner, "owner.show_overview", show_overview),
+        (owner, "owner.show_daily_schedule", show_daily_schedule),
+        (owner, "owner.show_revenue_report", show_revenue_report),
+        (owner, "owner.show_all_feedbacks", show_all_feedbacks),
+        (owner, "owner.show_history", show_history),
+        (None, "auth.login_page", login_page),
+    ]
+    for user, name, func in dashboard_benchmarks:
+        st.session_state.current_user = user
+        results[name] = _measure(func, repeat)
+
+    # Report snapshot right after a commit changed one booking (the owner reports
+    # above built the frozen copies): re-filing it copies the bookings map once
+    some_booking = next(iter(db.bookings.values()))
+
+    def snapshot_after_change():
+        with db.lock:
+            db._index_record('bookings', some_booking.booking_id, some_booking)
+            return db.snapshot()
+    results["db.snapshot_after_change"] = _measure(snapshot_after_change, repeat)
+
+    # Event history: recording one changed booking (the warm-up call bootstraps
+    # the log), then a point-in-time query served from a checkpoint vs. a full
+    # replay. Enough changes are recorded to pass a few checkpoints.
+    history = st.session_state.booking_service.history
+    changed = itertools.cycle(list(db.bookings.values()))
+
+    def record_change():
+        booking = next(changed)
+        booking.reminder_sent = not booking.reminder_sent
+        history.record([booking])
+    results["history.record_change"] = _measure(record_change, repeat)
+    for _ in range(2 * history.checkpoint_every):
+        record_change()
+    when = datetime.now()
+    for _ in range(history.checkpoint_every // 2):
+        record_change()
+
+    def point_in_time():
+        history._snapshot = None
+        return history.at(when)
+    results["history.point_in_time"] = _measure(point_in_time, repeat)
+    results["history.full_replay"] = _measure(lambda: history._follow(Projections(), until=when), repeat)
+
+    # Calendar feeds: a first build renders every day in the window; afterwards
+    # only days with changed bookings are rendered again
+    results["calendar.first_feed"] = _measure(lambda: CalendarFeeds(db).feed(), repeat)
+    feeds = CalendarFeeds(db)
+    feeds.feed()
+    results["calendar.feed_unchanged"] = _measure(lambda: b"".join(feeds.feed().chunks()), repeat)
+
+    def feed_after_change():
+        record_change()
+        return b"".join(feeds.feed().chunks())
+    results["calendar.feed_after_change"] = _measure(feed_after_change, repeat)
+
+    # Admission control in front of a write: 1000 new customers each taking a
+    # token (one float per key) plus a write slot, around a no-op call
+    admission = AdmissionController()
+    customer_ids = itertools.count()
+
+    def admit_1000():
+        for customer_id in itertools.islice(customer_ids, 1000):
+            admission.run('create_booking', customer_id, bool)
+    results["admission.admit_1000"] = _measure(admit_1000, repeat)
+
+    # Walk-in line of 10000 people: 1000 rounds of someone joining, the head
+    # leaving and the wait of someone in the middle - O(log n) each
+    line = QueueIndex(lambda w: 'B001' if w[2] else None, lambda w: w[1], lambda w: w[0])
+    walk_ins = {f"W{i:05d}": (i, 20 + i % 3 * 10, True) for i in range(10000)}
+    line.rebuild(walk_ins)
+    joined = itertools.count(10000)
+
+    def walk_in_churn():
+        for _ in range(1000):
+            number = next(joined)
+            line.add(f"W{number:05d}", (number, 30, True))
+            line.remove(f"W{number - 10000:05d}")
+            line.ahead(f"W{number - 5000:05d}")
+    results["walk_in.churn_1000"] = _measure(walk_in_churn, repeat)
+
+    # Learned service durations: 1000 actual times streamed into the running
+    # mean and P-square quantiles of one barber and service - O(1) each
+    stats = DurationStats()
+    minutes = [random.Random(i).gauss(35, 6) for i in range(1000)]
+
+    def learn_1000():
+        for value in minutes:
+            stats.add(value)
+    results["history.learn_duration_1000"] = _measure(learn_1000, repeat)
+
+    # End-of-day reconciliation of every booking against its payments
+    reconciler = Reconciler(db)
+    results["reconciliation.full"] = _measure(lambda: reconciler.run(incremental=False), repeat)
+
+    # Archival of bookings finished over 30 days ago: saving afterwards only pays
+    # for active data; an archived lookup opens (and decompresses) one segment
+    archive = st.session_state.booking_service.archive
+    segment = archive.run(30)
+    if segment is not None:
+        results["db.save_after_archive"] = _measure(db.save, repeat)
+        archived_id = db.load_archived(segment)[0][-1].booking_id
+
+        def find_archived():
+            db._archive_store._cache.clear()
+            return archive.find_booking(archived_id)
+        results["archive.find_booking"] = _measure(find_archived, repeat)
+
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print median deltas against a baseline and return regressed benchmark names"""
+    regressions = []
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'delta':>9}")
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"{name:<40} {'-':>12} {result['median_ms']:>10.3f}ms {'new':>9}")
+            continue
+        delta = (result["median_ms"] - old["median_ms"]) / old["median_ms"] if old["median_ms"] else 0.0
+        marker = " ⚠️" if delta > threshold else ""
+        print(f"{name:<40} {old['median_ms']:>10.3f}ms {result['median_ms']:>10.3f}ms {delta:>+8.1%}{marker}")
+        if delta > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run barbershop hot path benchmarks")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--barbers", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--payments", type=int, default=None)
+    parser.add_argument("--feedbacks", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=datetime.fromisoformat, default=DATASET_ANCHOR,
+                        help="Reference time of the generated dataset (ISO format)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Result JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="Baseline result JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative median slowdown reported as a regression")
+    args = parser.parse_args()
+
+    # Bare mode logs a "missing ScriptRunContext" warning for every widget
+    logging.disable(logging.WARNING)
+    params = {k: getattr(args, k) for k in ("customers", "barbers", "bookings", "payments",
+                                           "feedbacks", "seed", "repeat")}
+    params["anchor"] = args.anchor.isoformat()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = os.path.join(tmp, "barbershop_data.json")
+        write_dataset(data_file, customers=args.customers, barbers=args.barbers,
+                      bookings=args.bookings, payments=args.payments,
+                      feedbacks=args.feedbacks, seed=args.seed, anchor=args.anchor)
+        results = run_benchmarks(data_file, repeat=args.repeat, seed=args.seed)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params
+        },
+        "results": results
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"bench-{stamp}-{report['meta']['commit']}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:<40} median {result['median_ms']:>10.3f}ms  p95 {result['p95_ms']:>10.3f}ms")
+    print(f"\n✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
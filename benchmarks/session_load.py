@@ -0,0 +1,410 @@
+# ============================================================================
+# SESSION LOAD TEST - Concurrent browser sessions against one Streamlit server
+# ============================================================================
+#
+# Usage:
+#   python -m benchmarks.session_load --sessions 20 --flows 3
+#   python -m benchmarks.session_load --url ws://127.0.0.1:8501 --sessions 50 --customers 500
+#
+# AppTest installs a process-wide mock Runtime for every run, so several
+# AppTests cannot run at the same time in one process. Each simulated session
+# therefore talks to a real `streamlit run main.py` server over its websocket,
+# exactly like a browser tab: it sends widget states, collects the deltas
+# until script_finished and parses them with AppTest's element tree, so
+# widgets are looked up and set with the usual AppTest API. Clicks inside a
+# st.fragment are sent as fragment reruns, as the browser does.
+#
+# Every flow logs in as the session's own customer, browses the booking form
+# (service, barber, date), books a free slot, pays it, reviews a completed
+# booking and logs out. Rerun latency is the time from sending the rerun to
+# receiving script_finished. Afterwards the server is stopped and the data
+# file is checked for lost or duplicated records, id collisions and
+# overlapping bookings. --spawn (the default without --url) starts the server
+# on a generated dataset; the `websockets` package is required.
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import math
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1.element_tree import ElementTree, parse_tree_from_messages
+
+from benchmarks.data_generator import write_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STREAM_PATH = "/_stcore/stream"
+RERUN_FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+                  ForwardMsg.FINISHED_WITH_COMPILE_ERROR)
+FREE_TIMES = re.compile(r"Free times: (.*)")
+BOOKING_ID = re.compile(r"Booking ID: (\S+)")
+
+
+class BrowserSession:
+    """One browser tab connected to the app's websocket"""
+
+    def __init__(self, url: str, latencies: Dict[str, List[float]], errors: List[str], timeout: float):
+        self.url = url
+        self.latencies = latencies
+        self.errors = errors
+        self.timeout = timeout
+        self.page_script_hash = ""
+        self.tree: Optional[ElementTree] = None
+        # widget id -> id of the fragment that rendered it ("" outside fragments)
+        self.fragment_of: Dict[str, str] = {}
+        self.ws = None
+
+    async def open(self):
+        self.ws = await websockets.connect(self.url + STREAM_PATH, subprotocols=["streamlit"],
+                                           max_size=None)
+        await self.rerun("open")
+
+    async def close(self):
+        await self.ws.close()
+
+    async def rerun(self, step: str, *widgets, fragment_id: str = "") -> ElementTree:
+        """Send the given widgets' new values and wait for the rerun to finish.
+        
+        widgets are AppTest elements with a value set, or WidgetState protos.
+        Widgets that are not sent keep their value on the server.
+        """
+        back = BackMsg()
+        client_state = back.rerun_script
+        client_state.page_script_hash = self.page_script_hash
+        client_state.fragment_id = fragment_id
+        for widget in widgets:
+            client_state.widget_states.widgets.append(
+                widget if isinstance(widget, WidgetState) else widget._widget_state)
+
+        started = time.perf_counter()
+        await self.ws.send(back.SerializeToString())
+        deltas, fragments = [], {}
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                # Also sent again when the script calls st.rerun()
+                self.page_script_hash = msg.new_session.page_script_hash
+                deltas, fragments = [], {}
+            elif kind == "delta":
+                deltas.append(msg)
+                element = msg.delta.new_element
+                field = element.WhichOneof("type") if msg.delta.HasField("new_element") else None
+                widget_id = getattr(getattr(element, field), "id", None) if field else None
+                if widget_id:
+                    fragments[widget_id] = msg.delta.fragment_id
+            elif kind == "script_finished" and msg.script_finished in RERUN_FINISHED:
+                break
+        self.latencies.setdefault(step, []).append((time.perf_counter() - started) * 1000)
+
+        tree = parse_tree_from_messages(deltas)
+        for exception in tree.exception:
+            self.errors.append(f"{step}: {exception.message}")
+        if not fragment_id:
+            self.tree, self.fragment_of = tree, fragments
+        return tree
+
+    async def click(self, step: str, button, *widgets) -> ElementTree:
+        return await self.rerun(step, button.click(), *widgets,
+                                fragment_id=self.fragment_of.get(button.id, ""))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _find(elements, label: str):
+    return next((element for element in elements if element.label == label), None)
+
+
+def _choose(selectbox, option: str) -> WidgetState:
+    """Selectbox state; AppTest's own needs the format_func from a local session"""
+    return WidgetState(id=selectbox.id, string_value=option)
+
+
+async def customer_flow(session: BrowserSession, customer: int, rng: random.Random, outcome: dict):
+    """Log in, browse, book, pay, review and log out as one customer"""
+    tree = session.tree
+    tree = await session.click("login", _find(tree.button, "🔐 Login"),
+                               _find(tree.text_input, "Email").input(f"customer{customer}@example.com"),
+                               _find(tree.text_input, "Password").input("1234"))
+    if _find(tree.button, "🚪 Logout") is None:
+        outcome['failed_logins'] += 1
+        return
+    customer_id = f"C{customer:03d}"
+
+    # Browse: pick a service, then a barber and day until one has free time
+    service = _find(tree.selectbox, "Choose a service")
+    tree = await session.rerun("browse", _choose(service, rng.choice(service.options)))
+    free_times = []
+    for _ in range(3):
+        barber = _find(tree.selectbox, "Choose barber")
+        day = date.today() + timedelta(days=rng.randint(1, 14))
+        tree = await session.rerun("browse", _choose(barber, rng.choice(barber.options[1:])),
+                                   _find(tree.date_input, "Date").set_value(day))
+        captions = [FREE_TIMES.search(caption.value) for caption in tree.caption]
+        free_times = [match.group(1).rstrip(" .").split(", ") for match in captions if match]
+        if free_times:
+            break
+    if not free_times:
+        outcome['fully_booked'] += 1
+        return
+
+    slot = dt_time.fromisoformat(rng.choice(free_times[0]))
+    tree = await session.click("create", _find(tree.button, "🎯 Confirm Booking"),
+                               _find(tree.time_input, "Time").set_value(slot))
+    created = [BOOKING_ID.search(message.value) for message in tree.success]
+    created = [match.group(1) for match in created if match]
+    if not created:
+        # Somebody else took the slot first; shown to the user as an error
+        outcome['conflicts'] += 1
+    else:
+        booking_id = created[0]
+        outcome['created'].append({'booking_id': booking_id, 'customer_id': customer_id,
+                                   'booking_time': slot.isoformat()})
+        pay = next((b for b in tree.button if b.key == f"pay_{booking_id}"), None)
+        if pay is not None:
+            result = await session.click("pay", pay)
+            if any("Payment submitted" in message.value for message in result.success):
+                outcome['paid'].append(booking_id)
+
+    review = _find(session.tree.selectbox, "Select booking to review")
+    if review is not None and review.options:
+        choice = review.options[0]
+        await session.click("feedback", _find(session.tree.button, "📤 Submit Feedback"),
+                            _choose(review, choice))
+        outcome['reviewed'].append({'booking_id': choice.split(" - ")[0], 'customer_id': customer_id})
+
+    await session.click("logout", _find(session.tree.button, "🚪 Logout"))
+    outcome['flows'] += 1
+
+
+async def run_load(url: str, sessions: int, flows: int, customers: int, think_ms: float, seed: int,
+                   timeout: float) -> dict:
+    latencies: Dict[str, List[float]] = {}
+    errors: List[str] = []
+    outcome = {'flows': 0, 'failed_logins': 0, 'fully_booked': 0, 'conflicts': 0,
+               'created': [], 'paid': [], 'reviewed': []}
+
+    async def run_session(index: int):
+        rng = random.Random(seed + index)
+        session = BrowserSession(url, latencies, errors, timeout)
+        await session.open()
+        try:
+            for flow in range(flows):
+                # Sessions never share a customer, so their writes only meet in shared data
+                customer = (index + flow * sessions) % customers + 1
+                await customer_flow(session, customer, rng, outcome)
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / think_ms))
+        finally:
+            await session.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    reruns = sum(len(values) for values in latencies.values())
+    report = {'sessions': sessions, 'elapsed_s': round(elapsed, 3), 'reruns': reruns,
+              'throughput_reruns_per_s': round(reruns / elapsed, 1) if elapsed else 0.0,
+              'throughput_flows_per_s': round(outcome['flows'] / elapsed, 2) if elapsed else 0.0,
+              'steps': {}, 'errors': errors, 'outcome': outcome}
+    everything = sorted(value for values in latencies.values() for value in values)
+    for name, values in list(latencies.items()) + [("all", everything)]:
+        values = sorted(values)
+        report['steps'][name] = {
+            'count': len(values),
+            'p50_ms': round(_percentile(values, 0.50), 1),
+            'p95_ms': round(_percentile(values, 0.95), 1),
+            'p99_ms': round(_percentile(values, 0.99), 1),
+            'max_ms': round(values[-1], 1)
+        }
+    return report
+
+
+def verify(data_file: str, outcome: dict) -> List[str]:
+    """Return a list of problems found in the final data file"""
+    from patterns.singleton import DatabaseManager
+    problems = []
+    try:
+        with open(data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except ValueError as e:
+        return [f"data file is not valid JSON: {e}"]
+
+    id_fields = {'users': 'user_id', 'bookings': 'booking_id', 'payments': 'payment_id',
+                 'feedbacks': 'feedback_id', 'schedules': 'schedule_id', 'waitlist': 'entry_id'}
+    for collection, id_field in id_fields.items():
+        for key, record in data.get(collection, {}).items():
+            if record.get(id_field) != key:
+                problems.append(f"{collection}[{key}] holds record {record.get(id_field)}")
+
+    bookings = data['bookings']
+    created_ids = [c['booking_id'] for c in outcome['created']]
+    if len(created_ids) != len(set(created_ids)):
+        problems.append(f"booking ids handed out twice: {len(created_ids) - len(set(created_ids))}")
+    for created in outcome['created']:
+        stored = bookings.get(created['booking_id'])
+        if stored is None:
+            problems.append(f"lost booking {created['booking_id']}")
+        elif (stored['customer_id'], stored['booking_time']) != (created['customer_id'], created['booking_time']):
+            problems.append(f"booking {created['booking_id']} was overwritten by another session")
+
+    # New bookings must not overlap any active booking of the same barber
+    active: Dict[tuple, List[tuple]] = {}
+    for booking in bookings.values():
+        if booking['barber_id'] and booking['status'] not in ("canceled", "no-show"):
+            start = datetime.combine(date.fromisoformat(booking['booking_date']),
+                                     dt_time.fromisoformat(booking['booking_time']))
+            active.setdefault((booking['barber_id'], booking['booking_date']), []).append(
+                (start, start + timedelta(minutes=booking['service_duration']), booking['booking_id']))
+    new_ids = set(created_ids)
+    for intervals in active.values():
+        intervals.sort()
+        for (_, end, first), (start, _, second) in zip(intervals, intervals[1:]):
+            if start < end and (first in new_ids or second in new_ids):
+                problems.append(f"bookings {first} and {second} overlap")
+
+    payments_per_booking: Dict[str, int] = {}
+    for payment in data['payments'].values():
+        if payment['booking_id'] not in bookings:
+            problems.append(f"payment {payment['payment_id']} for unknown booking {payment['booking_id']}")
+        payments_per_booking[payment['booking_id']] = payments_per_booking.get(payment['booking_id'], 0) + 1
+    for booking_id in outcome['paid']:
+        if payments_per_booking.get(booking_id, 0) != 1:
+            problems.append(f"booking {booking_id} has {payments_per_booking.get(booking_id, 0)} payments")
+
+    feedbacks = {}
+    for feedback in data['feedbacks'].values():
+        feedbacks.setdefault(feedback['booking_id'], []).append(feedback)
+    for reviewed in outcome['reviewed']:
+        stored = feedbacks.get(reviewed['booking_id'], [])
+        if len(stored) != 1 or stored[0]['customer_id'] != reviewed['customer_id']:
+            problems.append(f"booking {reviewed['booking_id']} has {len(stored)} feedbacks")
+
+    # The application itself must still be able to load the file
+    DatabaseManager._instance = None
+    DatabaseManager.DATA_FILE = data_file
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = DatabaseManager()
+        if len(db.bookings) != len(bookings):
+            problems.append(f"application loaded {len(db.bookings)} of {len(bookings)} bookings")
+    except Exception as e:
+        problems.append(f"application cannot load the data file: {e!r}")
+    return problems
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn_server(data_dir: str, port: int) -> subprocess.Popen:
+    """Run `streamlit run main.py` with data_dir as working directory (and data file location)"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "main.py"),
+         "--server.headless", "true", "--server.port", str(port),
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=data_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("streamlit server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent browser sessions against the Streamlit app")
+    parser.add_argument("--url", help="ws:// address of a running server (default: spawn one)")
+    parser.add_argument("--data-file", help="data file of the --url server, to verify afterwards")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--flows", type=int, default=3, help="Flows per session")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between flows")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--barbers", type=int, default=6)
+    parser.add_argument("--bookings", type=int, default=5000, help="Pre-existing bookings when spawning")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for one rerun")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        url, data_file = args.url, args.data_file
+        if url is None:
+            data_file = os.path.join(tmp, "barbershop_data.json")
+            data = write_dataset(data_file, customers=args.customers, barbers=args.barbers,
+                                 bookings=args.bookings, seed=args.seed)
+            for user in data['users'].values():
+                if user['type'] == 'barber':
+                    user['is_available'] = True
+            with open(data_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            port = _free_port()
+            server = _spawn_server(tmp, port)
+            url = f"ws://127.0.0.1:{port}"
+        try:
+            report = asyncio.run(run_load(url, args.sessions, args.flows, args.customers,
+                                          args.think_ms, args.seed, args.timeout))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(30)
+        problems = verify(data_file, report['outcome']) if data_file else None
+
+    if args.json:
+        report['problems'] = problems
+        print(json.dumps(report, indent=2))
+    else:
+        outcome = report['outcome']
+        print(f"{report['sessions']} sessions, {outcome['flows']} flows, {report['reruns']} reruns "
+              f"in {report['elapsed_s']:.1f}s")
+        print(f"  throughput: {report['throughput_reruns_per_s']} reruns/s, "
+              f"{report['throughput_flows_per_s']} flows/s")
+        print(f"  booked {len(outcome['created'])}, paid {len(outcome['paid'])}, "
+              f"reviewed {len(outcome['reviewed'])}, slot conflicts {outcome['conflicts']}, "
+              f"fully booked {outcome['fully_booked']}, failed logins {outcome['failed_logins']}")
+        print(f"  {'step':<10} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+        for name, step in report['steps'].items():
+            print(f"  {name:<10} {step['count']:>6} {step['p50_ms']:>7.1f}ms {step['p95_ms']:>7.1f}ms "
+                  f"{step['p99_ms']:>7.1f}ms {step['max_ms']:>7.1f}ms")
+        for error in report['errors'][:10]:
+            print(f"  app exception: {error}")
+    failed = bool(report['errors'] or problems)
+    if problems:
+        print("❌ Data problems detected:")
+        for problem in problems:
+            print(f"  - {problem}")
+    elif problems is not None:
+        print("✅ No corruption or id collisions")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
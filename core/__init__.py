@@ -0,0 +1,14 @@
+# Core (headless application services) package
+from .booking_service import BookingService
+from .availability import AvailabilityIndex
+from .scheduler import TimerScheduler
+from .reminders import ReminderService
+from .history import BookingHistory
+
+__all__ = [
+    'BookingService',
+    'AvailabilityIndex',
+    'TimerScheduler',
+    'ReminderService',
+    'BookingHistory'
+]
@@ -0,0 +1,153 @@
+# ============================================================================
+# ADMISSION CONTROL - Per-user rate limits and a cap on concurrent writes
+# ============================================================================
+#
+# Customer-facing writes (booking, paying, registering, feedback, waitlist)
+# are admitted here before they take the database lock. Each action has a
+# token bucket per subject (the customer a call is made for, the email being
+# registered, or the barber whose day or walk-in line a bulk call changes),
+# plus optionally one bucket shared by everyone, so a user hammering
+# "Confirm Booking" or "Pay Now" is told to try again in a few seconds instead
+# of queueing saves for everybody else. On top of that at most
+# MAX_CONCURRENT_WRITES admitted writes may be in flight at once; a write that
+# cannot get a slot within WRITE_WAIT_SECONDS is turned away as "busy".
+#
+# Both refusals raise RateLimitedError (retryable, with retry_after), which
+# the UI shows as a warning and the API as 429 Too Many Requests.
+#
+# A write made from inside another admitted write (e.g. the waitlist booking
+# created by a cancellation) is not counted again. Limits are per process.
+
+import functools
+import inspect
+import threading
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from utils.exceptions import RateLimitedError
+from utils.metrics import count
+from utils.rate_limit import TokenBuckets
+
+# action -> (requests per minute, burst) for each subject
+ACTION_LIMITS: Dict[str, Tuple[float, int]] = {
+    'create_booking': (10, 5),
+    'cancel_booking': (10, 5),
+    'pay_booking': (10, 5),
+    'register_customer': (3, 3),
+    'submit_feedback': (10, 5),
+    'join_waitlist': (10, 5),
+    'complete_bookings': (10, 5),
+    'reassign_day': (10, 5),
+    'cancel_day': (10, 5),
+    'join_walk_in': (20, 10),
+}
+# action -> (requests per minute, burst) shared by all subjects
+OVERALL_LIMITS: Dict[str, Tuple[float, int]] = {
+    'register_customer': (60, 20),
+}
+MAX_CONCURRENT_WRITES = 8
+WRITE_WAIT_SECONDS = 2.0
+BUSY = "busy"
+OVERALL = "*"
+
+
+def _buckets(limits: Dict[str, Tuple[float, int]]) -> Dict[str, TokenBuckets]:
+    return {action: TokenBuckets(per_minute / 60.0, burst) for action, (per_minute, burst) in limits.items()}
+
+
+class AdmissionController:
+    """Admits or refuses writes; keeps admitted and rejected counts per action"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 overall: Optional[Dict[str, Tuple[float, int]]] = None,
+                 max_concurrent_writes: int = MAX_CONCURRENT_WRITES,
+                 write_wait: float = WRITE_WAIT_SECONDS):
+        self._limits = _buckets(ACTION_LIMITS if limits is None else limits)
+        self._overall = _buckets(OVERALL_LIMITS if overall is None else overall)
+        self.max_concurrent_writes = max_concurrent_writes
+        self.write_wait = write_wait
+        self._writes = threading.BoundedSemaphore(max_concurrent_writes)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+
+    def _tally(self, table: Dict[str, int], key: str, metric: str):
+        with self._stats_lock:
+            table[key] = table.get(key, 0) + 1
+        count(metric)
+
+    def _check_rate(self, action: str, subject: Optional[str]):
+        for buckets, key in ((self._limits.get(action), subject), (self._overall.get(action), OVERALL)):
+            if buckets is None or key is None:
+                continue
+            retry_after = buckets.acquire(key)
+            if retry_after:
+                self._tally(self.rejected, action, f"admission.{action}.rejected")
+                seconds = max(1, int(retry_after + 0.999))
+                raise RateLimitedError(f"Too many requests, please try again in {seconds} seconds",
+                                       retry_after=retry_after)
+
+    def run(self, action: str, subject: Optional[str], func, *args, **kwargs):
+        """Call func(*args, **kwargs) if the action is admitted, else raise RateLimitedError"""
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            # Part of an already admitted write
+            return func(*args, **kwargs)
+        self._check_rate(action, subject)
+        if not self._writes.acquire(timeout=self.write_wait):
+            self._tally(self.rejected, BUSY, "admission.busy.rejected")
+            raise RateLimitedError("The system is busy, please try again in a moment",
+                                   retry_after=self.write_wait)
+        self._tally(self.admitted, action, f"admission.{action}.admitted")
+        with self._stats_lock:
+            self._in_flight += 1
+        self._local.depth = 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._local.depth = 0
+            with self._stats_lock:
+                self._in_flight -= 1
+            self._writes.release()
+
+    def stats(self) -> dict:
+        """Counters and limiter state for diagnostics"""
+        with self._stats_lock:
+            return {
+                'admitted': dict(self.admitted),
+                'rejected': dict(self.rejected),
+                'in_flight': self._in_flight,
+                'max_concurrent_writes': self.max_concurrent_writes,
+                'tracked_keys': sum(len(b) for b in self._limits.values())
+                + sum(len(b) for b in self._overall.values()),
+            }
+
+
+admission = AdmissionController()
+
+
+def admitted(action: str, subject: Union[str, Callable[[dict], Optional[str]], None] = None):
+    """Decorator: run a service method through the shared admission controller.
+
+    subject names the argument whose value keys the per-subject bucket, or is
+    a function of the call's arguments (by name, defaults applied) returning
+    the key.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = None
+            if callable(subject):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = subject(bound.arguments)
+            elif subject is not None:
+                key = signature.bind_partial(*args, **kwargs).arguments.get(subject)
+            if isinstance(key, str):
+                key = key.strip().lower()
+            return admission.run(action, key, func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,272 @@
+# ============================================================================
+# ARCHIVE - Old bookings move to cold storage
+# ============================================================================
+#
+# Bookings that are finished (completed, canceled or no-show) and dated more
+# than ARCHIVE_AFTER_DAYS ago move, with their payments and feedbacks, into
+# an immutable compressed segment (utils.archive_store). They leave memory
+# and the data file, so loading, merging and every save only pay for active
+# data. Bookings with a payment still pending stay until it is settled.
+#
+# Each segment's manifest entry in the data file carries a summary (counts per
+# status, revenue per day, ratings, per-barber and per-customer totals), so
+# dashboard totals still cover the whole history without opening a segment.
+# Archived records are read on demand: by booking id, per customer or per
+# barber, opening only segments whose summary says they can hold a match.
+#
+# Usage (the app also runs it daily at ARCHIVE_AT):
+#   python -m core.archive [--days 90]
+
+import argparse
+import logging
+from datetime import date, time, timedelta
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core.scheduler import TimerScheduler
+from models.booking import Booking
+from models.feedback import Feedback
+from models.payment import Payment
+from utils.enums import BookingStatus, PaymentStatus
+from utils.metrics import timed
+from utils.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_AT = time(3, 0)
+ARCHIVED_STATUSES = (BookingStatus.COMPLETED, BookingStatus.CANCELED, BookingStatus.NO_SHOW)
+
+
+def _empty_totals() -> dict:
+    return {'bookings': 0, 'statuses': {}, 'revenue': 0.0, 'paid': 0, 'ratings': {}}
+
+
+def _add(totals: dict, other: dict):
+    """Add one totals dict into another (nested counters are summed)"""
+    for name, value in other.items():
+        if isinstance(value, dict):
+            target = totals.setdefault(name, {})
+            for key, number in value.items():
+                target[key] = target.get(key, 0) + number
+        else:
+            totals[name] = totals.get(name, 0) + value
+
+
+def summarize(bookings: List[Booking], payments: List[Payment], feedbacks: List[Feedback]) -> dict:
+    """Aggregates kept in the manifest for one segment's records"""
+    summary = _empty_totals()
+    summary.update({'first_booking': None, 'last_booking': None, 'first_date': None, 'last_date': None,
+                    'daily_revenue': {}, 'barbers': {}, 'customers': {}})
+    for booking in bookings:
+        summary['bookings'] += 1
+        status = booking.status.value
+        summary['statuses'][status] = summary['statuses'].get(status, 0) + 1
+        summary['customers'][booking.customer_id] = summary['customers'].get(booking.customer_id, 0) + 1
+        if booking.barber_id:
+            barber = summary['barbers'].setdefault(booking.barber_id, {'bookings': 0, 'completed': 0,
+                                                                       'revenue': 0.0, 'ratings': {}})
+            barber['bookings'] += 1
+            if booking.status == BookingStatus.COMPLETED:
+                barber['completed'] += 1
+                barber['revenue'] += booking.service.get_price()
+    if bookings:
+        ids = sorted(b.booking_id for b in bookings)
+        days = sorted(b.booking_date for b in bookings)
+        summary['first_booking'], summary['last_booking'] = ids[0], ids[-1]
+        summary['first_date'], summary['last_date'] = days[0].isoformat(), days[-1].isoformat()
+    for payment in payments:
+        if payment.payment_status == PaymentStatus.PAID:
+            summary['paid'] += 1
+            summary['revenue'] += payment.amount
+            if payment.payment_date:
+                day = summary['daily_revenue'].setdefault(payment.payment_date.date().isoformat(), [0, 0.0])
+                day[0] += 1
+                day[1] += payment.amount
+    for feedback in feedbacks:
+        rating = str(feedback.rating)
+        summary['ratings'][rating] = summary['ratings'].get(rating, 0) + 1
+        barber = summary['barbers'].get(feedback.barber_id)
+        if barber is not None:
+            barber['ratings'][rating] = barber['ratings'].get(rating, 0) + 1
+    return summary
+
+
+def average_rating(ratings: Dict[str, int]) -> Tuple[float, int]:
+    """(mean, count) of a {rating: count} histogram"""
+    count = sum(ratings.values())
+    return (sum(int(r) * n for r, n in ratings.items()) / count if count else 0.0), count
+
+
+class Archive:
+    """Archival policy and on-demand queries over one DatabaseManager's segments"""
+
+    def __init__(self, db):
+        self.db = db
+
+    # ------------------------------------------------------------------
+    # Archiving
+    # ------------------------------------------------------------------
+
+    def candidates(self, cutoff: date) -> List[Booking]:
+        """Finished bookings dated before cutoff without a pending payment, by id"""
+        db = self.db
+        with db.lock:
+            return sorted((b for b in db.bookings.values()
+                           if b.booking_date < cutoff and b.status in ARCHIVED_STATUSES and
+                           not any(p.payment_status == PaymentStatus.PENDING
+                                   for p in db.payments_for_booking(b.booking_id))),
+                          key=attrgetter('booking_id'))
+
+    @timed("archive.run")
+    def run(self, older_than_days: int = ARCHIVE_AFTER_DAYS, today: Optional[date] = None) -> Optional[str]:
+        """Archive eligible bookings into one new segment; returns its name (None if nothing to do)"""
+        cutoff = (today or date.today()) - timedelta(days=older_than_days)
+        db = self.db
+        with db.transaction():
+            bookings = self.candidates(cutoff)
+            if not bookings:
+                return None
+            booking_ids = {b.booking_id for b in bookings}
+            payments = sorted((p for b in bookings for p in db.payments_for_booking(b.booking_id)),
+                              key=attrgetter('booking_id', 'payment_id'))
+            feedbacks = sorted((f for f in db.feedbacks.values() if f.booking_id in booking_ids),
+                               key=attrgetter('feedback_id'))
+            name = db.archive_records(cutoff.isoformat(), bookings, payments, feedbacks,
+                                      summarize(bookings, payments, feedbacks))
+        logger.info("Archived %d bookings, %d payments, %d feedbacks into %s",
+                    len(bookings), len(payments), len(feedbacks), name)
+        return name
+
+    def schedule_daily(self, scheduler: TimerScheduler, at: time = ARCHIVE_AT,
+                       older_than_days: int = ARCHIVE_AFTER_DAYS):
+        """Archive every day at the given time"""
+        scheduler.every_day('archive', at, lambda: self.run(older_than_days))
+
+    # ------------------------------------------------------------------
+    # Summaries (no segment is opened)
+    # ------------------------------------------------------------------
+
+    def _summaries(self, snapshot: Optional[Snapshot] = None) -> List[dict]:
+        """Segment summaries, from the snapshot's manifest if one is given"""
+        if snapshot is not None:
+            return [entry['summary'] for entry in snapshot.archive.values()]
+        with self.db.lock:
+            return [entry['summary'] for entry in self.db.archive.values()]
+
+    def totals(self, snapshot: Optional[Snapshot] = None) -> dict:
+        """Archived bookings, statuses, paid revenue and rating histogram overall"""
+        totals = _empty_totals()
+        for summary in self._summaries(snapshot):
+            _add(totals, {name: summary[name] for name in totals})
+        return totals
+
+    def barber_totals(self, barber_id: str, snapshot: Optional[Snapshot] = None) -> dict:
+        """Archived bookings, completed bookings, their value and ratings of one barber"""
+        totals = {'bookings': 0, 'completed': 0, 'revenue': 0.0, 'ratings': {}}
+        for summary in self._summaries(snapshot):
+            if barber_id in summary['barbers']:
+                _add(totals, summary['barbers'][barber_id])
+        return totals
+
+    def customer_bookings(self, customer_id: str) -> int:
+        """Number of archived bookings of one customer"""
+        return sum(summary['customers'].get(customer_id, 0) for summary in self._summaries())
+
+    def revenue_between(self, start: date, end: date, snapshot: Optional[Snapshot] = None) -> Tuple[int, float]:
+        """(paid payments, amount) of archived payments made from start to end inclusive"""
+        first, last = start.isoformat(), end.isoformat()
+        count, amount = 0, 0.0
+        for summary in self._summaries(snapshot):
+            for day, (number, total) in summary['daily_revenue'].items():
+                if first <= day <= last:
+                    count += number
+                    amount += total
+        return count, amount
+
+    # ------------------------------------------------------------------
+    # Records (segments are opened on demand)
+    # ------------------------------------------------------------------
+
+    def _segments(self, keep=lambda summary: True, booking_filter=None
+                  ) -> Iterator[Tuple[List[Booking], List[Payment], List[Feedback]]]:
+        with self.db.lock:
+            names = [name for name, entry in sorted(self.db.archive.items()) if keep(entry['summary'])]
+        for name in names:
+            yield self.db.load_archived(name, booking_filter)
+
+    def segments(self) -> Iterator[Tuple[List[Booking], List[Payment], List[Feedback]]]:
+        """(bookings, payments, feedbacks) of every segment, oldest segment first"""
+        return self._segments()
+
+    def _find(self, booking_id: str) -> Tuple[List[Booking], List[Payment], List[Feedback]]:
+        def keep(summary: dict) -> bool:
+            return summary['bookings'] > 0 and summary['first_booking'] <= booking_id <= summary['last_booking']
+
+        for found in self._segments(keep, lambda data: data['booking_id'] == booking_id):
+            if found[0]:
+                return found
+        return [], [], []
+
+    def find_booking(self, booking_id: str) -> Optional[Booking]:
+        bookings = self._find(booking_id)[0]
+        return bookings[0] if bookings else None
+
+    def payments_for_booking(self, booking_id: str) -> List[Payment]:
+        return self._find(booking_id)[1]
+
+    def bookings(self, customer_id: Optional[str] = None, barber_id: Optional[str] = None) -> List[Booking]:
+        """Archived bookings of a customer and/or barber, newest first"""
+        def keep(summary: dict) -> bool:
+            return ((customer_id is None or customer_id in summary['customers']) and
+                    (barber_id is None or barber_id in summary['barbers']))
+
+        def matches(data: dict) -> bool:
+            return ((customer_id is None or data['customer_id'] == customer_id) and
+                    (barber_id is None or data.get('barber_id') == barber_id))
+
+        found = [b for bookings, _, _ in self._segments(keep, matches) for b in bookings]
+        found.sort(key=attrgetter('created_at'), reverse=True)
+        return found
+
+    def feedbacks(self, barber_id: Optional[str] = None) -> List[Feedback]:
+        """Archived feedbacks, optionally of one barber, newest first"""
+        def keep(summary: dict) -> bool:
+            return barber_id is None or bool(summary['barbers'].get(barber_id, {}).get('ratings'))
+
+        matches = None if barber_id is None else (lambda data: data.get('barber_id') == barber_id)
+        found = [f for _, _, feedbacks in self._segments(keep, matches) for f in feedbacks]
+        found.sort(key=attrgetter('created_at'), reverse=True)
+        return found
+
+
+_archive: Optional[Archive] = None
+
+
+def archive_for(db) -> Archive:
+    """Shared archive for the DatabaseManager singleton"""
+    global _archive
+    if _archive is None or _archive.db is not db:
+        _archive = Archive(db)
+    return _archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old finished bookings to archive segments")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f"archive bookings older than this many days (default {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--data-file", default=None, help="data file (default: barbershop_data.json)")
+    args = parser.parse_args()
+
+    from patterns.singleton import DatabaseManager
+    if args.data_file:
+        DatabaseManager.DATA_FILE = args.data_file
+    archive = Archive(DatabaseManager())
+    name = archive.run(args.days)
+    print(f"Archived into {name}" if name else "Nothing to archive")
+    totals = archive.totals()
+    print(f"Archive holds {totals['bookings']} bookings, Rp {totals['revenue']:,.0f} paid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# ============================================================================
+# ASSIGNMENT - Batch barber assignment for "Any Available" bookings
+# ============================================================================
+#
+# Bookings have fixed start times, so assigning them is interval scheduling
+# on several barbers. Each barber's free time for the day is one availability
+# bitmap (working hours minus existing bookings), which makes "does this
+# booking fit" a single AND.
+#
+# Bookings are placed in start-time order (longest first on ties), the order
+# that is optimal for interval partitioning. Among the barbers it fits, a
+# specialist for the base service is preferred, then the least loaded barber.
+# A booking that fits nowhere gets one repair attempt: move a single blocking
+# booking from this batch to another barber that is free for it.
+# Cost is O(n * b) bit operations for n bookings and b barbers.
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from core.availability import bitmap_minutes, interval_mask
+
+# Keywords in Barber.specialization that mark a specialist for a base service
+SPECIALTIES: Dict[str, Tuple[str, ...]] = {
+    "Haircut": ("hair",),
+    "Shave": ("beard", "shave"),
+    "Styling": ("styling", "hair"),
+    "Coloring": ("color",),
+}
+
+
+def base_service_name(booking) -> str:
+    return booking.service.get_description().split(" + ")[0]
+
+
+def is_specialist(barber, base_service: str) -> bool:
+    specialization = (barber.specialization or "").lower()
+    return any(keyword in specialization for keyword in SPECIALTIES.get(base_service, ()))
+
+
+@dataclass
+class AssignmentPlan:
+    """Result of plan_assignments: booking -> barber, plus what did not fit"""
+    assignments: Dict[str, str] = field(default_factory=dict)
+    unassigned: List[str] = field(default_factory=list)
+    # barber_id -> booked minutes for the day after the assignment
+    load: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class _Item:
+    booking_id: str
+    start: int
+    mask: int
+    minutes: int
+    specialists: Set[str]
+
+
+def plan_assignments(bookings: Iterable, barbers: Iterable, free: Dict[str, int],
+                     load: Optional[Dict[str, int]] = None) -> AssignmentPlan:
+    """Assign unassigned bookings of one day to barbers.
+
+    free maps barber_id to the bitmap of their free working slots that day,
+    load to the minutes they are already booked (used for balancing).
+    """
+    barbers = list(barbers)
+    free = {b.user_id: free.get(b.user_id, 0) for b in barbers}
+    load = {b.user_id: (load or {}).get(b.user_id, 0) for b in barbers}
+    items = []
+    for booking in bookings:
+        mask = interval_mask(booking.booking_time, booking.duration)
+        base = base_service_name(booking)
+        items.append(_Item(booking.booking_id, booking.booking_time.hour * 60 + booking.booking_time.minute,
+                           mask, bitmap_minutes(mask), {b.user_id for b in barbers if is_specialist(b, base)}))
+    items.sort(key=lambda item: (item.start, -item.minutes, item.booking_id))
+
+    plan = AssignmentPlan()
+    placed: Dict[str, List[_Item]] = {b.user_id: [] for b in barbers}
+
+    def place(item: _Item, barber_id: str):
+        free[barber_id] &= ~item.mask
+        load[barber_id] += item.minutes
+        placed[barber_id].append(item)
+        plan.assignments[item.booking_id] = barber_id
+
+    def unplace(item: _Item, barber_id: str):
+        free[barber_id] |= item.mask
+        load[barber_id] -= item.minutes
+        placed[barber_id].remove(item)
+
+    for item in items:
+        fits = [b for b in load if free[b] & item.mask == item.mask]
+        if fits:
+            place(item, min(fits, key=lambda b: (b not in item.specialists, load[b], b)))
+            continue
+        if not _repair(item, free, placed, place, unplace):
+            plan.unassigned.append(item.booking_id)
+
+    plan.load = load
+    return plan
+
+
+def _repair(item: _Item, free: Dict[str, int], placed: Dict[str, List[_Item]], place, unplace) -> bool:
+    """Fit item by moving one booking of this batch to another barber"""
+    for barber_id, items in placed.items():
+        blockers = [other for other in items if other.mask & item.mask]
+        if len(blockers) != 1:
+            continue
+        blocker = blockers[0]
+        if (free[barber_id] | blocker.mask) & item.mask != item.mask:
+            continue
+        target = next((b for b in placed if b != barber_id and free[b] & blocker.mask == blocker.mask), None)
+        if target is None:
+            continue
+        unplace(blocker, barber_id)
+        place(blocker, target)
+        place(item, barber_id)
+        return True
+    return False
@@ -0,0 +1,151 @@
+# ============================================================================
+# AVAILABILITY - Precomputed per barber-day availability bitmaps
+# ============================================================================
+#
+# A day is split into SLOT_MINUTES slots and stored as the bits of a Python
+# int (bit i = slot starting at i * SLOT_MINUTES). Working hours are compiled
+# from the barber's Schedule once per (barber, day) and cached until that
+# barber's schedule version changes. Validation and slot search then reduce
+# to a few integer AND/OR operations. Each barber keeps the CACHED_DAYS most
+# recently used days, so a long-running process does not keep a bitmap for
+# every day it was ever asked about.
+
+import threading
+from collections import OrderedDict
+from datetime import date, time, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.schedule import Schedule, DEFAULT_WEEKLY_HOURS
+from utils.enums import BookingStatus
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+CACHED_DAYS = 64
+
+
+def _slot_index(value: time, round_up: bool = False) -> int:
+    minutes = value.hour * 60 + value.minute
+    slot, remainder = divmod(minutes, SLOT_MINUTES)
+    return slot + (1 if round_up and remainder else 0)
+
+
+def interval_mask(start: time, duration_minutes: int) -> int:
+    """Bitmask covering [start, start + duration), clipped to the day"""
+    first = _slot_index(start)
+    end = datetime.combine(date.min, start) + timedelta(minutes=duration_minutes)
+    if end.date() > date.min:
+        last = SLOTS_PER_DAY
+    else:
+        last = _slot_index(end.time(), round_up=True)
+    return ((1 << max(last - first, 0)) - 1) << first
+
+
+def compile_intervals(intervals: Iterable[Tuple[time, time]]) -> int:
+    """Bitmap of the slots fully or partly inside the given intervals"""
+    bitmap = 0
+    for start, end in intervals:
+        first = _slot_index(start)
+        last = SLOTS_PER_DAY if end == time(0, 0) else _slot_index(end, round_up=True)
+        if last > first:
+            bitmap |= ((1 << (last - first)) - 1) << first
+    return bitmap
+
+
+def bitmap_minutes(bitmap: int) -> int:
+    """Total minutes covered by the set slots"""
+    return bin(bitmap).count("1") * SLOT_MINUTES
+
+
+class AvailabilityIndex:
+    """Cache of compiled working-hour bitmaps keyed by barber and day"""
+
+    def __init__(self, db, cache_days: int = CACHED_DAYS):
+        self.db = db
+        self.cache_days = cache_days
+        # barber_id -> (schedule version, {day: bitmap} least recently used first)
+        self._cache: Dict[str, Tuple[int, 'OrderedDict[date, int]']] = {}
+        self._lock = threading.Lock()
+
+    def schedule_for(self, barber_id: str) -> Schedule:
+        schedule = self.db.schedules.get(barber_id)
+        return schedule if schedule is not None else Schedule(barber_id)
+
+    def invalidate(self, barber_id: Optional[str] = None):
+        """Drop cached bitmaps for one barber, or all of them"""
+        with self._lock:
+            if barber_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(barber_id, None)
+
+    def working_bitmap(self, barber_id: str, day: date) -> int:
+        schedule = self.db.schedules.get(barber_id)
+        version = schedule.version if schedule is not None else 0
+        with self._lock:
+            cached = self._cache.get(barber_id)
+            if cached is None or cached[0] != version:
+                cached = self._cache[barber_id] = (version, OrderedDict())
+            days = cached[1]
+            bitmap = days.get(day)
+            if bitmap is not None:
+                days.move_to_end(day)
+                return bitmap
+        if schedule is None:
+            bitmap = compile_intervals(DEFAULT_WEEKLY_HOURS.get(day.weekday(), []))
+        else:
+            bitmap = compile_intervals(schedule.working_intervals(day))
+        with self._lock:
+            days[day] = bitmap
+            while len(days) > self.cache_days:
+                days.popitem(last=False)
+        return bitmap
+
+    def booked_bitmap(self, bookings: Iterable, exclude_id: Optional[str] = None) -> int:
+        bitmap = 0
+        for booking in bookings:
+            if booking.status == BookingStatus.CANCELED or booking.booking_id == exclude_id:
+                continue
+            bitmap |= interval_mask(booking.booking_time, booking.duration)
+        return bitmap
+
+    def is_working(self, barber_id: str, day: date, start: time, duration_minutes: int) -> bool:
+        mask = interval_mask(start, duration_minutes)
+        return self.working_bitmap(barber_id, day) & mask == mask
+
+    def free_bitmap(self, barber_id: str, day: date, bookings: Iterable) -> int:
+        return self.working_bitmap(barber_id, day) & ~self.booked_bitmap(bookings)
+
+    def free_minutes_from(self, barber_id: str, day: date, start: time, bookings: Iterable) -> int:
+        """Length of the uninterrupted free working time beginning at start"""
+        free = self.free_bitmap(barber_id, day, bookings) >> _slot_index(start)
+        # Number of trailing one bits
+        run = (~free & (free + 1)).bit_length() - 1
+        return run * SLOT_MINUTES
+
+    def find_slots(self, barber_id: str, day: date, duration_minutes: int, bookings: Iterable,
+                   step_minutes: int = 15, not_before: Optional[time] = None) -> List[time]:
+        """Start times where the whole service fits into free working time"""
+        free = self.free_bitmap(barber_id, day, bookings)
+        if not free:
+            return []
+        width = max(1, -(-duration_minutes // SLOT_MINUTES))
+        block = (1 << width) - 1
+        step = max(1, step_minutes // SLOT_MINUTES)
+        first = _slot_index(not_before, round_up=True) if not_before else 0
+        first += (-first) % step
+        slots = []
+        for index in range(first, SLOTS_PER_DAY - width + 1, step):
+            if (free >> index) & block == block:
+                minutes = index * SLOT_MINUTES
+                slots.append(time(minutes // 60, minutes % 60))
+        return slots
+
+
+_index: Optional[AvailabilityIndex] = None
+
+
+def availability_for(db) -> AvailabilityIndex:
+    """Shared index for the DatabaseManager singleton"""
+    global _index
+    if _index is None or _index.db is not db:
+        _index = AvailabilityIndex(db)
+    return _index
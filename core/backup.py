@@ -0,0 +1,402 @@
+# ============================================================================
+# BACKUP - Compressed full and incremental backups with verified restore
+# ============================================================================
+#
+# Usage (the app also takes one daily at BACKUP_AT):
+#   python -m core.backup create [--full]
+#   python -m core.backup list
+#   python -m core.backup verify [NAME]
+#   python -m core.backup restore [NAME] [--to barbershop_data.json] [--force]
+#
+# A backup covers the data file, the booking event log and the archive
+# segments. It works on files, not on the live DatabaseManager: the file lock
+# is held only to open the data file and note the event log size. Saves
+# replace the data file with a rename, so the opened file stays an unchanging
+# snapshot while it is read, compressed and diffed; the event log is append
+# only, so bytes before the noted size never change. Writers are never held
+# up by the compression work.
+#
+# Every FULL_EVERY-th backup is a full gzip snapshot. The ones in between are
+# deltas that store only records added, changed or removed since the previous
+# backup (found by comparing per-record hashes) and the event log bytes
+# appended since. Archive segments are immutable and copied once. Each file's
+# SHA-256 is kept in catalog.json; restore verifies the whole chain before it
+# writes anything. The newest KEEP_FULL chains are kept.
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from datetime import time as clock_time
+from typing import List, Optional, Tuple
+
+from core.history import EVENTS_SUFFIX
+from core.scheduler import TimerScheduler
+from utils.archive_store import ARCHIVE_SUFFIX
+from utils.file_lock import FileLock
+from utils.metrics import metrics, timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "backups"
+BACKUP_AT = clock_time(2, 30)
+FULL_EVERY = 7
+KEEP_FULL = 4
+# A delta touching more than this share of all records is written as a full backup
+MAX_DELTA_SHARE = 0.5
+
+_CHUNK = 1 << 20
+
+
+def _record_hash(record) -> str:
+    return hashlib.blake2b(json.dumps(record, sort_keys=True, separators=(',', ':')).encode('utf-8'),
+                           digest_size=8).hexdigest()
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+class BackupManager:
+    """Backups of one data file (with its event log and archive) in a directory"""
+
+    def __init__(self, data_file: Optional[str] = None, directory: str = DEFAULT_DIRECTORY,
+                 full_every: int = FULL_EVERY, keep_full: int = KEEP_FULL):
+        if data_file is None:
+            from patterns.singleton import DatabaseManager
+            data_file = DatabaseManager.DATA_FILE
+        self.data_file = data_file
+        base = os.path.splitext(data_file)[0]
+        self.events_file = base + EVENTS_SUFFIX
+        self.archive_dir = base + ARCHIVE_SUFFIX
+        self.directory = directory
+        self.segments_dir = os.path.join(directory, "segments")
+        self.full_every = full_every
+        self.keep_full = keep_full
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def backups(self) -> List[dict]:
+        """Catalog entries, oldest first"""
+        try:
+            with open(self._path("catalog.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)['backups']
+        except FileNotFoundError:
+            return []
+
+    def _save_catalog(self, backups: List[dict]):
+        _write_atomic(self._path("catalog.json"),
+                      json.dumps({'backups': backups}, indent=1).encode('utf-8'))
+
+    def _load_hashes(self, name: str) -> Optional[dict]:
+        """Record hashes as of backup name (kept for the newest backup only)"""
+        try:
+            with gzip.open(self._path("hashes.json.gz"), 'rt', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state['hashes'] if state.get('backup') == name else None
+
+    def _chain(self, name: Optional[str] = None) -> List[dict]:
+        """Backups to restore name (newest by default): its full backup, then each delta"""
+        by_name = {entry['name']: entry for entry in self.backups()}
+        if not by_name:
+            raise FileNotFoundError(f"No backups in {self.directory}")
+        entry = by_name.get(name) if name else self.backups()[-1]
+        if entry is None:
+            raise FileNotFoundError(f"Unknown backup: {name}")
+        chain = [entry]
+        while chain[-1]['kind'] == 'delta':
+            chain.append(by_name[chain[-1]['base']])
+        chain.reverse()
+        return chain
+
+    # ------------------------------------------------------------------
+    # Backup
+    # ------------------------------------------------------------------
+
+    def _capture(self) -> Tuple[object, int]:
+        """Open the data file and note the event log size, atomically w.r.t. writers"""
+        started = time.perf_counter()
+        with FileLock(self.data_file + ".lock"):
+            data = open(self.data_file, 'rb')
+            try:
+                events_size = os.path.getsize(self.events_file)
+            except FileNotFoundError:
+                events_size = 0
+        if metrics.enabled:
+            metrics.observe("backup.lock_held", time.perf_counter() - started)
+        return data, events_size
+
+    @timed("backup.create")
+    def backup(self, full: bool = False) -> dict:
+        """Take a backup (a delta when possible) and return its catalog entry"""
+        os.makedirs(self.segments_dir, exist_ok=True)
+        # One backup at a time per directory (scheduled job vs. command line)
+        with FileLock(self._path("backup.lock")):
+            return self._backup(full)
+
+    def _backup(self, full: bool) -> dict:
+        handle, events_size = self._capture()
+        with handle:
+            data = json.load(handle)
+        hashes = {collection: {key: _record_hash(record) for key, record in records.items()}
+                  for collection, records in data.items() if isinstance(records, dict)}
+
+        backups = self.backups()
+        previous = backups[-1] if backups else None
+        base_hashes = self._load_hashes(previous['name']) if previous else None
+        since_full = 0
+        for entry in reversed(backups):
+            if entry['kind'] == 'full':
+                break
+            since_full += 1
+        delta = None
+        if (not full and base_hashes is not None and since_full + 1 < self.full_every and
+                events_size >= previous['events_size']):
+            delta = {}
+            for collection, current in hashes.items():
+                before = base_hashes.get(collection, {})
+                changes = {key: data[collection][key] for key, digest in current.items()
+                           if before.get(key) != digest}
+                changes.update((key, None) for key in before if key not in current)
+                if changes:
+                    delta[collection] = changes
+            total = sum(len(current) for current in hashes.values())
+            if sum(len(changes) for changes in delta.values()) > MAX_DELTA_SHARE * total:
+                delta = None
+
+        number = int(previous['name'].split('-')[0]) + 1 if previous else 1
+        kind = 'delta' if delta is not None else 'full'
+        name = f"{number:06d}-{kind}-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        entry = {'name': name, 'kind': kind,
+                 'base': previous['name'] if delta is not None else None,
+                 'created_at': datetime.now().isoformat(timespec='seconds'),
+                 'records': sum(len(current) for current in hashes.values()),
+                 'changed': (sum(len(changes) for changes in delta.values()) if delta is not None
+                             else None),
+                 'events_start': previous['events_size'] if delta is not None else 0,
+                 'events_size': events_size,
+                 'segments': sorted(data.get('archive', {})),
+                 'files': {}}
+
+        # Data: the whole document, or only the changed records
+        payload = {'data': data} if delta is None else {'changes': delta}
+        data_file = f"{name}.json.gz"
+        _write_atomic(self._path(data_file),
+                      gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6, mtime=0))
+        entry['files'][data_file] = _sha256_file(self._path(data_file))
+
+        # Event log bytes appended since the base backup
+        events_file = f"{name}.events.gz"
+        tmp_file = f"{self._path(events_file)}.{os.getpid()}.tmp"
+        with gzip.open(tmp_file, 'wb', compresslevel=6) as out:
+            if events_size > entry['events_start']:
+                with open(self.events_file, 'rb') as log:
+                    log.seek(entry['events_start'])
+                    remaining = events_size - entry['events_start']
+                    while remaining:
+                        chunk = log.read(min(_CHUNK, remaining))
+                        if not chunk:
+                            raise OSError(f"{self.events_file} is shorter than {events_size} bytes")
+                        out.write(chunk)
+                        remaining -= len(chunk)
+        os.replace(tmp_file, self._path(events_file))
+        entry['files'][events_file] = _sha256_file(self._path(events_file))
+
+        # Archive segments are immutable and already compressed: copy each new one once
+        for segment, manifest in data.get('archive', {}).items():
+            copy = os.path.join(self.segments_dir, segment)
+            if not os.path.exists(copy):
+                if _sha256_file(os.path.join(self.archive_dir, segment)) != manifest['sha256']:
+                    raise ValueError(f"Archive segment {segment} is corrupted (checksum mismatch)")
+                shutil.copyfile(os.path.join(self.archive_dir, segment), copy + ".tmp")
+                os.replace(copy + ".tmp", copy)
+
+        backups.append(entry)
+        self._save_catalog(backups)
+        _write_atomic(self._path("hashes.json.gz"), gzip.compress(
+            json.dumps({'backup': name, 'hashes': hashes}, separators=(',', ':')).encode('utf-8'), 6, mtime=0))
+        self.prune()
+        logger.info("Backup %s written (%s, %s records changed)", name, entry['kind'],
+                    entry['changed'] if delta is not None else "all")
+        return entry
+
+    def prune(self) -> List[str]:
+        """Drop backups older than the newest keep_full full backups; returns their names"""
+        backups = self.backups()
+        fulls = [i for i, entry in enumerate(backups) if entry['kind'] == 'full']
+        if len(fulls) <= self.keep_full:
+            return []
+        first_kept = fulls[-self.keep_full]
+        dropped, kept = backups[:first_kept], backups[first_kept:]
+        self._save_catalog(kept)
+        for entry in dropped:
+            for filename in entry['files']:
+                try:
+                    os.remove(self._path(filename))
+                except FileNotFoundError:
+                    pass
+        referenced = {segment for entry in kept for segment in entry['segments']}
+        for segment in os.listdir(self.segments_dir):
+            if segment not in referenced:
+                os.remove(os.path.join(self.segments_dir, segment))
+        return [entry['name'] for entry in dropped]
+
+    def schedule_daily(self, scheduler: TimerScheduler, at: clock_time = BACKUP_AT):
+        """Take a backup every day at the given time"""
+        scheduler.every_day('backup', at, self.backup)
+
+    # ------------------------------------------------------------------
+    # Verify & restore
+    # ------------------------------------------------------------------
+
+    def verify(self, name: Optional[str] = None) -> List[str]:
+        """Problems found checking every file needed to restore name (none means restorable)"""
+        return self._check(self._chain(name))[0]
+
+    def _check(self, chain: List[dict]) -> Tuple[List[str], Optional[dict]]:
+        """(problems, restored data document) of a chain; data is None if files are damaged"""
+        problems = []
+        for entry in chain:
+            for filename, sha256 in entry['files'].items():
+                path = self._path(filename)
+                if not os.path.exists(path):
+                    problems.append(f"{filename}: missing")
+                elif _sha256_file(path) != sha256:
+                    problems.append(f"{filename}: checksum mismatch")
+        if problems:
+            return problems, None
+        data = self._restore_data(chain)
+        for segment, manifest in data.get('archive', {}).items():
+            path = os.path.join(self.segments_dir, segment)
+            if not os.path.exists(path):
+                problems.append(f"segments/{segment}: missing")
+            elif _sha256_file(path) != manifest['sha256']:
+                problems.append(f"segments/{segment}: checksum mismatch")
+        return problems, data
+
+    def _restore_data(self, chain: List[dict]) -> dict:
+        data = None
+        for entry in chain:
+            with gzip.open(self._path(f"{entry['name']}.json.gz"), 'rt', encoding='utf-8') as f:
+                payload = json.load(f)
+            if entry['kind'] == 'full':
+                data = payload['data']
+                continue
+            for collection, changes in payload['changes'].items():
+                records = data.setdefault(collection, {})
+                for key, record in changes.items():
+                    if record is None:
+                        records.pop(key, None)
+                    else:
+                        records[key] = record
+        return data
+
+    @timed("backup.restore")
+    def restore(self, name: Optional[str] = None, target: Optional[str] = None, force: bool = False) -> dict:
+        """Verify the chain of backup name, then write its data file, event log and archive.
+
+        target is the data file to create (the backed-up one by default); an
+        existing file is only replaced with force. Returns the catalog entry.
+        """
+        target = target or self.data_file
+        if os.path.exists(target) and not force:
+            raise FileExistsError(f"{target} exists, pass force to replace it")
+        chain = self._chain(name)
+        problems, data = self._check(chain)
+        if problems:
+            raise ValueError("Backup is damaged: " + "; ".join(problems))
+
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        base = os.path.splitext(target)[0]
+        archive_dir = base + ARCHIVE_SUFFIX
+        if data.get('archive'):
+            os.makedirs(archive_dir, exist_ok=True)
+        for segment in data.get('archive', {}):
+            path = os.path.join(archive_dir, segment)
+            if not os.path.exists(path):
+                shutil.copyfile(os.path.join(self.segments_dir, segment), path + ".tmp")
+                os.replace(path + ".tmp", path)
+
+        events_tmp = f"{base}{EVENTS_SUFFIX}.{os.getpid()}.tmp"
+        with open(events_tmp, 'wb') as out:
+            for entry in chain:
+                with gzip.open(self._path(f"{entry['name']}.events.gz"), 'rb') as f:
+                    shutil.copyfileobj(f, out, _CHUNK)
+        # Checkpoints and reports are derived from the log; stale ones would not match it
+        shutil.rmtree(base + EVENTS_SUFFIX + ".checkpoints", ignore_errors=True)
+        os.replace(events_tmp, base + EVENTS_SUFFIX)
+
+        # Same layout as DatabaseManager._save_to_json, written last
+        _write_atomic(target, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
+        return chain[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore the barbershop data")
+    parser.add_argument("--data-file", default=None, help="data file (default: barbershop_data.json)")
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help=f"backup directory (default: {DEFAULT_DIRECTORY})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="take a backup")
+    create.add_argument("--full", action="store_true", help="full backup even if a delta is possible")
+    commands.add_parser("list", help="list backups")
+    verify = commands.add_parser("verify", help="check the files needed to restore a backup")
+    verify.add_argument("name", nargs="?")
+    restore = commands.add_parser("restore", help="restore a backup (the newest by default)")
+    restore.add_argument("name", nargs="?")
+    restore.add_argument("--to", default=None, help="data file to write (default: the backed-up one)")
+    restore.add_argument("--force", action="store_true", help="replace an existing data file")
+    args = parser.parse_args()
+
+    manager = BackupManager(args.data_file, args.dir)
+    if args.command == "create":
+        entry = manager.backup(full=args.full)
+        print(f"{entry['name']}: {entry['kind']}, {entry['records']} records"
+              + (f", {entry['changed']} changed" if entry['kind'] == 'delta' else ""))
+    elif args.command == "list":
+        for entry in manager.backups():
+            size = sum(os.path.getsize(manager._path(f)) for f in entry['files'] if os.path.exists(manager._path(f)))
+            print(f"{entry['name']:<40} {entry['kind']:<6} {entry['records']:>8} records  {size / 1024:>9.1f} KB")
+    elif args.command == "verify":
+        problems = manager.verify(args.name)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ Backup verified")
+    else:
+        try:
+            entry = manager.restore(args.name, args.to, args.force)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Restored {entry['name']}")
+
+
+if __name__ == "__main__":
+    main()
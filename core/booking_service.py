@@ -0,0 +1,768 @@
+# ============================================================================
+# BOOKING SERVICE - UI independent booking, payment and feedback operations
+# ============================================================================
+#
+# Every mutation runs inside a short DatabaseManager.transaction() and persists
+# before returning, and reads that scan the collections hold db.lock, so the
+# Streamlit UI, the ASGI API (thread pool) and background workers can all
+# drive the same data safely. Errors are raised as BarbershopError
+# subclasses; callers decide how to present them.
+#
+# Mutations accept an optional expected_version: the version of the entity the
+# caller last displayed. A stale version raises ConcurrencyError (retryable)
+# instead of silently applying the action twice.
+#
+# New bookings are planned with the barber's learned duration for the service
+# (see estimate_duration) once enough of them were timed.
+#
+# Customer-facing and bulk mutations go through admission control first
+# (core.admission): too many calls from one user, or too many writes at once,
+# raise RateLimitedError (retryable) before any lock is taken.
+
+from datetime import date, time, datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from patterns.singleton import DatabaseManager
+from patterns.factory import ServiceFactory
+from patterns.observer import Observer
+from models.user import User, Customer, Barber
+from models.booking import Booking
+from models.payment import Payment
+from models.feedback import Feedback
+from models.schedule import Schedule
+from models.waitlist import WaitlistEntry
+from models.walk_in import WalkIn
+from core.availability import SLOT_MINUTES, availability_for, interval_mask, bitmap_minutes
+from core.assignment import AssignmentPlan, plan_assignments
+from core.waitlist import waitlist_for
+from core.history import history_for
+from core.archive import archive_for
+from core.admission import admitted
+from utils.enums import BookingStatus, PaymentMethod, PaymentStatus, UserRole, WaitlistStatus, WalkInStatus
+from utils.exceptions import (BarbershopError, NotFoundError, ValidationError, InvalidStateError,
+                              SlotConflictError)
+
+WAITLIST_MAX_DAYS = 14
+# Completed bookings of a barber and service needed before their actual times
+# replace the catalog duration, and how far a learned length may stray from it
+LEARNED_MIN_SAMPLES = 5
+LEARNED_MIN_FACTOR = 0.5
+LEARNED_MAX_FACTOR = 2.0
+SHOP = "shop"
+
+
+# Rate limit subjects (core.admission) resolved from a call's arguments
+
+def _booking_customer(args: dict) -> str:
+    """Customer a booking call is made for; the booking id if it is not active"""
+    db = args['self'].db
+    with db.lock:
+        booking = db.bookings.get(args['booking_id'])
+    return booking.customer_id if booking is not None else args['booking_id']
+
+
+def _bookings_barber(args: dict) -> str:
+    """Barber whose bookings a bulk call completes; SHOP if several (the owner)"""
+    db, booking_ids = args['self'].db, args['booking_ids']
+    if not isinstance(booking_ids, (list, tuple, set)):
+        # Do not consume an iterator the call itself needs
+        return SHOP
+    with db.lock:
+        barbers = {getattr(db.bookings.get(booking_id), 'barber_id', None) for booking_id in booking_ids}
+    if len(barbers) == 1:
+        return barbers.pop() or SHOP
+    return SHOP
+
+
+class BookingService:
+    """Facade over DatabaseManager for all booking workflows"""
+
+    def __init__(self, db: Optional[DatabaseManager] = None, observers: Iterable[Observer] = ()):
+        self.db = db or DatabaseManager()
+        self.observers: List[Observer] = list(observers)
+        self.availability = availability_for(self.db)
+        self.waitlist = waitlist_for(self.db)
+        # Records every committed change to bookings, payments and feedbacks
+        self.history = history_for(self.db)
+        # Old finished bookings moved out of memory, readable on demand
+        self.archive = archive_for(self.db)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get_user(self, user_id: str, role: Optional[UserRole] = None) -> User:
+        with self.db.lock:
+            user = self.db.users.get(user_id)
+        if user is None or (role is not None and user.role != role):
+            label = role.value if role else "user"
+            raise NotFoundError(f"Unknown {label}: {user_id}")
+        return user
+
+    def get_booking(self, booking_id: str) -> Booking:
+        booking = self.db.bookings.get(booking_id)
+        if booking is None:
+            raise NotFoundError(f"Unknown booking: {booking_id}")
+        return booking
+
+    def find_booking(self, booking_id: str) -> Booking:
+        """Active or archived booking; archived ones are read-only"""
+        booking = self.db.bookings.get(booking_id) or self.archive.find_booking(booking_id)
+        if booking is None:
+            raise NotFoundError(f"Unknown booking: {booking_id}")
+        return booking
+
+    def get_payment_for_booking(self, booking_id: str) -> Optional[Payment]:
+        payments = self.db.payments_for_booking(booking_id)
+        if not payments and booking_id not in self.db.bookings:
+            payments = self.archive.payments_for_booking(booking_id)
+        return payments[0] if payments else None
+
+    def available_barbers(self) -> List[Barber]:
+        with self.db.lock:
+            return [u for u in self.db.users.values() if u.role == UserRole.BARBER and u.is_available]
+
+    def list_schedule(self, barber_id: Optional[str] = None, day: Optional[date] = None,
+                      include_canceled: bool = False) -> List[Booking]:
+        """Bookings for a barber and/or day ordered by date and time"""
+        with self.db.lock:
+            bookings = [b for b in self.db.bookings.values()
+                        if (barber_id is None or b.barber_id == barber_id) and
+                        (day is None or b.booking_date == day) and
+                        (include_canceled or b.status != BookingStatus.CANCELED)]
+        bookings.sort(key=lambda b: (b.booking_date, b.booking_time))
+        return bookings
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+
+    def authenticate(self, email: str, password: str) -> Optional[User]:
+        return self.db.find_user_by_credentials(email, password)
+
+    @admitted('register_customer', subject='email')
+    def register_customer(self, name: str, email: str, phone: str, password: str) -> Customer:
+        if not all([name, email, phone, password]):
+            raise ValidationError("All fields are required")
+
+        with self.db.transaction():
+            if any(u.email == email for u in self.db.users.values()):
+                raise ValidationError("Email already registered")
+            customer_count = len([u for u in self.db.users.values() if u.role == UserRole.CUSTOMER])
+            user_id = f"C{customer_count + 1:03d}"
+            customer = Customer(user_id, name, email, password, phone)
+            self.db.add_user(customer)
+        return customer
+
+    def toggle_availability(self, barber_id: str, expected_version: Optional[int] = None) -> Barber:
+        with self.db.transaction():
+            barber = self.get_user(barber_id, UserRole.BARBER)
+            self.db.bump_version(barber, expected_version)
+            barber.is_available = not barber.is_available
+        return barber
+
+    # ------------------------------------------------------------------
+    # Working hours
+    # ------------------------------------------------------------------
+
+    def get_schedule(self, barber_id: str) -> Schedule:
+        self.get_user(barber_id, UserRole.BARBER)
+        return self.availability.schedule_for(barber_id)
+
+    def _edit_schedule(self, barber_id: str, expected_version: Optional[int]) -> Schedule:
+        """Stored schedule ready for mutation, must be called inside a transaction"""
+        self.get_user(barber_id, UserRole.BARBER)
+        schedule = self.db.schedules.get(barber_id)
+        if schedule is None:
+            schedule = self.db.set_schedule(Schedule(barber_id))
+        self.db.bump_version(schedule, expected_version)
+        return schedule
+
+    def update_weekly_hours(self, barber_id: str, weekly_hours: Dict[int, List[Tuple[time, time]]],
+                            breaks: Optional[Dict[int, List[Tuple[time, time]]]] = None,
+                            expected_version: Optional[int] = None) -> Schedule:
+        for start, end in [i for v in weekly_hours.values() for i in v] + \
+                [i for v in (breaks or {}).values() for i in v]:
+            if start >= end:
+                raise ValidationError("Each interval must end after it starts")
+        with self.db.transaction():
+            schedule = self._edit_schedule(barber_id, expected_version)
+            schedule.weekly_hours = {d: sorted(v) for d, v in weekly_hours.items()}
+            if breaks is not None:
+                schedule.breaks = {d: sorted(v) for d, v in breaks.items()}
+        return schedule
+
+    def set_day_off(self, barber_id: str, day: date, off: bool = True,
+                    expected_version: Optional[int] = None) -> Schedule:
+        with self.db.transaction():
+            schedule = self._edit_schedule(barber_id, expected_version)
+            if off:
+                schedule.days_off.add(day)
+            else:
+                schedule.days_off.discard(day)
+        return schedule
+
+    def set_override(self, barber_id: str, day: date, intervals: Optional[List[Tuple[time, time]]],
+                     expected_version: Optional[int] = None) -> Schedule:
+        """Replace working hours for one date; None removes the override"""
+        if intervals and any(start >= end for start, end in intervals):
+            raise ValidationError("Each interval must end after it starts")
+        with self.db.transaction():
+            schedule = self._edit_schedule(barber_id, expected_version)
+            if intervals is None:
+                schedule.overrides.pop(day, None)
+            else:
+                schedule.overrides[day] = sorted(intervals)
+        return schedule
+
+    # ------------------------------------------------------------------
+    # Booking lifecycle
+    # ------------------------------------------------------------------
+
+    def _attach_observers(self, booking: Booking):
+        """Bookings are shared by every session: observers must be process-wide"""
+        for observer in self.observers:
+            if observer not in booking._observers:
+                booking.attach(observer)
+
+    def _check_slot(self, barber_id: str, booking_date: date, booking_time: time, duration: int):
+        """Raise SlotConflictError if the slot is outside working hours or already booked"""
+        if not self.availability.is_working(barber_id, booking_date, booking_time, duration):
+            raise SlotConflictError("The barber is not working at that time, please choose another time")
+        day_bookings = self.list_schedule(barber_id=barber_id, day=booking_date)
+        mask = interval_mask(booking_time, duration)
+        if self.availability.booked_bitmap(day_bookings) & mask:
+            raise SlotConflictError("This barber is already booked at that time, please choose another time")
+
+    def estimate_duration(self, barber_id: Optional[str], base_service: str, addons: Iterable[str]) -> int:
+        """Minutes to plan for a service with a barber.
+
+        The 90th percentile of the barber's actual times for this service and
+        add-on set, rounded up to whole slots, once LEARNED_MIN_SAMPLES were
+        recorded; otherwise (or without a barber) the catalog duration.
+        """
+        try:
+            service = ServiceFactory.create_service(base_service, list(addons))
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+        catalog = service.get_duration()
+        if barber_id is None:
+            return catalog
+        stats = self.history.duration_stats(barber_id, service.get_description())
+        if stats is None or stats.count < LEARNED_MIN_SAMPLES:
+            return catalog
+        minutes = min(max(round(stats.p90), catalog * LEARNED_MIN_FACTOR), catalog * LEARNED_MAX_FACTOR)
+        return int(-(-minutes // SLOT_MINUTES) * SLOT_MINUTES)
+
+    def find_available_slots(self, barber_id: str, day: date, duration: int,
+                             step_minutes: int = 15) -> List[time]:
+        """Start times on day where a service of the given duration fits"""
+        not_before = datetime.now().time() if day == date.today() else None
+        return self.availability.find_slots(barber_id, day, duration,
+                                            self.list_schedule(barber_id=barber_id, day=day),
+                                            step_minutes, not_before)
+
+    @admitted('create_booking', subject='customer_id')
+    def create_booking(self, customer_id: str, base_service: str, addons: Iterable[str],
+                       booking_date: date, booking_time: time,
+                       barber_id: Optional[str] = None) -> Booking:
+        return self._create_booking(customer_id, base_service, addons, booking_date, booking_time, barber_id)
+
+    def _create_booking(self, customer_id: str, base_service: str, addons: Iterable[str],
+                        booking_date: date, booking_time: time, barber_id: Optional[str] = None,
+                        duration: Optional[int] = None) -> Booking:
+        """Create a booking planned for duration minutes (default: estimate_duration)"""
+        addons = list(addons)
+        try:
+            service = ServiceFactory.create_service(base_service, addons)
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+        if booking_date < date.today():
+            raise ValidationError("Booking date cannot be in the past")
+
+        with self.db.transaction():
+            self.get_user(customer_id, UserRole.CUSTOMER)
+            if barber_id is not None:
+                barber = self.get_user(barber_id, UserRole.BARBER)
+                if not barber.is_available:
+                    raise InvalidStateError(f"Barber {barber.name} is not available")
+            if duration is None:
+                duration = self.estimate_duration(barber_id, base_service, addons)
+            if barber_id is not None:
+                self._check_slot(barber_id, booking_date, booking_time, duration)
+
+            booking_id = self.db.next_id('bookings', "BK")
+            booking = Booking(
+                booking_id=booking_id,
+                customer_id=customer_id,
+                service=service,
+                barber_id=barber_id,
+                booking_date=booking_date,
+                booking_time=booking_time,
+                status=BookingStatus.SCHEDULED,
+                planned_minutes=duration if duration != service.get_duration() else None
+            )
+            self.db.add_booking(booking)
+            if barber_id is None:
+                self.assign_unassigned(booking_date)
+
+        self._attach_observers(booking)
+        booking.notify('confirmation', {
+            'user_id': customer_id,
+            'message': f'Booking {booking_id} confirmed for {booking_date} at {booking_time}'
+        })
+        return booking
+
+    def assign_unassigned(self, day: date) -> AssignmentPlan:
+        """Assign the day's "Any Available" bookings to available barbers.
+
+        Existing bookings and working hours are respected; bookings that fit
+        nowhere stay unassigned until the next run.
+        """
+        now = datetime.now()
+        with self.db.transaction():
+            day_bookings = self.list_schedule(day=day)
+            pending = [b for b in day_bookings
+                       if b.barber_id is None and b.status == BookingStatus.SCHEDULED and
+                       datetime.combine(day, b.booking_time) > now]
+            if not pending:
+                return AssignmentPlan()
+            barbers = self.available_barbers()
+            free, load = {}, {}
+            for barber in barbers:
+                busy = self.availability.booked_bitmap(b for b in day_bookings if b.barber_id == barber.user_id)
+                free[barber.user_id] = self.availability.working_bitmap(barber.user_id, day) & ~busy
+                load[barber.user_id] = bitmap_minutes(busy)
+            plan = plan_assignments(pending, barbers, free, load)
+            assigned = []
+            for booking_id, barber_id in plan.assignments.items():
+                booking = self.db.bookings[booking_id]
+                self.db.bump_version(booking)
+                booking.barber_id = barber_id
+                assigned.append(booking)
+
+        for booking in assigned:
+            self._attach_observers(booking)
+            booking.notify('assignment', {
+                'user_id': booking.customer_id,
+                'message': f'Booking {booking.booking_id} was assigned to '
+                           f'{self.db.users[booking.barber_id].name}'
+            })
+        return plan
+
+    @admitted('cancel_booking', subject=_booking_customer)
+    def cancel_booking(self, booking_id: str, expected_version: Optional[int] = None) -> Booking:
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            self.db.check_version(booking, expected_version)
+            error = booking.cancellation_error()
+            if error:
+                raise InvalidStateError(error)
+            self.db.bump_version(booking)
+            self._attach_observers(booking)
+            booking.cancel()
+            self._fill_from_waitlist(booking)
+        return booking
+
+    def start_booking(self, booking_id: str, expected_version: Optional[int] = None) -> Booking:
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            self.db.check_version(booking, expected_version)
+            if booking.status != BookingStatus.SCHEDULED:
+                raise InvalidStateError(f"Cannot start a {booking.status.value} booking")
+            self.db.bump_version(booking)
+            booking.start()
+        return booking
+
+    def complete_booking(self, booking_id: str, expected_version: Optional[int] = None) -> Booking:
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            self.db.check_version(booking, expected_version)
+            if booking.status != BookingStatus.IN_PROGRESS:
+                raise InvalidStateError(f"Cannot complete a {booking.status.value} booking")
+            self.db.bump_version(booking)
+            self._attach_observers(booking)
+            booking.complete()
+        return booking
+
+    def mark_reminder_sent(self, booking_id: str) -> bool:
+        """Flag the reminder of a scheduled booking as sent.
+
+        Returns False when it was already sent (possibly by another process)
+        or the booking is no longer scheduled, so each reminder goes out once.
+        """
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            if booking.reminder_sent or booking.status != BookingStatus.SCHEDULED:
+                return False
+            self.db.bump_version(booking)
+            booking.reminder_sent = True
+        return True
+
+    def mark_no_show(self, booking_id: str, expected_version: Optional[int] = None) -> Booking:
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            self.db.check_version(booking, expected_version)
+            if booking.status != BookingStatus.SCHEDULED:
+                raise InvalidStateError(f"Cannot mark a {booking.status.value} booking as no-show")
+            self.db.bump_version(booking)
+            self._attach_observers(booking)
+            booking.mark_no_show()
+        return booking
+
+    # ------------------------------------------------------------------
+    # Bulk operations
+    # ------------------------------------------------------------------
+    #
+    # Each runs as one transaction (a single save and commit-hook call) and
+    # hands its notifications to every observer as one batch once committed.
+    # All bookings are checked before any is changed, so a bulk action applies
+    # to every booking or to none.
+
+    def _checked(self, booking_ids: Iterable[str], expected_versions: Optional[Dict[str, int]],
+                 error: Callable[[Booking], Optional[str]]) -> List[Booking]:
+        """Bookings by id, after checking each one's expected version and error(booking)"""
+        expected_versions = expected_versions or {}
+        bookings, problems = [], []
+        for booking_id in dict.fromkeys(booking_ids):
+            booking = self.get_booking(booking_id)
+            self.db.check_version(booking, expected_versions.get(booking_id))
+            reason = error(booking)
+            if reason:
+                problems.append(f"{booking_id}: {reason}")
+            bookings.append(booking)
+        if problems:
+            raise InvalidStateError("Nothing was changed. " + "; ".join(problems))
+        return bookings
+
+    @admitted('complete_bookings', subject=_bookings_barber)
+    def complete_bookings(self, booking_ids: Iterable[str],
+                          expected_versions: Optional[Dict[str, int]] = None) -> List[Booking]:
+        """Complete several in-progress bookings at once, e.g. at the end of a shift"""
+        with self.db.transaction():
+            bookings = self._checked(booking_ids, expected_versions,
+                                     lambda b: None if b.status == BookingStatus.IN_PROGRESS
+                                     else f"cannot complete a {b.status.value} booking")
+            for booking in bookings:
+                self.db.bump_version(booking)
+                self._attach_observers(booking)
+                booking.complete()
+        return bookings
+
+    @admitted('reassign_day', subject='from_barber_id')
+    def reassign_day(self, from_barber_id: str, to_barber_id: str, day: date) -> List[Booking]:
+        """Move a barber's scheduled bookings on day to another barber.
+
+        Raises SlotConflictError listing the bookings that do not fit the
+        other barber's working hours and bookings.
+        """
+        if from_barber_id == to_barber_id:
+            raise ValidationError("Choose a different barber to take over the bookings")
+        with self.db.transaction():
+            self.get_user(from_barber_id, UserRole.BARBER)
+            target = self.get_user(to_barber_id, UserRole.BARBER)
+            if not target.is_available:
+                raise InvalidStateError(f"Barber {target.name} is not available")
+            moving = [b for b in self.list_schedule(barber_id=from_barber_id, day=day)
+                      if b.status == BookingStatus.SCHEDULED]
+            busy = self.availability.booked_bitmap(self.list_schedule(barber_id=to_barber_id, day=day))
+            conflicts = []
+            for booking in moving:
+                duration = booking.duration
+                mask = interval_mask(booking.booking_time, duration)
+                if busy & mask or not self.availability.is_working(to_barber_id, day, booking.booking_time,
+                                                                   duration):
+                    conflicts.append(f"{booking.booking_id} at {booking.booking_time.strftime('%H:%M')}")
+                busy |= mask
+            if conflicts:
+                raise SlotConflictError(f"{target.name} cannot take {', '.join(conflicts)}. Nothing was changed.")
+            for booking in moving:
+                self.db.bump_version(booking)
+                booking.barber_id = to_barber_id
+                self._attach_observers(booking)
+                booking.notify('assignment', {
+                    'user_id': booking.customer_id,
+                    'message': f'Booking {booking.booking_id} on {day} at {booking.booking_time} '
+                               f'was moved to {target.name}'
+                })
+        return moving
+
+    @admitted('cancel_day', subject=lambda args: args['barber_id'] or SHOP)
+    def cancel_day(self, day: date, barber_id: Optional[str] = None) -> List[Booking]:
+        """Cancel every scheduled booking on day (or one barber's) when the shop closes.
+
+        The shop cancels, so the customer notice period does not apply, and
+        the freed slots are not offered to the waitlist.
+        """
+        with self.db.transaction():
+            if barber_id is not None:
+                self.get_user(barber_id, UserRole.BARBER)
+            bookings = [b for b in self.list_schedule(barber_id=barber_id, day=day)
+                        if b.status == BookingStatus.SCHEDULED]
+            for booking in bookings:
+                self.db.bump_version(booking)
+                self._attach_observers(booking)
+                booking.cancel(by_shop=True)
+        return bookings
+
+    # ------------------------------------------------------------------
+    # Waitlist
+    # ------------------------------------------------------------------
+
+    @admitted('join_waitlist', subject='customer_id')
+    def join_waitlist(self, customer_id: str, base_service: str, addons: Iterable[str],
+                      date_from: date, date_to: date,
+                      barber_id: Optional[str] = None) -> WaitlistEntry:
+        """Wait for a canceled slot with a barber (None = any barber) between two dates"""
+        addons = list(addons)
+        try:
+            service = ServiceFactory.create_service(base_service, addons)
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+        if date_from < date.today():
+            raise ValidationError("Waitlist dates cannot be in the past")
+        if date_to < date_from:
+            raise ValidationError("End date must not be before start date")
+        if (date_to - date_from).days >= WAITLIST_MAX_DAYS:
+            raise ValidationError(f"Waitlist window is limited to {WAITLIST_MAX_DAYS} days")
+
+        with self.db.transaction():
+            self.get_user(customer_id, UserRole.CUSTOMER)
+            if barber_id is not None:
+                self.get_user(barber_id, UserRole.BARBER)
+            entry = WaitlistEntry(
+                entry_id=f"WL{len(self.db.waitlist) + 1:04d}",
+                customer_id=customer_id,
+                barber_id=barber_id,
+                date_from=date_from,
+                date_to=date_to,
+                base_service=base_service,
+                addons=addons,
+                duration=service.get_duration()
+            )
+            self.db.add_waitlist_entry(entry)
+        return entry
+
+    def leave_waitlist(self, entry_id: str, expected_version: Optional[int] = None) -> WaitlistEntry:
+        with self.db.transaction():
+            entry = self.db.waitlist.get(entry_id)
+            if entry is None:
+                raise NotFoundError(f"Unknown waitlist entry: {entry_id}")
+            self.db.check_version(entry, expected_version)
+            if entry.status != WaitlistStatus.WAITING:
+                raise InvalidStateError(f"Waitlist entry is already {entry.status.value}")
+            self.db.bump_version(entry)
+            entry.status = WaitlistStatus.CANCELED
+        return entry
+
+    def list_waitlist(self, customer_id: str) -> List[WaitlistEntry]:
+        with self.db.lock:
+            entries = [e for e in self.db.waitlist.values() if e.customer_id == customer_id]
+        entries.sort(key=lambda e: e.created_at, reverse=True)
+        return entries
+
+    def _fill_from_waitlist(self, canceled: Booking) -> Optional[Booking]:
+        """Book the slot freed by a cancellation for the best waiting customer.
+
+        Must be called inside the cancelling transaction. Candidates whose
+        booking fails (e.g. barber marked unavailable) are skipped. Fills are
+        planned at the catalog duration the waitlist matched the gap on.
+        """
+        barber_id, day, start = canceled.barber_id, canceled.booking_date, canceled.booking_time
+        if barber_id is None or datetime.combine(day, start) <= datetime.now():
+            return None
+        free_minutes = self.availability.free_minutes_from(
+            barber_id, day, start, self.list_schedule(barber_id=barber_id, day=day))
+
+        for _ in range(5):
+            entry = self.waitlist.best(barber_id, day, free_minutes)
+            if entry is None:
+                return None
+            try:
+                booking = self._create_booking(entry.customer_id, entry.base_service, entry.addons,
+                                               day, start, barber_id, duration=entry.duration)
+            except BarbershopError:
+                self.waitlist.discard(entry, barber_id, day)
+                continue
+            self.db.bump_version(entry)
+            entry.status = WaitlistStatus.FILLED
+            entry.booking_id = booking.booking_id
+            booking.notify('waitlist_match', {
+                'user_id': entry.customer_id,
+                'message': f'A slot opened up! Booking {booking.booking_id} on {day} at {start} '
+                           f'is yours (from waitlist {entry.entry_id})'
+            })
+            return booking
+        return None
+
+    # ------------------------------------------------------------------
+    # Walk-ins
+    # ------------------------------------------------------------------
+
+    @admitted('join_walk_in', subject='barber_id')
+    def join_walk_in(self, customer_name: str, barber_id: str, base_service: str, addons: Iterable[str],
+                     customer_id: Optional[str] = None) -> WalkIn:
+        """Put a walk-in customer at the end of a barber's line for today"""
+        customer_name = customer_name.strip()
+        if not customer_name:
+            raise ValidationError("Customer name is required")
+        addons = list(addons)
+        try:
+            service = ServiceFactory.create_service(base_service, addons)
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+
+        with self.db.transaction():
+            barber = self.get_user(barber_id, UserRole.BARBER)
+            if not barber.is_available:
+                raise InvalidStateError(f"{barber.name} is not available")
+            if customer_id is not None:
+                self.get_user(customer_id, UserRole.CUSTOMER)
+            walk_in = WalkIn(
+                entry_id=self.db.next_id('walk_ins', "W"),
+                customer_name=customer_name,
+                barber_id=barber_id,
+                base_service=base_service,
+                addons=addons,
+                duration=self.estimate_duration(barber_id, base_service, addons),
+                customer_id=customer_id
+            )
+            self.db.add_walk_in(walk_in)
+        return walk_in
+
+    def _walk_in(self, entry_id: str, status: WalkInStatus, expected_version: Optional[int]) -> WalkIn:
+        walk_in = self.db.walk_ins.get(entry_id)
+        if walk_in is None:
+            raise NotFoundError(f"Unknown walk-in: {entry_id}")
+        self.db.check_version(walk_in, expected_version)
+        if walk_in.status != status:
+            raise InvalidStateError(f"Walk-in is already {walk_in.status.value}")
+        self.db.bump_version(walk_in)
+        return walk_in
+
+    def leave_walk_in(self, entry_id: str, expected_version: Optional[int] = None) -> WalkIn:
+        """Take a waiting customer out of the line"""
+        with self.db.transaction():
+            walk_in = self._walk_in(entry_id, WalkInStatus.WAITING, expected_version)
+            walk_in.status = WalkInStatus.LEFT
+            walk_in.finished_at = datetime.now()
+        return walk_in
+
+    def start_walk_in(self, entry_id: str, expected_version: Optional[int] = None) -> WalkIn:
+        """Barber starts serving a waiting walk-in"""
+        with self.db.transaction():
+            walk_in = self._walk_in(entry_id, WalkInStatus.WAITING, expected_version)
+            walk_in.status = WalkInStatus.SERVING
+            walk_in.started_at = datetime.now()
+        return walk_in
+
+    def finish_walk_in(self, entry_id: str, expected_version: Optional[int] = None) -> WalkIn:
+        with self.db.transaction():
+            walk_in = self._walk_in(entry_id, WalkInStatus.SERVING, expected_version)
+            walk_in.status = WalkInStatus.DONE
+            walk_in.finished_at = datetime.now()
+        return walk_in
+
+    # ------------------------------------------------------------------
+    # Payments and feedback
+    # ------------------------------------------------------------------
+
+    @admitted('pay_booking', subject=_booking_customer)
+    def pay_booking(self, booking_id: str,
+                    payment_method: PaymentMethod = PaymentMethod.E_WALLET) -> Payment:
+        """Record a pending payment intent; a PaymentProcessor observer charges it.
+
+        Idempotent per booking: while its payment is pending or paid, repeated
+        calls (a double click, a retried request) return that payment instead
+        of creating another. A failed payment is retried as a new attempt.
+        """
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            if booking.status in [BookingStatus.CANCELED, BookingStatus.NO_SHOW]:
+                raise InvalidStateError(f"Cannot pay for a {booking.status.value} booking")
+            payment = self.get_payment_for_booking(booking_id)
+            if payment is not None and payment.payment_status in [PaymentStatus.PENDING, PaymentStatus.PAID]:
+                return payment
+            if payment is None:
+                payment = Payment(
+                    payment_id=self.db.next_id('payments', "PAY"),
+                    booking_id=booking_id,
+                    amount=booking.service.get_price(),
+                    payment_method=payment_method,
+                    payment_status=PaymentStatus.PENDING,
+                    idempotency_key=f"{booking_id}-1"
+                )
+                self.db.add_payment(payment)
+            elif payment.payment_status == PaymentStatus.FAILED:
+                self.db.bump_version(payment)
+                payment.retry(payment_method)
+            else:
+                raise InvalidStateError(f"Payment of booking {booking_id} was {payment.payment_status.value}")
+
+        self._attach_observers(booking)
+        booking.notify('payment_requested', {
+            'user_id': booking.customer_id,
+            'payment_id': payment.payment_id,
+            'message': f'Payment of Rp {payment.amount:,.0f} for booking {booking_id} is being processed'
+        })
+        return payment
+
+    def settle_payment(self, payment_id: str, approved: bool, transaction_id: Optional[str] = None,
+                       reason: Optional[str] = None) -> Payment:
+        """Record the gateway's answer for a pending payment.
+
+        A payment that is no longer pending (settled by another worker or
+        replica) is returned unchanged, so each outcome is applied once.
+        """
+        with self.db.transaction():
+            payment = self.db.payments.get(payment_id)
+            if payment is None:
+                raise NotFoundError(f"Unknown payment: {payment_id}")
+            if payment.payment_status != PaymentStatus.PENDING:
+                return payment
+            self.db.bump_version(payment)
+            if approved:
+                payment.mark_paid(transaction_id)
+            else:
+                payment.mark_failed(reason or "Declined")
+            booking = self.db.bookings.get(payment.booking_id)
+
+        if booking is not None:
+            self._attach_observers(booking)
+            if approved:
+                booking.notify('payment_paid', {
+                    'user_id': booking.customer_id,
+                    'message': f'Payment for booking {booking.booking_id} successful. '
+                               f'Transaction ID: {transaction_id}'
+                })
+            else:
+                booking.notify('payment_failed', {
+                    'user_id': booking.customer_id,
+                    'message': f'Payment for booking {booking.booking_id} failed: {payment.failure_reason}'
+                })
+        return payment
+
+    @admitted('submit_feedback', subject='customer_id')
+    def submit_feedback(self, booking_id: str, customer_id: str, rating: int,
+                        comment: str = "") -> Feedback:
+        if not 1 <= rating <= 5:
+            raise ValidationError("Rating must be between 1 and 5")
+
+        with self.db.transaction():
+            booking = self.get_booking(booking_id)
+            if booking.customer_id != customer_id:
+                raise ValidationError("Only the customer of a booking can review it")
+            if booking.status != BookingStatus.COMPLETED:
+                raise InvalidStateError("Only completed bookings can be reviewed")
+            if any(f.booking_id == booking_id for f in self.db.feedbacks.values()):
+                raise InvalidStateError(f"Booking {booking_id} already has feedback")
+
+            feedback = Feedback(
+                feedback_id=self.db.next_id('feedbacks', "FB"),
+                booking_id=booking_id,
+                customer_id=customer_id,
+                barber_id=booking.barber_id or "",
+                rating=rating,
+                comment=comment
+            )
+            self.db.add_feedback(feedback)
+        return feedback
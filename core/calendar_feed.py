@@ -0,0 +1,280 @@
+# ============================================================================
+# CALENDAR FEEDS - iCalendar (RFC 5545) export of barber schedules
+# ============================================================================
+#
+# One feed per barber and one for the whole shop, so barbers can subscribe
+# from their phone calendars (GET /calendars/{barber_id}.ics on the API).
+#
+# Each (day, barber) pair is rendered once into a block of VEVENTs and kept.
+# Which days need rendering again is read from the booking event log (see
+# core.history): every booking with events since the last sync has its old
+# and its new day re-rendered, so changes made by other processes are picked
+# up too and nothing else is touched. A feed is then streamed block by block,
+# never built as one string. Its ETag is a hash of the blocks it contains,
+# so identical content gives the same ETag in every process and polling
+# clients get a cheap 304 Not Modified.
+#
+# Usage:
+#   python -m core.calendar_feed [--barber B001] [--output schedule.ics]
+
+import argparse
+import hashlib
+import sys
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from core.history import BookingHistory, history_for
+from models.booking import Booking
+from utils.enums import BookingStatus, UserRole
+from utils.exceptions import NotFoundError
+from utils.metrics import timed
+
+# Days before today still included in a feed; later days are all included
+FEED_PAST_DAYS = 30
+PRODID = "-//Barbershop Booking System//Calendar Feed//EN"
+UID_DOMAIN = "barbershop-booking"
+# Barber key of bookings still waiting for an "Any Available" assignment
+UNASSIGNED = ""
+SHOP = "*"
+
+
+def escape(text: str) -> str:
+    """TEXT value escaping (RFC 5545 3.3.11)"""
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold(line: str) -> str:
+    """Content line folded at 75 octets, CRLF-terminated (RFC 5545 3.1)"""
+    if len(line.encode('utf-8')) <= 75:
+        return line + "\r\n"
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append("".join(current))
+            current, size, limit = [], 0, 74
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(moment: datetime) -> str:
+    """UTC date-time; naive datetimes are local time"""
+    return moment.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(booking: Booking, customer_name: str, barber_name: str) -> str:
+    """One VEVENT; times are floating (the shop's local time)"""
+    start = datetime.combine(booking.booking_date, booking.booking_time)
+    end = start + timedelta(minutes=booking.duration)
+    description = (f"Booking {booking.booking_id}\nCustomer: {customer_name}\nBarber: {barber_name}\n"
+                   f"Status: {booking.status.value}\nPrice: Rp {booking.service.get_price():,.0f}")
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{booking.booking_id}@{UID_DOMAIN}",
+        f"DTSTAMP:{_stamp(booking.created_at)}",
+        f"DTSTART:{start:%Y%m%dT%H%M%S}",
+        f"DTEND:{end:%Y%m%dT%H%M%S}",
+        f"SEQUENCE:{booking.version - 1}",
+        f"SUMMARY:{escape(f'{booking.service.get_description()} - {customer_name}')}",
+        f"DESCRIPTION:{escape(description)}",
+        f"STATUS:{'CANCELLED' if booking.status == BookingStatus.CANCELED else 'CONFIRMED'}",
+        "END:VEVENT",
+    ]
+    return "".join(fold(line) for line in lines)
+
+
+@dataclass(frozen=True)
+class CalendarFeed:
+    """One feed's rendered day blocks and cache validators, streamed with chunks()"""
+    name: str
+    etag: str
+    last_modified: datetime
+    blocks: Tuple[str, ...]
+
+    def chunks(self) -> Iterator[bytes]:
+        yield "".join(fold(line) for line in [
+            "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH", f"X-WR-CALNAME:{escape(self.name)}",
+        ]).encode('utf-8')
+        for block in self.blocks:
+            yield block.encode('utf-8')
+        yield fold("END:VCALENDAR").encode('utf-8')
+
+
+class CalendarFeeds:
+    """Per-day cache of rendered bookings behind every barber's and the shop's feed"""
+
+    def __init__(self, db, history: Optional[BookingHistory] = None, past_days: int = FEED_PAST_DAYS):
+        self.db = db
+        self.history = history or history_for(db)
+        self.past_days = past_days
+        # Event log offset the cache is up to date with (None until first built)
+        self._offset: Optional[int] = None
+        # booking id -> (day, barber key) it is rendered under
+        self._placed: Dict[str, Tuple[date, str]] = {}
+        self._by_day: Dict[date, Set[str]] = {}
+        # day -> barber key -> (VEVENT block, its digest)
+        self._blocks: Dict[date, Dict[str, Tuple[str, str]]] = {}
+        # barber key or SHOP -> when its content last changed (UTC)
+        self._modified: Dict[str, datetime] = {}
+
+    def window_start(self) -> date:
+        return date.today() - timedelta(days=self.past_days)
+
+    # ------------------------------------------------------------------
+    # Cache maintenance
+    # ------------------------------------------------------------------
+
+    def _place(self, booking_id: str, booking: Optional[Booking]) -> Set[date]:
+        """Re-file one booking; returns the days whose blocks it affects"""
+        days = set()
+        old = self._placed.pop(booking_id, None)
+        if old is not None:
+            days.add(old[0])
+            self._by_day[old[0]].discard(booking_id)
+        if booking is not None:
+            placement = (booking.booking_date, booking.barber_id or UNASSIGNED)
+            self._placed[booking_id] = placement
+            self._by_day.setdefault(placement[0], set()).add(booking_id)
+            days.add(placement[0])
+        return days
+
+    def _render(self, day: date, now: datetime):
+        """Render one day's blocks again, noting which feeds actually changed"""
+        db = self.db
+        grouped: Dict[str, List[Booking]] = {}
+        if day >= self.window_start():
+            for booking_id in self._by_day.get(day, ()):
+                booking = db.bookings.get(booking_id)
+                if booking is None:
+                    # Archived (archiving records no events)
+                    continue
+                grouped.setdefault(booking.barber_id or UNASSIGNED, []).append(booking)
+        blocks = {}
+        for barber_key, bookings in grouped.items():
+            bookings.sort(key=lambda b: (b.booking_time, b.booking_id))
+            barber = db.users.get(barber_key)
+            text = "".join(render_event(b, getattr(db.users.get(b.customer_id), 'name', b.customer_id),
+                                        barber.name if barber else "Any available")
+                           for b in bookings)
+            blocks[barber_key] = (text, hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest())
+        old = self._blocks.get(day, {})
+        for barber_key in set(old) | set(blocks):
+            if old.get(barber_key) != blocks.get(barber_key):
+                self._modified[barber_key] = self._modified[SHOP] = now
+        if blocks:
+            self._blocks[day] = blocks
+        else:
+            self._blocks.pop(day, None)
+
+    @timed("calendar.sync")
+    def sync(self):
+        """Bring the cache up to date with committed changes from every process"""
+        db = self.db
+        # Events before this offset were saved to the data file before they were
+        # logged, so the refresh below has merged every booking they mention
+        end = self.history.log.size()
+        db.refresh()
+        with db.lock:
+            now = datetime.now(timezone.utc)
+            if self._offset is not None and self._offset > end:
+                # The event log was replaced: start over
+                self._offset = None
+                self._placed, self._by_day, self._blocks = {}, {}, {}
+            if self._offset is None:
+                for booking_id, booking in db.bookings.items():
+                    self._place(booking_id, booking)
+                dirty = set(self._by_day)
+            else:
+                changed = set()
+                for offset, _, raw in self.history.log.read(self._offset):
+                    if offset >= end:
+                        break
+                    if raw['entity'] == 'booking':
+                        changed.add(raw['id'])
+                    elif raw['entity'] == 'archive':
+                        changed.update(key.partition(':')[2] for key in raw['data']['keys']
+                                       if key.startswith('booking:'))
+                dirty = set()
+                for booking_id in changed:
+                    dirty |= self._place(booking_id, db.bookings.get(booking_id))
+            for day in dirty:
+                self._render(day, now)
+            self._offset = end
+
+    # ------------------------------------------------------------------
+    # Feeds
+    # ------------------------------------------------------------------
+
+    @timed("calendar.feed")
+    def feed(self, barber_id: Optional[str] = None) -> CalendarFeed:
+        """Feed of one barber, or of the whole shop (unassigned bookings included)"""
+        if barber_id is not None:
+            barber = self.db.users.get(barber_id)
+            if barber is None or barber.role != UserRole.BARBER:
+                raise NotFoundError(f"Unknown barber: {barber_id}")
+            name = f"{barber.name} - Barbershop"
+        else:
+            name = "Barbershop - All Barbers"
+        self.sync()
+        with self.db.lock:
+            start = self.window_start()
+            blocks = []
+            for day in sorted(d for d in self._blocks if d >= start):
+                day_blocks = self._blocks[day]
+                if barber_id is None:
+                    blocks.extend(block for _, block in sorted(day_blocks.items()))
+                elif barber_id in day_blocks:
+                    blocks.append(day_blocks[barber_id])
+            modified = self._modified.get(SHOP if barber_id is None else barber_id)
+        etag = hashlib.blake2b("".join(digest for _, digest in blocks).encode(), digest_size=16).hexdigest()
+        # Days also leave the feed at midnight, so it is never older than today
+        midnight = datetime.combine(date.today(), time.min).astimezone(timezone.utc)
+        last_modified = max(modified, midnight) if modified else midnight
+        return CalendarFeed(name, f'"{etag}"', last_modified.replace(microsecond=0),
+                            tuple(text for text, _ in blocks))
+
+    def ics(self, barber_id: Optional[str] = None) -> bytes:
+        """Whole feed as one .ics file, e.g. for a download"""
+        return b"".join(self.feed(barber_id).chunks())
+
+
+_feeds: Optional[CalendarFeeds] = None
+
+
+def feeds_for(db) -> CalendarFeeds:
+    """Shared calendar feeds for the DatabaseManager singleton"""
+    global _feeds
+    if _feeds is None or _feeds.db is not db:
+        _feeds = CalendarFeeds(db)
+    return _feeds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export bookings as an iCalendar feed")
+    parser.add_argument("--barber", default=None, help="barber id (default: the whole shop)")
+    parser.add_argument("--output", default=None, help="file to write (default: stdout)")
+    parser.add_argument("--data-file", default=None, help="data file (default: barbershop_data.json)")
+    args = parser.parse_args()
+
+    from patterns.singleton import DatabaseManager
+    if args.data_file:
+        DatabaseManager.DATA_FILE = args.data_file
+    # Keep load messages out of a feed written to stdout
+    with redirect_stdout(sys.stderr):
+        feed = CalendarFeeds(DatabaseManager()).feed(args.barber)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.writelines(feed.chunks())
+        print(f"Wrote {len(feed.blocks)} day blocks to {args.output}")
+    else:
+        sys.stdout.buffer.writelines(feed.chunks())
+
+
+if __name__ == "__main__":
+    main()
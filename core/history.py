@@ -0,0 +1,377 @@
+# ============================================================================
+# BOOKING HISTORY - Event-sourced changes with incremental projections
+# ============================================================================
+#
+# Bookings, payments and feedbacks are still updated in place; this module
+# keeps the history next to them. After every committed transaction the
+# DatabaseManager hands over the records it added or touched, and each one is
+# diffed against its last recorded state. Differences become immutable events
+# appended to "<data file>.events.jsonl" under the same file lock, so every
+# process (UI, API, scheduler) writes one ordered log.
+#
+# Projections (current state, daily status counts, actual service durations,
+# learned duration statistics per barber and service) are updated per event,
+# never recomputed. Every CHECKPOINT_EVERY events they
+# are saved as a checkpoint; a point-in-time query loads the newest checkpoint
+# at or before that time and replays only the events after it.
+#
+# The first commit in a process also diffs every record, which records
+# changes made while no history was attached (and bootstraps an empty log).
+# History therefore starts when the log was created.
+#
+# When old bookings move to an archive segment (core.archive) the next commit
+# logs one 'archived' event for the segment, listing the records it took.
+# Applying it drops them from the live state and the timeline offsets, so the
+# projections and their checkpoints only grow with active data. Their events
+# stay in the log: point-in-time queries before the archival still see them,
+# and the timeline of an archived record is read back with a scan of the log.
+
+import os
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models.booking import Booking
+from models.event import DomainEvent
+from models.feedback import Feedback
+from models.payment import Payment
+from utils.enums import BookingStatus
+from utils.event_log import EventLog
+from utils.metrics import timed
+from utils.stream_stats import DurationStats
+
+EVENTS_SUFFIX = ".events.jsonl"
+CHECKPOINT_EVERY = 2000
+# Actual times outside (1 minute, this many times the planned duration) are not
+# learned from: the barber forgot to press Start or Complete
+LEARN_MAX_FACTOR = 4
+
+
+def service_key(description: str) -> str:
+    """Service description with its add-ons in a fixed order, e.g. Haircut + Hair Spa + Hair Wash"""
+    base, *addons = description.split(" + ")
+    return " + ".join([base, *sorted(addons)])
+
+
+def duration_key(barber_id: str, description: str) -> str:
+    return f"{barber_id}|{service_key(description)}"
+
+
+def booking_state(booking: Booking) -> dict:
+    return {
+        'customer_id': booking.customer_id,
+        'barber_id': booking.barber_id,
+        'date': booking.booking_date.isoformat(),
+        'time': booking.booking_time.isoformat(timespec='minutes'),
+        'service': booking.service.get_description(),
+        'price': booking.service.get_price(),
+        'duration': booking.duration,
+        'status': booking.status.value,
+        'reminder_sent': booking.reminder_sent,
+        'started_at': booking.started_at.isoformat() if booking.started_at else None,
+        'completed_at': booking.completed_at.isoformat() if booking.completed_at else None,
+    }
+
+
+def payment_state(payment: Payment) -> dict:
+    return {
+        'booking_id': payment.booking_id,
+        'amount': payment.amount,
+        'method': payment.payment_method.value,
+        'status': payment.payment_status.value,
+        'transaction_id': payment.transaction_id,
+        'attempts': payment.attempts,
+        'failure_reason': payment.failure_reason,
+    }
+
+
+def feedback_state(feedback: Feedback) -> dict:
+    return {
+        'booking_id': feedback.booking_id,
+        'customer_id': feedback.customer_id,
+        'barber_id': feedback.barber_id,
+        'rating': feedback.rating,
+        'comment': feedback.comment,
+    }
+
+
+def describe(record) -> Optional[Tuple[str, str, dict]]:
+    """(entity, id, state) of a record whose changes are recorded, else None"""
+    if isinstance(record, Booking):
+        return 'booking', record.booking_id, booking_state(record)
+    if isinstance(record, Payment):
+        return 'payment', record.payment_id, payment_state(record)
+    if isinstance(record, Feedback):
+        return 'feedback', record.feedback_id, feedback_state(record)
+    return None
+
+
+def diff(before: Optional[dict], after: dict) -> List[Tuple[str, dict]]:
+    """(kind, data) of the events that turn state before into after"""
+    if before is None:
+        return [('created', after)]
+    changes = {name: [before.get(name), value] for name, value in after.items()
+               if before.get(name) != value}
+    status = changes.pop('status', None)
+    events = []
+    if changes:
+        events.append(('updated', changes))
+    if status:
+        events.append(('status_changed', {'from': status[0], 'to': status[1]}))
+    return events
+
+
+def _to_event(raw: dict) -> DomainEvent:
+    return DomainEvent(raw['seq'], datetime.fromisoformat(raw['at']), raw['entity'],
+                       raw['id'], raw['kind'], raw['data'])
+
+
+# ============================================================================
+# PROJECTIONS
+# ============================================================================
+
+class Projections:
+    """Read models derived from the event stream, updated one event at a time"""
+
+    def __init__(self):
+        # "entity:id" -> current state
+        self.current: Dict[str, dict] = {}
+        # booking date -> status -> number of bookings
+        self.daily: Dict[str, Dict[str, int]] = {}
+        # booking id -> when it went in progress (ISO)
+        self.started: Dict[str, str] = {}
+        # service -> [completed bookings, actual minutes, booked minutes]
+        self.durations: Dict[str, List[float]] = {}
+        # duration_key(barber, service) -> actual minutes statistics
+        self.learned: Dict[str, DurationStats] = {}
+        # "entity:id" -> log offsets of its events
+        self.offsets: Dict[str, List[int]] = {}
+        # Archive segments whose records were dropped from current and offsets
+        self.archived: Set[str] = set()
+        self.seq = 0
+        # Log offset after the last applied event, and that event's time
+        self.offset = 0
+        self.at: Optional[datetime] = None
+
+    def apply(self, event: DomainEvent, offset: int, end: int):
+        self.seq, self.offset, self.at = event.seq, end, event.occurred_at
+        if event.entity == 'archive':
+            # Daily counts, durations and learned statistics keep what they counted
+            for key in event.data['keys']:
+                self.current.pop(key, None)
+                self.offsets.pop(key, None)
+            self.archived.add(event.entity_id)
+            return
+        key = event.key
+        before = self.current.get(key)
+        if event.kind == 'created':
+            after = dict(event.data)
+        elif event.kind == 'status_changed':
+            after = dict(before or {}, status=event.data['to'])
+        else:
+            after = dict(before or {})
+            after.update((name, change[1]) for name, change in event.data.items())
+        self.current[key] = after
+        if event.entity == 'booking':
+            self._count(before, -1)
+            self._count(after, 1)
+            self._time(event, before, after)
+        self.offsets.setdefault(key, []).append(offset)
+
+    def _count(self, state: Optional[dict], delta: int):
+        if not state or 'date' not in state:
+            return
+        day = self.daily.setdefault(state['date'], {})
+        count = day.get(state['status'], 0) + delta
+        if count:
+            day[state['status']] = count
+        else:
+            day.pop(state['status'], None)
+
+    def _time(self, event: DomainEvent, before: Optional[dict], after: dict):
+        status = after.get('status')
+        if before is not None and before.get('status') == status:
+            return
+        booking_id = event.entity_id
+        if status == BookingStatus.IN_PROGRESS.value:
+            self.started[booking_id] = event.occurred_at.isoformat()
+            return
+        started = self.started.pop(booking_id, None)
+        if status == BookingStatus.COMPLETED.value and started is not None:
+            # Bookings record their own start and completion times; older events only have theirs
+            started = datetime.fromisoformat(after.get('started_at') or started)
+            completed = datetime.fromisoformat(after['completed_at']) if after.get('completed_at') \
+                else event.occurred_at
+            minutes = (completed - started).total_seconds() / 60
+            stats = self.durations.setdefault(after['service'], [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += minutes
+            stats[2] += after.get('duration', 0)
+            if after.get('barber_id') and 1 <= minutes <= LEARN_MAX_FACTOR * after.get('duration', 0):
+                key = duration_key(after['barber_id'], after['service'])
+                self.learned.setdefault(key, DurationStats()).add(minutes)
+
+    def to_state(self) -> dict:
+        return {'seq': self.seq, 'offset': self.offset, 'at': self.at.isoformat() if self.at else None,
+                'current': self.current, 'daily': self.daily, 'started': self.started,
+                'durations': self.durations, 'offsets': self.offsets, 'archived': sorted(self.archived),
+                'learned': {key: stats.to_state() for key, stats in self.learned.items()}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'Projections':
+        projections = cls()
+        projections.seq, projections.offset = state['seq'], state['offset']
+        projections.at = datetime.fromisoformat(state['at']) if state['at'] else None
+        projections.current, projections.daily = state['current'], state['daily']
+        projections.started, projections.durations = state['started'], state['durations']
+        projections.offsets, projections.archived = state['offsets'], set(state.get('archived', ()))
+        projections.learned = {key: DurationStats(stats) for key, stats in state.get('learned', {}).items()}
+        return projections
+
+
+# ============================================================================
+# HISTORY
+# ============================================================================
+
+class BookingHistory:
+    """Event log of one DatabaseManager plus its live projections"""
+
+    def __init__(self, db, checkpoint_every: int = CHECKPOINT_EVERY):
+        self.db = db
+        self.log = EventLog(os.path.splitext(db.DATA_FILE)[0] + EVENTS_SUFFIX)
+        self.checkpoint_every = checkpoint_every
+        self._live: Optional[Projections] = None
+        self._reconciled = False
+        # One cached point-in-time result: ((when, live seq), projections)
+        self._snapshot: Optional[Tuple[Tuple[datetime, int], Projections]] = None
+        db.add_commit_hook(self.record)
+
+    def _restore(self, at: Optional[datetime] = None) -> Projections:
+        """Projections from the newest checkpoint taken at or before at"""
+        checkpoint = self.log.latest_checkpoint(at.timestamp() if at else None)
+        if checkpoint is None:
+            return Projections()
+        return Projections.from_state(self.log.load_checkpoint(checkpoint))
+
+    def _follow(self, projections: Projections, until: Optional[datetime] = None):
+        """Apply events appended after the projections' offset (up to time until)"""
+        for offset, end, raw in self.log.read(projections.offset):
+            event = _to_event(raw)
+            if until is not None and event.occurred_at > until:
+                break
+            projections.apply(event, offset, end)
+
+    def live(self) -> Projections:
+        """Projections up to the end of the log; the caller holds db.lock"""
+        if self._live is None:
+            self._live = self._restore()
+        self._follow(self._live)
+        return self._live
+
+    @timed("history.record")
+    def record(self, records: Iterable[object]):
+        """Commit hook: append events for records that differ from their recorded state"""
+        if self._reconciled and not records and self._live.archived.issuperset(self.db.archive):
+            return
+        live = self.live()
+        if not self._reconciled:
+            db = self.db
+            records = [*db.bookings.values(), *db.payments.values(), *db.feedbacks.values()]
+            self._reconciled = True
+        now = datetime.now().isoformat(timespec='microseconds')
+        raw_events, seen = [], set()
+        for record in records:
+            described = describe(record)
+            if described is None:
+                continue
+            entity, entity_id, state = described
+            key = f"{entity}:{entity_id}"
+            if key in seen:
+                continue
+            seen.add(key)
+            for kind, data in diff(live.current.get(key), state):
+                raw_events.append({'seq': live.seq + len(raw_events) + 1, 'at': now, 'entity': entity,
+                                   'id': entity_id, 'kind': kind, 'data': data})
+        for name in sorted(set(self.db.archive) - live.archived):
+            raw_events.append({'seq': live.seq + len(raw_events) + 1, 'at': now, 'entity': 'archive',
+                               'id': name, 'kind': 'archived', 'data': {'keys': self._archived_keys(name, live)}})
+        if not raw_events:
+            return
+        previous_seq = live.seq
+        self.log.append(raw_events)
+        self._follow(live)
+        if live.seq // self.checkpoint_every > previous_seq // self.checkpoint_every:
+            self.log.write_checkpoint((live.seq, live.at.timestamp()), live.to_state())
+
+    def _archived_keys(self, name: str, live: Projections) -> List[str]:
+        """Keys of the recorded entities archived into one segment"""
+        bookings, payments, feedbacks = self.db.load_archived(name)
+        keys = ([f"booking:{b.booking_id}" for b in bookings] + [f"payment:{p.payment_id}" for p in payments] +
+                [f"feedback:{f.feedback_id}" for f in feedbacks])
+        return [key for key in keys if key in live.current]
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def timeline(self, entity: str, entity_id: str) -> List[DomainEvent]:
+        """Every event of one booking, payment or feedback, oldest first"""
+        with self.db.lock:
+            offsets = self.live().offsets.get(f"{entity}:{entity_id}")
+            offsets = list(offsets) if offsets is not None else None
+        if offsets is not None:
+            return [_to_event(next(self.log.read(offset))[2]) for offset in offsets]
+        # Archived (or unknown): not kept in the live projection, scan the log
+        return [_to_event(raw) for _, _, raw in self.log.read()
+                if raw['entity'] == entity and raw['id'] == entity_id]
+
+    @timed("history.at")
+    def at(self, when: Optional[datetime] = None) -> Projections:
+        """Projections as they were at time when (now by default); treat as read-only"""
+        with self.db.lock:
+            live = self.live()
+            if when is None or (live.at is not None and when >= live.at):
+                return live
+            key = (when, live.seq)
+        if self._snapshot is not None and self._snapshot[0] == key:
+            return self._snapshot[1]
+        projections = self._restore(when)
+        self._follow(projections, until=when)
+        self._snapshot = (key, projections)
+        return projections
+
+    def bookings_at(self, when: datetime) -> Dict[str, dict]:
+        """booking_id -> booking state at time when"""
+        return {key.partition(':')[2]: state for key, state in self.at(when).current.items()
+                if key.startswith('booking:')}
+
+    def status_counts(self, day: date, when: Optional[datetime] = None) -> Dict[str, int]:
+        """Bookings on day per status, as of time when (now by default)"""
+        return dict(self.at(when).daily.get(day.isoformat(), {}))
+
+    def service_durations(self, when: Optional[datetime] = None) -> Dict[str, dict]:
+        """service -> completed count and mean actual vs booked minutes"""
+        return {service: {'completed': int(count), 'actual_minutes': actual / count,
+                          'booked_minutes': booked / count}
+                for service, (count, actual, booked) in self.at(when).durations.items() if count}
+
+    def duration_stats(self, barber_id: str, description: str) -> Optional[DurationStats]:
+        """Actual minutes a barber took for a service (add-ons in any order), None if never"""
+        with self.db.lock:
+            return self.live().learned.get(duration_key(barber_id, description))
+
+    def learned_durations(self) -> List[Tuple[str, str, DurationStats]]:
+        """(barber_id, service, statistics) for every barber and service with actual times"""
+        with self.db.lock:
+            learned = list(self.live().learned.items())
+        return sorted((*key.split("|", 1), stats) for key, stats in learned)
+
+
+_history: Optional[BookingHistory] = None
+
+
+def history_for(db) -> BookingHistory:
+    """Shared history for the DatabaseManager singleton"""
+    global _history
+    if _history is None or _history.db is not db:
+        _history = BookingHistory(db)
+    return _history
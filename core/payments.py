@@ -0,0 +1,215 @@
+# ============================================================================
+# PAYMENTS - Async gateway adapters and the payment intent worker
+# ============================================================================
+#
+# BookingService.pay_booking only records a pending payment intent and
+# notifies observers, so the UI and API return immediately. PaymentProcessor
+# observes those intents and charges them on its own asyncio loop (one daemon
+# thread), at most `concurrency` gateway calls at a time, then settles each
+# payment to paid or failed in a short transaction.
+#
+# Every intent carries an idempotency key (booking id + attempt). Gateways
+# must return the original result when a key is repeated, which makes it safe
+# to re-ask after a timeout, after a restart (pending intents are resubmitted
+# on start) or when several replicas pick up the same intent. When the
+# gateway still has not answered after RETRY_DELAYS the payment is settled
+# as failed with UNANSWERED_REASON, so customers are not left waiting on a
+# pending payment; paying again re-asks under the same key and therefore
+# cannot charge twice.
+#
+# Not re-exported from core: importing asyncio would double the cold import
+# time of the package for processes that never take payments.
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from core.booking_service import BookingService
+from patterns.observer import Observer
+from models.payment import UNANSWERED_REASON
+from utils.enums import PaymentMethod, PaymentStatus
+from utils.exceptions import GatewayError
+from utils.metrics import count, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+GATEWAY_TIMEOUT_SECONDS = 30.0
+# Waits before asking the gateway again when the outcome is unknown
+RETRY_DELAYS = (1.0, 5.0, 30.0)
+
+
+@dataclass(frozen=True)
+class ChargeResult:
+    """Gateway answer for one idempotency key"""
+    approved: bool
+    transaction_id: Optional[str] = None
+    reason: Optional[str] = None
+
+
+class PaymentGateway(ABC):
+    """Adapter to a payment provider.
+
+    charge() must be idempotent per key: repeating a key returns the first
+    result instead of charging again. Raise GatewayError when the outcome is
+    unknown (network error, provider outage).
+    """
+
+    @abstractmethod
+    async def charge(self, idempotency_key: str, amount: float, method: PaymentMethod) -> ChargeResult:
+        pass
+
+
+class FakeGateway(PaymentGateway):
+    """Local gateway for development, tests and load tests.
+
+    Answers after `latency` seconds and declines a `decline_rate` share of
+    charges; amounts at or above `limit` are always declined.
+    """
+
+    def __init__(self, latency: float = 0.5, decline_rate: float = 0.0,
+                 limit: Optional[float] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.limit = limit
+        self._rng = random.Random(seed)
+        # idempotency key -> charge in flight or done (only touched on the loop thread)
+        self._charges: Dict[str, asyncio.Future] = {}
+        self.charges_made = 0
+
+    async def charge(self, idempotency_key: str, amount: float, method: PaymentMethod) -> ChargeResult:
+        charge = self._charges.get(idempotency_key)
+        if charge is None:
+            charge = self._charges[idempotency_key] = asyncio.ensure_future(self._charge(amount))
+        return await asyncio.shield(charge)
+
+    async def _charge(self, amount: float) -> ChargeResult:
+        await asyncio.sleep(self.latency)
+        self.charges_made += 1
+        if self.limit is not None and amount >= self.limit:
+            return ChargeResult(False, reason="Amount exceeds the card limit")
+        if self._rng.random() < self.decline_rate:
+            return ChargeResult(False, reason="Declined by issuer")
+        return ChargeResult(True, transaction_id=f"TXN-{uuid.uuid4().hex[:8].upper()}")
+
+
+class PaymentProcessor(Observer):
+    """Charges pending payment intents concurrently on a background event loop.
+
+    Attach it to bookings (via BookingService observers) so new intents are
+    submitted immediately; start() also resubmits intents left pending.
+    """
+
+    def __init__(self, service: BookingService, gateway: Optional[PaymentGateway] = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = GATEWAY_TIMEOUT_SECONDS):
+        self.service = service
+        self.gateway = gateway or FakeGateway()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._inflight: Set[str] = set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="payments", daemon=True)
+            self._thread.start()
+        self.recover()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+    def recover(self) -> int:
+        """Resubmit every pending payment (e.g. after a restart); returns how many"""
+        with self.service.db.lock:
+            pending = [p.payment_id for p in self.service.db.payments.values()
+                       if p.payment_status == PaymentStatus.PENDING]
+        return sum(1 for payment_id in pending if self.submit(payment_id) is not None)
+
+    def submit(self, payment_id: str) -> Optional[Future]:
+        """Charge a pending payment in the background.
+
+        Returns a future of the settled Payment (None if it was no longer
+        pending), or None when the payment is already being processed here.
+        """
+        with self._lock:
+            if self._loop is None or payment_id in self._inflight:
+                return None
+            self._inflight.add(payment_id)
+            return asyncio.run_coroutine_threadsafe(self._process(payment_id), self._loop)
+
+    def pending(self) -> int:
+        """Payments currently being processed by this worker"""
+        with self._lock:
+            return len(self._inflight)
+
+    def _intent(self, payment_id: str) -> Optional[Tuple[str, float, PaymentMethod]]:
+        with self.service.db.lock:
+            payment = self.service.db.payments.get(payment_id)
+            if payment is None or payment.payment_status != PaymentStatus.PENDING:
+                return None
+            key = payment.idempotency_key or f"{payment.booking_id}-{payment.attempts}"
+            return key, payment.amount, payment.payment_method
+
+    async def _process(self, payment_id: str):
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            for delay in (0.0,) + RETRY_DELAYS:
+                await asyncio.sleep(delay)
+                # Reading and settling take the database locks, so keep them off the loop
+                intent = await loop.run_in_executor(None, self._intent, payment_id)
+                if intent is None:
+                    return None
+                try:
+                    async with self._semaphore:
+                        started = time.perf_counter()
+                        result = await asyncio.wait_for(self.gateway.charge(*intent), self.timeout)
+                        if metrics.enabled:
+                            metrics.observe("payments.gateway", time.perf_counter() - started)
+                except (asyncio.TimeoutError, GatewayError) as e:
+                    # Outcome unknown: stay pending and ask again under the same key
+                    count("payments.gateway_error")
+                    logger.warning("Payment %s: no gateway answer (%s)", payment_id, e or "timeout")
+                    continue
+                count("payments.paid" if result.approved else "payments.failed")
+                return await loop.run_in_executor(
+                    None, self.service.settle_payment, payment_id, result.approved,
+                    result.transaction_id, result.reason)
+            logger.error("Payment %s unanswered after %d gateway attempts", payment_id, len(RETRY_DELAYS) + 1)
+            count("payments.unanswered")
+            return await loop.run_in_executor(
+                None, self.service.settle_payment, payment_id, False, None, UNANSWERED_REASON)
+        except Exception:
+            logger.exception("Payment %s could not be processed", payment_id)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.discard(payment_id)
+
+    # ------------------------------------------------------------------
+    # Observer
+    # ------------------------------------------------------------------
+
+    def update(self, subject, event_type: str, data: dict):
+        if event_type == 'payment_requested':
+            self.submit(data['payment_id'])
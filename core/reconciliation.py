@@ -0,0 +1,272 @@
+# ============================================================================
+# RECONCILIATION - End-of-day check of bookings against their payments
+# ============================================================================
+#
+# Usage (e.g. from cron; the app also runs it daily at END_OF_DAY):
+#   python -m core.reconciliation            # incremental
+#   python -m core.reconciliation --full
+#
+# A full run is one merge-join of two streams sorted by booking id: bookings,
+# and payments. Only the current booking's payments are held while joining,
+# and records are checked as they stream past; nothing is grouped or hashed
+# up front. Archive segments hold whole bookings with their payments, so a
+# full run joins each of them on its own, one segment in memory at a time.
+# An incremental run reads the booking event log from where the
+# previous run stopped and re-checks only the bookings whose booking or
+# payment changed since, keeping the previous findings for everything else.
+#
+# The report (with the log position it covers) is saved as
+# "<data file>.reconciliation.json".
+
+import argparse
+import json
+import logging
+import os
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime, time
+from operator import attrgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from core.archive import Archive, archive_for
+from core.history import BookingHistory, history_for
+from core.scheduler import TimerScheduler
+from models.booking import Booking
+from models.payment import Payment
+from utils.enums import BookingStatus, PaymentStatus
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+REPORT_SUFFIX = ".reconciliation.json"
+END_OF_DAY = time(23, 55)
+
+# Discrepancy kinds
+UNPAID_COMPLETED = 'unpaid_completed'
+AMOUNT_MISMATCH = 'amount_mismatch'
+PAYMENT_FOR_CANCELED = 'payment_for_canceled'
+DUPLICATE_PAYMENT = 'duplicate_payment'
+ORPHAN_PAYMENT = 'orphan_payment'
+
+
+@dataclass(frozen=True)
+class Discrepancy:
+    """One booking/payment mismatch found by reconciliation"""
+    booking_id: str
+    kind: str
+    detail: str
+    payment_id: Optional[str] = None
+
+
+def merge_join(bookings: Iterable[Tuple[str, Booking]],
+               payments: Iterable[Tuple[str, Payment]]) -> Iterator[Tuple[str, Optional[Booking], List[Payment]]]:
+    """(booking_id, booking or None, its payments) from two streams sorted by booking id"""
+    payments = iter(payments)
+    head = next(payments, None)
+
+    def take(booking_id: str) -> List[Payment]:
+        nonlocal head
+        group = []
+        while head is not None and head[0] == booking_id:
+            group.append(head[1])
+            head = next(payments, None)
+        return group
+
+    for booking_id, booking in bookings:
+        # Payments sorting before this booking point at no booking
+        while head is not None and head[0] < booking_id:
+            orphan_id = head[0]
+            yield orphan_id, None, take(orphan_id)
+        yield booking_id, booking, take(booking_id)
+    while head is not None:
+        orphan_id = head[0]
+        yield orphan_id, None, take(orphan_id)
+
+
+def check(booking_id: str, booking: Optional[Booking], payments: List[Payment]) -> List[Discrepancy]:
+    """Discrepancies between one booking and the payments pointing at it"""
+    if booking is None:
+        return [Discrepancy(booking_id, ORPHAN_PAYMENT, "Payment for an unknown booking", p.payment_id)
+                for p in payments]
+    found = []
+    paid = [p for p in payments if p.payment_status == PaymentStatus.PAID]
+    price = booking.service.get_price()
+    if booking.status == BookingStatus.COMPLETED and not paid:
+        found.append(Discrepancy(booking_id, UNPAID_COMPLETED, f"Completed booking has no paid payment "
+                                                               f"(expected Rp {price:,.0f})"))
+    if booking.status in [BookingStatus.CANCELED, BookingStatus.NO_SHOW]:
+        for p in payments:
+            if p.payment_status in [PaymentStatus.PENDING, PaymentStatus.PAID]:
+                found.append(Discrepancy(booking_id, PAYMENT_FOR_CANCELED,
+                                         f"{p.payment_status.value.title()} payment for a "
+                                         f"{booking.status.value} booking", p.payment_id))
+    for p in paid:
+        if p.amount != price:
+            found.append(Discrepancy(booking_id, AMOUNT_MISMATCH,
+                                     f"Paid Rp {p.amount:,.0f}, service costs Rp {price:,.0f}", p.payment_id))
+    if len(paid) > 1:
+        found.append(Discrepancy(booking_id, DUPLICATE_PAYMENT, f"{len(paid)} paid payments",
+                                 paid[-1].payment_id))
+    return found
+
+
+class Reconciler:
+    """Runs reconciliation for one DatabaseManager and keeps the last report"""
+
+    def __init__(self, db, history: Optional[BookingHistory] = None, archive: Optional[Archive] = None):
+        self.db = db
+        self.history = history or history_for(db)
+        self.archive = archive or archive_for(db)
+        self.path = os.path.splitext(db.DATA_FILE)[0] + REPORT_SUFFIX
+
+    def last_report(self) -> Optional[dict]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, report: dict):
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        os.replace(tmp_file, self.path)
+
+    # ------------------------------------------------------------------
+    # Sources, sorted by booking id
+    # ------------------------------------------------------------------
+
+    def booking_stream(self) -> Iterator[Tuple[str, Booking]]:
+        with self.db.lock:
+            booking_ids = sorted(self.db.bookings)
+        for booking_id in booking_ids:
+            booking = self.db.bookings.get(booking_id)
+            if booking is not None:
+                yield booking_id, booking
+
+    def payment_stream(self) -> Iterator[Tuple[str, Payment]]:
+        with self.db.lock:
+            payments = sorted(self.db.payments.values(), key=attrgetter('booking_id', 'payment_id'))
+        for payment in payments:
+            yield payment.booking_id, payment
+
+    def sources(self) -> Iterator[Tuple[Iterator[Tuple[str, Booking]], Iterator[Tuple[str, Payment]]]]:
+        """(bookings, payments) stream pairs to join: active data, then each archive segment"""
+        yield self.booking_stream(), self.payment_stream()
+        for bookings, payments, _ in self.archive.segments():
+            yield ((b.booking_id, b) for b in bookings), ((p.booking_id, p) for p in payments)
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+
+    def _log_position(self) -> Tuple[int, int]:
+        """(seq, offset) of the end of the event log, after recording pending changes"""
+        with self.db.lock:
+            live = self.history.live()
+            return live.seq, live.offset
+
+    @timed("reconciliation.run")
+    def run(self, incremental: bool = True) -> dict:
+        """Reconcile and save the report; incremental falls back to full without a usable report"""
+        previous = self.last_report() if incremental else None
+        if previous is not None and previous.get('log_offset', 0) > self.history.log.size():
+            # The event log was replaced since the last run
+            previous = None
+        seq, offset = self._log_position()
+        if previous is None:
+            mode, checked, found = 'full', 0, []
+            for bookings, payments in self.sources():
+                for booking_id, booking, group in merge_join(bookings, payments):
+                    checked += 1
+                    found.extend(check(booking_id, booking, group))
+        else:
+            mode = 'incremental'
+            changed = self._changed_since(previous['log_offset'], offset)
+            found = [Discrepancy(**d) for d in previous['discrepancies'] if d['booking_id'] not in changed]
+            for booking_id in sorted(changed):
+                booking = self.db.bookings.get(booking_id)
+                if booking is not None:
+                    found.extend(check(booking_id, booking, self.db.payments_for_booking(booking_id)))
+                else:
+                    # Archived since it changed (or an orphan payment)
+                    found.extend(check(booking_id, self.archive.find_booking(booking_id),
+                                       self.db.payments_for_booking(booking_id) or
+                                       self.archive.payments_for_booking(booking_id)))
+            checked = len(changed)
+
+        found.sort(key=attrgetter('booking_id', 'kind'))
+        counts = {}
+        for discrepancy in found:
+            counts[discrepancy.kind] = counts.get(discrepancy.kind, 0) + 1
+        report = {
+            'ran_at': datetime.now().isoformat(timespec='seconds'),
+            'mode': mode,
+            'checked': checked,
+            'log_seq': seq,
+            'log_offset': offset,
+            'counts': counts,
+            'discrepancies': [asdict(d) for d in found],
+        }
+        self._save(report)
+        return report
+
+    def _changed_since(self, start: int, end: int) -> set:
+        """Booking ids whose booking or payment has events in [start, end) of the log"""
+        changed = set()
+        with self.db.lock:
+            current = self.history.live().current
+        for offset, _, raw in self.history.log.read(start):
+            if offset >= end:
+                break
+            if raw['entity'] == 'booking':
+                changed.add(raw['id'])
+            elif raw['entity'] == 'payment':
+                state = current.get(f"payment:{raw['id']}") or raw['data']
+                if state.get('booking_id'):
+                    changed.add(state['booking_id'])
+        return changed
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def schedule_daily(self, scheduler: TimerScheduler, at: time = END_OF_DAY):
+        """Run an incremental reconciliation every day at the given time"""
+        def run():
+            report = self.run()
+            logger.info("Reconciliation (%s): %d checked, %s", report['mode'], report['checked'],
+                        report['counts'] or "no discrepancies")
+
+        scheduler.every_day('reconciliation', at, run)
+
+
+_reconciler: Optional[Reconciler] = None
+
+
+def reconciler_for(db) -> Reconciler:
+    """Shared reconciler for the DatabaseManager singleton"""
+    global _reconciler
+    if _reconciler is None or _reconciler.db is not db:
+        _reconciler = Reconciler(db)
+    return _reconciler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile bookings against payments")
+    parser.add_argument("--full", action="store_true", help="check every booking, not only changed ones")
+    parser.add_argument("--data-file", default=None, help="data file (default: barbershop_data.json)")
+    args = parser.parse_args()
+
+    from patterns.singleton import DatabaseManager
+    if args.data_file:
+        DatabaseManager.DATA_FILE = args.data_file
+    report = Reconciler(DatabaseManager()).run(incremental=not args.full)
+    print(f"{report['mode']} reconciliation: {report['checked']} bookings checked")
+    for kind, number in sorted(report['counts'].items()):
+        print(f"  {kind:<22} {number}")
+    sys.exit(1 if report['discrepancies'] else 0)
+
+
+if __name__ == "__main__":
+    main()
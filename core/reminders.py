@@ -0,0 +1,190 @@
+# ============================================================================
+# REMINDERS - Appointment reminders and automatic no-shows
+# ============================================================================
+#
+# Every scheduled booking gets up to two timers on a TimerScheduler:
+#   * reminder: REMINDER_HOURS before the appointment (immediately if that
+#     moment already passed but the appointment did not),
+#   * no-show:  NO_SHOW_GRACE_MINUTES after the appointment start.
+# Timers are built from the persisted bookings once, on start. The service is
+# also registered as a DatabaseManager index on bookings, so every booking
+# that is added, changed, merged from another process (refresh() every
+# RESYNC_SECONDS) or archived re-arms or disarms only its own timers. When a
+# timer fires the booking is re-checked inside a transaction, so canceled or
+# started bookings are skipped and a reminder is sent once even with several
+# replicas.
+#
+# Timers already due on start (the app was down) are swept in batches of
+# SWEEP_BATCH bookings per transaction. No-shows more than
+# NO_SHOW_CATCH_UP_HOURS overdue are not swept: they are left for the owner
+# instead of turning every stale booking into a no-show at once.
+
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from core.booking_service import BookingService
+from core.scheduler import TimerScheduler
+from models.booking import Booking
+from patterns.observer import Observer, Subject
+from utils.enums import BookingStatus
+from utils.exceptions import BarbershopError
+from utils.metrics import timed, count
+
+REMINDER_HOURS = 24
+NO_SHOW_GRACE_MINUTES = 15
+RESYNC_SECONDS = 300
+NO_SHOW_CATCH_UP_HOURS = 24
+SWEEP_BATCH = 200
+
+
+class ReminderService(Observer, Subject):
+    """Keeps one reminder and one no-show timer per scheduled booking.
+
+    Attach it to bookings (via BookingService observers) to track new
+    bookings immediately; attach observers to it to deliver reminders.
+    Once started it follows the RecentIndex protocol on the bookings of
+    the DatabaseManager (see rebuild, add and remove).
+    """
+
+    def __init__(self, service: BookingService, scheduler: Optional[TimerScheduler] = None,
+                 reminder_hours: float = REMINDER_HOURS,
+                 grace_minutes: float = NO_SHOW_GRACE_MINUTES,
+                 resync_seconds: float = RESYNC_SECONDS,
+                 catch_up_hours: float = NO_SHOW_CATCH_UP_HOURS):
+        Subject.__init__(self)
+        self.service = service
+        self.scheduler = scheduler if scheduler is not None else TimerScheduler(name="reminders")
+        self.reminder_lead = timedelta(hours=reminder_hours)
+        self.grace = timedelta(minutes=grace_minutes)
+        self.resync_seconds = resync_seconds
+        self.catch_up_seconds = catch_up_hours * 3600
+        # Timers are only kept per booking once rebuild() loaded them all
+        self.built = False
+        service.db.add_index('bookings', 'reminders', self)
+
+    def _timers_for(self, booking: Booking, now: float) -> List[Tuple[Hashable, float, Callable[[], None]]]:
+        if booking.status != BookingStatus.SCHEDULED:
+            return []
+        starts_at = datetime.combine(booking.booking_date, booking.booking_time)
+        booking_ids = [booking.booking_id]
+        timers = []
+        if not booking.reminder_sent and starts_at.timestamp() > now:
+            due = max((starts_at - self.reminder_lead).timestamp(), now)
+            timers.append((('reminder', booking.booking_id), due,
+                           lambda: self._send_reminders(booking_ids)))
+        no_show_at = (starts_at + self.grace).timestamp()
+        if no_show_at > now - self.catch_up_seconds:
+            timers.append((('no_show', booking.booking_id), no_show_at,
+                           lambda: self._mark_no_shows(booking_ids)))
+        return timers
+
+    def track(self, booking: Booking):
+        for key, due, callback in self._timers_for(booking, self.scheduler.clock()):
+            self.scheduler.schedule(key, due, callback)
+
+    def untrack(self, booking_id: str):
+        self.scheduler.cancel(('reminder', booking_id))
+        self.scheduler.cancel(('no_show', booking_id))
+
+    @timed("reminders.rebuild")
+    def rebuild(self, bookings: Optional[Dict[str, Booking]] = None):
+        """Reload all timers from the bookings in O(n) plus one heapify.
+
+        Timers that are already due are folded into sweeps of SWEEP_BATCH
+        bookings per kind so a backlog (e.g. after downtime) is handled in a
+        few transactions.
+        """
+        db = self.service.db
+        with db.lock:
+            now = self.scheduler.clock()
+            timers = []
+            overdue = {'reminder': [], 'no_show': []}
+            for booking in (db.bookings if bookings is None else bookings).values():
+                for key, due, callback in self._timers_for(booking, now):
+                    if due <= now:
+                        overdue[key[0]].append(key[1])
+                    else:
+                        timers.append((key, due, callback))
+            for kind, sweep in (('reminder', self._send_reminders), ('no_show', self._mark_no_shows)):
+                booking_ids = overdue[kind]
+                for start in range(0, len(booking_ids), SWEEP_BATCH):
+                    timers.append(((f'{kind}_sweep', start), now,
+                                   partial(sweep, booking_ids[start:start + SWEEP_BATCH])))
+            timers.append(('resync', now + self.resync_seconds, self._resync))
+            self.scheduler.clear()
+            self.scheduler.bulk_load(timers)
+            self.built = True
+
+    def invalidate(self):
+        # Bookings were reloaded wholesale: the next resync rebuilds every timer
+        self.built = False
+
+    def add(self, booking_id: str, booking: Booking):
+        """Re-arm the timers of a booking that was added, changed or merged"""
+        if self.built:
+            self.untrack(booking_id)
+            self.track(booking)
+
+    def remove(self, booking_id: str):
+        if self.built:
+            self.untrack(booking_id)
+
+    def _resync(self):
+        """Merge other processes' changes; add() re-arms the bookings they touched"""
+        if not self.built:
+            self.rebuild()
+            return
+        try:
+            self.service.db.refresh()
+        finally:
+            self.scheduler.schedule('resync', self.scheduler.clock() + self.resync_seconds, self._resync)
+
+    def start(self):
+        self.rebuild()
+        self.scheduler.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.scheduler.stop(timeout)
+
+    # ------------------------------------------------------------------
+    # Timer callbacks
+    # ------------------------------------------------------------------
+
+    def _send_reminders(self, booking_ids: List[str]):
+        sent = []
+        with self.service.db.transaction():
+            for booking_id in booking_ids:
+                try:
+                    if self.service.mark_reminder_sent(booking_id):
+                        sent.append(self.service.get_booking(booking_id))
+                except BarbershopError:
+                    continue
+        for booking in sent:
+            count("reminders.sent")
+            self.notify('reminder', {
+                'user_id': booking.customer_id,
+                'message': f'Reminder: booking {booking.booking_id} is on {booking.booking_date} '
+                           f'at {booking.booking_time}'
+            })
+
+    def _mark_no_shows(self, booking_ids: List[str]):
+        with self.service.db.transaction():
+            for booking_id in booking_ids:
+                try:
+                    self.service.mark_no_show(booking_id)
+                except BarbershopError:
+                    # Started, completed or canceled in the meantime
+                    continue
+                count("reminders.no_show")
+
+    # ------------------------------------------------------------------
+    # Observer
+    # ------------------------------------------------------------------
+
+    def update(self, subject, event_type: str, data: dict):
+        if not isinstance(subject, Booking):
+            return
+        if event_type == 'confirmation':
+            self.track(subject)
+        elif event_type in ('start', 'cancellation', 'completion', 'no_show'):
+            self.untrack(subject.booking_id)
@@ -0,0 +1,157 @@
+# ============================================================================
+# TIMER SCHEDULER - Heap of due callbacks driven by one daemon thread
+# ============================================================================
+#
+# Timers live in a binary heap ordered by due time, so scheduling is
+# O(log n) and the thread only ever looks at the earliest entry. Rescheduling
+# or cancelling a key does not search the heap: the key's current sequence
+# number is remembered and stale heap entries are skipped when they surface
+# (lazy deletion). The heap is rebuilt once stale entries dominate it.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as clock_time
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (due timestamp, sequence, key, callback)
+_Entry = Tuple[float, int, Hashable, Callable[[], None]]
+
+
+class TimerScheduler:
+    """Run callbacks at wall-clock timestamps on a background thread"""
+
+    def __init__(self, clock: Callable[[], float] = time.time, name: str = "timer-scheduler"):
+        self.clock = clock
+        self.name = name
+        self._heap: List[_Entry] = []
+        self._active: Dict[Hashable, int] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._active
+
+    def schedule(self, key: Hashable, due: float, callback: Callable[[], None]):
+        """Run callback at timestamp due, replacing any timer with the same key"""
+        with self._condition:
+            seq = next(self._counter)
+            self._active[key] = seq
+            heapq.heappush(self._heap, (due, seq, key, callback))
+            self._maybe_compact()
+            if self._heap[0][1] == seq:
+                self._condition.notify()
+
+    def bulk_load(self, timers: Iterable[Tuple[Hashable, float, Callable[[], None]]]):
+        """Add many timers at once with a single O(n) heapify"""
+        with self._condition:
+            for key, due, callback in timers:
+                seq = next(self._counter)
+                self._active[key] = seq
+                self._heap.append((due, seq, key, callback))
+            heapq.heapify(self._heap)
+            self._maybe_compact()
+            self._condition.notify()
+
+    def every_day(self, key: Hashable, at: clock_time, callback: Callable[[], None]):
+        """Run callback daily at local time at, starting with the next occurrence"""
+        def run():
+            try:
+                callback()
+            finally:
+                self.every_day(key, at, callback)
+
+        now = datetime.fromtimestamp(self.clock())
+        due = datetime.combine(now.date(), at)
+        if due <= now:
+            due += timedelta(days=1)
+        self.schedule(key, due.timestamp(), run)
+
+    def cancel(self, key: Hashable) -> bool:
+        with self._condition:
+            return self._active.pop(key, None) is not None
+
+    def clear(self):
+        with self._condition:
+            self._heap.clear()
+            self._active.clear()
+
+    def _maybe_compact(self):
+        # Drop stale entries once they outnumber live ones
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._active):
+            self._heap = [e for e in self._heap if self._active.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+    def run_pending(self) -> int:
+        """Run every timer that is due now, returns how many ran"""
+        ran = 0
+        while True:
+            with self._condition:
+                entry = self._pop_due(self.clock())
+            if entry is None:
+                return ran
+            self._run(entry)
+            ran += 1
+
+    def _pop_due(self, now: float) -> Optional[_Entry]:
+        while self._heap:
+            due, seq, key, callback = self._heap[0]
+            if self._active.get(key) != seq:
+                heapq.heappop(self._heap)
+                continue
+            if due > now:
+                return None
+            heapq.heappop(self._heap)
+            del self._active[key]
+            return due, seq, key, callback
+        return None
+
+    def _run(self, entry: _Entry):
+        try:
+            entry[3]()
+        except Exception:
+            logger.exception("Timer %r failed", entry[2])
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                entry = None
+                while not self._stopping:
+                    entry = self._pop_due(self.clock())
+                    if entry is not None:
+                        break
+                    timeout = self._heap[0][0] - self.clock() if self._heap else None
+                    self._condition.wait(timeout)
+                if self._stopping:
+                    return
+            self._run(entry)
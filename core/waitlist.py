@@ -0,0 +1,117 @@
+# ============================================================================
+# WAITLIST - Priority queues matching freed slots to waiting customers
+# ============================================================================
+#
+# Waiting entries are indexed per (barber, day); an entry for "any barber" is
+# filed under (None, day). Each queue is split into buckets by service
+# duration, and every bucket is a heap ordered by join time. A freed slot of
+# G minutes only looks at the heads of the buckets with duration <= G, so a
+# match costs O(B log n) with B the handful of distinct service durations,
+# independent of how many customers are waiting.
+#
+# The index is registered with DatabaseManager.add_index(), so entries are
+# pushed when they are added or merged from disk. Entries that were filled,
+# canceled or expired are not removed eagerly; they are dropped when they
+# reach the head of a heap (lazy deletion).
+
+import heapq
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from models.waitlist import WaitlistEntry
+
+_Key = Tuple[Optional[str], date]
+
+
+class WaitlistIndex:
+    """Per barber-day, duration-bucketed priority queues over db.waitlist"""
+
+    def __init__(self, db):
+        self.db = db
+        # (barber_id or None, day) -> {duration: heap of (created_at, entry_id)}
+        self._queues: Dict[_Key, Dict[int, List[Tuple[datetime, str]]]] = {}
+        # Entries already pushed; a merged newer version only changes the status
+        self._filed: set = set()
+        self._pruned_on: Optional[date] = None
+        self.built = False
+        db.add_index('waitlist', 'queues', self)
+
+    def rebuild(self, entries: Dict[str, WaitlistEntry]):
+        self._queues.clear()
+        self._filed.clear()
+        for entry in entries.values():
+            self._add(entry)
+        self.built = True
+
+    def invalidate(self):
+        self._queues.clear()
+        self._filed.clear()
+        self.built = False
+
+    def add(self, entry_id: str, entry: WaitlistEntry):
+        """New entry, or one merged from disk"""
+        if self.built and entry_id not in self._filed:
+            self._add(entry)
+
+    def remove(self, entry_id: str):
+        """The heaps drop it lazily once it reaches a head"""
+        self._filed.discard(entry_id)
+
+    def _sync(self):
+        with self.db.lock:
+            if not self.built:
+                self.rebuild(self.db.waitlist)
+        today = date.today()
+        if self._pruned_on != today:
+            for key in [k for k in self._queues if k[1] < today]:
+                del self._queues[key]
+            self._pruned_on = today
+
+    def _add(self, entry: WaitlistEntry):
+        self._filed.add(entry.entry_id)
+        if not entry.is_waiting():
+            return
+        day = max(entry.date_from, date.today())
+        while day <= entry.date_to:
+            buckets = self._queues.setdefault((entry.barber_id, day), {})
+            heapq.heappush(buckets.setdefault(entry.duration, []), (entry.created_at, entry.entry_id))
+            day += timedelta(days=1)
+
+    def _head(self, heap: List[Tuple[datetime, str]], day: date) -> Optional[WaitlistEntry]:
+        while heap:
+            entry = self.db.waitlist.get(heap[0][1])
+            if entry is not None and entry.is_waiting() and entry.covers(day):
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def best(self, barber_id: str, day: date, max_duration: int) -> Optional[WaitlistEntry]:
+        """Longest-waiting entry for this barber (or any barber) that fits max_duration minutes"""
+        self._sync()
+        best = None
+        for key in ((barber_id, day), (None, day)):
+            for duration, heap in self._queues.get(key, {}).items():
+                if duration > max_duration:
+                    continue
+                entry = self._head(heap, day)
+                if entry is not None and (best is None or
+                                          (entry.created_at, entry.entry_id) < (best.created_at, best.entry_id)):
+                    best = entry
+        return best
+
+    def discard(self, entry: WaitlistEntry, barber_id: str, day: date):
+        """Skip an entry for this barber-day after a failed match attempt"""
+        for key in ((barber_id, day), (None, day)):
+            heap = self._queues.get(key, {}).get(entry.duration)
+            if heap and heap[0][1] == entry.entry_id:
+                heapq.heappop(heap)
+
+
+_index: Optional[WaitlistIndex] = None
+
+
+def waitlist_for(db) -> WaitlistIndex:
+    """Shared index for the DatabaseManager singleton"""
+    global _index
+    if _index is None or _index.db is not db:
+        _index = WaitlistIndex(db)
+    return _index
@@ -0,0 +1,108 @@
+# ============================================================================
+# WALK-IN QUEUE - Live per-barber lines and wait-time estimates
+# ============================================================================
+#
+# Every barber has a walk-in line per day (BookingService.join_walk_in). The
+# wait of a customer in line is the time left on what the barber is doing now
+# (bookings in progress and walk-ins being served: start + planned duration
+# - now) plus the service minutes of everyone ahead of them.
+#
+# The "minutes ahead" part comes from DatabaseManager's walk-in line index: a
+# Fenwick tree per (barber, day) keeps people and service minutes by position,
+# updated in O(log n) whenever someone joins, leaves or is started, so the
+# wait of one customer is O(log n) and the whole lobby screen is one pass over
+# the people waiting. Booked appointments later in the day are not slotted
+# into the line; the estimate covers the work in front of the customer.
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from models.walk_in import WalkIn
+from utils.enums import UserRole
+from utils.exceptions import NotFoundError
+from utils.metrics import timed
+
+LOBBY_REFRESH_SECONDS = 15
+
+
+@dataclass(frozen=True)
+class WaitingWalkIn:
+    walk_in: WalkIn
+    position: int
+    wait_minutes: int
+
+
+@dataclass(frozen=True)
+class BarberLine:
+    """One barber's walk-in line as shown in the lobby"""
+    barber_id: str
+    barber_name: str
+    busy_minutes: int
+    waiting: List[WaitingWalkIn]
+    # Wait of someone joining now
+    next_wait_minutes: int
+
+
+class WalkInQueue:
+    """Wait-time estimates over the walk-in lines of DatabaseManager"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def busy_minutes(self, barber_id: str, now: Optional[datetime] = None) -> int:
+        """Minutes left on the bookings and walk-ins a barber is working on"""
+        now = now or datetime.now()
+        ends = [(b.started_at or datetime.combine(b.booking_date, b.booking_time)) + timedelta(minutes=b.duration)
+                for b in self.db.in_progress_bookings(barber_id)]
+        ends += [w.started_at + timedelta(minutes=w.duration) for w in self.db.serving_walk_ins(barber_id)]
+        return sum(max(0, int((end - now).total_seconds() + 59) // 60) for end in ends)
+
+    def estimate(self, entry_id: str, now: Optional[datetime] = None) -> Tuple[int, int]:
+        """(position, wait in minutes) of a waiting walk-in"""
+        walk_in = self.db.walk_ins.get(entry_id)
+        ahead = self.db.walk_in_ahead(entry_id) if walk_in is not None else None
+        if ahead is None:
+            raise NotFoundError(f"Walk-in {entry_id} is not waiting")
+        people, minutes = ahead
+        return people + 1, self.busy_minutes(walk_in.barber_id, now) + minutes
+
+    def quote(self, barber_id: str, now: Optional[datetime] = None) -> int:
+        """Wait in minutes for someone joining a barber's line now"""
+        now = now or datetime.now()
+        return self.busy_minutes(barber_id, now) + self.db.walk_in_totals(barber_id, now.date())[1]
+
+    def line(self, barber_id: str, now: Optional[datetime] = None) -> BarberLine:
+        now = now or datetime.now()
+        barber = self.db.users.get(barber_id)
+        if barber is None or barber.role != UserRole.BARBER:
+            raise NotFoundError(f"Unknown barber: {barber_id}")
+        with self.db.lock:
+            busy = wait = self.busy_minutes(barber_id, now)
+            waiting = []
+            for position, walk_in in enumerate(self.db.walk_in_line(barber_id, now.date()), 1):
+                waiting.append(WaitingWalkIn(walk_in, position, wait))
+                wait += walk_in.duration
+        return BarberLine(barber_id, barber.name, busy, waiting, wait)
+
+    @timed("walk_in.lobby")
+    def lobby(self, now: Optional[datetime] = None) -> List[BarberLine]:
+        """Lines of every available barber (or one with people waiting), shortest wait first"""
+        now = now or datetime.now()
+        self.db.refresh()
+        barbers = [u for u in self.db.users.values() if u.role == UserRole.BARBER and
+                   (u.is_available or self.db.walk_in_totals(u.user_id, now.date())[0])]
+        lines = [self.line(barber.user_id, now) for barber in barbers]
+        lines.sort(key=lambda line: (line.next_wait_minutes, line.barber_name))
+        return lines
+
+
+_queue: Optional[WalkInQueue] = None
+
+
+def walk_ins_for(db) -> WalkInQueue:
+    """Shared walk-in queue for the DatabaseManager singleton"""
+    global _queue
+    if _queue is None or _queue.db is not db:
+        _queue = WalkInQueue(db)
+    return _queue
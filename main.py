@@ -8,18 +8,54 @@
 # ============================================================================
 
 import streamlit as st
-from patterns import DatabaseManager, NotificationObserver
+from patterns import DatabaseManager, InboxObserver
+from core import BookingService, ReminderService, TimerScheduler
+from core.archive import archive_for
+from core.backup import BackupManager
+from core.reconciliation import reconciler_for
+from core.payments import PaymentProcessor
 from ui import login_page, register_page, customer_dashboard, barber_dashboard, owner_dashboard
+from ui.actions import show_flash
+from ui.walk_ins import lobby_screen
 from utils.enums import UserRole
+from utils.metrics import metrics
+
+@st.cache_resource
+def get_background_services():
+    """Process-wide notification inbox, reminder/no-show scheduler, payment worker
+    and the daily reconciliation, archival and backup timers"""
+    inbox = InboxObserver()
+    reminders = ReminderService(BookingService(DatabaseManager(), [inbox]))
+    reminders.attach(inbox)
+    reminders.start()
+    payments = PaymentProcessor(BookingService(DatabaseManager(), [inbox]))
+    payments.start()
+    # Own scheduler: ReminderService.rebuild() clears the reminder timers
+    daily = TimerScheduler(name="maintenance")
+    reconciler_for(DatabaseManager()).schedule_daily(daily)
+    archive_for(DatabaseManager()).schedule_daily(daily)
+    BackupManager(DatabaseManager.DATA_FILE).schedule_daily(daily)
+    daily.start()
+    return inbox, reminders, payments, daily
+
 
 def init_session_state():
     """Initialize session state"""
     if 'db' not in st.session_state:
         st.session_state.db = DatabaseManager()
+    else:
+        # Pick up changes written by other app processes (cheap when nothing changed)
+        st.session_state.db.refresh()
     if 'current_user' not in st.session_state:
         st.session_state.current_user = None
-    if 'notification_observer' not in st.session_state:
-        st.session_state.notification_observer = NotificationObserver()
+    if 'booking_service' not in st.session_state:
+        inbox, reminders, payments, _ = get_background_services()
+        st.session_state.inbox = inbox
+        # Only process-wide observers: they get attached to shared Booking objects, so a
+        # per-session observer would outlive its session and fire once per session that
+        # touched the booking. Session feedback comes from return values and the inbox.
+        st.session_state.booking_service = BookingService(
+            st.session_state.db, [inbox, reminders, payments])
 
 
 def main():
@@ -45,8 +81,11 @@ def main():
     
     init_session_state()
     
+    # Lobby display for walk-in customers, no login needed
+    if st.query_params.get("view") == "lobby":
+        lobby_screen()
     # Check if user is logged in
-    if st.session_state.current_user is None:
+    elif st.session_state.current_user is None:
         if 'show_register' in st.session_state and st.session_state.show_register:
             register_page()
         else:
@@ -62,6 +101,12 @@ def main():
             st.write(f"📧 {user.email}")
             st.write(f"🎭 Role: {user.role.value}")
             
+            notifications = st.session_state.inbox.for_user(user.user_id)
+            if notifications:
+                with st.expander(f"🔔 Notifications ({len(notifications)})"):
+                    for notification in notifications[:5]:
+                        st.caption(f"{notification.sent_at:%d %b %H:%M} · {notification.message}")
+            
             st.divider()
             
             if st.button("🚪 Logout", use_container_width=True):
@@ -85,6 +130,9 @@ def main():
                - Service creation
             """)
         
+        # Outcome of the last button callback (success, error or retry)
+        show_flash()
+        
         # Main content based on user role
         if user.role.value == "customer":
             customer_dashboard()
@@ -94,6 +142,9 @@ def main():
             owner_dashboard()
         else:
             st.error(f"Unknown user role: {user.role}")
+    
+    # Periodically export metrics in Prometheus text format (no-op when disabled)
+    metrics.maybe_dump()
 
 
 if __name__ == "__main__":
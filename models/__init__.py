@@ -4,6 +4,10 @@ from .booking import Booking
 from .payment import Payment
 from .feedback import Feedback
 from .notification import Notification
+from .schedule import Schedule
+from .waitlist import WaitlistEntry
+from .walk_in import WalkIn
+from .event import DomainEvent
 
 __all__ = [
     'User',
@@ -13,5 +17,9 @@ __all__ = [
     'Booking',
     'Payment',
     'Feedback',
-    'Notification'
+    'Notification',
+    'Schedule',
+    'WaitlistEntry',
+    'WalkIn',
+    'DomainEvent'
 ]
@@ -5,11 +5,12 @@
 from dataclasses import dataclass, field
 from datetime import datetime, date, time
 from typing import Optional
-import streamlit as st
 from utils.enums import BookingStatus
 from patterns.observer import Subject
 from services import Service
 
+CANCELLATION_NOTICE_HOURS = 2
+
 @dataclass
 class Booking(Subject):
     """Booking model with Observer pattern"""
@@ -21,32 +22,88 @@ class Booking(Subject):
     booking_time: time
     status: BookingStatus
     created_at: datetime = field(default_factory=datetime.now)
+    version: int = 1
+    reminder_sent: bool = False
+    # Minutes the slot was planned for when it differs from the service's
+    # catalog duration (learned from the barber's actual times)
+    planned_minutes: Optional[int] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
     
     def __post_init__(self):
         Subject.__init__(self)
     
-    def cancel(self) -> bool:
-        """Cancel booking with validation"""
-        if self.status in [BookingStatus.CANCELED, BookingStatus.COMPLETED]:
-            return False
+    @property
+    def duration(self) -> int:
+        """Minutes the booking occupies in the barber's schedule"""
+        return self.planned_minutes or self.service.get_duration()
+    
+    def actual_minutes(self) -> Optional[float]:
+        """How long the service really took, once completed"""
+        if self.started_at is None or self.completed_at is None:
+            return None
+        return (self.completed_at - self.started_at).total_seconds() / 60
+    
+    def cancellation_error(self, by_shop: bool = False) -> Optional[str]:
+        """Reason why this booking cannot be canceled, or None if it can.
+        
+        The notice period only binds customers; the shop may cancel (e.g. when
+        it closes for the day) any booking that has not started.
+        """
+        if self.status in [BookingStatus.CANCELED, BookingStatus.COMPLETED, BookingStatus.NO_SHOW]:
+            return f"Booking is already {self.status.value}"
+        if by_shop:
+            if self.status != BookingStatus.SCHEDULED:
+                return f"Cannot cancel a {self.status.value} booking"
+            return None
         
         booking_datetime = datetime.combine(self.booking_date, self.booking_time)
         hours_until = (booking_datetime - datetime.now()).total_seconds() / 3600
         
-        if hours_until < 2:
-            st.error("Cannot cancel less than 2 hours before appointment")
+        if hours_until < CANCELLATION_NOTICE_HOURS:
+            return f"Cannot cancel less than {CANCELLATION_NOTICE_HOURS} hours before appointment"
+        return None
+    
+    def cancel(self, by_shop: bool = False) -> bool:
+        """Cancel booking with validation"""
+        if self.cancellation_error(by_shop):
             return False
         
         self.status = BookingStatus.CANCELED
         self.notify('cancellation', {
             'user_id': self.customer_id,
-            'message': f'Booking {self.booking_id} has been canceled'
+            'message': (f'Booking {self.booking_id} has been canceled by the barbershop, sorry for the '
+                        f'inconvenience' if by_shop else f'Booking {self.booking_id} has been canceled')
+        })
+        return True
+    
+    def start(self) -> bool:
+        """Mark booking as in progress"""
+        if self.status != BookingStatus.SCHEDULED:
+            return False
+        self.status = BookingStatus.IN_PROGRESS
+        self.started_at = datetime.now()
+        self.notify('start', {
+            'user_id': self.customer_id,
+            'message': f'Booking {self.booking_id} has started'
+        })
+        return True
+    
+    def mark_no_show(self) -> bool:
+        """Mark a booking whose customer never arrived"""
+        if self.status != BookingStatus.SCHEDULED:
+            return False
+        self.status = BookingStatus.NO_SHOW
+        self.notify('no_show', {
+            'user_id': self.customer_id,
+            'message': f'Booking {self.booking_id} was marked as a no-show'
         })
         return True
     
     def complete(self):
         """Mark booking as completed"""
         self.status = BookingStatus.COMPLETED
+        self.completed_at = datetime.now()
         self.notify('completion', {
             'user_id': self.customer_id,
             'message': f'Booking {self.booking_id} is completed. Please provide feedback!'
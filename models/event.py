@@ -0,0 +1,29 @@
+# ============================================================================
+# EVENT MODEL - Immutable record of one state change
+# ============================================================================
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict
+
+
+@dataclass(frozen=True)
+class DomainEvent:
+    """One booking, payment or feedback change, as appended to the event log.
+
+    kind is 'created' (data holds the full state), 'status_changed'
+    (data holds 'from' and 'to') or 'updated' (data maps each changed
+    field to [old, new]). Archival is logged as one 'archived' event of
+    entity 'archive' (entity_id: the segment, data['keys']: the
+    "entity:id" of each record it took).
+    """
+    seq: int
+    occurred_at: datetime
+    entity: str
+    entity_id: str
+    kind: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.entity}:{self.entity_id}"
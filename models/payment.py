@@ -5,12 +5,20 @@
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
-import uuid
 from utils.enums import PaymentMethod, PaymentStatus
 
+# Failure reason when the gateway never answered: the charge may have gone through
+UNANSWERED_REASON = "No answer from the payment provider"
+
 @dataclass
 class Payment:
-    """Payment model"""
+    """Payment model.
+    
+    A payment starts as a pending intent and is settled by a gateway to
+    paid or failed. idempotency_key identifies the charge attempt at the
+    gateway, so resubmitting it can never charge twice; a declined payment
+    is retried under a new key, an unanswered one under the same key.
+    """
     payment_id: str
     booking_id: str
     amount: float
@@ -18,10 +26,28 @@ class Payment:
     payment_status: PaymentStatus
     transaction_id: Optional[str] = None
     payment_date: Optional[datetime] = None
+    version: int = 1
+    idempotency_key: Optional[str] = None
+    attempts: int = 1
+    failure_reason: Optional[str] = None
     
-    def process_payment(self) -> bool:
-        """Process payment"""
+    def mark_paid(self, transaction_id: str):
+        """Pending -> paid"""
         self.payment_status = PaymentStatus.PAID
         self.payment_date = datetime.now()
-        self.transaction_id = f"TXN-{uuid.uuid4().hex[:8].upper()}"
-        return True
+        self.transaction_id = transaction_id
+        self.failure_reason = None
+    
+    def mark_failed(self, reason: str):
+        """Pending -> failed"""
+        self.payment_status = PaymentStatus.FAILED
+        self.failure_reason = reason
+    
+    def retry(self, payment_method: PaymentMethod):
+        """Failed -> pending, as a new charge attempt unless the last one was never answered"""
+        if self.failure_reason != UNANSWERED_REASON:
+            self.attempts += 1
+            self.idempotency_key = f"{self.booking_id}-{self.attempts}"
+        self.payment_method = payment_method
+        self.payment_status = PaymentStatus.PENDING
+        self.failure_reason = None
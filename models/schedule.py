@@ -0,0 +1,56 @@
+# ============================================================================
+# SCHEDULE MODEL - Barber working hours
+# ============================================================================
+
+from dataclasses import dataclass, field
+from datetime import date, time
+from typing import Dict, List, Set, Tuple
+
+Interval = Tuple[time, time]
+
+# Monday=0 ... Sunday=6, used for barbers without an explicit schedule
+DEFAULT_WEEKLY_HOURS: Dict[int, List[Interval]] = {
+    weekday: [(time(9, 0), time(21, 0))] for weekday in range(7)
+}
+
+
+def _subtract(intervals: List[Interval], gaps: List[Interval]) -> List[Interval]:
+    """Remove gap intervals (breaks) from working intervals"""
+    result = list(intervals)
+    for gap_start, gap_end in gaps:
+        remaining = []
+        for start, end in result:
+            if gap_end <= start or gap_start >= end:
+                remaining.append((start, end))
+                continue
+            if start < gap_start:
+                remaining.append((start, gap_start))
+            if gap_end < end:
+                remaining.append((gap_end, end))
+        result = remaining
+    return result
+
+
+@dataclass
+class Schedule:
+    """Weekly working hours of a barber with breaks, days off and per-date overrides"""
+    barber_id: str
+    weekly_hours: Dict[int, List[Interval]] = field(
+        default_factory=lambda: {d: list(v) for d, v in DEFAULT_WEEKLY_HOURS.items()})
+    breaks: Dict[int, List[Interval]] = field(default_factory=dict)
+    days_off: Set[date] = field(default_factory=set)
+    overrides: Dict[date, List[Interval]] = field(default_factory=dict)
+    version: int = 1
+
+    def working_intervals(self, day: date) -> List[Interval]:
+        """Working intervals for a specific date.
+
+        Precedence: day off, then a per-date override (an empty override also
+        means off), then the weekly template minus that weekday's breaks.
+        """
+        if day in self.days_off:
+            return []
+        if day in self.overrides:
+            return sorted(self.overrides[day])
+        weekday = day.weekday()
+        return sorted(_subtract(self.weekly_hours.get(weekday, []), self.breaks.get(weekday, [])))
@@ -16,6 +16,7 @@ class User:
     phone: str
     role: UserRole
     created_at: datetime = field(default_factory=datetime.now)
+    version: int = 1
 
 
 class Customer(User):
@@ -28,6 +29,7 @@ class Customer(User):
         self.phone = phone
         self.role = UserRole.CUSTOMER
         self.created_at = datetime.now()
+        self.version = 1
         self.address = ""
         self.loyalty_points = 0
 
@@ -43,6 +45,7 @@ class Barber(User):
         self.phone = phone
         self.role = UserRole.BARBER
         self.created_at = datetime.now()
+        self.version = 1
         self.specialization = specialization
         self.is_available = is_available
         self.rating = 5.0
@@ -58,3 +61,4 @@ class Owner(User):
         self.phone = phone
         self.role = UserRole.OWNER
         self.created_at = datetime.now()
+        self.version = 1
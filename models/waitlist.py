@@ -0,0 +1,32 @@
+# ============================================================================
+# WAITLIST MODEL - Customers waiting for a canceled slot
+# ============================================================================
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import List, Optional
+from utils.enums import WaitlistStatus
+
+
+@dataclass
+class WaitlistEntry:
+    """Request for any freed slot with a barber (or any barber) in a date window"""
+    entry_id: str
+    customer_id: str
+    barber_id: Optional[str]
+    date_from: date
+    date_to: date
+    base_service: str
+    addons: List[str]
+    duration: int
+    created_at: datetime = field(default_factory=datetime.now)
+    status: WaitlistStatus = WaitlistStatus.WAITING
+    booking_id: Optional[str] = None
+    version: int = 1
+
+    def covers(self, day: date) -> bool:
+        return self.date_from <= day <= self.date_to
+
+    def is_waiting(self, today: Optional[date] = None) -> bool:
+        """Still waiting and the window has not passed yet"""
+        return self.status == WaitlistStatus.WAITING and self.date_to >= (today or date.today())
@@ -0,0 +1,33 @@
+# ============================================================================
+# WALK-IN MODEL - Customer waiting in a barber's walk-in line
+# ============================================================================
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import List, Optional
+from utils.enums import WalkInStatus
+
+
+@dataclass
+class WalkIn:
+    """Walk-in customer queued for one barber on the day they joined"""
+    entry_id: str
+    customer_name: str
+    barber_id: str
+    base_service: str
+    addons: List[str]
+    duration: int
+    customer_id: Optional[str] = None
+    joined_at: datetime = field(default_factory=datetime.now)
+    status: WalkInStatus = WalkInStatus.WAITING
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    version: int = 1
+
+    @property
+    def day(self) -> date:
+        return self.joined_at.date()
+
+    def line_key(self):
+        """(barber, day) line this entry waits in, None once it stopped waiting"""
+        return (self.barber_id, self.day) if self.status == WalkInStatus.WAITING else None
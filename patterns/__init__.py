@@ -1,12 +1,30 @@
 # Design Patterns package
-from .singleton import DatabaseManager
-from .observer import Observer, NotificationObserver, Subject
-from .factory import ServiceFactory
-
-__all__ = [
-    'DatabaseManager',
-    'Observer',
-    'NotificationObserver',
-    'Subject',
-    'ServiceFactory'
-]
+#
+# Exports are resolved lazily (PEP 562) so importing a single submodule such
+# as patterns.observer from the models does not load DatabaseManager and,
+# through it, the models package again (which used to be a circular import).
+from importlib import import_module
+
+_EXPORTS = {
+    'DatabaseManager': '.singleton',
+    'Observer': '.observer',
+    'NotificationObserver': '.observer',
+    'InboxObserver': '.observer',
+    'Subject': '.observer',
+    'batched_notifications': '.observer',
+    'ServiceFactory': '.factory',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
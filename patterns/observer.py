@@ -2,20 +2,40 @@
 # OBSERVER PATTERN - Notification System
 # ============================================================================
 
+import logging
+import threading
 from abc import ABC, abstractmethod
-from typing import List
-import streamlit as st
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from models.notification import Notification
+from utils.metrics import timed, count
 
 class Observer(ABC):
     """Observer interface"""
     @abstractmethod
     def update(self, subject, event_type: str, data: dict):
         pass
+    
+    def update_many(self, events: List[Tuple[object, str, dict]]):
+        """Deliver a batch of (subject, event_type, data); override to handle it at once"""
+        for subject, event_type, data in events:
+            self.update(subject, event_type, data)
+
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationObserver(Observer):
-    """Concrete Observer for notifications"""
+    """Concrete Observer for notifications.
+    
+    Delivery is delegated to a display callback (the UI passes one that
+    renders the message), so this module stays free of UI dependencies.
+    Without a callback notifications are logged.
+    """
+    def __init__(self, display: Optional[Callable[[Notification], None]] = None):
+        self.display = display
+    
     def update(self, subject, event_type: str, data: dict):
         notification = Notification(
             user_id=data.get('user_id'),
@@ -23,7 +43,47 @@ class NotificationObserver(Observer):
             message=data.get('message'),
             channel='email'
         )
-        st.success(f"📧 Notification: {notification.message}")
+        if self.display is not None:
+            self.display(notification)
+        else:
+            logger.info("Notification for %s: %s", notification.user_id, notification.message)
+
+
+class InboxObserver(Observer):
+    """Concrete Observer keeping the latest notifications per user in memory.
+    
+    Thread-safe, so background jobs can deliver notifications that the UI
+    shows on the user's next rerun.
+    """
+    def __init__(self, max_per_user: int = 20):
+        self._lock = threading.Lock()
+        self._max_per_user = max_per_user
+        self._inbox: Dict[str, Deque[Notification]] = {}
+    
+    def update(self, subject, event_type: str, data: dict):
+        notification = Notification(
+            user_id=data.get('user_id'),
+            notification_type=event_type,
+            message=data.get('message'),
+            channel='in-app'
+        )
+        with self._lock:
+            inbox = self._inbox.setdefault(notification.user_id, deque(maxlen=self._max_per_user))
+            inbox.appendleft(notification)
+    
+    def update_many(self, events: List[Tuple[object, str, dict]]):
+        notifications = [Notification(user_id=data.get('user_id'), notification_type=event_type,
+                                      message=data.get('message'), channel='in-app')
+                         for _, event_type, data in events]
+        with self._lock:
+            for notification in notifications:
+                inbox = self._inbox.setdefault(notification.user_id, deque(maxlen=self._max_per_user))
+                inbox.appendleft(notification)
+    
+    def for_user(self, user_id: str) -> List[Notification]:
+        """Newest first"""
+        with self._lock:
+            return list(self._inbox.get(user_id, ()))
 
 
 class Subject(ABC):
@@ -37,6 +97,61 @@ class Subject(ABC):
     def detach(self, observer: Observer):
         self._observers.remove(observer)
     
+    @timed("observer.notify")
     def notify(self, event_type: str, data: dict):
+        count(f"observer.{event_type}")
+        pending = getattr(_batch, 'pending', None)
+        if pending is not None:
+            pending.extend((observer, (self, event_type, data)) for observer in self._observers)
+            return
         for observer in self._observers:
             observer.update(self, event_type, data)
+
+
+# notify() calls deferred by batched_notifications() on the current thread
+_batch = threading.local()
+
+
+@contextmanager
+def batched_notifications():
+    """Defer notify() calls made on this thread until the block ends.
+    
+    Each observer then gets all of its events in one update_many() call, in
+    the order they were raised. If the block raises, nothing is delivered.
+    Nested blocks join the outermost one.
+    """
+    if getattr(_batch, 'pending', None) is not None:
+        yield
+        return
+    _batch.pending = pending = []
+    try:
+        yield
+    finally:
+        _batch.pending = None
+    _deliver(pending)
+
+
+@contextmanager
+def discard_notifications():
+    """Drop the notify() calls deferred inside the block if it raises.
+    
+    For a nested step of a batched_notifications() block that the caller may
+    catch and recover from, e.g. a nested database transaction.
+    """
+    pending = getattr(_batch, 'pending', None)
+    mark = len(pending) if pending is not None else 0
+    try:
+        yield
+    except BaseException:
+        if pending is not None:
+            del pending[mark:]
+        raise
+
+
+@timed("observer.deliver_batch")
+def _deliver(pending: List[Tuple[Observer, Tuple[object, str, dict]]]):
+    batches: Dict[int, Tuple[Observer, list]] = {}
+    for observer, event in pending:
+        batches.setdefault(id(observer), (observer, []))[1].append(event)
+    for observer, events in batches.values():
+        observer.update_many(events)
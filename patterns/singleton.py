@@ -2,21 +2,52 @@
 # SINGLETON PATTERN - Database Manager with JSON Persistence
 # ============================================================================
 
+import copy
 import json
 import os
-from typing import Dict
+import threading
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice, takewhile
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from datetime import datetime, date, time
 from models.user import User, Customer, Barber, Owner
 from models.booking import Booking
 from models.payment import Payment
 from models.feedback import Feedback
-from utils.enums import UserRole, BookingStatus, PaymentStatus, PaymentMethod
+from models.schedule import Schedule
+from models.waitlist import WaitlistEntry
+from models.walk_in import WalkIn
+from utils.enums import UserRole, BookingStatus, PaymentStatus, PaymentMethod, WaitlistStatus, WalkInStatus
 from patterns.factory import ServiceFactory
+from patterns.observer import batched_notifications, discard_notifications
+from utils.exceptions import ConcurrencyError
+from utils.archive_store import ARCHIVE_SUFFIX, SegmentStore
+from utils.file_lock import FileLock
+from utils.queue_index import QueueIndex
+from utils.recent_index import RecentIndex, Cursor
+from utils.snapshot import Snapshot
+from utils.text_index import TextIndex, parse_query
+from utils.metrics import timed
 
 class DatabaseManager:
-    """Singleton pattern to manage all data storage with JSON persistence"""
+    """Singleton pattern to manage all data storage with JSON persistence.
+    
+    Several processes may share DATA_FILE: writes hold a cross-process file
+    lock and first merge records other processes changed (detected through
+    the lock file's generation counter), so no process overwrites another's
+    updates. refresh() does the same merge for readers.
+    
+    Old bookings with their payments and feedbacks can be moved out of memory
+    and the data file into immutable archive segments (see core.archive);
+    the data file keeps only the segment manifest.
+    
+    Reports read a consistent, lock-free point-in-time view via snapshot().
+    """
     _instance = None
     DATA_FILE = "barbershop_data.json"
+    SNAPSHOT_COLLECTIONS = ('users', 'bookings', 'payments', 'feedbacks')
     
     def __new__(cls):
         if cls._instance is None:
@@ -28,19 +59,79 @@ class DatabaseManager:
         if self._initialized:
             return
         self._initialized = True
+        # Guards short read-modify-write sections, never held across a UI render
+        self.lock = threading.RLock()
+        self._transaction_depth = 0
+        self._file_lock = FileLock(self.DATA_FILE + ".lock")
+        self._generation = 0
+        self._signature = None
         self.users: Dict[str, User] = {}
         self.bookings: Dict[str, Booking] = {}
         self.services: Dict[str, 'Service'] = {}
         self.payments: Dict[str, Payment] = {}
         self.feedbacks: Dict[str, 'Feedback'] = {}
-        self.schedules: Dict[str, 'Schedule'] = {}
+        self.schedules: Dict[str, Schedule] = {}
+        self.waitlist: Dict[str, WaitlistEntry] = {}
+        self.walk_ins: Dict[str, WalkIn] = {}
+        # Archive segment name -> {'sha256', 'archived_at', 'counts', 'summary'}
+        self.archive: Dict[str, dict] = {}
+        self._archive_store = SegmentStore(os.path.splitext(self.DATA_FILE)[0] + ARCHIVE_SUFFIX)
+        
+        # Secondary indexes for "most recent first" and full-text queries, per collection
+        self._indexes: Dict[str, Dict[str, Union[RecentIndex, TextIndex]]] = {
+            'users': {
+                'customer_text': TextIndex(lambda u: f"{u.name} {u.email} {u.phone}"
+                                           if u.role == UserRole.CUSTOMER else None),
+            },
+            'bookings': {
+                'customer': RecentIndex(lambda b: b.customer_id, lambda b: b.created_at),
+                'barber': RecentIndex(lambda b: b.barber_id, lambda b: b.created_at),
+                'in_progress': RecentIndex(lambda b: b.barber_id if b.status == BookingStatus.IN_PROGRESS else None,
+                                           lambda b: b.created_at),
+            },
+            'feedbacks': {
+                'all': RecentIndex(lambda f: '*', lambda f: f.created_at),
+                'barber': RecentIndex(lambda f: f.barber_id or None, lambda f: f.created_at),
+                'customer': RecentIndex(lambda f: f.customer_id, lambda f: f.created_at),
+                'comment': TextIndex(lambda f: f.comment),
+            },
+            'payments': {
+                'paid': RecentIndex(lambda p: '*' if p.payment_status == PaymentStatus.PAID else None,
+                                    lambda p: p.payment_date),
+                # One bucket per booking; a constant timestamp orders it by payment id
+                'booking': RecentIndex(lambda p: p.booking_id, lambda p: datetime.min),
+            },
+            'walk_ins': {
+                # Waiting walk-ins per (barber, day) in join order, weighted by service minutes
+                'line': QueueIndex(WalkIn.line_key, attrgetter('duration'), attrgetter('joined_at')),
+                'serving': RecentIndex(lambda w: w.barber_id if w.status == WalkInStatus.SERVING else None,
+                                       lambda w: w.started_at),
+            },
+        }
+        # Entities added or mutated in the current transaction, re-indexed when it ends
+        self._touched: List[object] = []
+        # Undo steps of the current transaction, newest last: (id of the entity whose
+        # pre-image the step restores or None, that entity's previous _saved entry, step).
+        # Each (nested) transaction level rolls back to where it started if it raises.
+        self._undo: List[Tuple[Optional[int], Optional[int], Callable[[], None]]] = []
+        # id(entity) -> position of its pre-image in _undo
+        self._saved: Dict[int, int] = {}
+        self._savepoints: List[int] = []
+        # Called with those entities after each committed transaction (see add_commit_hook)
+        self._commit_hooks: List[Callable[[List[object]], None]] = []
+        # Frozen copies of committed records per SNAPSHOT_COLLECTIONS name, built by the
+        # first snapshot(); maps in _frozen_shared belong to a snapshot and are copied on write
+        self._frozen: Dict[str, dict] = {}
+        self._frozen_shared: set = set()
+        self._snapshot: Optional[Snapshot] = None
         
         # Load data from JSON or initialize demo data
-        if os.path.exists(self.DATA_FILE):
-            self._load_from_json()
-        else:
-            self._initialize_demo_data()
-            self._save_to_json()
+        with self._file_lock:
+            if os.path.exists(self.DATA_FILE):
+                self._load_from_json()
+            else:
+                self._initialize_demo_data()
+                self._save_to_json()
     
     def _serialize_user(self, user: User) -> dict:
         """Serialize user object to dict"""
@@ -51,7 +142,8 @@ class DatabaseManager:
             'password': user.password,
             'phone': user.phone,
             'role': user.role.value,
-            'created_at': user.created_at.isoformat() if hasattr(user.created_at, 'isoformat') else str(user.created_at)
+            'created_at': user.created_at.isoformat() if hasattr(user.created_at, 'isoformat') else str(user.created_at),
+            'version': user.version
         }
         
         if isinstance(user, Customer):
@@ -91,6 +183,7 @@ class DatabaseManager:
             user = Customer(data['user_id'], data['name'], data['email'],
                           data['password'], data['phone'])
         
+        user.version = data.get('version', 1)
         return user
     
     def _serialize_booking(self, booking: Booking) -> dict:
@@ -105,7 +198,12 @@ class DatabaseManager:
             'created_at': booking.created_at.isoformat(),
             'service_description': booking.service.get_description(),
             'service_price': booking.service.get_price(),
-            'service_duration': booking.service.get_duration()
+            'service_duration': booking.service.get_duration(),
+            'version': booking.version,
+            'reminder_sent': booking.reminder_sent,
+            'planned_minutes': booking.planned_minutes,
+            'started_at': booking.started_at.isoformat() if booking.started_at else None,
+            'completed_at': booking.completed_at.isoformat() if booking.completed_at else None
         }
     
     def _deserialize_booking(self, data: dict) -> Booking:
@@ -136,7 +234,12 @@ class DatabaseManager:
             booking_date=date.fromisoformat(data['booking_date']),
             booking_time=time.fromisoformat(data['booking_time']),
             status=BookingStatus(data['status']),
-            created_at=datetime.fromisoformat(data['created_at'])
+            created_at=datetime.fromisoformat(data['created_at']),
+            version=data.get('version', 1),
+            reminder_sent=data.get('reminder_sent', False),
+            planned_minutes=data.get('planned_minutes'),
+            started_at=datetime.fromisoformat(data['started_at']) if data.get('started_at') else None,
+            completed_at=datetime.fromisoformat(data['completed_at']) if data.get('completed_at') else None
         )
         
         return booking
@@ -150,7 +253,11 @@ class DatabaseManager:
             'payment_method': payment.payment_method.value,
             'payment_status': payment.payment_status.value,
             'transaction_id': payment.transaction_id,
-            'payment_date': payment.payment_date.isoformat() if payment.payment_date else None
+            'payment_date': payment.payment_date.isoformat() if payment.payment_date else None,
+            'version': payment.version,
+            'idempotency_key': payment.idempotency_key,
+            'attempts': payment.attempts,
+            'failure_reason': payment.failure_reason
         }
     
     def _deserialize_payment(self, data: dict) -> Payment:
@@ -162,7 +269,11 @@ class DatabaseManager:
             payment_method=PaymentMethod(data['payment_method']),
             payment_status=PaymentStatus(data['payment_status']),
             transaction_id=data.get('transaction_id'),
-            payment_date=datetime.fromisoformat(data['payment_date']) if data.get('payment_date') else None
+            payment_date=datetime.fromisoformat(data['payment_date']) if data.get('payment_date') else None,
+            version=data.get('version', 1),
+            idempotency_key=data.get('idempotency_key'),
+            attempts=data.get('attempts', 1),
+            failure_reason=data.get('failure_reason')
         )
         return payment
     
@@ -191,21 +302,145 @@ class DatabaseManager:
             created_at=datetime.fromisoformat(data['created_at'])
         )
     
+    def _serialize_intervals(self, intervals) -> list:
+        return [[start.strftime('%H:%M'), end.strftime('%H:%M')] for start, end in intervals]
+    
+    def _deserialize_intervals(self, data: list) -> list:
+        return [(time.fromisoformat(start), time.fromisoformat(end)) for start, end in data]
+    
+    def _serialize_schedule(self, schedule: Schedule) -> dict:
+        """Serialize schedule object to dict"""
+        return {
+            'barber_id': schedule.barber_id,
+            'weekly_hours': {str(d): self._serialize_intervals(v) for d, v in schedule.weekly_hours.items()},
+            'breaks': {str(d): self._serialize_intervals(v) for d, v in schedule.breaks.items()},
+            'days_off': sorted(day.isoformat() for day in schedule.days_off),
+            'overrides': {day.isoformat(): self._serialize_intervals(v)
+                          for day, v in sorted(schedule.overrides.items())},
+            'version': schedule.version
+        }
+    
+    def _deserialize_schedule(self, data: dict) -> Schedule:
+        """Deserialize dict to schedule object"""
+        return Schedule(
+            barber_id=data['barber_id'],
+            weekly_hours={int(d): self._deserialize_intervals(v) for d, v in data.get('weekly_hours', {}).items()},
+            breaks={int(d): self._deserialize_intervals(v) for d, v in data.get('breaks', {}).items()},
+            days_off={date.fromisoformat(day) for day in data.get('days_off', [])},
+            overrides={date.fromisoformat(day): self._deserialize_intervals(v)
+                       for day, v in data.get('overrides', {}).items()},
+            version=data.get('version', 1)
+        )
+    
+    def _serialize_waitlist_entry(self, entry: WaitlistEntry) -> dict:
+        """Serialize waitlist entry to dict"""
+        return {
+            'entry_id': entry.entry_id,
+            'customer_id': entry.customer_id,
+            'barber_id': entry.barber_id,
+            'date_from': entry.date_from.isoformat(),
+            'date_to': entry.date_to.isoformat(),
+            'base_service': entry.base_service,
+            'addons': entry.addons,
+            'duration': entry.duration,
+            'created_at': entry.created_at.isoformat(),
+            'status': entry.status.value,
+            'booking_id': entry.booking_id,
+            'version': entry.version
+        }
+    
+    def _deserialize_waitlist_entry(self, data: dict) -> WaitlistEntry:
+        """Deserialize dict to waitlist entry"""
+        return WaitlistEntry(
+            entry_id=data['entry_id'],
+            customer_id=data['customer_id'],
+            barber_id=data.get('barber_id'),
+            date_from=date.fromisoformat(data['date_from']),
+            date_to=date.fromisoformat(data['date_to']),
+            base_service=data['base_service'],
+            addons=list(data.get('addons', [])),
+            duration=data['duration'],
+            created_at=datetime.fromisoformat(data['created_at']),
+            status=WaitlistStatus(data['status']),
+            booking_id=data.get('booking_id'),
+            version=data.get('version', 1)
+        )
+    
+    def _serialize_walk_in(self, walk_in: WalkIn) -> dict:
+        """Serialize walk-in to dict"""
+        return {
+            'entry_id': walk_in.entry_id,
+            'customer_name': walk_in.customer_name,
+            'customer_id': walk_in.customer_id,
+            'barber_id': walk_in.barber_id,
+            'base_service': walk_in.base_service,
+            'addons': walk_in.addons,
+            'duration': walk_in.duration,
+            'joined_at': walk_in.joined_at.isoformat(),
+            'status': walk_in.status.value,
+            'started_at': walk_in.started_at.isoformat() if walk_in.started_at else None,
+            'finished_at': walk_in.finished_at.isoformat() if walk_in.finished_at else None,
+            'version': walk_in.version
+        }
+    
+    def _deserialize_walk_in(self, data: dict) -> WalkIn:
+        """Deserialize dict to walk-in"""
+        return WalkIn(
+            entry_id=data['entry_id'],
+            customer_name=data['customer_name'],
+            customer_id=data.get('customer_id'),
+            barber_id=data['barber_id'],
+            base_service=data['base_service'],
+            addons=list(data.get('addons', [])),
+            duration=data['duration'],
+            joined_at=datetime.fromisoformat(data['joined_at']),
+            status=WalkInStatus(data['status']),
+            started_at=datetime.fromisoformat(data['started_at']) if data.get('started_at') else None,
+            finished_at=datetime.fromisoformat(data['finished_at']) if data.get('finished_at') else None,
+            version=data.get('version', 1)
+        )
+    
+    @timed("db.serialize")
+    def _serialize_all(self) -> dict:
+        """Serialize all collections to plain dicts"""
+        return {
+            'users': {uid: self._serialize_user(user) for uid, user in self.users.items()},
+            'bookings': {bid: self._serialize_booking(booking) for bid, booking in self.bookings.items()},
+            'payments': {pid: self._serialize_payment(payment) for pid, payment in self.payments.items()},
+            'feedbacks': {fid: self._serialize_feedback(feedback) for fid, feedback in self.feedbacks.items()},
+            'schedules': {bid: self._serialize_schedule(schedule) for bid, schedule in self.schedules.items()},
+            'waitlist': {eid: self._serialize_waitlist_entry(entry) for eid, entry in self.waitlist.items()},
+            'walk_ins': {eid: self._serialize_walk_in(walk_in) for eid, walk_in in self.walk_ins.items()},
+            'archive': self.archive
+        }
+    
+    def _stat_signature(self):
+        """(mtime, size) of the data file, None if it does not exist"""
+        try:
+            stat = os.stat(self.DATA_FILE)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    @timed("db.save")
     def _save_to_json(self):
         """Save all data to JSON file"""
         try:
-            data = {
-                'users': {uid: self._serialize_user(user) for uid, user in self.users.items()},
-                'bookings': {bid: self._serialize_booking(booking) for bid, booking in self.bookings.items()},
-                'payments': {pid: self._serialize_payment(payment) for pid, payment in self.payments.items()},
-                'feedbacks': {fid: self._serialize_feedback(feedback) for fid, feedback in self.feedbacks.items()}
-            }
+            data = self._serialize_all()
             
-            with open(self.DATA_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with self._file_lock:
+                # Write a temp file and swap it in so readers never see a partial file
+                tmp_file = f"{self.DATA_FILE}.{os.getpid()}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.DATA_FILE)
+                self._generation = self._file_lock.read_generation() + 1
+                self._file_lock.write_generation(self._generation)
+                self._signature = self._stat_signature()
         except Exception as e:
             print(f"Error saving to JSON: {e}")
     
+    @timed("db.load")
     def _load_from_json(self):
         """Load all data from JSON file"""
         try:
@@ -228,6 +463,28 @@ class DatabaseManager:
             self.feedbacks = {fid: self._deserialize_feedback(feedback_data)
                             for fid, feedback_data in data.get('feedbacks', {}).items()}
             
+            # Load schedules
+            self.schedules = {bid: self._deserialize_schedule(schedule_data)
+                            for bid, schedule_data in data.get('schedules', {}).items()}
+            
+            # Load waitlist
+            self.waitlist = {eid: self._deserialize_waitlist_entry(entry_data)
+                           for eid, entry_data in data.get('waitlist', {}).items()}
+            
+            # Load walk-ins
+            self.walk_ins = {eid: self._deserialize_walk_in(walk_in_data)
+                             for eid, walk_in_data in data.get('walk_ins', {}).items()}
+            
+            # Archived records are not in the file, only the manifest of their segments
+            self.archive = data.get('archive', {})
+            
+            for indexes in self._indexes.values():
+                for index in indexes.values():
+                    index.invalidate()
+            self._frozen, self._frozen_shared, self._snapshot = {}, set(), None
+            
+            self._generation = self._file_lock.read_generation()
+            self._signature = self._stat_signature()
             print(f"✅ Data loaded from {self.DATA_FILE}")
         except Exception as e:
             print(f"Error loading from JSON: {e}")
@@ -235,7 +492,543 @@ class DatabaseManager:
     
     def save(self):
         """Public method to save data"""
-        self._save_to_json()
+        with self.transaction():
+            pass
+    
+    def has_external_changes(self) -> bool:
+        """Cheap check whether another process wrote the data file since our last sync"""
+        return (self._file_lock.read_generation() != self._generation or
+                self._stat_signature() != self._signature)
+    
+    def refresh(self) -> bool:
+        """Merge records changed by other processes, True if anything was reloaded"""
+        if not self.has_external_changes():
+            return False
+        with self.lock, self._file_lock:
+            return self._merge_from_disk()
+    
+    def _replace_record(self, collection: dict, key: str, fresh):
+        """Swap in a newer copy of a record, keeping object identity where possible"""
+        local = collection.get(key)
+        if local is None or type(local) is not type(fresh):
+            collection[key] = fresh
+            return
+        observers = getattr(local, '_observers', None)
+        local.__dict__.update(fresh.__dict__)
+        if observers is not None:
+            local._observers = observers
+    
+    @timed("db.refresh")
+    def _merge_from_disk(self) -> bool:
+        """Load only new records and records whose version on disk is newer"""
+        try:
+            with open(self.DATA_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error refreshing from JSON: {e}")
+            return False
+        
+        changed = 0
+        # Segments archived by another process: drop our copies of their records
+        for name, entry in data.get('archive', {}).items():
+            if name not in self.archive:
+                self._drop_archived(name, entry)
+                changed += 1
+        
+        versioned = [
+            ('users', self._deserialize_user),
+            ('bookings', self._deserialize_booking),
+            ('payments', self._deserialize_payment),
+            ('schedules', self._deserialize_schedule),
+            ('waitlist', self._deserialize_waitlist_entry),
+            ('walk_ins', self._deserialize_walk_in),
+        ]
+        for name, deserialize in versioned:
+            collection = getattr(self, name)
+            for key, record in data.get(name, {}).items():
+                local = collection.get(key)
+                if local is None or record.get('version', 1) > local.version:
+                    self._replace_record(collection, key, deserialize(record))
+                    self._index_record(name, key, collection[key])
+                    changed += 1
+        
+        # Feedbacks are immutable once written
+        for key, record in data.get('feedbacks', {}).items():
+            if key not in self.feedbacks:
+                self.feedbacks[key] = self._deserialize_feedback(record)
+                self._index_record('feedbacks', key, self.feedbacks[key])
+                changed += 1
+        
+        self._generation = self._file_lock.read_generation()
+        self._signature = self._stat_signature()
+        return changed > 0
+    
+    @contextmanager
+    def transaction(self):
+        """Hold the write locks for a short mutation and save once at the end.
+        
+        The outermost transaction takes the cross-process file lock and merges
+        other processes' changes first, so validation and version checks see
+        the latest data. Nested transactions join it and share its single save.
+        
+        A transaction that raises puts back what it changed (see _remember())
+        and drops the notifications raised inside it; the rest are delivered
+        once the outermost transaction is saved and the locks are released.
+        """
+        with batched_notifications(), self.lock:
+            outermost = self._transaction_depth == 0
+            if outermost:
+                self._file_lock.acquire()
+            try:
+                if outermost and self.has_external_changes():
+                    self._merge_from_disk()
+                self._transaction_depth += 1
+                self._savepoints.append(len(self._undo))
+                touched_mark = len(self._touched)
+                try:
+                    with discard_notifications():
+                        yield self
+                except BaseException:
+                    self._rollback(self._savepoints[-1], touched_mark)
+                    raise
+                finally:
+                    self._transaction_depth -= 1
+                    self._savepoints.pop()
+                    if outermost:
+                        touched = self._reindex_touched()
+                        self._undo, self._saved = [], {}
+                if outermost:
+                    self._save_to_json()
+                    self._run_commit_hooks(touched)
+            finally:
+                if outermost:
+                    self._file_lock.release()
+    
+    def _remember(self, entity):
+        """Keep the state of an entity before the current transaction level changes it"""
+        if not self._savepoints or self._saved.get(id(entity), -1) >= self._savepoints[-1]:
+            return
+        state = copy.deepcopy({key: value for key, value in vars(entity).items() if key != '_observers'})
+        self._undo.append((id(entity), self._saved.get(id(entity)), partial(self._restore, entity, state)))
+        self._saved[id(entity)] = len(self._undo) - 1
+    
+    def _restore(self, entity, state: dict):
+        observers = getattr(entity, '_observers', None)
+        vars(entity).clear()
+        vars(entity).update(state)
+        if observers is not None:
+            entity._observers = observers
+        self._touched.append(entity)
+    
+    def _on_rollback(self, step: Callable[[], None]):
+        """Undo step for a record added or removed by the current transaction"""
+        if self._savepoints:
+            self._undo.append((None, None, step))
+    
+    def _rollback(self, mark: int, touched_mark: int):
+        """Undo everything after undo position mark; restored entities get re-indexed"""
+        del self._touched[touched_mark:]
+        steps = self._undo[mark:]
+        for key, previous, step in reversed(steps):
+            step()
+            if key is not None:
+                if previous is None:
+                    del self._saved[key]
+                else:
+                    self._saved[key] = previous
+        # Drop the steps, and any the undo itself recorded
+        del self._undo[mark:]
+        if not self._savepoints[:-1]:
+            # Outermost level: nothing will be committed, put the indexes back now
+            self._reindex_touched()
+    
+    def check_version(self, entity, expected_version: Optional[int]):
+        """Raise ConcurrencyError if the caller's expected_version is stale"""
+        if expected_version is not None and entity.version != expected_version:
+            raise ConcurrencyError(
+                f"{type(entity).__name__} was modified by someone else, please reload and try again")
+    
+    def bump_version(self, entity, expected_version: Optional[int] = None):
+        """Compare-and-set an entity's version right before mutating it"""
+        with self.lock:
+            self.check_version(entity, expected_version)
+            self._remember(entity)
+            entity.version += 1
+            self._touched.append(entity)
+    
+    def add_user(self, user: User) -> User:
+        """Register a new user"""
+        with self.lock:
+            self.users[user.user_id] = user
+            self._index_record('users', user.user_id, user)
+            self._on_rollback(partial(self._remove_records, 'users', [user.user_id]))
+        return user
+    
+    def add_booking(self, booking: Booking) -> Booking:
+        """Register a new booking"""
+        with self.lock:
+            self.bookings[booking.booking_id] = booking
+            self._index_record('bookings', booking.booking_id, booking)
+            self._on_rollback(partial(self._remove_records, 'bookings', [booking.booking_id]))
+            self._touched.append(booking)
+        return booking
+    
+    def add_payment(self, payment: Payment) -> Payment:
+        """Register a new payment"""
+        with self.lock:
+            self.payments[payment.payment_id] = payment
+            self._index_record('payments', payment.payment_id, payment)
+            self._on_rollback(partial(self._remove_records, 'payments', [payment.payment_id]))
+            self._touched.append(payment)
+        return payment
+    
+    def add_feedback(self, feedback: Feedback) -> Feedback:
+        """Register a new feedback"""
+        with self.lock:
+            self.feedbacks[feedback.feedback_id] = feedback
+            self._index_record('feedbacks', feedback.feedback_id, feedback)
+            self._on_rollback(partial(self._remove_records, 'feedbacks', [feedback.feedback_id]))
+            self._touched.append(feedback)
+        return feedback
+    
+    def set_schedule(self, schedule: Schedule) -> Schedule:
+        """Register or replace a barber's schedule"""
+        with self.lock:
+            previous = self.schedules.get(schedule.barber_id)
+            self.schedules[schedule.barber_id] = schedule
+            self._on_rollback(partial(self._put_back, 'schedules', schedule.barber_id, previous))
+        return schedule
+    
+    def add_waitlist_entry(self, entry: WaitlistEntry) -> WaitlistEntry:
+        """Register a new waitlist entry"""
+        with self.lock:
+            self.waitlist[entry.entry_id] = entry
+            self._index_record('waitlist', entry.entry_id, entry)
+            self._on_rollback(partial(self._remove_records, 'waitlist', [entry.entry_id]))
+        return entry
+    
+    def add_walk_in(self, walk_in: WalkIn) -> WalkIn:
+        """Register a new walk-in"""
+        with self.lock:
+            self.walk_ins[walk_in.entry_id] = walk_in
+            self._index_record('walk_ins', walk_in.entry_id, walk_in)
+            self._on_rollback(partial(self._remove_records, 'walk_ins', [walk_in.entry_id]))
+        return walk_in
+    
+    def next_id(self, name: str, prefix: str) -> str:
+        """Next sequential id of a collection, counting its archived records too"""
+        number = len(getattr(self, name)) + sum(entry['counts'].get(name, 0) for entry in self.archive.values())
+        return f"{prefix}{number + 1:04d}"
+    
+    # ------------------------------------------------------------------
+    # Archive
+    # ------------------------------------------------------------------
+    
+    def archive_records(self, label: str, bookings: List[Booking], payments: List[Payment],
+                        feedbacks: List[Feedback], summary: dict) -> str:
+        """Move records into a new archive segment and return its name.
+        
+        Call inside transaction(): the segment is written immediately, the
+        records leave the data file (and the manifest gains the segment) with
+        the transaction's save. summary holds the caller's aggregates.
+        """
+        with self.lock:
+            name = self._archive_store.next_name(label)
+            sha256 = self._archive_store.write(name, {
+                'bookings': [self._serialize_booking(booking) for booking in bookings],
+                'payments': [self._serialize_payment(payment) for payment in payments],
+                'feedbacks': [self._serialize_feedback(feedback) for feedback in feedbacks],
+            })
+            self._remove_records('bookings', [b.booking_id for b in bookings])
+            self._remove_records('payments', [p.payment_id for p in payments])
+            self._remove_records('feedbacks', [f.feedback_id for f in feedbacks])
+            self._snapshot = None
+            self.archive[name] = {
+                'sha256': sha256,
+                'archived_at': datetime.now().isoformat(timespec='seconds'),
+                'counts': {'bookings': len(bookings), 'payments': len(payments), 'feedbacks': len(feedbacks)},
+                'summary': summary,
+            }
+            self._on_rollback(partial(self.archive.pop, name, None))
+        return name
+    
+    def load_archived(self, name: str, booking_filter: Optional[Callable[[dict], bool]] = None
+                      ) -> Tuple[List[Booking], List[Payment], List[Feedback]]:
+        """Records of one archive segment, each list sorted by id.
+        
+        booking_filter(serialized booking) selects bookings before they are
+        deserialized; only their payments and feedbacks are returned.
+        """
+        segment = self._archive_store.read(name, self.archive[name]['sha256'])
+        bookings, payments, feedbacks = segment['bookings'], segment['payments'], segment['feedbacks']
+        if booking_filter is not None:
+            bookings = [data for data in bookings if booking_filter(data)]
+            booking_ids = {data['booking_id'] for data in bookings}
+            payments = [data for data in payments if data['booking_id'] in booking_ids]
+            feedbacks = [data for data in feedbacks if data['booking_id'] in booking_ids]
+        return ([self._deserialize_booking(data) for data in bookings],
+                [self._deserialize_payment(data) for data in payments],
+                [self._deserialize_feedback(data) for data in feedbacks])
+    
+    def _drop_archived(self, name: str, entry: dict):
+        try:
+            segment = self._archive_store.read(name, entry['sha256'])
+        except (OSError, ValueError) as e:
+            # Keep the manifest entry anyway so our next save does not forget the segment
+            print(f"Error reading archive segment {name}: {e}")
+            self.archive[name] = entry
+            return
+        self._remove_records('bookings', [data['booking_id'] for data in segment['bookings']])
+        self._remove_records('payments', [data['payment_id'] for data in segment['payments']])
+        self._remove_records('feedbacks', [data['feedback_id'] for data in segment['feedbacks']])
+        self._snapshot = None
+        self.archive[name] = entry
+    
+    def _remove_records(self, name: str, keys: Iterable[str]):
+        collection, indexes = getattr(self, name), self._indexes.get(name, {}).values()
+        for key in keys:
+            record = collection.pop(key, None)
+            if record is not None:
+                for index in indexes:
+                    index.remove(key)
+                self._freeze(name, key, None)
+                self._on_rollback(partial(self._put_back, name, key, record))
+    
+    def _put_back(self, name: str, key: str, record):
+        """Undo step: restore (record None: drop) one record of a collection"""
+        if record is None:
+            getattr(self, name).pop(key, None)
+        else:
+            getattr(self, name)[key] = record
+            self._index_record(name, key, record)
+    
+    def _index_record(self, name: str, key: str, record):
+        for index in self._indexes.get(name, {}).values():
+            index.add(key, record)
+        self._freeze(name, key, record)
+    
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+    
+    def snapshot(self) -> Snapshot:
+        """Consistent read-only view of the committed records, for reports.
+        
+        O(1) except for the first call, which copies every record once. The
+        same snapshot is handed out until the next change is committed.
+        """
+        with self.lock:
+            if self._snapshot is None:
+                if not self._frozen:
+                    self._frozen = {name: {key: copy.copy(record) for key, record in getattr(self, name).items()}
+                                    for name in self.SNAPSHOT_COLLECTIONS}
+                self._frozen_shared = set(self._frozen)
+                self._snapshot = Snapshot(self._frozen.copy(), dict(self.archive), datetime.now())
+            return self._snapshot
+    
+    def _freeze(self, name: str, key: str, record):
+        """Replace (record None: drop) the frozen copy of a committed or merged record"""
+        frozen = self._frozen.get(name)
+        if frozen is None:
+            return
+        if name in self._frozen_shared:
+            frozen = self._frozen[name] = frozen.copy()
+            self._frozen_shared.discard(name)
+        if record is None:
+            frozen.pop(key, None)
+        else:
+            frozen[key] = copy.copy(record)
+        self._snapshot = None
+    
+    def _reindex_touched(self) -> List[object]:
+        """Re-file entities mutated in the finished transaction (e.g. a reassigned barber)"""
+        touched, self._touched = self._touched, []
+        for entity in touched:
+            if isinstance(entity, Booking):
+                self._index_record('bookings', entity.booking_id, entity)
+            elif isinstance(entity, Payment):
+                self._index_record('payments', entity.payment_id, entity)
+            elif isinstance(entity, User):
+                self._index_record('users', entity.user_id, entity)
+            elif isinstance(entity, WalkIn):
+                self._index_record('walk_ins', entity.entry_id, entity)
+        return touched
+    
+    def add_commit_hook(self, hook: Callable[[List[object]], None]):
+        """Call hook(entities) after every committed transaction.
+        
+        Hooks run while the write locks are still held, right after the save,
+        so they see changes in commit order across processes.
+        """
+        with self.lock:
+            if hook not in self._commit_hooks:
+                self._commit_hooks.append(hook)
+    
+    def _run_commit_hooks(self, touched: List[object]):
+        for hook in self._commit_hooks:
+            try:
+                hook(touched)
+            except Exception as e:
+                # The data is already saved; a failing hook must not undo the caller's action
+                print(f"Error in commit hook: {e}")
+    
+    def add_index(self, name: str, index_name: str, index):
+        """Keep another module's secondary index over a collection up to date.
+        
+        index follows the RecentIndex protocol (built, rebuild, invalidate, add,
+        remove): it sees every record added, re-filed, merged or removed.
+        """
+        with self.lock:
+            self._indexes.setdefault(name, {})[index_name] = index
+    
+    def _index(self, name: str, index: str):
+        """A secondary index, built on first use so loading the data file stays cheap"""
+        secondary = self._indexes[name][index]
+        if not secondary.built:
+            secondary.rebuild(getattr(self, name))
+        return secondary
+    
+    def _recent(self, name: str, index: str, key: str, limit: Optional[int],
+                before: Optional[Cursor], since: Optional[datetime] = None) -> list:
+        collection = getattr(self, name)
+        with self.lock:
+            recent_index = self._index(name, index)
+            ids = recent_index.iter_recent(key, before)
+            records = (collection[record_id] for record_id in ids)
+            if since is not None:
+                ts_func = recent_index.ts_func
+                records = takewhile(lambda r: ts_func(r) >= since, records)
+            return list(islice(records, limit))
+    
+    def recent_bookings(self, customer_id: Optional[str] = None, barber_id: Optional[str] = None,
+                        limit: Optional[int] = 10, before: Optional[Cursor] = None) -> List[Booking]:
+        """Newest bookings of a customer or barber by created_at.
+        
+        Pass before=(created_at, booking_id) of the last item to get the next page.
+        """
+        if customer_id is not None:
+            return self._recent('bookings', 'customer', customer_id, limit, before)
+        return self._recent('bookings', 'barber', barber_id, limit, before)
+    
+    def recent_feedbacks(self, barber_id: Optional[str] = None, limit: Optional[int] = 10,
+                         before: Optional[Cursor] = None) -> List[Feedback]:
+        """Newest feedbacks overall or for one barber, cursor as in recent_bookings"""
+        if barber_id is not None:
+            return self._recent('feedbacks', 'barber', barber_id, limit, before)
+        return self._recent('feedbacks', 'all', '*', limit, before)
+    
+    def recent_payments(self, limit: Optional[int] = 10, before: Optional[Cursor] = None,
+                        since: Optional[datetime] = None) -> List[Payment]:
+        """Newest paid payments by payment_date, optionally stopping at since"""
+        return self._recent('payments', 'paid', '*', limit, before, since)
+    
+    def payments_for_booking(self, booking_id: str) -> List[Payment]:
+        """Payments of one booking, oldest first (normally zero or one)"""
+        payments = self._recent('payments', 'booking', booking_id, None, None)
+        payments.reverse()
+        return payments
+    
+    def in_progress_bookings(self, barber_id: str) -> List[Booking]:
+        """A barber's bookings currently in progress (normally zero or one)"""
+        return self._recent('bookings', 'in_progress', barber_id, None, None)
+    
+    def serving_walk_ins(self, barber_id: str) -> List[WalkIn]:
+        """Walk-ins a barber is serving right now (normally zero or one)"""
+        return self._recent('walk_ins', 'serving', barber_id, None, None)
+    
+    def walk_in_line(self, barber_id: str, day: date) -> List[WalkIn]:
+        """Walk-ins waiting for a barber on a day, first in line first"""
+        with self.lock:
+            line = self._index('walk_ins', 'line')
+            return [self.walk_ins[entry_id] for entry_id, _ in line.iter_line((barber_id, day))]
+    
+    def walk_in_ahead(self, entry_id: str) -> Optional[Tuple[int, int]]:
+        """(people, service minutes) waiting before a walk-in, None if it is not waiting"""
+        with self.lock:
+            return self._index('walk_ins', 'line').ahead(entry_id)
+    
+    def walk_in_totals(self, barber_id: str, day: date) -> Tuple[int, int]:
+        """(people, service minutes) waiting for a barber on a day"""
+        with self.lock:
+            return self._index('walk_ins', 'line').totals((barber_id, day))
+    
+    @timed("db.search_feedbacks")
+    def search_feedbacks(self, query: str = "", barber_id: Optional[str] = None,
+                         min_rating: Optional[int] = None, max_rating: Optional[int] = None,
+                         date_from: Optional[date] = None, date_to: Optional[date] = None,
+                         limit: Optional[int] = 20) -> List[Feedback]:
+        """Feedbacks matching every query term, best match first.
+        
+        A term matches the comment or the customer's name, e-mail or phone;
+        "fad*" matches by prefix. Without terms the filtered feedbacks are
+        returned newest first.
+        """
+        def keep(feedback: Feedback) -> bool:
+            return ((barber_id is None or feedback.barber_id == barber_id) and
+                    (min_rating is None or feedback.rating >= min_rating) and
+                    (max_rating is None or feedback.rating <= max_rating) and
+                    (date_from is None or feedback.created_at.date() >= date_from) and
+                    (date_to is None or feedback.created_at.date() <= date_to))
+        
+        terms = parse_query(query)
+        with self.lock:
+            if not terms:
+                recent = (self._index('feedbacks', 'barber').iter_recent(barber_id) if barber_id is not None
+                          else self._index('feedbacks', 'all').iter_recent('*'))
+                return list(islice(filter(keep, (self.feedbacks[fid] for fid in recent)), limit))
+            
+            comments = self._index('feedbacks', 'comment')
+            customers = self._index('users', 'customer_text')
+            by_customer = self._index('feedbacks', 'customer')
+            feedbacks = self.feedbacks
+            per_term = []
+            for term, prefix in terms:
+                comment_hits = comments.scores(term, prefix)
+                customer_hits = customers.scores(term, prefix)
+                size = len(comment_hits) + sum(by_customer.count(cid) for cid in customer_hits)
+                if not size:
+                    return []
+                per_term.append((size, comment_hits, customer_hits))
+            # Every term must match (AND): the most selective term yields the candidates,
+            # the others only check membership, so common words never get materialized
+            per_term.sort(key=lambda t: t[0])
+            _, comment_hits, customer_hits = per_term[0]
+            matched = dict(comment_hits)
+            for customer_id, score in customer_hits.items():
+                for feedback_id in by_customer.iter_recent(customer_id):
+                    matched[feedback_id] = matched.get(feedback_id, 0.0) + score
+            for _, comment_hits, customer_hits in per_term[1:]:
+                narrowed = {}
+                for feedback_id, score in matched.items():
+                    extra = (comment_hits.get(feedback_id, 0.0) +
+                             customer_hits.get(feedbacks[feedback_id].customer_id, 0.0))
+                    if extra:
+                        narrowed[feedback_id] = score + extra
+                matched = narrowed
+                if not matched:
+                    return []
+            
+            filtered = not (barber_id is None and min_rating is None and max_rating is None and
+                            date_from is None and date_to is None)
+            candidates = matched.items()
+            if filtered:
+                candidates = [(fid, score) for fid, score in candidates if keep(feedbacks[fid])]
+            by_rank = lambda c: (c[1], feedbacks[c[0]].created_at)
+            if limit is None or len(candidates) <= limit:
+                return [feedbacks[fid] for fid, _ in sorted(candidates, key=by_rank, reverse=True)]
+            # Many feedbacks share a score (same wording), so rank everything above the
+            # limit-th best score and fill up with the newest of those tied with it
+            cutoff = sorted([score for _, score in candidates], reverse=True)[limit - 1]
+            above = sorted(((fid, score) for fid, score in candidates if score > cutoff),
+                           key=by_rank, reverse=True)
+            tied = sorted(map(feedbacks.__getitem__, [fid for fid, score in candidates if score == cutoff]),
+                          key=attrgetter('created_at'), reverse=True)
+            return [feedbacks[fid] for fid, _ in above] + tied[:limit - len(above)]
+    
+    def find_user_by_credentials(self, email: str, password: str):
+        """Return the user matching email and password, or None"""
+        return next((u for u in self.users.values()
+                     if u.email == email and u.password == password), None)
     
     def _initialize_demo_data(self):
         """Initialize with demo data"""
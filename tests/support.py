@@ -0,0 +1,32 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import core.admission
+from patterns.singleton import DatabaseManager
+
+
+def open_db(data_file: str) -> DatabaseManager:
+    """A new DatabaseManager on data_file, as another process would open it"""
+    DatabaseManager._instance = None
+    DatabaseManager.DATA_FILE = data_file
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DatabaseManager()
+
+
+class TempDataTest(unittest.TestCase):
+    """Runs each test on the demo data in a temporary DATA_FILE, without rate limits"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.tmp, "barbershop_data.json")
+        self._saved = (DatabaseManager._instance, DatabaseManager.DATA_FILE, core.admission.admission)
+        core.admission.admission = core.admission.AdmissionController(limits={}, overall={})
+        self.db = open_db(self.data_file)
+
+    def tearDown(self):
+        DatabaseManager._instance, DatabaseManager.DATA_FILE, core.admission.admission = self._saved
+        shutil.rmtree(self.tmp, ignore_errors=True)
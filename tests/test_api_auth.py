@@ -0,0 +1,85 @@
+import asyncio
+import json
+import unittest
+from datetime import date, time, timedelta
+
+from api.asgi import BookingAPI, tokens_from_env
+from core.booking_service import BookingService
+from utils.enums import BookingStatus, UserRole
+from support import TempDataTest
+
+
+class TokensFromEnvTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(tokens_from_env("s3cret:owner, b4rber:barber,"),
+                         {"s3cret": UserRole.OWNER, "b4rber": UserRole.BARBER})
+        self.assertEqual(tokens_from_env(""), {})
+        with self.assertRaises(ValueError):
+            tokens_from_env("owner")
+        with self.assertRaises(ValueError):
+            tokens_from_env("s3cret:admin")
+
+
+class OwnerEndpointsTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.day = date.today() + timedelta(days=1)
+        self.booking = self.service.create_booking(customer.user_id, "Shave", [], self.day, time(10, 0), "B001")
+        self.app = BookingAPI(service_factory=lambda: self.service,
+                              tokens={"owner-token": UserRole.OWNER, "barber-token": UserRole.BARBER})
+
+    def post(self, path: str, body: dict, token: str = None):
+        headers = [(b'authorization', f"Bearer {token}".encode())] if token else []
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': json.dumps(body).encode(), 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'headers': headers}
+        asyncio.run(self.app(scope, receive, send))
+        return sent[0]['status'], dict(sent[0]['headers']), json.loads(sent[1]['body'])
+
+    def test_cancel_day_needs_an_owner_token(self):
+        body = {'date': self.day.isoformat()}
+        status, headers, _ = self.post("/schedules/cancel", body)
+        self.assertEqual(status, 401)
+        self.assertEqual(headers[b'www-authenticate'], b'Bearer')
+        self.assertEqual(self.post("/schedules/cancel", body, "wrong")[0], 401)
+        self.assertEqual(self.post("/schedules/cancel", body, "barber-token")[0], 403)
+        self.assertEqual(self.booking.status, BookingStatus.SCHEDULED)
+
+        status, _, payload = self.post("/schedules/cancel", body, "owner-token")
+        self.assertEqual(status, 200)
+        self.assertEqual([b['booking_id'] for b in payload['bookings']], [self.booking.booking_id])
+        self.assertEqual(self.booking.status, BookingStatus.CANCELED)
+
+    def test_reassign_day_is_owner_only(self):
+        body = {'from_barber_id': "B001", 'to_barber_id': "B002", 'date': self.day.isoformat()}
+        self.assertEqual(self.post("/schedules/reassign", body, "barber-token")[0], 403)
+        self.assertEqual(self.post("/schedules/reassign", body, "owner-token")[0], 200)
+        self.assertEqual(self.booking.barber_id, "B002")
+
+    def test_barbers_may_complete_in_bulk(self):
+        self.service.start_booking(self.booking.booking_id)
+        body = {'booking_ids': [self.booking.booking_id]}
+        self.assertEqual(self.post("/bookings/complete", body)[0], 401)
+        self.assertEqual(self.post("/bookings/complete", body, "barber-token")[0], 200)
+        self.assertEqual(self.booking.status, BookingStatus.COMPLETED)
+
+    def test_no_configured_tokens_refuses_everyone(self):
+        self.app.tokens = {}
+        self.assertEqual(self.post("/schedules/cancel", {'date': self.day.isoformat()}, "owner-token")[0], 401)
+
+    def test_public_endpoints_need_no_token(self):
+        self.assertEqual(self.post(f"/bookings/{self.booking.booking_id}/cancel", {})[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from datetime import date, time, timedelta
+
+from core.archive import Archive
+from core.booking_service import BookingService
+from core.history import BookingHistory
+from utils.enums import BookingStatus, PaymentStatus
+from support import TempDataTest, open_db
+
+
+class ArchiveRoundTripTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        day = date.today() + timedelta(days=1)
+        self.done = self.service.create_booking(customer.user_id, "Shave", ["Hair Wash"], day, time(10, 0),
+                                                "B001")
+        self.service.start_booking(self.done.booking_id)
+        self.service.complete_booking(self.done.booking_id)
+        payment = self.service.pay_booking(self.done.booking_id)
+        self.service.settle_payment(payment.payment_id, True, "TXN-1")
+        self.service.submit_feedback(self.done.booking_id, customer.user_id, 5, "Great")
+        self.active = self.service.create_booking(customer.user_id, "Shave", [], day, time(12, 0), "B001")
+        # Every finished booking up to the day after tomorrow is old enough
+        self.later = date.today() + timedelta(days=3)
+
+    def test_archived_records_read_back_unchanged(self):
+        expected = (self.done.booking_id, self.done.status, self.done.service.get_description(),
+                    self.done.booking_date, self.done.booking_time)
+        name = Archive(self.db).run(older_than_days=0, today=self.later)
+        self.assertIsNotNone(name)
+        self.assertNotIn(self.done.booking_id, self.db.bookings)
+        self.assertIn(self.active.booking_id, self.db.bookings)
+
+        archive = Archive(self.db)
+        booking = archive.find_booking(self.done.booking_id)
+        self.assertEqual((booking.booking_id, booking.status, booking.service.get_description(),
+                          booking.booking_date, booking.booking_time), expected)
+        payments = archive.payments_for_booking(self.done.booking_id)
+        self.assertEqual([p.payment_status for p in payments], [PaymentStatus.PAID])
+        self.assertEqual([f.comment for f in archive.feedbacks("B001")], ["Great"])
+        totals = archive.totals()
+        self.assertEqual(totals['bookings'], 1)
+        self.assertEqual(totals['statuses'], {BookingStatus.COMPLETED.value: 1})
+
+    def test_reloaded_and_merging_processes_see_the_archive(self):
+        other = open_db(self.data_file)
+        self.assertIn(self.done.booking_id, other.bookings)
+        Archive(self.db).run(older_than_days=0, today=self.later)
+
+        other.refresh()
+        self.assertNotIn(self.done.booking_id, other.bookings)
+        reloaded = open_db(self.data_file)
+        self.assertNotIn(self.done.booking_id, reloaded.bookings)
+        self.assertEqual(Archive(reloaded).find_booking(self.done.booking_id).booking_id, self.done.booking_id)
+        self.assertEqual(reloaded.next_id('bookings', "BK"), "BK0003")
+
+    def test_nothing_to_archive(self):
+        self.assertIsNone(Archive(self.db).run(older_than_days=0, today=date.today()))
+        self.assertEqual(self.db.archive, {})
+
+    def test_history_drops_archived_records_but_keeps_their_timeline(self):
+        history = self.service.history
+        keys = [f"booking:{self.done.booking_id}", "payment:PAY0001", "feedback:FB0001"]
+        live = history.live()
+        self.assertTrue(all(key in live.current for key in keys))
+        counts = history.status_counts(self.done.booking_date)
+        events = history.timeline('booking', self.done.booking_id)
+
+        name = Archive(self.db).run(older_than_days=0, today=self.later)
+        live = history.live()
+        self.assertEqual(live.archived, {name})
+        self.assertFalse(any(key in live.current or key in live.offsets for key in keys))
+        self.assertIn(f"booking:{self.active.booking_id}", live.current)
+        self.assertEqual(history.status_counts(self.done.booking_date), counts)
+        self.assertEqual(history.timeline('booking', self.done.booking_id), events)
+
+        # Checkpoints leave them out too, and a later commit logs nothing more for the segment
+        history.log.write_checkpoint((live.seq, live.at.timestamp()), live.to_state())
+        seq = live.seq
+        self.service.cancel_booking(self.active.booking_id)
+        restored = BookingHistory(self.db).live()
+        self.assertEqual(restored.archived, {name})
+        self.assertNotIn(keys[0], restored.current)
+        self.assertEqual(restored.seq, seq + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
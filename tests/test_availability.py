@@ -0,0 +1,49 @@
+import unittest
+from datetime import date, time, timedelta
+
+from core.availability import AvailabilityIndex, compile_intervals, interval_mask
+from support import TempDataTest
+
+
+class WorkingBitmapCacheTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.index = AvailabilityIndex(self.db, cache_days=3)
+        self.monday = date(2030, 1, 7)
+
+    def days(self, barber_id: str):
+        return list(self.index._cache[barber_id][1])
+
+    def test_cache_keeps_the_most_recently_used_days(self):
+        first, second, third, fourth = (self.monday + timedelta(days=i) for i in range(4))
+        for day in (first, second, third):
+            self.index.working_bitmap("B001", day)
+        # first is used again, so second is the least recently used day
+        self.index.working_bitmap("B001", first)
+        self.index.working_bitmap("B001", fourth)
+        self.assertEqual(self.days("B001"), [third, first, fourth])
+
+    def test_evicted_days_are_recompiled_unchanged(self):
+        bitmaps = [self.index.working_bitmap("B001", self.monday + timedelta(days=i)) for i in range(7)]
+        again = [self.index.working_bitmap("B001", self.monday + timedelta(days=i)) for i in range(7)]
+        self.assertEqual(again, bitmaps)
+        self.assertEqual(len(self.days("B001")), 3)
+        self.assertEqual(bitmaps[0] & interval_mask(time(9, 0), 60), interval_mask(time(9, 0), 60))
+
+    def test_schedule_change_drops_the_cached_days(self):
+        self.index.working_bitmap("B001", self.monday)
+        self.index._cache["B001"] = (-1, self.index._cache["B001"][1])
+        self.index.working_bitmap("B001", self.monday + timedelta(days=1))
+        self.assertEqual(self.days("B001"), [self.monday + timedelta(days=1)])
+
+
+class CompileIntervalsTest(unittest.TestCase):
+
+    def test_until_midnight_covers_the_end_of_the_day(self):
+        bitmap = compile_intervals([(time(23, 0), time(0, 0))])
+        self.assertEqual(bitmap, interval_mask(time(23, 0), 60))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import os
+import unittest
+from datetime import date, time, timedelta
+
+from core.archive import Archive
+from core.backup import BackupManager
+from core.booking_service import BookingService
+from core.history import EVENTS_SUFFIX
+from support import TempDataTest, open_db
+
+
+class BackupRestoreTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.backups = BackupManager(self.data_file, directory=os.path.join(self.tmp, "backups"))
+        self.target = os.path.join(self.tmp, "restored", "barbershop_data.json")
+
+    def book(self, hour: int):
+        return self.service.create_booking(self.customer.user_id, "Shave", [],
+                                           date.today() + timedelta(days=1), time(hour, 0), "B001")
+
+    def read(self, path: str, mode: str = 'r'):
+        with open(path, mode) as f:
+            return json.load(f) if mode == 'r' else f.read()
+
+    def test_delta_chain_restores_the_data_file_and_event_log(self):
+        first = self.book(10)
+        self.assertEqual(self.backups.backup()['kind'], 'full')
+        self.service.cancel_booking(first.booking_id)
+        self.book(11)
+        self.assertEqual(self.backups.backup()['kind'], 'delta')
+
+        self.assertEqual(self.backups.verify(), [])
+        self.backups.restore(target=self.target)
+        self.assertEqual(self.read(self.target), self.read(self.data_file))
+        events = os.path.splitext(self.data_file)[0] + EVENTS_SUFFIX
+        restored_events = os.path.splitext(self.target)[0] + EVENTS_SUFFIX
+        self.assertEqual(self.read(restored_events, 'rb'), self.read(events, 'rb'))
+
+    def test_restored_archive_is_readable(self):
+        booking = self.book(10)
+        self.service.cancel_booking(booking.booking_id)
+        Archive(self.db).run(older_than_days=0, today=date.today() + timedelta(days=3))
+        self.backups.backup()
+
+        self.backups.restore(target=self.target)
+        restored = open_db(self.target)
+        self.assertEqual(Archive(restored).find_booking(booking.booking_id).booking_id, booking.booking_id)
+
+    def test_damaged_backup_is_not_restored(self):
+        self.book(10)
+        self.backups.backup()
+        self.book(11)
+        entry = self.backups.backup()
+        damaged = next(name for name in entry['files'] if name.endswith(".json.gz"))
+        with open(os.path.join(self.backups.directory, damaged), 'ab') as f:
+            f.write(b"garbage")
+
+        self.assertEqual(self.backups.verify(), [f"{damaged}: checksum mismatch"])
+        with self.assertRaises(ValueError):
+            self.backups.restore(target=self.target)
+        self.assertFalse(os.path.exists(self.target))
+
+    def test_existing_target_needs_force(self):
+        self.backups.backup()
+        with self.assertRaises(FileExistsError):
+            self.backups.restore()
+        self.backups.restore(force=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
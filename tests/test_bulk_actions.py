@@ -0,0 +1,76 @@
+import unittest
+from datetime import date, time, timedelta
+
+from core.booking_service import BookingService
+from patterns.observer import InboxObserver
+from utils.enums import BookingStatus
+from utils.exceptions import ConcurrencyError, InvalidStateError, SlotConflictError
+from support import TempDataTest
+
+
+class BulkActionsTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.inbox = InboxObserver()
+        self.service = BookingService(self.db, [self.inbox])
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.day = date.today() + timedelta(days=1)
+        self.bookings = [self.book(hour) for hour in (10, 11, 12)]
+
+    def book(self, hour: int, barber_id: str = "B001"):
+        return self.service.create_booking(self.customer.user_id, "Shave", [], self.day, time(hour, 0), barber_id)
+
+    def statuses(self):
+        return [b.status for b in self.bookings]
+
+    def test_complete_bookings_is_all_or_nothing_on_a_version_conflict(self):
+        for booking in self.bookings:
+            self.service.start_booking(booking.booking_id)
+        versions = {b.booking_id: b.version for b in self.bookings}
+        # Another session completes one of them first
+        self.service.complete_booking(self.bookings[1].booking_id)
+        with self.assertRaises(ConcurrencyError):
+            self.service.complete_bookings(list(versions), versions)
+        self.assertEqual(self.statuses(), [BookingStatus.IN_PROGRESS, BookingStatus.COMPLETED,
+                                           BookingStatus.IN_PROGRESS])
+        self.assertEqual(self.bookings[0].version, versions[self.bookings[0].booking_id])
+
+    def test_complete_bookings_rejects_the_batch_if_one_cannot_complete(self):
+        self.service.start_booking(self.bookings[0].booking_id)
+        with self.assertRaises(InvalidStateError):
+            self.service.complete_bookings([b.booking_id for b in self.bookings[:2]])
+        self.assertEqual(self.statuses(), [BookingStatus.IN_PROGRESS, BookingStatus.SCHEDULED,
+                                           BookingStatus.SCHEDULED])
+
+    def test_complete_bookings_notifies_once_per_booking(self):
+        for booking in self.bookings:
+            self.service.start_booking(booking.booking_id)
+        before = len(self.inbox.for_user(self.customer.user_id))
+        done = self.service.complete_bookings([b.booking_id for b in self.bookings])
+        self.assertEqual(done, self.bookings)
+        self.assertEqual(self.statuses(), [BookingStatus.COMPLETED] * 3)
+        self.assertEqual(len(self.inbox.for_user(self.customer.user_id)) - before, 3)
+
+    def test_reassign_day_moves_nothing_on_a_conflict(self):
+        self.book(11, barber_id="B002")
+        with self.assertRaises(SlotConflictError):
+            self.service.reassign_day("B001", "B002", self.day)
+        self.assertEqual([b.barber_id for b in self.bookings], ["B001"] * 3)
+
+    def test_reassign_day(self):
+        moved = self.service.reassign_day("B001", "B002", self.day)
+        self.assertEqual(moved, self.bookings)
+        self.assertEqual([b.barber_id for b in self.bookings], ["B002"] * 3)
+        self.assertEqual(self.service.list_schedule(barber_id="B001", day=self.day), [])
+
+    def test_cancel_day(self):
+        self.service.start_booking(self.bookings[0].booking_id)
+        canceled = self.service.cancel_day(self.day)
+        self.assertEqual(canceled, self.bookings[1:])
+        self.assertEqual(self.statuses(), [BookingStatus.IN_PROGRESS, BookingStatus.CANCELED,
+                                           BookingStatus.CANCELED])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from datetime import date, time, timedelta
+
+from core.booking_service import BookingService
+from core.calendar_feed import CalendarFeeds, escape, fold
+from support import TempDataTest
+
+
+class FormattingTest(unittest.TestCase):
+
+    def test_escape(self):
+        self.assertEqual(escape("Cut, wash; done\\\nthanks"), "Cut\\, wash\\; done\\\\\\nthanks")
+
+    def test_fold_keeps_lines_within_75_octets(self):
+        line = "DESCRIPTION:" + "é" * 100
+        folded = fold(line)
+        parts = folded[:-2].split("\r\n ")
+        self.assertTrue(all(len(part.encode('utf-8')) <= 75 for part in parts))
+        self.assertEqual("".join(parts), line)
+        self.assertEqual(fold("SHORT:line"), "SHORT:line\r\n")
+
+
+class CalendarFeedTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.day = date.today() + timedelta(days=1)
+        self.feeds = CalendarFeeds(self.db)
+
+    def book(self, hour: int, barber_id: str = "B001"):
+        return self.service.create_booking(self.customer.user_id, "Shave", [], self.day, time(hour, 0), barber_id)
+
+    def test_ics_output(self):
+        first = self.book(10)
+        self.book(11, barber_id="B002")
+        text = self.feeds.ics("B001").decode('utf-8')
+        self.assertTrue(text.startswith("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"))
+        self.assertTrue(text.endswith("END:VCALENDAR\r\n"))
+        self.assertNotIn("\n", text.replace("\r\n", ""))
+        self.assertEqual(text.count("BEGIN:VEVENT"), 1)
+        self.assertIn(f"UID:{first.booking_id}@", text)
+        self.assertIn(f"DTSTART:{self.day:%Y%m%d}T100000\r\n", text)
+        end = time(10, first.duration)
+        self.assertIn(f"DTEND:{self.day:%Y%m%d}T{end:%H%M%S}\r\n", text)
+        self.assertEqual(self.feeds.ics().decode('utf-8').count("BEGIN:VEVENT"), 2)
+
+    def test_canceled_booking_stays_as_cancelled(self):
+        booking = self.book(10)
+        self.service.cancel_booking(booking.booking_id)
+        text = self.feeds.ics("B001").decode('utf-8')
+        self.assertIn("STATUS:CANCELLED", text)
+        self.assertIn("SEQUENCE:1", text)
+
+    def test_etag_is_stable_across_calls_and_processes(self):
+        self.book(10)
+        etag = self.feeds.feed("B001").etag
+        self.assertEqual(self.feeds.feed("B001").etag, etag)
+        self.assertEqual(CalendarFeeds(self.db).feed("B001").etag, etag)
+
+    def test_etag_changes_only_for_the_feeds_that_changed(self):
+        booking = self.book(10)
+        b001, b002, shop = (self.feeds.feed("B001").etag, self.feeds.feed("B002").etag,
+                            self.feeds.feed().etag)
+        self.book(12, barber_id="B002")
+        self.assertEqual(self.feeds.feed("B001").etag, b001)
+        self.assertNotEqual(self.feeds.feed("B002").etag, b002)
+        self.assertNotEqual(self.feeds.feed().etag, shop)
+        self.service.cancel_booking(booking.booking_id)
+        self.assertNotEqual(self.feeds.feed("B001").etag, b001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import unittest
+from datetime import date, time, timedelta
+
+from benchmarks import multiprocess_harness
+from core.booking_service import BookingService
+from utils.exceptions import ConcurrencyError
+from support import TempDataTest, open_db
+
+
+class OptimisticLockingTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.booking = self.service.create_booking(self.customer.user_id, "Shave", [],
+                                                   date.today() + timedelta(days=1), time(10, 0), "B001")
+
+    def test_stale_expected_version_raises(self):
+        seen = self.booking.version
+        self.service.start_booking(self.booking.booking_id, seen)
+        with self.assertRaises(ConcurrencyError):
+            self.service.complete_booking(self.booking.booking_id, seen)
+
+    def test_failed_transaction_leaves_no_trace(self):
+        seen = self.booking.version
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.service.cancel_booking(self.booking.booking_id, seen)
+                raise RuntimeError("after the cancel")
+        self.assertEqual(self.booking.version, seen)
+        self.assertEqual(self.booking.status.value, "scheduled")
+        # The booking is still cancellable with the version the user saw
+        self.service.cancel_booking(self.booking.booking_id, seen)
+
+
+class MergeFromDiskTest(TempDataTest):
+
+    def test_second_process_sees_committed_changes(self):
+        other = open_db(self.data_file)
+        with self.db.transaction():
+            barber = self.db.users["B001"]
+            self.db.bump_version(barber)
+            barber.is_available = not barber.is_available
+        self.assertTrue(other.refresh())
+        self.assertEqual(other.users["B001"].is_available, barber.is_available)
+        self.assertEqual(other.users["B001"].version, barber.version)
+
+    def test_stale_copy_is_rejected_after_merge(self):
+        other = open_db(self.data_file)
+        stale = other.users["B001"].version
+        with self.db.transaction():
+            self.db.bump_version(self.db.users["B001"], stale)
+        with self.assertRaises(ConcurrencyError):
+            with other.transaction():
+                other.bump_version(other.users["B001"], stale)
+
+    def test_writes_from_both_processes_survive(self):
+        other = open_db(self.data_file)
+        with self.db.transaction():
+            first = self.db.next_id('users', 'U')
+            self.db.add_user(_customer(first, "first@example.com"))
+        with other.transaction():
+            second = other.next_id('users', 'U')
+            other.add_user(_customer(second, "second@example.com"))
+        self.assertNotEqual(first, second)
+        with open(self.data_file, encoding='utf-8') as f:
+            users = json.load(f)['users']
+        self.assertIn(first, users)
+        self.assertIn(second, users)
+
+
+def _customer(user_id: str, email: str):
+    from models.user import Customer
+    return Customer(user_id, "Customer", email, "pw", "0812")
+
+
+class MultiProcessHarnessTest(unittest.TestCase):
+
+    def test_no_lost_updates(self):
+        results, problems, _ = multiprocess_harness.run(processes=2, operations=12, customers=20,
+                                                         barbers=2, bookings=50)
+        self.assertEqual(problems, [])
+        self.assertEqual(sum(len(r['created']) for r in results), 8)
+        self.assertEqual(sum(r['increments'] for r in results), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
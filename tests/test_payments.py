@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from datetime import date, time, timedelta
+from unittest import mock
+
+from core.booking_service import BookingService
+from core.payments import ChargeResult, FakeGateway, PaymentGateway, PaymentProcessor
+from models.payment import UNANSWERED_REASON
+from utils.enums import PaymentMethod, PaymentStatus
+from utils.exceptions import GatewayError
+from support import TempDataTest
+
+
+class OutageGateway(PaymentGateway):
+    """Raises GatewayError while down; charges each idempotency key once"""
+
+    def __init__(self):
+        self.down = True
+        self.asked = []
+        self.charged = {}
+
+    async def charge(self, idempotency_key, amount, method):
+        self.asked.append(idempotency_key)
+        if self.down:
+            raise GatewayError("provider outage")
+        if idempotency_key not in self.charged:
+            self.charged[idempotency_key] = ChargeResult(True, transaction_id=f"TXN-{len(self.charged) + 1}")
+        return self.charged[idempotency_key]
+
+
+class FakeGatewayTest(unittest.TestCase):
+
+    def test_repeated_key_charges_once(self):
+        gateway = FakeGateway(latency=0.01)
+
+        async def charge_twice():
+            return await asyncio.gather(gateway.charge("BK0001-1", 50000, PaymentMethod.CASH),
+                                        gateway.charge("BK0001-1", 50000, PaymentMethod.CASH))
+
+        first, second = asyncio.run(charge_twice())
+        self.assertEqual(gateway.charges_made, 1)
+        self.assertEqual(first, second)
+
+
+class PaymentIntentTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.booking = self.service.create_booking(customer.user_id, "Shave", [],
+                                                   date.today() + timedelta(days=1), time(10, 0), "B001")
+        self.gateway = OutageGateway()
+        self.processor = PaymentProcessor(BookingService(self.db), self.gateway)
+        self.processor.start()
+
+    def tearDown(self):
+        self.processor.stop(timeout=5)
+        super().tearDown()
+
+    def settle(self, payment):
+        return self.processor.submit(payment.payment_id).result(timeout=5)
+
+    def test_repeated_request_returns_the_pending_payment(self):
+        payment = self.service.pay_booking(self.booking.booking_id)
+        self.assertIs(self.service.pay_booking(self.booking.booking_id), payment)
+        self.assertEqual(len(self.db.payments), 1)
+
+    def test_unanswered_payment_is_retried_under_the_same_key(self):
+        payment = self.service.pay_booking(self.booking.booking_id)
+        with mock.patch('core.payments.RETRY_DELAYS', (0.01, 0.01)):
+            payment = self.settle(payment)
+        self.assertEqual(payment.payment_status, PaymentStatus.FAILED)
+        self.assertEqual(payment.failure_reason, UNANSWERED_REASON)
+        self.assertEqual(self.gateway.asked, ["BK0001-1"] * 3)
+
+        self.gateway.down = False
+        payment = self.settle(self.service.pay_booking(self.booking.booking_id))
+        self.assertEqual(payment.payment_status, PaymentStatus.PAID)
+        self.assertEqual(payment.idempotency_key, "BK0001-1")
+        self.assertEqual(len(self.gateway.charged), 1)
+
+    def test_declined_payment_is_retried_as_a_new_attempt(self):
+        self.gateway.down = False
+        payment = self.service.pay_booking(self.booking.booking_id)
+        self.service.settle_payment(payment.payment_id, False, reason="Declined by issuer")
+        payment = self.settle(self.service.pay_booking(self.booking.booking_id))
+        self.assertEqual(payment.payment_status, PaymentStatus.PAID)
+        self.assertEqual(payment.idempotency_key, "BK0001-2")
+
+
+if __name__ == '__main__':
+    unittest.main()
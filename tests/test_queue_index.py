@@ -0,0 +1,148 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from core.booking_service import BookingService
+from core.walk_in import WalkInQueue
+from utils.enums import WalkInStatus
+from utils.queue_index import COMPACT_MIN_SLOTS, FenwickTree, QueueIndex
+from support import TempDataTest
+
+
+class FenwickTreeTest(unittest.TestCase):
+
+    def test_prefix_sums_match_a_naive_scan(self):
+        rng = random.Random(7)
+        values = [rng.randint(0, 50) for _ in range(37)]
+        tree = FenwickTree(values)
+        for _ in range(200):
+            index = rng.randrange(len(values) + 5)
+            if index < len(values):
+                delta = rng.randint(-values[index], 20)
+                values[index] += delta
+                tree.add(index, delta)
+            else:
+                values.append(rng.randint(0, 50))
+                tree.append(values[-1])
+            self.assertEqual(len(tree), len(values))
+            for count in range(len(values) + 1):
+                self.assertEqual(tree.prefix(count), sum(values[:count]))
+
+
+class QueueIndexTest(unittest.TestCase):
+    """QueueIndex against a naive scan over the same records"""
+
+    def setUp(self):
+        # record: [order, line, weight]; line None once it left
+        self.records = {}
+        self.index = QueueIndex(lambda r: r[1], lambda r: r[2], lambda r: r[0])
+        self.index.rebuild(self.records)
+
+    def naive_line(self, key):
+        return sorted((r[0], record_id, r[2]) for record_id, r in self.records.items() if r[1] == key)
+
+    def check(self):
+        for key in {r[1] for r in self.records.values()} | {"a", "b"}:
+            if key is None:
+                continue
+            line = self.naive_line(key)
+            self.assertEqual(list(self.index.iter_line(key)), [(record_id, w) for _, record_id, w in line])
+            self.assertEqual(self.index.totals(key), (len(line), sum(w for _, _, w in line)))
+            for position, (_, record_id, _) in enumerate(line):
+                self.assertEqual(self.index.ahead(record_id),
+                                 (position, sum(w for _, _, w in line[:position])))
+        for record_id, record in self.records.items():
+            if record[1] is None:
+                self.assertIsNone(self.index.ahead(record_id))
+
+    def put(self, record_id, record):
+        self.records[record_id] = record
+        self.index.add(record_id, record)
+
+    def test_random_joins_and_leaves_match_a_naive_scan(self):
+        rng = random.Random(42)
+        for step in range(400):
+            waiting = [record_id for record_id, r in self.records.items() if r[1] is not None]
+            if waiting and rng.random() < 0.45:
+                record_id = rng.choice(waiting)
+                self.records[record_id][1] = None
+                self.index.remove(record_id)
+            elif waiting and rng.random() < 0.1:
+                # Service changed: same place in line, new weight
+                record_id = rng.choice(waiting)
+                record = self.records[record_id]
+                self.put(record_id, [record[0], record[1], rng.randint(10, 60)])
+            else:
+                # Mostly appended at the tail, sometimes merged in earlier
+                order = step if rng.random() < 0.9 else rng.uniform(0, step)
+                self.put(f"W{step:04d}", [order, rng.choice("ab"), rng.randint(10, 60)])
+            self.check()
+
+    def test_long_line_is_compacted(self):
+        for i in range(COMPACT_MIN_SLOTS * 2):
+            self.put(f"W{i:04d}", [i, "a", 20])
+        for i in range(COMPACT_MIN_SLOTS + 1):
+            self.records[f"W{i:04d}"][1] = None
+            self.index.remove(f"W{i:04d}")
+        self.assertEqual(len(self.index._lines["a"].slots), COMPACT_MIN_SLOTS - 1)
+        self.check()
+
+    def test_rebuild_matches_incremental_adds(self):
+        rng = random.Random(3)
+        for i in range(50):
+            self.put(f"W{i:04d}", [rng.random(), rng.choice("ab"), rng.randint(10, 60)])
+        rebuilt = QueueIndex(lambda r: r[1], lambda r: r[2], lambda r: r[0])
+        rebuilt.rebuild(self.records)
+        for key in "ab":
+            self.assertEqual(list(rebuilt.iter_line(key)), list(self.index.iter_line(key)))
+            self.assertEqual(rebuilt.totals(key), self.index.totals(key))
+
+
+class WalkInEstimateTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.queue = WalkInQueue(self.db)
+
+    def naive_estimate(self, walk_in, now):
+        line = sorted((w for w in self.db.walk_ins.values()
+                       if w.status == WalkInStatus.WAITING and w.barber_id == walk_in.barber_id
+                       and w.day == walk_in.day), key=lambda w: w.joined_at)
+        ahead = line[:line.index(walk_in)]
+        return len(ahead) + 1, self.queue.busy_minutes(walk_in.barber_id, now) + sum(w.duration for w in ahead)
+
+    def test_estimates_match_a_naive_scan(self):
+        rng = random.Random(11)
+        joined = []
+        for i in range(30):
+            action = rng.random()
+            waiting = [w for w in joined if w.status == WalkInStatus.WAITING]
+            if waiting and action < 0.2:
+                self.service.leave_walk_in(rng.choice(waiting).entry_id)
+            elif waiting and action < 0.3:
+                self.service.start_walk_in(rng.choice(waiting).entry_id)
+            else:
+                joined.append(self.service.join_walk_in(f"Guest {i}", rng.choice(["B001", "B002"]),
+                                                        rng.choice(["Haircut", "Shave"]), []))
+            now = datetime.now()
+            for walk_in in joined:
+                if walk_in.status == WalkInStatus.WAITING:
+                    self.assertEqual(self.queue.estimate(walk_in.entry_id, now), self.naive_estimate(walk_in, now))
+            for barber_id in ("B001", "B002"):
+                line = self.queue.line(barber_id, now)
+                if line.waiting:
+                    last = line.waiting[-1]
+                    self.assertEqual(line.next_wait_minutes, last.wait_minutes + last.walk_in.duration)
+                self.assertEqual(self.queue.quote(barber_id, now), line.next_wait_minutes)
+
+    def test_started_walk_in_counts_as_busy_time(self):
+        first = self.service.join_walk_in("Ana", "B001", "Shave", [])
+        second = self.service.join_walk_in("Budi", "B001", "Shave", [])
+        self.service.start_walk_in(first.entry_id)
+        now = first.started_at + timedelta(minutes=5)
+        self.assertEqual(self.queue.estimate(second.entry_id, now), (1, first.duration - 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
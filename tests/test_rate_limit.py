@@ -0,0 +1,114 @@
+import threading
+import unittest
+
+from core.admission import AdmissionController
+from utils.exceptions import RateLimitedError
+from utils.rate_limit import SWEEP_INTERVAL_SECONDS, TokenBuckets
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        # 2 tokens per second, bursts of 3
+        self.buckets = TokenBuckets(2.0, 3, clock=self.clock)
+
+    def test_burst_then_limited(self):
+        self.assertEqual([self.buckets.acquire("a") for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(self.buckets.acquire("a"), 0.5)
+        self.assertEqual(self.buckets.tokens("a"), 0.0)
+
+    def test_refill_at_rate(self):
+        for _ in range(3):
+            self.buckets.acquire("a")
+        self.clock.now += 0.5
+        self.assertAlmostEqual(self.buckets.tokens("a"), 1.0)
+        self.assertEqual(self.buckets.acquire("a"), 0.0)
+        self.assertGreater(self.buckets.acquire("a"), 0.0)
+        self.clock.now += 10
+        self.assertEqual(self.buckets.tokens("a"), 3.0)
+
+    def test_refused_requests_take_no_tokens(self):
+        for _ in range(3):
+            self.buckets.acquire("a")
+        for _ in range(5):
+            self.assertGreater(self.buckets.acquire("a"), 0.0)
+        self.clock.now += 0.5
+        self.assertEqual(self.buckets.acquire("a"), 0.0)
+
+    def test_keys_are_independent(self):
+        for _ in range(3):
+            self.buckets.acquire("a")
+        self.assertEqual(self.buckets.acquire("b"), 0.0)
+        self.assertEqual(self.buckets.tokens("b"), 2.0)
+
+    def test_idle_keys_are_swept(self):
+        self.buckets.acquire("a")
+        self.buckets.acquire("b")
+        self.assertEqual(len(self.buckets), 2)
+        self.clock.now += SWEEP_INTERVAL_SECONDS
+        self.buckets.acquire("c")
+        self.assertEqual(len(self.buckets), 1)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def test_per_subject_limit(self):
+        admission = AdmissionController(limits={'create_booking': (60, 2)}, overall={})
+        for _ in range(2):
+            admission.run('create_booking', "c001", lambda: None)
+        with self.assertRaises(RateLimitedError) as raised:
+            admission.run('create_booking', "c001", lambda: None)
+        self.assertGreater(raised.exception.retry_after, 0)
+        admission.run('create_booking', "c002", lambda: None)
+        self.assertEqual(admission.stats()['rejected'], {'create_booking': 1})
+
+    def test_overall_limit(self):
+        admission = AdmissionController(limits={}, overall={'register_customer': (60, 2)})
+        admission.run('register_customer', "a@example.com", lambda: None)
+        admission.run('register_customer', "b@example.com", lambda: None)
+        with self.assertRaises(RateLimitedError):
+            admission.run('register_customer', "c@example.com", lambda: None)
+
+    def test_nested_write_is_not_counted_again(self):
+        admission = AdmissionController(limits={'cancel_booking': (60, 1), 'create_booking': (60, 1)},
+                                        overall={})
+
+        def cancel():
+            return admission.run('create_booking', "c001", lambda: "refilled")
+
+        self.assertEqual(admission.run('cancel_booking', "c001", cancel), "refilled")
+        admission.run('create_booking', "c001", lambda: None)
+        self.assertEqual(admission.stats()['admitted'], {'cancel_booking': 1, 'create_booking': 1})
+
+    def test_busy_when_all_write_slots_are_taken(self):
+        admission = AdmissionController(limits={}, overall={}, max_concurrent_writes=1, write_wait=0.01)
+        entered, release = threading.Event(), threading.Event()
+
+        def slow():
+            entered.set()
+            release.wait(5)
+
+        writer = threading.Thread(target=admission.run, args=('create_booking', "c001", slow))
+        writer.start()
+        entered.wait(5)
+        try:
+            with self.assertRaises(RateLimitedError):
+                admission.run('create_booking', "c002", lambda: None)
+        finally:
+            release.set()
+            writer.join(5)
+        admission.run('create_booking', "c002", lambda: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
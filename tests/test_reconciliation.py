@@ -0,0 +1,69 @@
+import unittest
+from datetime import date, time, timedelta
+
+from core.booking_service import BookingService
+from core.reconciliation import (PAYMENT_FOR_CANCELED, UNPAID_COMPLETED, Reconciler, merge_join)
+from support import TempDataTest
+
+
+class MergeJoinTest(unittest.TestCase):
+
+    def test_groups_payments_and_reports_orphans(self):
+        bookings = [("BK0002", "b2"), ("BK0004", "b4")]
+        payments = [("BK0001", "p1"), ("BK0002", "p2"), ("BK0002", "p3"), ("BK0005", "p5")]
+        self.assertEqual(list(merge_join(bookings, payments)), [
+            ("BK0001", None, ["p1"]),
+            ("BK0002", "b2", ["p2", "p3"]),
+            ("BK0004", "b4", []),
+            ("BK0005", None, ["p5"]),
+        ])
+
+
+class ReconcilerTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.reconciler = Reconciler(self.db)
+
+    def book(self, hour: int):
+        return self.service.create_booking(self.customer.user_id, "Shave", [],
+                                           date.today() + timedelta(days=1), time(hour, 0), "B001")
+
+    def kinds(self, report):
+        return [(d['booking_id'], d['kind']) for d in report['discrepancies']]
+
+    def test_full_run_finds_unpaid_and_canceled_payments(self):
+        completed = self.book(10)
+        self.service.start_booking(completed.booking_id)
+        self.service.complete_booking(completed.booking_id)
+        canceled = self.book(11)
+        payment = self.service.pay_booking(canceled.booking_id)
+        self.service.settle_payment(payment.payment_id, True, "TXN-1")
+        self.service.cancel_booking(canceled.booking_id)
+        self.book(12)
+
+        report = self.reconciler.run(incremental=False)
+        self.assertEqual(report['mode'], 'full')
+        self.assertEqual(report['checked'], 3)
+        self.assertEqual(self.kinds(report), [(completed.booking_id, UNPAID_COMPLETED),
+                                              (canceled.booking_id, PAYMENT_FOR_CANCELED)])
+
+    def test_incremental_run_rechecks_only_changed_bookings(self):
+        completed = self.book(10)
+        self.service.start_booking(completed.booking_id)
+        self.service.complete_booking(completed.booking_id)
+        self.book(11)
+        self.assertEqual(self.kinds(self.reconciler.run()), [(completed.booking_id, UNPAID_COMPLETED)])
+
+        payment = self.service.pay_booking(completed.booking_id)
+        self.service.settle_payment(payment.payment_id, True, "TXN-1")
+        report = self.reconciler.run()
+        self.assertEqual(report['mode'], 'incremental')
+        self.assertEqual(report['checked'], 1)
+        self.assertEqual(report['discrepancies'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
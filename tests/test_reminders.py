@@ -0,0 +1,90 @@
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest import mock
+
+import core.reminders
+from core.booking_service import BookingService
+from core.reminders import ReminderService
+from core.scheduler import TimerScheduler
+from utils.enums import BookingStatus
+from support import TempDataTest, open_db
+
+
+class FakeClock:
+
+    def __init__(self, now: datetime):
+        self.now = now.timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+class ReminderTimersTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.day = date.today() + timedelta(days=1)
+        self.clock = FakeClock(datetime.now())
+        self.scheduler = TimerScheduler(clock=self.clock)
+        self.reminders = ReminderService(self.service, self.scheduler)
+
+    def book(self, hour: int, service: BookingService = None):
+        return (service or self.service).create_booking(self.customer.user_id, "Shave", [], self.day,
+                                                        time(hour, 0), "B001")
+
+    def at(self, hour: int, minute: int = 0, days: int = 0):
+        self.clock.now = (datetime.combine(self.day, time(hour, minute)) + timedelta(days=days)).timestamp()
+
+    def test_merged_booking_is_armed_without_a_rebuild(self):
+        self.reminders.rebuild()
+        with mock.patch.object(self.reminders, 'rebuild') as rebuild:
+            other = BookingService(open_db(self.data_file))
+            booking = self.book(10, other)
+            self.reminders._resync()
+            rebuild.assert_not_called()
+        self.assertIn(('no_show', booking.booking_id), self.scheduler)
+        self.assertIn(('reminder', booking.booking_id), self.scheduler)
+        self.assertIn('resync', self.scheduler)
+
+    def test_start_disarms_the_no_show_timer(self):
+        booking = self.book(10)
+        self.reminders.rebuild()
+        self.assertIn(('no_show', booking.booking_id), self.scheduler)
+        self.service.start_booking(booking.booking_id)
+        self.assertNotIn(('no_show', booking.booking_id), self.scheduler)
+        self.at(11)
+        self.scheduler.run_pending()
+        self.assertEqual(booking.status, BookingStatus.IN_PROGRESS)
+
+    def test_no_show_after_the_grace_period(self):
+        booking = self.book(10)
+        self.reminders.rebuild()
+        self.at(10, 20)
+        self.scheduler.run_pending()
+        self.assertEqual(booking.status, BookingStatus.NO_SHOW)
+
+    def test_catch_up_sweep_skips_long_overdue_bookings(self):
+        stale = self.book(10)
+        recent = self.book(12)
+        # Back a day later: the 10:00 no-show is more than 24 hours overdue, the 12:00 one is not
+        self.at(11, days=1)
+        self.reminders.rebuild()
+        self.scheduler.run_pending()
+        self.assertEqual(stale.status, BookingStatus.SCHEDULED)
+        self.assertEqual(recent.status, BookingStatus.NO_SHOW)
+
+    def test_overdue_backlog_is_swept_in_batches(self):
+        bookings = [self.book(hour) for hour in (10, 11, 12)]
+        self.at(13)
+        with mock.patch.object(core.reminders, 'SWEEP_BATCH', 2):
+            self.reminders.rebuild()
+        self.assertIn(('no_show_sweep', 0), self.scheduler)
+        self.assertIn(('no_show_sweep', 2), self.scheduler)
+        self.scheduler.run_pending()
+        self.assertEqual([b.status for b in bookings], [BookingStatus.NO_SHOW] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from datetime import date, datetime, time, timedelta
+
+from core.booking_service import BookingService
+from utils.enums import BookingStatus
+from support import TempDataTest
+
+
+class SnapshotIsolationTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.booking = self.book(10)
+
+    def book(self, hour: int):
+        return self.service.create_booking(self.customer.user_id, "Shave", [],
+                                           date.today() + timedelta(days=1), time(hour, 0), "B001")
+
+    def test_later_writes_do_not_show_up(self):
+        snapshot = self.db.snapshot()
+        self.service.cancel_booking(self.booking.booking_id)
+        added = self.book(11)
+        payment = self.service.pay_booking(added.booking_id)
+        self.service.settle_payment(payment.payment_id, True, "TXN-1")
+
+        self.assertEqual(snapshot.bookings[self.booking.booking_id].status, BookingStatus.SCHEDULED)
+        self.assertNotIn(added.booking_id, snapshot.bookings)
+        self.assertEqual(len(snapshot.payments), 0)
+        self.assertEqual(snapshot.paid_payments(datetime.min, datetime.max), [])
+
+        latest = self.db.snapshot()
+        self.assertEqual(latest.bookings[self.booking.booking_id].status, BookingStatus.CANCELED)
+        self.assertEqual([p.payment_id for p in latest.paid_payments(datetime.min, datetime.max)],
+                         [payment.payment_id])
+
+    def test_snapshot_is_reused_until_the_next_commit(self):
+        snapshot = self.db.snapshot()
+        self.assertIs(self.db.snapshot(), snapshot)
+        self.book(11)
+        self.assertIsNot(self.db.snapshot(), snapshot)
+
+    def test_uncommitted_and_rolled_back_changes_stay_out(self):
+        snapshot = self.db.snapshot()
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.service.cancel_booking(self.booking.booking_id)
+                self.book(11)
+                raise RuntimeError("rolled back")
+        latest = self.db.snapshot()
+        self.assertEqual(set(latest.bookings), set(snapshot.bookings))
+        self.assertEqual(latest.bookings[self.booking.booking_id].status, BookingStatus.SCHEDULED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import math
+import random
+import unittest
+
+from core.booking_service import LEARNED_MIN_SAMPLES
+from utils.stream_stats import EXACT_SAMPLES, DurationStats
+
+
+def nearest_rank(values, p):
+    values = sorted(values)
+    return values[max(0, math.ceil(p * len(values)) - 1)]
+
+
+def stats_of(values):
+    stats = DurationStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+
+class DurationStatsTest(unittest.TestCase):
+
+    def test_p90_is_not_the_median_at_the_learning_threshold(self):
+        stats = stats_of([20, 25, 30, 35, 60])
+        self.assertEqual(stats.count, LEARNED_MIN_SAMPLES)
+        self.assertEqual(stats.p50, 30)
+        self.assertEqual(stats.p90, 60)
+
+    def test_exact_around_the_learning_threshold(self):
+        values = [random.Random(seed).uniform(20, 60) for seed in range(LEARNED_MIN_SAMPLES + 2)]
+        for count in (LEARNED_MIN_SAMPLES, LEARNED_MIN_SAMPLES + 1, LEARNED_MIN_SAMPLES + 2):
+            stats = stats_of(values[:count])
+            self.assertEqual(stats.p90, nearest_rank(values[:count], 0.9))
+            self.assertEqual(stats.p50, nearest_rank(values[:count], 0.5))
+
+    def test_estimate_stays_close_after_switching_to_markers(self):
+        rng = random.Random(7)
+        values = [rng.gauss(40, 8) for _ in range(EXACT_SAMPLES + 200)]
+        for count in (EXACT_SAMPLES, EXACT_SAMPLES + 1, EXACT_SAMPLES + 200):
+            stats = stats_of(values[:count])
+            self.assertAlmostEqual(stats.p90, nearest_rank(values[:count], 0.9), delta=3)
+            self.assertAlmostEqual(stats.p50, nearest_rank(values[:count], 0.5), delta=3)
+            self.assertGreater(stats.p90, stats.p50)
+
+    def test_state_round_trip(self):
+        rng = random.Random(3)
+        values = [rng.uniform(20, 60) for _ in range(EXACT_SAMPLES + 20)]
+        stats = stats_of(values[:EXACT_SAMPLES + 10])
+        restored = DurationStats(stats.to_state())
+        for value in values[EXACT_SAMPLES + 10:]:
+            stats.add(value)
+            restored.add(value)
+        self.assertEqual(restored.to_state(), stats.to_state())
+
+
+if __name__ == '__main__':
+    unittest.main()
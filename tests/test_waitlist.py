@@ -0,0 +1,43 @@
+import unittest
+from datetime import date, timedelta
+
+from core.booking_service import BookingService
+from core.waitlist import waitlist_for
+from support import TempDataTest, open_db
+
+
+class WaitlistIndexTest(TempDataTest):
+
+    def setUp(self):
+        super().setUp()
+        self.service = BookingService(self.db)
+        self.customer = self.service.register_customer("Rita", "rita@example.com", "0812", "pw")
+        self.day = date.today() + timedelta(days=1)
+
+    def test_entry_is_filed_when_added(self):
+        index = waitlist_for(self.db)
+        self.assertIsNone(index.best("B001", self.day, 60))
+        entry = self.service.join_waitlist(self.customer.user_id, "Shave", [], self.day, self.day, "B001")
+        self.assertIs(index.best("B001", self.day, 60), entry)
+        self.assertIsNone(index.best("B001", self.day, entry.duration - 1))
+
+    def test_entry_merged_from_another_process_is_filed(self):
+        index = waitlist_for(self.db)
+        index.best("B001", self.day, 60)
+        other = open_db(self.data_file)
+        joined = BookingService(other).join_waitlist(self.customer.user_id, "Shave", [], self.day, self.day)
+        self.assertTrue(self.db.refresh())
+        self.assertEqual(index.best("B001", self.day, 60).entry_id, joined.entry_id)
+
+    def test_entry_of_a_failed_transaction_is_not_offered(self):
+        index = waitlist_for(self.db)
+        index.best("B001", self.day, 60)
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.service.join_waitlist(self.customer.user_id, "Shave", [], self.day, self.day, "B001")
+                raise RuntimeError("rolled back")
+        self.assertIsNone(index.best("B001", self.day, 60))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# ============================================================================
+# UI ACTIONS - Button callbacks bound to the version the user saw
+# ============================================================================
+#
+# Streamlit callbacks receive their args from the run that rendered the
+# button, so passing entity.version here gives compare-and-set semantics:
+# if another session changed the booking in between, the action is rejected
+# with a "please retry" message instead of being applied twice.
+#
+# Per-booking cards and rows are st.fragment functions: a button inside one
+# only reruns that fragment, so fragments call show_flash() themselves. Where
+# several fragments and controls share a page, each passes its own flash key
+# so a full rerun shows every outcome next to the control that caused it; the
+# default 'flash' key is shown (and cleared) by main.py above the dashboard.
+
+import streamlit as st
+from utils.exceptions import BarbershopError, ConcurrencyError, RateLimitedError
+
+
+def run_action(func, *args, success=None, flash: str = 'flash'):
+    """on_click callback: run a service call and keep its outcome for the next render.
+    
+    success is a message, or a callable building one from the call's result;
+    flash is the key show_flash() reads the outcome from.
+    """
+    try:
+        result = func(*args)
+    except ConcurrencyError as e:
+        st.session_state[flash] = ('warning', f"🔄 {e}")
+    except RateLimitedError as e:
+        st.session_state[flash] = ('warning', f"⏳ {e}")
+    except BarbershopError as e:
+        st.session_state[flash] = ('error', str(e))
+    else:
+        if callable(success):
+            success = success(result)
+        if success:
+            st.session_state[flash] = ('success', success)
+
+
+def show_flash(key: str = 'flash'):
+    """Render and clear the outcome of the last action callback"""
+    flash = st.session_state.pop(key, None)
+    if flash:
+        level, message = flash
+        getattr(st, level)(message)
+
+
+def page_limit(key: str, step: int = 10) -> int:
+    """Number of items the user asked to see for a paged list"""
+    return st.session_state.setdefault(f"limit_{key}", step)
+
+
+def _grow_limit(key: str, step: int):
+    st.session_state[f"limit_{key}"] = page_limit(key, step) + step
+
+
+def show_more_button(key: str, shown: int, step: int = 10):
+    """'Show more' button for a list rendered with page_limit(key)"""
+    if shown >= page_limit(key, step):
+        st.button("⬇️ Show more", key=f"more_{key}", on_click=_grow_limit, args=(key, step))
@@ -3,9 +3,11 @@
 # ============================================================================
 
 import streamlit as st
-from models.user import Customer
 from utils.enums import UserRole
+from utils.exceptions import BarbershopError, RateLimitedError
+from utils.metrics import timed
 
+@timed("ui.login_page")
 def login_page():
     """Login page"""
     st.title("🪒 Barbershop Booking System")
@@ -21,9 +23,7 @@ def login_page():
         
         with col_login:
             if st.button("🔐 Login", use_container_width=True):
-                db = st.session_state.db
-                user = next((u for u in db.users.values() 
-                           if u.email == email and u.password == password), None)
+                user = st.session_state.booking_service.authenticate(email, password)
                 if user:
                     st.session_state.current_user = user
                     st.rerun()
@@ -49,6 +49,7 @@ def login_page():
             - Password: admin
             """)
 
+@timed("ui.register_page")
 def register_page():
     """Registration page"""
     st.title("📝 Register New Account")
@@ -73,18 +74,14 @@ def register_page():
             if st.button("✅ Register", use_container_width=True):
                 if password != confirm_password:
                     st.error("Passwords don't match")
-                elif not all([name, email, phone, password]):
-                    st.error("All fields are required")
                 else:
-                    db = st.session_state.db
-                    # Check if email exists
-                    if any(u.email == email for u in db.users.values()):
-                        st.error("Email already registered")
+                    try:
+                        st.session_state.booking_service.register_customer(name, email, phone, password)
+                    except RateLimitedError as e:
+                        st.warning(f"⏳ {e}")
+                    except BarbershopError as e:
+                        st.error(str(e))
                     else:
-                        user_id = f"C{len([u for u in db.users.values() if u.role.value == 'customer']) + 1:03d}"
-                        customer = Customer(user_id, name, email, password, phone)
-                        db.users[user_id] = customer
-                        db.save()  # Save to JSON
                         st.success("Registration successful! Please login.")
                         st.session_state.show_register = False
                         st.rerun()
@@ -2,42 +2,65 @@
 # BARBER DASHBOARD UI
 # ============================================================================
 
+import calendar
+from functools import partial
 import streamlit as st
-from datetime import date
+from datetime import date, datetime, time, timedelta
+from core.archive import average_rating
+from core.calendar_feed import feeds_for
 from utils.enums import BookingStatus
+from ui.actions import run_action, show_flash, page_limit, show_more_button
+from ui.walk_ins import show_walk_in_queue
+from utils.metrics import timed
 
+# How often the bulk "Complete Selected" control picks up rows started or finished
+SCHEDULE_POLL_SECONDS = 5
+
+@timed("ui.barber_dashboard")
 def barber_dashboard():
     """Barber dashboard"""
     user = st.session_state.current_user
     st.title(f"✂️ Barber Dashboard - {user.name}")
     
-    tab1, tab2, tab3 = st.tabs(["📅 My Schedule", "📊 My Stats", "⭐ My Reviews"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📅 My Schedule", "🚶 Walk-ins", "🗓️ Working Hours",
+                                             "📊 My Stats", "⭐ My Reviews"])
     
     with tab1:
         show_barber_schedule(user)
     
     with tab2:
-        show_barber_stats(user)
+        show_walk_in_queue(user)
     
     with tab3:
+        show_working_hours(user)
+    
+    with tab4:
+        show_barber_stats(user)
+    
+    with tab5:
         show_barber_reviews(user)
 
 
+@timed("ui.show_barber_schedule")
 def show_barber_schedule(barber):
     """Show barber's schedule"""
     st.subheader("My Schedule")
     
-    db = st.session_state.db
+    service = st.session_state.booking_service
     
     # Toggle availability
     col1, col2 = st.columns([3, 1])
     with col1:
         st.write(f"**Status:** {'🟢 Available' if barber.is_available else '🔴 Unavailable'}")
     with col2:
-        if st.button("Toggle Status"):
-            barber.is_available = not barber.is_available
-            db.save()  # Save to JSON
-            st.rerun()
+        st.button("Toggle Status", on_click=run_action,
+                  args=(service.toggle_availability, barber.user_id, barber.version))
+    
+    # Rendered only when clicked, not on every rerun of the schedule
+    feeds = feeds_for(st.session_state.db)
+    st.download_button("📆 Add to Calendar (.ics)", data=partial(feeds.ics, barber.user_id),
+                       file_name=f"{barber.user_id}-schedule.ics", mime="text/calendar",
+                       help=f"Or subscribe to /calendars/{barber.user_id}.ics on the booking API")
     
     st.divider()
     
@@ -45,75 +68,180 @@ def show_barber_schedule(barber):
     selected_date = st.date_input("Select Date", value=date.today())
     
     # Get bookings for this barber on selected date
-    barber_bookings = [b for b in db.bookings.values() 
-                      if b.barber_id == barber.user_id and 
-                      b.booking_date == selected_date and
-                      b.status != BookingStatus.CANCELED]
+    barber_bookings = service.list_schedule(barber_id=barber.user_id, day=selected_date)
     
     if not barber_bookings:
         st.info(f"No bookings for {selected_date}")
         return
     
-    barber_bookings.sort(key=lambda x: x.booking_time)
-    
     for booking in barber_bookings:
-        with st.container():
-            col1, col2, col3 = st.columns([1, 2, 1])
-            
-            with col1:
-                st.write(f"**{booking.booking_time}**")
-                status_emoji = {
-                    BookingStatus.SCHEDULED: "🟡",
-                    BookingStatus.IN_PROGRESS: "🔵",
-                    BookingStatus.COMPLETED: "🟢"
-                }
-                st.write(f"{status_emoji.get(booking.status, '⚪')} {booking.status.value}")
-            
-            with col2:
-                customer = db.users.get(booking.customer_id)
-                st.write(f"**Customer:** {customer.name if customer else 'N/A'}")
-                st.write(f"**Service:** {booking.service.get_description()}")
-                st.write(f"**Duration:** {booking.service.get_duration()} min")
-            
-            with col3:
-                if booking.status == BookingStatus.SCHEDULED:
-                    if st.button("▶️ Start", key=f"start_barber_{booking.booking_id}"):
-                        booking.status = BookingStatus.IN_PROGRESS
-                        db.save()  # Save to JSON
-                        st.rerun()
-                elif booking.status == BookingStatus.IN_PROGRESS:
-                    if st.button("✅ Complete", key=f"complete_barber_{booking.booking_id}"):
-                        booking.complete()
-                        db.save()  # Save to JSON
-                        st.rerun()
-            
-            st.divider()
+        barber_schedule_row(booking.booking_id)
+    
+    complete_selected(barber.user_id, selected_date)
+
+
+@st.fragment(run_every=SCHEDULE_POLL_SECONDS)
+@timed("ui.complete_selected")
+def complete_selected(barber_id: str, day: date):
+    """End of shift: complete several bookings with one save.
+    
+    Rows start and finish bookings without rerunning the page, so this control
+    re-reads the in-progress bookings (and their versions) on its own timer.
+    Completing them reruns the page so the rows catch up.
+    """
+    service = st.session_state.booking_service
+    in_progress = [b for b in service.list_schedule(barber_id=barber_id, day=day)
+                   if b.status == BookingStatus.IN_PROGRESS]
+    if len(in_progress) > 1:
+        labels = {b.booking_id: f"{b.booking_time} - {b.service.get_description()}" for b in in_progress}
+        selected = st.multiselect("Bookings to complete", list(labels), default=list(labels),
+                                  format_func=labels.get)
+        if st.button("✅ Complete Selected", disabled=not selected, on_click=run_action,
+                     args=(service.complete_bookings, selected,
+                           {b.booking_id: b.version for b in in_progress if b.booking_id in selected}),
+                     kwargs={'success': lambda done: f"{len(done)} bookings completed", 'flash': "flash_bulk"}):
+            # Several rows changed; the outcome waits in session state for the next run
+            st.rerun()
+    show_flash("flash_bulk")
+
+
+@st.fragment
+@timed("ui.barber_schedule_row")
+def barber_schedule_row(booking_id: str):
+    """One schedule row; its Start/Complete buttons rerun only this row"""
+    db = st.session_state.db
+    service = st.session_state.booking_service
+    booking = db.bookings.get(booking_id)
+    if booking is None:
+        st.caption(f"Booking {booking_id} is no longer available.")
+        return
+    
+    flash = f"flash_{booking_id}"
+    show_flash(flash)
+    with st.container():
+        col1, col2, col3 = st.columns([1, 2, 1])
+        
+        with col1:
+            st.write(f"**{booking.booking_time}**")
+            status_emoji = {
+                BookingStatus.SCHEDULED: "🟡",
+                BookingStatus.IN_PROGRESS: "🔵",
+                BookingStatus.COMPLETED: "🟢",
+                BookingStatus.NO_SHOW: "⚫"
+            }
+            st.write(f"{status_emoji.get(booking.status, '⚪')} {booking.status.value}")
+        
+        with col2:
+            customer = db.users.get(booking.customer_id)
+            st.write(f"**Customer:** {customer.name if customer else 'N/A'}")
+            st.write(f"**Service:** {booking.service.get_description()}")
+            st.write(f"**Duration:** {booking.duration} min")
+            actual = booking.actual_minutes()
+            if actual is not None:
+                st.caption(f"Took {actual:.0f} min ({booking.started_at:%H:%M}-{booking.completed_at:%H:%M})")
+            elif booking.started_at:
+                st.caption(f"Started {booking.started_at:%H:%M}")
+        
+        with col3:
+            if booking.status == BookingStatus.SCHEDULED:
+                st.button("▶️ Start", key=f"start_barber_{booking.booking_id}", on_click=run_action,
+                          args=(service.start_booking, booking.booking_id, booking.version),
+                          kwargs={'flash': flash})
+            elif booking.status == BookingStatus.IN_PROGRESS:
+                st.button("✅ Complete", key=f"complete_barber_{booking.booking_id}", on_click=run_action,
+                          args=(service.complete_booking, booking.booking_id, booking.version),
+                          kwargs={'flash': flash})
+        
+        st.divider()
+
+
+@timed("ui.show_working_hours")
+def show_working_hours(barber):
+    """Edit weekly working hours, breaks and days off"""
+    st.subheader("Working Hours")
+    
+    service = st.session_state.booking_service
+    schedule = service.get_schedule(barber.user_id)
+    
+    weekly_hours = {}
+    breaks = {}
+    for weekday in range(7):
+        hours = schedule.weekly_hours.get(weekday, [])
+        day_breaks = schedule.breaks.get(weekday, [])
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
+        with col1:
+            working = st.checkbox(calendar.day_name[weekday], value=bool(hours), key=f"work_{weekday}")
+        with col2:
+            start = st.time_input("From", value=hours[0][0] if hours else time(9, 0),
+                                  key=f"start_{weekday}", disabled=not working)
+        with col3:
+            end = st.time_input("To", value=hours[-1][1] if hours else time(21, 0),
+                                key=f"end_{weekday}", disabled=not working)
+        with col4:
+            break_start = day_breaks[0][0] if day_breaks else None
+            lunch = st.checkbox("Break", value=bool(day_breaks), key=f"break_{weekday}", disabled=not working)
+            if lunch and working:
+                break_start = st.time_input("Break at", value=break_start or time(12, 0), key=f"break_at_{weekday}")
+        if working:
+            weekly_hours[weekday] = [(start, end)]
+            if lunch and break_start:
+                # One hour, cut short at the end of the working day (never past midnight)
+                break_end = (datetime.combine(date.min, break_start) + timedelta(hours=1)).time()
+                if break_end <= break_start or break_end > end:
+                    break_end = end
+                if break_start < break_end:
+                    breaks[weekday] = [(break_start, break_end)]
+    
+    st.button("💾 Save Working Hours", on_click=run_action,
+              args=(service.update_weekly_hours, barber.user_id, weekly_hours, breaks, schedule.version),
+              kwargs={'success': "Working hours saved"})
+    
+    st.divider()
+    st.write("### Days Off")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        day_off = st.date_input("Date", min_value=date.today(), key="day_off_date")
+    with col2:
+        st.button("➕ Add Day Off", on_click=run_action,
+                  args=(service.set_day_off, barber.user_id, day_off, True, schedule.version))
+    
+    for day in sorted(d for d in schedule.days_off if d >= date.today()):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.write(f"🏖️ {day.strftime('%A, %Y-%m-%d')}")
+        with col2:
+            st.button("Remove", key=f"remove_off_{day}", on_click=run_action,
+                      args=(service.set_day_off, barber.user_id, day, False, schedule.version))
 
 
+@timed("ui.show_barber_stats")
 def show_barber_stats(barber):
     """Show barber statistics"""
     st.subheader("My Statistics")
     
     db = st.session_state.db
     
-    # Get all bookings for this barber
+    # Get all bookings for this barber; archived ones only as totals
     all_bookings = [b for b in db.bookings.values() if b.barber_id == barber.user_id]
     completed = [b for b in all_bookings if b.status == BookingStatus.COMPLETED]
+    archived = st.session_state.booking_service.archive.barber_totals(barber.user_id)
     
     # Get feedbacks
     feedbacks = [f for f in db.feedbacks.values() if f.barber_id == barber.user_id]
-    avg_rating = sum(f.rating for f in feedbacks) / len(feedbacks) if feedbacks else 0
+    archived_rating, archived_reviews = average_rating(archived['ratings'])
+    reviews = len(feedbacks) + archived_reviews
+    avg_rating = (sum(f.rating for f in feedbacks) + archived_rating * archived_reviews) / reviews if reviews else 0
     
     # Calculate revenue
-    revenue = sum(b.service.get_price() for b in completed)
+    revenue = sum(b.service.get_price() for b in completed) + archived['revenue']
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Bookings", len(all_bookings))
+        st.metric("Total Bookings", len(all_bookings) + archived['bookings'])
     
     with col2:
-        st.metric("Completed", len(completed))
+        st.metric("Completed", len(completed) + archived['completed'])
     
     with col3:
         st.metric("Avg Rating", f"{avg_rating:.1f} ⭐")
@@ -123,7 +251,7 @@ def show_barber_stats(barber):
     
     # Show recent activity
     st.write("### Recent Bookings")
-    recent_bookings = sorted(all_bookings, key=lambda x: x.created_at, reverse=True)[:5]
+    recent_bookings = db.recent_bookings(barber_id=barber.user_id, limit=5)
     
     for booking in recent_bookings:
         customer = db.users.get(booking.customer_id)
@@ -140,33 +268,39 @@ def show_barber_stats(barber):
                 BookingStatus.SCHEDULED: "🟡",
                 BookingStatus.IN_PROGRESS: "🔵",
                 BookingStatus.COMPLETED: "🟢",
-                BookingStatus.CANCELED: "🔴"
+                BookingStatus.CANCELED: "🔴",
+                BookingStatus.NO_SHOW: "⚫"
             }
             st.write(f"{status_color.get(booking.status, '⚪')} {booking.status.value}")
         
         st.divider()
 
 
+@timed("ui.show_barber_reviews")
 def show_barber_reviews(barber):
     """Show reviews for this barber"""
     st.subheader("My Reviews")
     
     db = st.session_state.db
     feedbacks = [f for f in db.feedbacks.values() if f.barber_id == barber.user_id]
+    archived_ratings = st.session_state.booking_service.archive.barber_totals(barber.user_id)['ratings']
     
-    if not feedbacks:
+    if not feedbacks and not archived_ratings:
         st.info("No reviews yet.")
         return
     
-    # Calculate rating distribution
+    # Calculate rating distribution, archived reviews included
     rating_counts = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
     for feedback in feedbacks:
         rating_counts[feedback.rating] += 1
+    for rating, count in archived_ratings.items():
+        rating_counts[int(rating)] += count
+    total_reviews = sum(rating_counts.values())
     
     st.write("### Rating Distribution")
     for rating in range(5, 0, -1):
         count = rating_counts[rating]
-        percentage = (count / len(feedbacks) * 100) if feedbacks else 0
+        percentage = (count / total_reviews * 100) if total_reviews else 0
         st.write(f"{'⭐' * rating} ({rating}) - {count} reviews ({percentage:.1f}%)")
         st.progress(percentage / 100)
     
@@ -174,7 +308,8 @@ def show_barber_reviews(barber):
     
     # Show individual reviews
     st.write("### Customer Comments")
-    for feedback in sorted(feedbacks, key=lambda x: x.created_at, reverse=True):
+    recent_feedbacks = db.recent_feedbacks(barber_id=barber.user_id, limit=page_limit("barber_reviews"))
+    for feedback in recent_feedbacks:
         customer = db.users.get(feedback.customer_id)
         booking = db.bookings.get(feedback.booking_id)
         
@@ -184,3 +319,4 @@ def show_barber_reviews(barber):
                 st.write(f"**Service:** {booking.service.get_description()}")
             if feedback.comment:
                 st.write(f"**Comment:** {feedback.comment}")
+    show_more_button("barber_reviews", len(recent_feedbacks))
@@ -3,20 +3,23 @@
 # ============================================================================
 
 import streamlit as st
-from datetime import date, time
-from models.user import Barber
-from models.booking import Booking
-from models.payment import Payment
-from models.feedback import Feedback
-from utils.enums import BookingStatus, PaymentMethod, PaymentStatus
+from datetime import date, time, timedelta
+from utils.enums import BookingStatus, PaymentMethod, PaymentStatus, WaitlistStatus
+from utils.exceptions import BarbershopError, RateLimitedError
+from ui.actions import run_action, show_flash, page_limit, show_more_button
+from utils.metrics import timed
 from patterns.factory import ServiceFactory
 
+# How often a pending payment re-checks its status
+PAYMENT_POLL_SECONDS = 2
+
+@timed("ui.customer_dashboard")
 def customer_dashboard():
     """Customer dashboard"""
     user = st.session_state.current_user
     st.title(f"👤 Welcome, {user.name}")
     
-    tab1, tab2, tab3 = st.tabs(["📅 New Booking", "📋 My Bookings", "⭐ Give Feedback"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📅 New Booking", "📋 My Bookings", "⭐ Give Feedback", "⏳ Waitlist"])
     
     with tab1:
         create_booking_form(user)
@@ -26,13 +29,17 @@ def customer_dashboard():
     
     with tab3:
         show_feedback_form(user)
+    
+    with tab4:
+        show_waitlist(user)
 
 
+@timed("ui.create_booking_form")
 def create_booking_form(user):
     """Create new booking form"""
     st.subheader("Create New Booking")
     
-    db = st.session_state.db
+    service_layer = st.session_state.booking_service
     
     # Service selection
     st.write("### 1️⃣ Select Base Service")
@@ -74,120 +81,195 @@ def create_booking_form(user):
     
     # Barber selection
     st.write("### 4️⃣ Select Barber (Optional)")
-    barbers = [u for u in db.users.values() if u.role.value == "barber" and u.is_available]
+    barbers = service_layer.available_barbers()
     barber_options = ["Any Available"] + [f"{b.name} - {b.specialization}" for b in barbers]
     selected_barber = st.selectbox("Choose barber", barber_options)
     
     barber_id = None
     if selected_barber != "Any Available":
         barber_id = barbers[barber_options.index(selected_barber) - 1].user_id
+        duration = service_layer.estimate_duration(barber_id, base_service, addons)
+        if duration != service.get_duration():
+            st.caption(f"⏱️ This barber usually needs about {duration} minutes for this service.")
+        slots = service_layer.find_available_slots(barber_id, booking_date, duration)
+        if slots:
+            st.caption("🕒 Free times: " + ", ".join(t.strftime('%H:%M') for t in slots[:16]) +
+                       (" ..." if len(slots) > 16 else ""))
+        else:
+            st.warning("This barber has no free time on the selected date.")
     
     # Submit button
     if st.button("🎯 Confirm Booking", type="primary", use_container_width=True):
-        # Create booking
-        booking_id = f"BK{len(db.bookings) + 1:04d}"
-        final_service = ServiceFactory.create_service(base_service, addons)
-        
-        booking = Booking(
-            booking_id=booking_id,
-            customer_id=user.user_id,
-            service=final_service,
-            barber_id=barber_id,
-            booking_date=booking_date,
-            booking_time=booking_time,
-            status=BookingStatus.SCHEDULED
-        )
-        
-        # Attach observer
-        booking.attach(st.session_state.notification_observer)
-        
-        db.bookings[booking_id] = booking
-        
-        # Save to JSON
-        db.save()
-        
-        # Notify
-        booking.notify('confirmation', {
-            'user_id': user.user_id,
-            'message': f'Booking {booking_id} confirmed for {booking_date} at {booking_time}'
-        })
-        
-        st.success(f"✅ Booking created successfully! Booking ID: {booking_id}")
-        st.balloons()
+        try:
+            booking = service_layer.create_booking(user.user_id, base_service, addons,
+                                                   booking_date, booking_time, barber_id)
+        except RateLimitedError as e:
+            st.warning(f"⏳ {e}")
+        except BarbershopError as e:
+            st.error(str(e))
+        else:
+            st.success(f"✅ Booking created successfully! Booking ID: {booking.booking_id}")
+            st.balloons()
+
+
+@timed("ui.show_waitlist")
+def show_waitlist(user):
+    """Join the waitlist for canceled slots and manage entries"""
+    st.subheader("Waitlist")
+    st.caption("Fully booked? Join the waitlist and you are booked automatically "
+               "when a matching slot is canceled.")
+    
+    service_layer = st.session_state.booking_service
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        base_service = st.selectbox("Service", options=list(ServiceFactory.BASE_SERVICES.keys()),
+                                    key="waitlist_service")
+        addons = st.multiselect("Add-ons", options=list(ServiceFactory.DECORATORS.keys()),
+                                key="waitlist_addons")
+        barbers = service_layer.available_barbers()
+        barber_options = ["Any Barber"] + [b.name for b in barbers]
+        selected_barber = st.selectbox("Barber", barber_options, key="waitlist_barber")
+    with col2:
+        date_from = st.date_input("From", min_value=date.today(), key="waitlist_from")
+        date_to = st.date_input("To", value=date_from + timedelta(days=6), min_value=date_from,
+                                key="waitlist_to")
+    
+    if st.button("⏳ Join Waitlist", use_container_width=True):
+        barber_id = None
+        if selected_barber != "Any Barber":
+            barber_id = barbers[barber_options.index(selected_barber) - 1].user_id
+        try:
+            entry = service_layer.join_waitlist(user.user_id, base_service, addons,
+                                                date_from, date_to, barber_id)
+        except RateLimitedError as e:
+            st.warning(f"⏳ {e}")
+        except BarbershopError as e:
+            st.error(str(e))
+        else:
+            st.success(f"✅ Added to the waitlist ({entry.entry_id})")
+    
+    entries = service_layer.list_waitlist(user.user_id)
+    if not entries:
+        st.info("You are not on any waitlist.")
+        return
+    
+    st.write("### My Waitlist Entries")
+    for entry in entries:
+        barber = st.session_state.db.users.get(entry.barber_id) if entry.barber_id else None
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.write(f"**{entry.entry_id}** · {entry.base_service} ({entry.duration} min) · "
+                     f"{barber.name if barber else 'Any Barber'} · {entry.date_from} → {entry.date_to}")
+        with col2:
+            if entry.status == WaitlistStatus.WAITING:
+                st.button("Leave", key=f"leave_{entry.entry_id}", on_click=run_action,
+                          args=(service_layer.leave_waitlist, entry.entry_id, entry.version),
+                          kwargs={'success': "Left the waitlist"})
+            elif entry.status == WaitlistStatus.FILLED:
+                st.write(f"🟢 Booked: {entry.booking_id}")
+            else:
+                st.write(f"⚪ {entry.status.value}")
 
 
+@timed("ui.show_customer_bookings")
 def show_customer_bookings(user):
     """Show customer's bookings"""
     st.subheader("My Bookings")
     
     db = st.session_state.db
-    user_bookings = [b for b in db.bookings.values() if b.customer_id == user.user_id]
+    archive = st.session_state.booking_service.archive
+    user_bookings = db.recent_bookings(customer_id=user.user_id, limit=page_limit("my_bookings"))
+    archived = archive.customer_bookings(user.user_id)
     
-    if not user_bookings:
+    if not user_bookings and not archived:
         st.info("No bookings yet. Create your first booking!")
         return
     
-    for booking in sorted(user_bookings, key=lambda x: x.created_at, reverse=True):
-        with st.expander(f"🎫 Booking {booking.booking_id} - {booking.status.value.upper()}"):
-            col1, col2 = st.columns([2, 1])
+    for booking in user_bookings:
+        booking_card(booking.booking_id)
+    
+    show_more_button("my_bookings", len(user_bookings))
+    
+    # Old finished bookings are read from the archive only when asked for
+    if archived and st.toggle(f"🗄️ Show {archived} archived bookings", key="show_archived_bookings"):
+        for booking in archive.bookings(customer_id=user.user_id):
+            st.write(f"**{booking.booking_date} {booking.booking_time.strftime('%H:%M')}** - "
+                     f"{booking.service.get_description()} - {booking.status.value}")
+
+
+@st.fragment
+@timed("ui.booking_card")
+def booking_card(booking_id: str):
+    """One booking with its actions; reruns on its own when a button is clicked"""
+    db = st.session_state.db
+    service = st.session_state.booking_service
+    booking = db.bookings.get(booking_id)
+    if booking is None:
+        # Archived or removed by another process since the list was rendered
+        st.caption(f"🎫 Booking {booking_id} is no longer available.")
+        return
+    
+    flash = f"flash_{booking_id}"
+    show_flash(flash)
+    with st.expander(f"🎫 Booking {booking.booking_id} - {booking.status.value.upper()}"):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.write(f"**Service:** {booking.service.get_description()}")
+            st.write(f"**Date:** {booking.booking_date}")
+            st.write(f"**Time:** {booking.booking_time}")
+            st.write(f"**Duration:** {booking.duration} minutes")
+            st.write(f"**Price:** Rp {booking.service.get_price():,}")
             
-            with col1:
-                st.write(f"**Service:** {booking.service.get_description()}")
-                st.write(f"**Date:** {booking.booking_date}")
-                st.write(f"**Time:** {booking.booking_time}")
-                st.write(f"**Duration:** {booking.service.get_duration()} minutes")
-                st.write(f"**Price:** Rp {booking.service.get_price():,}")
-                
-                if booking.barber_id:
-                    barber = db.users.get(booking.barber_id)
-                    st.write(f"**Barber:** {barber.name if barber else 'N/A'}")
+            if booking.barber_id:
+                barber = db.users.get(booking.barber_id)
+                st.write(f"**Barber:** {barber.name if barber else 'N/A'}")
+        
+        with col2:
+            status_color = {
+                BookingStatus.SCHEDULED: "🟡",
+                BookingStatus.IN_PROGRESS: "🔵",
+                BookingStatus.COMPLETED: "🟢",
+                BookingStatus.CANCELED: "🔴",
+                BookingStatus.NO_SHOW: "⚫"
+            }
+            st.write(f"### {status_color.get(booking.status, '⚪')} {booking.status.value.upper()}")
             
-            with col2:
-                status_color = {
-                    BookingStatus.SCHEDULED: "🟡",
-                    BookingStatus.IN_PROGRESS: "🔵",
-                    BookingStatus.COMPLETED: "🟢",
-                    BookingStatus.CANCELED: "🔴"
-                }
-                st.write(f"### {status_color.get(booking.status, '⚪')} {booking.status.value.upper()}")
-                
-                if booking.status == BookingStatus.SCHEDULED:
-                    if st.button(f"❌ Cancel", key=f"cancel_{booking.booking_id}"):
-                        if booking.cancel():
-                            db.save()  # Save after cancellation
-                            st.success("Booking canceled")
-                            st.rerun()
-                
-                # Check payment status
-                payment = next((p for p in db.payments.values() 
-                              if p.booking_id == booking.booking_id), None)
+            if booking.status == BookingStatus.SCHEDULED:
+                st.button(f"❌ Cancel", key=f"cancel_{booking.booking_id}", on_click=run_action,
+                          args=(service.cancel_booking, booking.booking_id, booking.version),
+                          kwargs={'success': "Booking canceled", 'flash': flash})
+            
+            # Check payment status
+            payment = service.get_payment_for_booking(booking.booking_id)
+            if payment and payment.payment_status == PaymentStatus.PENDING:
+                payment_progress(booking.booking_id)
+            elif payment and payment.payment_status != PaymentStatus.FAILED:
+                st.write(f"💳 Payment: {payment.payment_status.value}")
+            elif booking.status not in [BookingStatus.CANCELED, BookingStatus.NO_SHOW]:
                 if payment:
-                    st.write(f"💳 Payment: {payment.payment_status.value}")
-                elif booking.status != BookingStatus.CANCELED:
-                    if st.button(f"💳 Pay Now", key=f"pay_{booking.booking_id}"):
-                        process_payment(booking)
+                    st.error(f"💳 Payment failed: {payment.failure_reason}")
+                method = st.selectbox("Payment method", list(PaymentMethod), key=f"pay_method_{booking.booking_id}",
+                                      format_func=lambda m: m.value.replace('_', ' ').title())
+                st.button("🔁 Retry Payment" if payment else "💳 Pay Now", key=f"pay_{booking.booking_id}",
+                          on_click=run_action, args=(service.pay_booking, booking.booking_id, method),
+                          kwargs={'success': "⏳ Payment submitted, you will be notified when it is confirmed",
+                                  'flash': flash})
 
 
-def process_payment(booking):
-    """Process payment for booking"""
-    db = st.session_state.db
-    
-    payment_id = f"PAY{len(db.payments) + 1:04d}"
-    payment = Payment(
-        payment_id=payment_id,
-        booking_id=booking.booking_id,
-        amount=booking.service.get_price(),
-        payment_method=PaymentMethod.E_WALLET,
-        payment_status=PaymentStatus.PENDING
-    )
-    
-    if payment.process_payment():
-        db.payments[payment_id] = payment
-        db.save()  # Save payment to JSON
-        st.success(f"✅ Payment successful! Transaction ID: {payment.transaction_id}")
+@st.fragment(run_every=PAYMENT_POLL_SECONDS)
+def payment_progress(booking_id: str):
+    """Pending payment status, re-checked on its own timer instead of blocking the page"""
+    payment = st.session_state.booking_service.get_payment_for_booking(booking_id)
+    if payment is not None and payment.payment_status == PaymentStatus.PENDING:
+        st.write("💳 Payment: ⏳ processing...")
+    else:
+        # Settled: redraw once so the card shows the outcome and its actions
         st.rerun()
 
 
+@timed("ui.show_feedback_form")
 def show_feedback_form(user):
     """Show feedback form for completed bookings"""
     st.subheader("Give Feedback")
@@ -216,17 +298,14 @@ def show_feedback_form(user):
         comment = st.text_area("Comment (optional)")
         
         if st.button("📤 Submit Feedback", type="primary"):
-            feedback_id = f"FB{len(db.feedbacks) + 1:04d}"
-            feedback = Feedback(
-                feedback_id=feedback_id,
-                booking_id=booking.booking_id,
-                customer_id=user.user_id,
-                barber_id=booking.barber_id or "",
-                rating=rating,
-                comment=comment
-            )
-            db.feedbacks[feedback_id] = feedback
-            db.save()  # Save feedback to JSON
-            st.success("✅ Thank you for your feedback!")
-            st.balloons()
-            st.rerun()
+            try:
+                st.session_state.booking_service.submit_feedback(booking.booking_id, user.user_id,
+                                                                 rating, comment)
+            except RateLimitedError as e:
+                st.warning(f"⏳ {e}")
+            except BarbershopError as e:
+                st.error(str(e))
+            else:
+                st.success("✅ Thank you for your feedback!")
+                st.balloons()
+                st.rerun()
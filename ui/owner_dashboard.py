@@ -3,15 +3,30 @@
 # ============================================================================
 
 import streamlit as st
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
+from core.admission import admission
+from core.archive import average_rating
+from core.booking_service import LEARNED_MIN_SAMPLES
+from core.calendar_feed import feeds_for
+from core.reconciliation import reconciler_for
+from patterns.factory import ServiceFactory
 from utils.enums import BookingStatus, PaymentStatus
+from ui.actions import run_action, show_flash, page_limit, show_more_button
+from ui.walk_ins import show_walk_in_desk
+from utils.metrics import timed, metrics
 
+# How often the unassigned warning and bulk complete pick up rows started or finished
+SCHEDULE_POLL_SECONDS = 5
+
+@timed("ui.owner_dashboard")
 def owner_dashboard():
     """Owner/Admin dashboard"""
     user = st.session_state.current_user
     st.title(f"👔 Admin Dashboard - {user.name}")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "📅 Today's Schedule", "💰 Revenue", "⭐ Feedbacks"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["📊 Overview", "📅 Today's Schedule", "🚶 Walk-ins",
+                                                         "💰 Revenue", "⭐ Feedbacks", "🕰️ History",
+                                                         "🩺 Diagnostics"])
     
     with tab1:
         show_overview()
@@ -20,23 +35,41 @@ def owner_dashboard():
         show_daily_schedule()
     
     with tab3:
-        show_revenue_report()
+        show_walk_in_desk()
     
     with tab4:
+        show_revenue_report()
+        show_reconciliation()
+    
+    with tab5:
         show_all_feedbacks()
+    
+    with tab6:
+        show_history()
+    
+    with tab7:
+        show_diagnostics()
 
 
+@timed("ui.show_overview")
 def show_overview():
     """Show overview statistics"""
     st.subheader("Business Overview")
     
-    db = st.session_state.db
+    # One point-in-time view, so the figures agree with each other while bookings come in
+    snapshot = st.session_state.db.snapshot()
     
-    # Calculate statistics
-    total_bookings = len(db.bookings)
-    completed_bookings = len([b for b in db.bookings.values() if b.status == BookingStatus.COMPLETED])
-    total_revenue = sum(p.amount for p in db.payments.values() if p.payment_status == PaymentStatus.PAID)
-    avg_rating = sum(f.rating for f in db.feedbacks.values()) / len(db.feedbacks) if db.feedbacks else 0
+    # Calculate statistics (archived bookings come from the archive summaries)
+    archived = st.session_state.booking_service.archive.totals(snapshot)
+    archived_rating, archived_reviews = average_rating(archived['ratings'])
+    total_bookings = len(snapshot.bookings) + archived['bookings']
+    completed_bookings = (len([b for b in snapshot.bookings.values() if b.status == BookingStatus.COMPLETED]) +
+                          archived['statuses'].get(BookingStatus.COMPLETED.value, 0))
+    total_revenue = (sum(p.amount for p in snapshot.payments.values() if p.payment_status == PaymentStatus.PAID) +
+                     archived['revenue'])
+    reviews = len(snapshot.feedbacks) + archived_reviews
+    avg_rating = ((sum(f.rating for f in snapshot.feedbacks.values()) + archived_rating * archived_reviews) / reviews
+                  if reviews else 0)
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -53,58 +86,145 @@ def show_overview():
         st.metric("Avg Rating", f"{avg_rating:.1f} ⭐")
 
 
+@timed("ui.show_daily_schedule")
 def show_daily_schedule():
     """Show today's schedule"""
     st.subheader(f"Today's Schedule - {date.today()}")
     
-    db = st.session_state.db
-    today_bookings = [b for b in db.bookings.values() 
-                     if b.booking_date == date.today() and b.status != BookingStatus.CANCELED]
+    service = st.session_state.booking_service
+    today_bookings = service.list_schedule(day=date.today())
+    # Rendered only when clicked, not on every rerun of the schedule
+    st.download_button("📆 Shop Calendar (.ics)", data=feeds_for(st.session_state.db).ics,
+                       file_name="barbershop-schedule.ics",
+                       mime="text/calendar", help="Or subscribe to /calendars/shop.ics on the booking API")
+    schedule_summary()
+    show_bulk_actions()
     
     if not today_bookings:
         st.info("No bookings for today.")
         return
     
-    # Sort by time
-    today_bookings.sort(key=lambda x: x.booking_time)
-    
     for booking in today_bookings:
-        with st.container():
-            col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
-            
-            with col1:
-                st.write(f"**{booking.booking_time}**")
-                st.write(f"🎫 {booking.booking_id}")
-            
-            with col2:
-                customer = db.users.get(booking.customer_id)
-                st.write(f"👤 {customer.name if customer else 'N/A'}")
-                st.write(f"📞 {customer.phone if customer else 'N/A'}")
-            
-            with col3:
-                st.write(f"✂️ {booking.service.get_description()}")
-                st.write(f"⏱️ {booking.service.get_duration()} min")
-            
-            with col4:
-                if booking.status == BookingStatus.SCHEDULED:
-                    if st.button("▶️ Start", key=f"start_{booking.booking_id}"):
-                        booking.status = BookingStatus.IN_PROGRESS
-                        db.save()  # Save to JSON
-                        st.rerun()
-                elif booking.status == BookingStatus.IN_PROGRESS:
-                    if st.button("✅ Done", key=f"done_{booking.booking_id}"):
-                        booking.complete()
-                        db.save()  # Save to JSON
-                        st.rerun()
-            
-            st.divider()
+        daily_schedule_row(booking.booking_id)
+
+
+@st.fragment(run_every=SCHEDULE_POLL_SECONDS)
+@timed("ui.schedule_summary")
+def schedule_summary():
+    """Unassigned bookings and in-progress work, re-read on a timer.
+    
+    Rows start and finish bookings without rerunning the page, so these
+    controls list today's bookings (and their versions) themselves. Their
+    buttons change many rows at once and rerun the page afterwards.
+    """
+    service = st.session_state.booking_service
+    today_bookings = service.list_schedule(day=date.today())
+    rerun = False
+    
+    unassigned = [b for b in today_bookings if b.barber_id is None and b.status == BookingStatus.SCHEDULED]
+    if unassigned:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.warning(f"{len(unassigned)} 'Any Available' booking(s) have no barber yet")
+        with col2:
+            rerun |= st.button("🧩 Assign Barbers", key="assign_barbers", on_click=run_action,
+                               args=(service.assign_unassigned, date.today()),
+                               kwargs={'success': "Barber assignment updated", 'flash': "flash_summary"})
+    
+    in_progress = [b for b in today_bookings if b.status == BookingStatus.IN_PROGRESS]
+    if in_progress:
+        rerun |= st.button(f"✅ Complete all {len(in_progress)} in-progress bookings", key="bulk_complete",
+                           on_click=run_action,
+                           args=(service.complete_bookings, [b.booking_id for b in in_progress],
+                                 {b.booking_id: b.version for b in in_progress}),
+                           kwargs={'success': lambda done: f"{len(done)} bookings completed",
+                                   'flash': "flash_summary"})
+    if rerun:
+        # The outcome stays in session state for the next run's show_flash()
+        st.rerun()
+    show_flash("flash_summary")
+
+
+def show_bulk_actions():
+    """Day-wide actions, each applied in one transaction"""
+    service = st.session_state.booking_service
+    with st.expander("🗂️ Bulk Actions"):
+        show_flash("flash_bulk")
+        barbers = [u for u in st.session_state.db.users.values() if u.role.value == "barber"]
+        names = {b.user_id: b.name for b in barbers}
+        st.write("**Move a barber's day**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            day = st.date_input("Day", value=date.today(), key="bulk_day")
+        with col2:
+            from_barber = st.selectbox("From", list(names), format_func=names.get, key="bulk_from")
+        with col3:
+            to_barber = st.selectbox("To", list(names), format_func=names.get, key="bulk_to")
+        st.button("🔀 Move Scheduled Bookings", key="bulk_reassign", on_click=run_action,
+                  args=(service.reassign_day, from_barber, to_barber, day),
+                  kwargs={'success': lambda moved: f"{len(moved)} bookings moved to {names[to_barber]}",
+                          'flash': "flash_bulk"})
+        
+        st.write("**Close the shop**")
+        confirm = st.checkbox(f"Cancel every scheduled booking on {day} and notify the customers",
+                              key="bulk_cancel_confirm")
+        st.button("❌ Cancel Day", key="bulk_cancel", disabled=not confirm, on_click=run_action,
+                  args=(service.cancel_day, day),
+                  kwargs={'success': lambda canceled: f"{len(canceled)} bookings canceled",
+                          'flash': "flash_bulk"})
 
 
+@st.fragment
+@timed("ui.daily_schedule_row")
+def daily_schedule_row(booking_id: str):
+    """One row of today's schedule; its Start/Done buttons rerun only this row"""
+    db = st.session_state.db
+    service = st.session_state.booking_service
+    booking = db.bookings.get(booking_id)
+    if booking is None:
+        st.caption(f"🎫 Booking {booking_id} is no longer available.")
+        return
+    
+    flash = f"flash_{booking_id}"
+    show_flash(flash)
+    with st.container():
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+        
+        with col1:
+            st.write(f"**{booking.booking_time}**")
+            st.write(f"🎫 {booking.booking_id}")
+        
+        with col2:
+            customer = db.users.get(booking.customer_id)
+            st.write(f"👤 {customer.name if customer else 'N/A'}")
+            st.write(f"📞 {customer.phone if customer else 'N/A'}")
+        
+        with col3:
+            st.write(f"✂️ {booking.service.get_description()}")
+            st.write(f"⏱️ {booking.duration} min")
+            barber = db.users.get(booking.barber_id) if booking.barber_id else None
+            st.write(f"💈 {barber.name if barber else 'Unassigned'}")
+        
+        with col4:
+            if booking.status == BookingStatus.SCHEDULED:
+                st.button("▶️ Start", key=f"start_{booking.booking_id}", on_click=run_action,
+                          args=(service.start_booking, booking.booking_id, booking.version),
+                          kwargs={'flash': flash})
+            elif booking.status == BookingStatus.IN_PROGRESS:
+                st.button("✅ Done", key=f"done_{booking.booking_id}", on_click=run_action,
+                          args=(service.complete_booking, booking.booking_id, booking.version),
+                          kwargs={'flash': flash})
+        
+        st.divider()
+
+
+@timed("ui.show_revenue_report")
 def show_revenue_report():
     """Show revenue report"""
     st.subheader("Revenue Report")
     
-    db = st.session_state.db
+    # Totals and the transaction list come from one point-in-time view
+    snapshot = st.session_state.db.snapshot()
     
     # Date range selection
     col1, col2 = st.columns(2)
@@ -113,18 +233,19 @@ def show_revenue_report():
     with col2:
         end_date = st.date_input("To", value=date.today())
     
-    # Filter payments
-    payments_in_range = [p for p in db.payments.values() 
-                        if p.payment_status == PaymentStatus.PAID and 
-                        p.payment_date and
-                        start_date <= p.payment_date.date() <= end_date]
+    # Paid payments in range, newest first
+    payments_in_range = snapshot.paid_payments(since=datetime.combine(start_date, time.min),
+                                               until=datetime.combine(end_date + timedelta(days=1), time.min))
+    
+    archived_transactions, archived_revenue = \
+        st.session_state.booking_service.archive.revenue_between(start_date, end_date, snapshot)
     
-    if not payments_in_range:
+    if not payments_in_range and not archived_transactions:
         st.info("No revenue data for selected period.")
         return
     
-    total_revenue = sum(p.amount for p in payments_in_range)
-    total_transactions = len(payments_in_range)
+    total_revenue = sum(p.amount for p in payments_in_range) + archived_revenue
+    total_transactions = len(payments_in_range) + archived_transactions
     avg_transaction = total_revenue / total_transactions if total_transactions > 0 else 0
     
     col1, col2, col3 = st.columns(3)
@@ -140,8 +261,11 @@ def show_revenue_report():
     
     # Show payment details
     st.write("### Transaction Details")
-    for payment in sorted(payments_in_range, key=lambda x: x.payment_date, reverse=True):
-        booking = db.bookings.get(payment.booking_id)
+    if archived_transactions:
+        st.caption(f"Totals include {archived_transactions} archived transactions "
+                   f"(Rp {archived_revenue:,.0f}) not listed below.")
+    for payment in payments_in_range:
+        booking = snapshot.bookings.get(payment.booking_id)
         if booking:
             col1, col2, col3, col4 = st.columns([2, 3, 2, 2])
             
@@ -160,31 +284,70 @@ def show_revenue_report():
             st.divider()
 
 
+def show_reconciliation():
+    """Last booking/payment reconciliation report, with manual runs"""
+    st.write("### 🧾 Reconciliation")
+    
+    reconciler = reconciler_for(st.session_state.db)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("Run Incremental", key="reconcile_incremental", on_click=run_action,
+                  args=(reconciler.run, True),
+                  kwargs={'success': "Reconciliation finished.", 'flash': "flash_reconcile"})
+    with col2:
+        st.button("Run Full", key="reconcile_full", on_click=run_action,
+                  args=(reconciler.run, False),
+                  kwargs={'success': "Reconciliation finished.", 'flash': "flash_reconcile"})
+    show_flash("flash_reconcile")
+    
+    report = reconciler.last_report()
+    if report is None:
+        st.info("Reconciliation has not run yet. It runs daily at the end of the day.")
+        return
+    st.caption(f"Last run {report['ran_at']} ({report['mode']}, {report['checked']} bookings checked)")
+    if not report['discrepancies']:
+        st.success("✅ Every completed booking is paid in full.")
+        return
+    st.warning(f"⚠️ {len(report['discrepancies'])} discrepancies: "
+               + ", ".join(f"{kind} {number}" for kind, number in sorted(report['counts'].items())))
+    st.dataframe(report['discrepancies'], use_container_width=True, hide_index=True)
+
+
+@timed("ui.show_all_feedbacks")
 def show_all_feedbacks():
     """Show all customer feedbacks"""
     st.subheader("Customer Feedbacks")
     
     db = st.session_state.db
+    archive = st.session_state.booking_service.archive
+    # Everything below reads one point-in-time view; search hits are kept to the feedbacks in it
+    snapshot = db.snapshot()
     
-    if not db.feedbacks:
+    if not snapshot.feedbacks and not archive.totals(snapshot)['ratings']:
         st.info("No feedbacks yet.")
         return
     
-    # Calculate average rating per barber
+    # Calculate average rating per barber, archived reviews included
     barber_ratings = {}
-    for feedback in db.feedbacks.values():
+    for feedback in snapshot.feedbacks.values():
         if feedback.barber_id:
             if feedback.barber_id not in barber_ratings:
-                barber_ratings[feedback.barber_id] = []
-            barber_ratings[feedback.barber_id].append(feedback.rating)
+                barber_ratings[feedback.barber_id] = {}
+            rating = str(feedback.rating)
+            barber_ratings[feedback.barber_id][rating] = barber_ratings[feedback.barber_id].get(rating, 0) + 1
+    for barber in snapshot.users.values():
+        if barber.role.value == "barber":
+            for rating, count in archive.barber_totals(barber.user_id, snapshot)['ratings'].items():
+                ratings = barber_ratings.setdefault(barber.user_id, {})
+                ratings[rating] = ratings.get(rating, 0) + count
     
     # Show barber ratings
     if barber_ratings:
         st.write("### Barber Performance")
         for barber_id, ratings in barber_ratings.items():
-            barber = db.users.get(barber_id)
+            barber = snapshot.users.get(barber_id)
             if barber:
-                avg_rating = sum(ratings) / len(ratings)
+                avg_rating, reviews = average_rating(ratings)
                 col1, col2, col3 = st.columns([2, 1, 1])
                 
                 with col1:
@@ -194,17 +357,43 @@ def show_all_feedbacks():
                     st.write(f"⭐ {avg_rating:.1f} / 5.0")
                 
                 with col3:
-                    st.write(f"📊 {len(ratings)} reviews")
+                    st.write(f"📊 {reviews} reviews")
         
         st.divider()
     
-    # Show all feedbacks
+    # Search or list all feedbacks
     st.write("### All Feedbacks")
-    for feedback in sorted(db.feedbacks.values(), key=lambda x: x.created_at, reverse=True):
+    query = st.text_input("🔍 Search", placeholder="Words in the comment, or customer name, email or phone "
+                                                   "(end a word with * to match by prefix, e.g. fad*)")
+    
+    barbers = [u for u in snapshot.users.values() if u.role.value == "barber"]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        min_rating, max_rating = st.slider("Rating", 1, 5, (1, 5), key="feedback_rating")
+    with col2:
+        barber_options = ["All Barbers"] + [b.name for b in barbers]
+        selected_barber = st.selectbox("Barber", barber_options, key="feedback_barber")
+    with col3:
+        date_from = st.date_input("From", value=None, key="feedback_from")
+    with col4:
+        date_to = st.date_input("To", value=None, key="feedback_to")
+    
+    barber_id = None
+    if selected_barber != "All Barbers":
+        barber_id = barbers[barber_options.index(selected_barber) - 1].user_id
+    filters = dict(barber_id=barber_id, min_rating=min_rating if min_rating > 1 else None,
+                   max_rating=max_rating if max_rating < 5 else None, date_from=date_from, date_to=date_to)
+    
+    # Best matches first for a query, otherwise newest first; both paged
+    results = [f for f in db.search_feedbacks(query, limit=page_limit("all_feedbacks", 20), **filters)
+               if f.feedback_id in snapshot.feedbacks]
+    if not results:
+        st.info("No feedbacks match your search.")
+    for feedback in results:
         with st.expander(f"⭐ {feedback.rating} stars - {feedback.created_at.strftime('%Y-%m-%d')}"):
-            customer = db.users.get(feedback.customer_id)
-            barber = db.users.get(feedback.barber_id)
-            booking = db.bookings.get(feedback.booking_id)
+            customer = snapshot.users.get(feedback.customer_id)
+            barber = snapshot.users.get(feedback.barber_id)
+            booking = snapshot.bookings.get(feedback.booking_id)
             
             st.write(f"**Customer:** {customer.name if customer else 'N/A'}")
             st.write(f"**Barber:** {barber.name if barber else 'N/A'}")
@@ -213,3 +402,132 @@ def show_all_feedbacks():
             
             if feedback.comment:
                 st.write(f"**Comment:** {feedback.comment}")
+    show_more_button("all_feedbacks", len(results), 20)
+
+
+@timed("ui.show_history")
+def show_history():
+    """Past states rebuilt from the booking event log"""
+    st.subheader("Booking History")
+    
+    history = st.session_state.booking_service.history
+    
+    st.write("### Bookings As Of")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        day = st.date_input("Bookings on", value=date.today(), key="history_day")
+    with col2:
+        as_of_date = st.date_input("As of date", value=date.today() - timedelta(days=1), key="history_as_of_date")
+    with col3:
+        as_of_time = st.time_input("As of time", value=time(23, 59), key="history_as_of_time")
+    
+    as_of = datetime.combine(as_of_date, as_of_time)
+    then = history.status_counts(day, as_of)
+    now = history.status_counts(day)
+    columns = st.columns(len(BookingStatus))
+    for column, status in zip(columns, BookingStatus):
+        with column:
+            count = then.get(status.value, 0)
+            st.metric(status.value.title(), count, delta=now.get(status.value, 0) - count,
+                      delta_color="off", help="Delta: change from then until now")
+    
+    st.write("### Actual Service Durations")
+    durations = history.service_durations()
+    if not durations:
+        st.info("No completed bookings with a recorded start yet.")
+    else:
+        st.dataframe([{'service': name, 'completed': stats['completed'],
+                       'booked (min)': stats['booked_minutes'], 'actual (min)': round(stats['actual_minutes'], 1)}
+                      for name, stats in sorted(durations.items())],
+                     use_container_width=True, hide_index=True)
+
+    st.write("### Learned Durations")
+    st.caption(f"New bookings are planned at a barber's 90th percentile once {LEARNED_MIN_SAMPLES} "
+               "services were timed.")
+    learned = history.learned_durations()
+    if not learned:
+        st.info("No timed services yet.")
+    else:
+        service_layer = st.session_state.booking_service
+        rows = []
+        for barber_id, description, stats in learned:
+            base_service, *addons = description.split(" + ")
+            barber = st.session_state.db.users.get(barber_id)
+            rows.append({'barber': barber.name if barber else barber_id, 'service': description,
+                         'samples': stats.count, 'mean (min)': round(stats.mean, 1),
+                         'p50 (min)': round(stats.p50, 1), 'p90 (min)': round(stats.p90, 1),
+                         'catalog (min)': ServiceFactory.create_service(base_service, addons).get_duration(),
+                         'planned (min)': service_layer.estimate_duration(barber_id, base_service, addons)})
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    st.write("### Booking Timeline")
+    booking_id = st.text_input("Booking ID", placeholder="e.g. BK0001", key="history_booking").strip()
+    if booking_id:
+        events = history.timeline('booking', booking_id)
+        if not events:
+            st.info(f"No recorded events for {booking_id}.")
+        for event in events:
+            if event.kind == 'created':
+                detail = f"created as {event.data.get('status')}"
+            elif event.kind == 'status_changed':
+                detail = f"{event.data['from']} → {event.data['to']}"
+            else:
+                detail = ", ".join(f"{name}: {old} → {new}" for name, (old, new) in event.data.items())
+            st.write(f"**{event.occurred_at.strftime('%Y-%m-%d %H:%M:%S')}** - {detail}")
+
+
+def show_admission_stats():
+    """Rate limiter and write cap counters (always collected)"""
+    stats = admission.stats()
+    st.write("### Admission Control")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Admitted Writes", sum(stats['admitted'].values()))
+    col2.metric("Rejected Writes", sum(stats['rejected'].values()))
+    col3.metric("Writes In Flight", f"{stats['in_flight']}/{stats['max_concurrent_writes']}")
+    col4.metric("Limited Keys", stats['tracked_keys'])
+    actions = sorted(set(stats['admitted']) | set(stats['rejected']))
+    if actions:
+        st.dataframe([{'action': action, 'admitted': stats['admitted'].get(action, 0),
+                       'rejected': stats['rejected'].get(action, 0)} for action in actions],
+                     use_container_width=True, hide_index=True)
+
+
+def show_diagnostics():
+    """Show performance instrumentation (owner only)"""
+    st.subheader("Performance Diagnostics")
+    
+    enabled = st.toggle("Enable instrumentation", value=metrics.enabled)
+    if enabled != metrics.enabled:
+        metrics.enabled = enabled
+        st.rerun()
+    
+    show_admission_stats()
+    
+    if not metrics.enabled:
+        st.info("Instrumentation is disabled. Enable it here or start the app with BARBERSHOP_METRICS=1.")
+        return
+    
+    summary = metrics.summary()
+    if not summary:
+        st.info("No measurements yet. Use the app and come back here.")
+    else:
+        st.write("### Operation Timings")
+        st.dataframe(summary, use_container_width=True, hide_index=True)
+    
+    if metrics.counters:
+        st.write("### Counters")
+        st.dataframe([{'event': name, 'count': value} for name, value in sorted(metrics.counters.items())],
+                     use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("💾 Write Prometheus File"):
+            try:
+                path = metrics.dump_prometheus()
+                st.success(f"Metrics written to {path}")
+            except OSError as e:
+                st.error(f"Could not write metrics: {e}")
+    with col2:
+        if st.button("🗑️ Reset Metrics"):
+            metrics.reset()
+            st.rerun()
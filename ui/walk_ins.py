@@ -0,0 +1,124 @@
+# ============================================================================
+# WALK-IN UI - Front desk, barber queue and the lobby screen
+# ============================================================================
+#
+# The lobby screen (main.py?view=lobby, no login) is a fragment that reruns
+# itself every LOBBY_REFRESH_SECONDS: each refresh is one cheap data file
+# check plus one pass over the people waiting, not a full page rerun.
+
+import streamlit as st
+from patterns.factory import ServiceFactory
+from core.walk_in import LOBBY_REFRESH_SECONDS, walk_ins_for
+from ui.actions import run_action, show_flash
+from utils.metrics import timed
+
+# Walk-in outcomes show above the line, not in the sidebar's page-wide flash
+WALK_IN_FLASH = "flash_walk_ins"
+
+
+def _wait_label(minutes: int) -> str:
+    if minutes <= 0:
+        return "now"
+    hours, minutes = divmod(minutes, 60)
+    return f"~{hours}h {minutes:02d}m" if hours else f"~{minutes} min"
+
+
+def _show_line(line, controls: bool):
+    """Waiting walk-ins of one barber; the lobby (no controls) shows first names only"""
+    if not line.waiting:
+        st.caption("Nobody waiting")
+    for entry in line.waiting:
+        walk_in = entry.walk_in
+        if not controls:
+            st.write(f"**#{entry.position} {walk_in.customer_name.split()[0]}** · "
+                     f"⏱️ {_wait_label(entry.wait_minutes)}")
+            continue
+        service = st.session_state.booking_service
+        description = ServiceFactory.create_service(walk_in.base_service, walk_in.addons).get_description()
+        col1, col2, col3 = st.columns([3, 1, 1])
+        col1.write(f"**#{entry.position} {walk_in.customer_name}** · {description} ({walk_in.duration} min)")
+        col2.write(f"⏱️ {_wait_label(entry.wait_minutes)}")
+        with col3:
+            if entry.position == 1:
+                st.button("▶️ Start", key=f"walk_in_start_{walk_in.entry_id}", on_click=run_action,
+                          args=(service.start_walk_in, walk_in.entry_id, walk_in.version),
+                          kwargs={'flash': WALK_IN_FLASH})
+            st.button("🚪 Left", key=f"walk_in_leave_{walk_in.entry_id}", on_click=run_action,
+                      args=(service.leave_walk_in, walk_in.entry_id, walk_in.version),
+                      kwargs={'flash': WALK_IN_FLASH})
+
+
+def _show_serving(barber_id: str):
+    service = st.session_state.booking_service
+    for walk_in in st.session_state.db.serving_walk_ins(barber_id):
+        col1, col2 = st.columns([4, 1])
+        col1.write(f"✂️ Serving **{walk_in.customer_name}** since {walk_in.started_at:%H:%M} "
+                   f"({walk_in.duration} min)")
+        col2.button("✅ Done", key=f"walk_in_done_{walk_in.entry_id}", on_click=run_action,
+                    args=(service.finish_walk_in, walk_in.entry_id, walk_in.version),
+                    kwargs={'flash': WALK_IN_FLASH})
+
+
+@timed("ui.show_walk_in_queue")
+def show_walk_in_queue(barber):
+    """Barber's own walk-in line"""
+    st.subheader("Walk-in Queue")
+    show_flash(WALK_IN_FLASH)
+    line = walk_ins_for(st.session_state.db).line(barber.user_id)
+    st.metric("Waiting", len(line.waiting), help=f"Next walk-in waits {_wait_label(line.next_wait_minutes)}")
+    _show_serving(barber.user_id)
+    _show_line(line, controls=True)
+
+
+@timed("ui.show_walk_in_desk")
+def show_walk_in_desk():
+    """Front desk: add walk-ins and manage every barber's line"""
+    st.subheader("Walk-ins")
+    st.caption("Lobby screen for customers: open this app with `?view=lobby`.")
+    service = st.session_state.booking_service
+    queue = walk_ins_for(st.session_state.db)
+    lines = queue.lobby()
+    if not lines:
+        st.info("No barbers are available for walk-ins.")
+        return
+
+    with st.form("walk_in_form", clear_on_submit=True):
+        col1, col2 = st.columns(2)
+        with col1:
+            name = st.text_input("Customer Name")
+            labels = {line.barber_id: f"{line.barber_name} (wait {_wait_label(line.next_wait_minutes)})"
+                      for line in lines}
+            barber_id = st.selectbox("Barber", list(labels), format_func=labels.get)
+        with col2:
+            base_service = st.selectbox("Service", options=list(ServiceFactory.BASE_SERVICES.keys()))
+            addons = st.multiselect("Add-ons", options=list(ServiceFactory.DECORATORS.keys()))
+        submitted = st.form_submit_button("➕ Add to Queue", use_container_width=True)
+    if submitted:
+        run_action(service.join_walk_in, name, barber_id, base_service, addons,
+                   success=lambda w: f"{w.customer_name} joined the line ({w.entry_id}), "
+                                     f"estimated wait {_wait_label(queue.estimate(w.entry_id)[1])}",
+                   flash=WALK_IN_FLASH)
+    show_flash(WALK_IN_FLASH)
+
+    for line in queue.lobby():
+        st.write(f"### {line.barber_name}")
+        _show_serving(line.barber_id)
+        _show_line(line, controls=True)
+
+
+@st.fragment(run_every=LOBBY_REFRESH_SECONDS)
+@timed("ui.lobby_screen")
+def lobby_screen():
+    """Public lobby display of every barber's line and estimated waits"""
+    st.title("💈 Walk-in Queue")
+    lines = walk_ins_for(st.session_state.db).lobby()
+    if not lines:
+        st.info("No barbers are taking walk-ins right now.")
+        return
+    columns = st.columns(min(len(lines), 4))
+    for index, line in enumerate(lines):
+        with columns[index % len(columns)]:
+            st.subheader(f"✂️ {line.barber_name}")
+            st.metric("Wait for new walk-ins", _wait_label(line.next_wait_minutes),
+                      help=f"{len(line.waiting)} waiting")
+            _show_line(line, controls=False)
@@ -0,0 +1,82 @@
+# ============================================================================
+# ARCHIVE STORE - Immutable gzip segments of archived records
+# ============================================================================
+#
+# Each archival run writes one segment "<seq>-<cutoff date>.json.gz" into
+# "<data file>.archive/". A segment is written once (temp file, then an
+# atomic rename), made read-only and never rewritten; its SHA-256 is kept by
+# the caller so corruption is detected on read. Which segments count is
+# decided by the caller's manifest, so a segment left behind by a crash before
+# the manifest was saved is simply ignored.
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import stat
+from collections import OrderedDict
+from typing import List, Optional
+
+# Segments of "<name>.json" live in "<name>.archive/"
+ARCHIVE_SUFFIX = ".archive"
+
+_SEGMENT_NAME = re.compile(r"^(\d+)-[\w-]+\.json\.gz$")
+
+
+class SegmentStore:
+    """Directory of immutable, compressed archive segments"""
+
+    def __init__(self, directory: str, cache_size: int = 4):
+        self.directory = directory
+        self.cache_size = cache_size
+        # Recently read segments, so paging through one segment decompresses it once
+        self._cache: 'OrderedDict[str, dict]' = OrderedDict()
+
+    def names(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if _SEGMENT_NAME.match(name))
+
+    def next_name(self, label: str) -> str:
+        """Unused segment name, numbered after every segment on disk"""
+        last = max((int(_SEGMENT_NAME.match(name).group(1)) for name in self.names()), default=0)
+        return f"{last + 1:06d}-{label}.json.gz"
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def write(self, name: str, payload: dict) -> str:
+        """Write a new segment and return its SHA-256; existing segments are never replaced"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(name)
+        if os.path.exists(path):
+            raise FileExistsError(f"Archive segment {name} already exists")
+        # dumps() uses the C encoder; mtime=0 makes equal payloads compress to equal bytes
+        data = gzip.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6, mtime=0)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_file, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(tmp_file, path)
+        return hashlib.sha256(data).hexdigest()
+
+    def read(self, name: str, sha256: Optional[str] = None) -> dict:
+        """Decoded segment; raises ValueError if it does not match sha256"""
+        cached = self._cache.get(name)
+        if cached is not None:
+            self._cache.move_to_end(name)
+            return cached
+        with open(self.path(name), 'rb') as f:
+            data = f.read()
+        if sha256 is not None and hashlib.sha256(data).hexdigest() != sha256:
+            raise ValueError(f"Archive segment {name} is corrupted (checksum mismatch)")
+        segment = json.loads(gzip.decompress(data))
+        self._cache[name] = segment
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return segment
@@ -9,6 +9,7 @@ class BookingStatus(Enum):
     IN_PROGRESS = "in-progress"
     COMPLETED = "completed"
     CANCELED = "canceled"
+    NO_SHOW = "no-show"
 
 class PaymentMethod(Enum):
     CASH = "cash"
@@ -27,3 +28,14 @@ class UserRole(Enum):
     BARBER = "barber"
     STAFF = "staff"
     OWNER = "owner"
+
+class WaitlistStatus(Enum):
+    WAITING = "waiting"
+    FILLED = "filled"
+    CANCELED = "canceled"
+
+class WalkInStatus(Enum):
+    WAITING = "waiting"
+    SERVING = "serving"
+    DONE = "done"
+    LEFT = "left"
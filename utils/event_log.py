@@ -0,0 +1,92 @@
+# ============================================================================
+# EVENT LOG - Append-only JSON Lines file with gzip checkpoints
+# ============================================================================
+#
+# Writers append whole lines while holding the DatabaseManager file lock, so
+# lines from different processes never interleave and sequence numbers stay
+# dense. Readers follow the file by byte offset: catching up with another
+# process costs only the lines appended since the last read. A line without
+# its trailing newline is a write still in progress and is left for later.
+#
+# Checkpoints are projection snapshots named "<seq>-<epoch seconds>.json.gz"
+# in "<log>.checkpoints/", so picking the one for a point in time is a
+# directory listing, not a file read.
+
+import gzip
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+Checkpoint = Tuple[int, float]
+
+
+class EventLog:
+    """Append-only event file shared by all processes using one data file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.checkpoint_dir = path + ".checkpoints"
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, offset: int = 0) -> Iterator[Tuple[int, int, dict]]:
+        """(start offset, end offset, event) for every complete line from offset on"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end = offset + len(line)
+                yield offset, end, json.loads(line)
+                offset = end
+
+    def append(self, events: Iterable[dict]) -> int:
+        """Append events and return the start offset of the first one"""
+        payload = "".join(json.dumps(event, separators=(',', ':')) + "\n" for event in events)
+        with open(self.path, 'ab') as f:
+            start = f.tell()
+            f.write(payload.encode('utf-8'))
+        return start
+
+    def checkpoints(self) -> List[Checkpoint]:
+        """(seq, epoch seconds of its last event) of stored checkpoints, oldest first"""
+        try:
+            names = os.listdir(self.checkpoint_dir)
+        except FileNotFoundError:
+            return []
+        found = []
+        for name in names:
+            if name.endswith(".json.gz"):
+                seq, _, at = name[:-len(".json.gz")].partition("-")
+                found.append((int(seq), float(at)))
+        return sorted(found)
+
+    def latest_checkpoint(self, at: Optional[float] = None) -> Optional[Checkpoint]:
+        """Newest checkpoint, or the newest taken at or before epoch seconds at"""
+        candidates = [c for c in self.checkpoints() if at is None or c[1] <= at]
+        return candidates[-1] if candidates else None
+
+    def _checkpoint_path(self, checkpoint: Checkpoint) -> str:
+        return os.path.join(self.checkpoint_dir, f"{checkpoint[0]:012d}-{checkpoint[1]:.6f}.json.gz")
+
+    def write_checkpoint(self, checkpoint: Checkpoint, state: dict):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(checkpoint)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        # dumps() uses the C encoder; dump() into a stream would not
+        payload = json.dumps(state, separators=(',', ':')).encode('utf-8')
+        with gzip.open(tmp_file, 'wb', compresslevel=5) as f:
+            f.write(payload)
+        os.replace(tmp_file, path)
+
+    def load_checkpoint(self, checkpoint: Checkpoint) -> dict:
+        with gzip.open(self._checkpoint_path(checkpoint), 'rt', encoding='utf-8') as f:
+            return json.load(f)
@@ -0,0 +1,41 @@
+# ============================================================================
+# EXCEPTIONS - Domain errors raised by the service layer
+# ============================================================================
+
+class BarbershopError(Exception):
+    """Base class for errors raised by domain operations"""
+
+
+class NotFoundError(BarbershopError):
+    """Referenced user, booking or payment does not exist"""
+
+
+class ValidationError(BarbershopError):
+    """Input data is invalid"""
+
+
+class InvalidStateError(BarbershopError):
+    """Operation is not allowed in the entity's current state"""
+
+
+class ConcurrencyError(BarbershopError):
+    """Entity was modified by someone else since it was read; reload and retry"""
+    retryable = True
+
+
+class SlotConflictError(InvalidStateError):
+    """Requested barber time slot overlaps an existing booking"""
+
+
+class GatewayError(BarbershopError):
+    """Payment gateway unreachable or gave no answer; the charge outcome is unknown"""
+    retryable = True
+
+
+class RateLimitedError(BarbershopError):
+    """Too many requests from this user, or too many writes at once; retry after retry_after seconds"""
+    retryable = True
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
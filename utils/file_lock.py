@@ -0,0 +1,87 @@
+# ============================================================================
+# FILE LOCK - Cross-process exclusive lock with a generation counter
+# ============================================================================
+#
+# The lock file doubles as a tiny generation counter: every writer bumps it
+# while holding the lock, so other processes can detect changes to the data
+# file by reading a few bytes instead of parsing the whole JSON document.
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Exclusive advisory lock on ``<path>`` shared by all processes.
+
+    Re-entrant within a process: nested acquisitions by the same thread only
+    take the OS lock once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                else:
+                    # msvcrt.locking retries for ~10s then raises, keep trying
+                    while True:
+                        try:
+                            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def read_generation(self) -> int:
+        """Current generation number, 0 if no writer has run yet"""
+        try:
+            with open(self.path, 'rb') as f:
+                return int(f.read(32).strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def write_generation(self, generation: int):
+        """Store a new generation number, caller must hold the lock"""
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, str(generation).encode())
@@ -0,0 +1,161 @@
+# ============================================================================
+# METRICS - Lightweight timing histograms and counters
+# ============================================================================
+#
+# Instrumentation is disabled by default and costs a single flag check per
+# call. Enable it with BARBERSHOP_METRICS=1 or from the owner's Diagnostics
+# tab. Snapshots can be dumped in Prometheus text format for node_exporter's
+# textfile collector or any other scraper.
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+METRICS_FILE = os.environ.get("BARBERSHOP_METRICS_FILE", "barbershop_metrics.prom")
+DUMP_INTERVAL_SECONDS = 30.0
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * ((rank - seen) / bucket_count)
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Process-wide store of histograms and counters"""
+
+    def __init__(self):
+        self.enabled = os.environ.get("BARBERSHOP_METRICS", "0").lower() not in ("", "0", "false", "no")
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self._last_dump = 0.0
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self) -> List[dict]:
+        """Per-operation statistics in milliseconds, slowest total first"""
+        with self._lock:
+            rows = [{
+                'operation': name,
+                'count': h.count,
+                'total_ms': round(h.total * 1000, 2),
+                'mean_ms': round(h.mean * 1000, 3),
+                'p50_ms': round(h.quantile(0.50) * 1000, 3),
+                'p95_ms': round(h.quantile(0.95) * 1000, 3),
+                'p99_ms': round(h.quantile(0.99) * 1000, 3)
+            } for name, h in self.histograms.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        lines = [
+            "# HELP barbershop_operation_duration_seconds Duration of instrumented operations.",
+            "# TYPE barbershop_operation_duration_seconds histogram"
+        ]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(h.buckets, h.counts):
+                    cumulative += bucket_count
+                    lines.append(f'barbershop_operation_duration_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'barbershop_operation_duration_seconds_bucket{{operation="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'barbershop_operation_duration_seconds_sum{{operation="{name}"}} {h.total:.6f}')
+                lines.append(f'barbershop_operation_duration_seconds_count{{operation="{name}"}} {h.count}')
+            lines.append("# HELP barbershop_events_total Count of instrumented events.")
+            lines.append("# TYPE barbershop_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'barbershop_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def dump_prometheus(self, path: Optional[str] = None) -> str:
+        """Atomically write the Prometheus text file and return its path"""
+        path = path or METRICS_FILE
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        self._last_dump = time.monotonic()
+        return path
+
+    def maybe_dump(self, interval: float = DUMP_INTERVAL_SECONDS):
+        """Dump the Prometheus file if enabled and the last dump is older than interval"""
+        if self.enabled and time.monotonic() - self._last_dump >= interval:
+            try:
+                self.dump_prometheus()
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+
+
+metrics = MetricsRegistry()
+
+
+def timed(name: str):
+    """Decorator recording the wall time of each call under name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name: str, amount: int = 1):
+    """Increment a counter when metrics are enabled"""
+    if metrics.enabled:
+        metrics.increment(name, amount)
@@ -0,0 +1,166 @@
+# ============================================================================
+# QUEUE INDEX - Per-key FIFO lines with O(log n) "how much is ahead of me"
+# ============================================================================
+#
+# Each line is an array of slots in join order. Two Fenwick (binary indexed)
+# trees over the slots hold the number of people and their total weight (e.g.
+# service minutes), so "how many people / minutes are ahead of slot i" is a
+# prefix sum and joining (append) or leaving (zero the slot) are point
+# updates - all O(log n). Leaving slots are not shifted out; a line is
+# compacted once more than half of its slots are empty.
+
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+COMPACT_MIN_SLOTS = 64
+
+
+class FenwickTree:
+    """Prefix sums over a growable array of numbers"""
+
+    def __init__(self, values: Iterable[int] = ()):
+        tree = [0]
+        tree.extend(values)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def prefix(self, count: int) -> int:
+        """Sum of the first count values"""
+        tree, total = self._tree, 0
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+    def add(self, index: int, delta: int):
+        tree, i = self._tree, index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def append(self, value: int):
+        i = len(self._tree)
+        self._tree.append(value + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+
+
+class _Line:
+    __slots__ = ('slots', 'people', 'weights', 'empty', 'tail')
+
+    def __init__(self, rows: List[Tuple[object, str, int]]):
+        # slot -> (order, record_id, weight), None once the record left
+        self.slots: List[Optional[Tuple[object, str, int]]] = list(rows)
+        self.people = FenwickTree(1 for _ in rows)
+        self.weights = FenwickTree(weight for _, _, weight in rows)
+        self.empty = 0
+        # Greatest row ever appended; slots stay sorted while new rows come after it
+        self.tail = rows[-1]
+
+
+class QueueIndex:
+    """Secondary index: key -> records in order, with people and weight ahead of each.
+
+    key_func maps a record to its line (None: not queued), weight_func to its
+    weight and order_func to its place in the line. Like RecentIndex it is
+    unbuilt until the first rebuild(), and add() re-files a changed record.
+    """
+
+    def __init__(self, key_func: Callable[[object], Optional[Hashable]], weight_func: Callable[[object], int],
+                 order_func: Callable[[object], object]):
+        self.key_func = key_func
+        self.weight_func = weight_func
+        self.order_func = order_func
+        self._lines: Dict[Hashable, _Line] = {}
+        # record_id -> (key, slot)
+        self._position: Dict[str, Tuple[Hashable, int]] = {}
+        self.built = False
+
+    def rebuild(self, records: Dict[str, object]):
+        grouped: Dict[Hashable, List[Tuple[object, str, int]]] = {}
+        for record_id, record in records.items():
+            key = self.key_func(record)
+            if key is not None:
+                grouped.setdefault(key, []).append((self.order_func(record), record_id, self.weight_func(record)))
+        self._lines, self._position = {}, {}
+        for key, rows in grouped.items():
+            self._set_line(key, sorted(rows))
+        self.built = True
+
+    def invalidate(self):
+        self._lines, self._position = {}, {}
+        self.built = False
+
+    def _set_line(self, key: Hashable, rows: List[Tuple[object, str, int]]):
+        if not rows:
+            self._lines.pop(key, None)
+            return
+        self._lines[key] = _Line(rows)
+        for slot, (_, record_id, _) in enumerate(rows):
+            self._position[record_id] = (key, slot)
+
+    def add(self, record_id: str, record):
+        """Queue a new record, or re-file one whose line or weight changed"""
+        if not self.built:
+            return
+        key = self.key_func(record)
+        old = self._position.get(record_id)
+        if old is not None:
+            if old[0] == key and self._lines[key].slots[old[1]][2] == self.weight_func(record):
+                return
+            self.remove(record_id)
+        if key is None:
+            return
+        row = (self.order_func(record), record_id, self.weight_func(record))
+        line = self._lines.get(key)
+        if line is None:
+            self._set_line(key, [row])
+        elif row > line.tail:
+            self._position[record_id] = (key, len(line.slots))
+            line.slots.append(row)
+            line.tail = row
+            line.people.append(1)
+            line.weights.append(row[2])
+        else:
+            # Joined earlier than the tail (merged from another process): re-sort the line
+            self._set_line(key, sorted([slot for slot in line.slots if slot] + [row]))
+
+    def remove(self, record_id: str):
+        old = self._position.pop(record_id, None)
+        if old is None:
+            return
+        key, slot = old
+        line = self._lines[key]
+        line.people.add(slot, -1)
+        line.weights.add(slot, -line.slots[slot][2])
+        line.slots[slot] = None
+        line.empty += 1
+        if line.empty == len(line.slots):
+            del self._lines[key]
+        elif len(line.slots) >= COMPACT_MIN_SLOTS and line.empty * 2 > len(line.slots):
+            self._set_line(key, [row for row in line.slots if row])
+
+    def ahead(self, record_id: str) -> Optional[Tuple[int, int]]:
+        """(people, total weight) queued before record_id, None if it is not queued"""
+        position = self._position.get(record_id)
+        if position is None:
+            return None
+        line = self._lines[position[0]]
+        return line.people.prefix(position[1]), line.weights.prefix(position[1])
+
+    def totals(self, key: Hashable) -> Tuple[int, int]:
+        """(people, total weight) in a line"""
+        line = self._lines.get(key)
+        if line is None:
+            return 0, 0
+        return line.people.prefix(len(line.slots)), line.weights.prefix(len(line.slots))
+
+    def iter_line(self, key: Hashable) -> Iterator[Tuple[str, int]]:
+        """(record_id, weight) of a line in order"""
+        line = self._lines.get(key)
+        for row in (line.slots if line else ()):
+            if row:
+                yield row[1], row[2]
@@ -0,0 +1,60 @@
+# ============================================================================
+# RATE LIMIT - Token buckets for many keys in one dict of floats
+# ============================================================================
+#
+# Generic cell rate algorithm: a bucket of `burst` tokens refilled at `rate`
+# per second is fully described by its "theoretical arrival time" (TAT), the
+# moment it would be full again. Each key therefore costs one float. A key
+# whose TAT has passed holds a full bucket, which is the same as no entry, so
+# idle keys are simply dropped by a periodic sweep.
+
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
+
+SWEEP_INTERVAL_SECONDS = 60.0
+
+
+class TokenBuckets:
+    """One token bucket per key: burst tokens, refilled at rate tokens per second"""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._interval = 1.0 / rate
+        # A request is admitted while its TAT is at most this far in the future
+        self._tolerance = (burst - 1) * self._interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tat: Dict[Hashable, float] = {}
+        self._next_sweep = clock() + SWEEP_INTERVAL_SECONDS
+
+    def acquire(self, key: Hashable) -> float:
+        """Take a token: 0.0 if admitted, else seconds until one is available"""
+        with self._lock:
+            now = self._clock()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now)
+            if tat - now > self._tolerance:
+                return tat - self._tolerance - now
+            self._tat[key] = tat + self._interval
+            return 0.0
+
+    def _sweep(self, now: float):
+        # Rebuilding (rather than deleting in place) also gives the memory back
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+        self._next_sweep = now + SWEEP_INTERVAL_SECONDS
+
+    def tokens(self, key: Hashable) -> float:
+        """Tokens currently available to key"""
+        with self._lock:
+            now = self._clock()
+            tat: Optional[float] = self._tat.get(key)
+            if tat is None or tat <= now:
+                return float(self.burst)
+            return max(0.0, self.burst - (tat - now) / self._interval)
+
+    def __len__(self) -> int:
+        """Keys with a bucket that is not full"""
+        return len(self._tat)
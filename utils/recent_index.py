@@ -0,0 +1,92 @@
+# ============================================================================
+# RECENT INDEX - Per-key record ids kept in timestamp order
+# ============================================================================
+#
+# Records are almost always created "now", so keeping each key's list sorted
+# is an append; older timestamps (records merged from another process) fall
+# back to bisect.insort. "Newest k" and cursor pages then read the tail of one
+# list: O(log n + k) instead of filtering and sorting a whole collection.
+
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+Cursor = Tuple[datetime, str]
+
+
+class RecentIndex:
+    """Secondary index: key -> [(timestamp, record_id)] oldest first.
+
+    key_func maps a record to its index key (None skips the record),
+    ts_func to its ordering timestamp (None also skips it). Until the first
+    rebuild() the index is unbuilt and add() is a no-op, so owners can build
+    it lazily on first query.
+    """
+
+    def __init__(self, key_func: Callable[[object], Hashable], ts_func: Callable[[object], Optional[datetime]]):
+        self.key_func = key_func
+        self.ts_func = ts_func
+        self._entries: Dict[Hashable, List[Cursor]] = {}
+        # record_id -> (key, timestamp) it is filed under
+        self._position: Dict[str, Tuple[Hashable, datetime]] = {}
+        self.built = False
+
+    def rebuild(self, records: Dict[str, object]):
+        key_func, ts_func = self.key_func, self.ts_func
+        rows = [(ts_func(record), record_id, key_func(record)) for record_id, record in records.items()]
+        rows = [row for row in rows if row[0] is not None and row[2] is not None]
+        # Record ids are unique, so keys are never compared; stored data is usually
+        # already in creation order, which makes this sort close to linear
+        rows.sort()
+        entries: Dict[Hashable, List[Cursor]] = {}
+        for ts, record_id, key in rows:
+            bucket = entries.get(key)
+            if bucket is None:
+                bucket = entries[key] = []
+            bucket.append((ts, record_id))
+        self._entries = entries
+        self._position = {record_id: (key, ts) for ts, record_id, key in rows}
+        self.built = True
+
+    def invalidate(self):
+        self._entries, self._position = {}, {}
+        self.built = False
+
+    def add(self, record_id: str, record):
+        """Index a new record, or re-file one whose key or timestamp changed"""
+        if not self.built:
+            return
+        key, ts = self.key_func(record), self.ts_func(record)
+        old = self._position.get(record_id)
+        if old == (key, ts):
+            return
+        if old is not None:
+            self.remove(record_id)
+        if key is None or ts is None:
+            return
+        entries = self._entries.setdefault(key, [])
+        if not entries or entries[-1] <= (ts, record_id):
+            entries.append((ts, record_id))
+        else:
+            insort(entries, (ts, record_id))
+        self._position[record_id] = (key, ts)
+
+    def remove(self, record_id: str):
+        old = self._position.pop(record_id, None)
+        if old is None:
+            return
+        key, ts = old
+        entries = self._entries[key]
+        index = bisect_left(entries, (ts, record_id))
+        if index < len(entries) and entries[index] == (ts, record_id):
+            del entries[index]
+
+    def count(self, key: Hashable) -> int:
+        return len(self._entries.get(key, ()))
+
+    def iter_recent(self, key: Hashable, before: Optional[Cursor] = None) -> Iterator[str]:
+        """Record ids newest first, starting strictly before the cursor"""
+        entries = self._entries.get(key, [])
+        end = len(entries) if before is None else bisect_left(entries, before)
+        for index in range(end - 1, -1, -1):
+            yield entries[index][1]
@@ -0,0 +1,48 @@
+# ============================================================================
+# SNAPSHOT - Point-in-time, read-only view of the records
+# ============================================================================
+#
+# DatabaseManager keeps, once the first snapshot is asked for, a frozen copy
+# of every committed user, booking, payment and feedback. A transaction
+# replaces the copies of records it changed; it never changes a copy in place.
+# A snapshot just holds the frozen maps as they were, so taking one is O(1),
+# reading it needs no lock, and nothing a writer does later shows up in it.
+# The first commit after a snapshot copies the map of each collection it
+# changes (the old map stays with the snapshot) - one dict copy, not a copy
+# of the records.
+
+from bisect import bisect_left
+from datetime import datetime
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+
+from utils.enums import PaymentStatus
+
+
+class Snapshot:
+    """Immutable view of users, bookings, payments, feedbacks and the archive
+    manifest as of taken_at. Treat the records as read-only."""
+
+    def __init__(self, collections: Dict[str, dict], archive: dict, taken_at: datetime):
+        self.taken_at = taken_at
+        self.users: Mapping[str, object] = MappingProxyType(collections['users'])
+        self.bookings: Mapping[str, object] = MappingProxyType(collections['bookings'])
+        self.payments: Mapping[str, object] = MappingProxyType(collections['payments'])
+        self.feedbacks: Mapping[str, object] = MappingProxyType(collections['feedbacks'])
+        self.archive: Mapping[str, dict] = MappingProxyType(archive)
+        # Paid payments oldest first and their dates, sorted on first use
+        self._paid: Optional[List[object]] = None
+        self._paid_dates: List[datetime] = []
+
+    def paid_payments(self, since: datetime, until: datetime) -> List[object]:
+        """Paid payments with since <= payment_date < until, newest first"""
+        if self._paid is None:
+            paid = sorted((p for p in self.payments.values()
+                           if p.payment_status == PaymentStatus.PAID and p.payment_date),
+                          key=attrgetter('payment_date', 'payment_id'))
+            self._paid_dates = [p.payment_date for p in paid]
+            self._paid = paid
+        first = bisect_left(self._paid_dates, since)
+        last = bisect_left(self._paid_dates, until)
+        return self._paid[first:last][::-1]
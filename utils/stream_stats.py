@@ -0,0 +1,122 @@
+# ============================================================================
+# STREAM STATS - Running mean and quantiles in constant memory
+# ============================================================================
+#
+# The first EXACT_SAMPLES observations are kept sorted and quantiles are the
+# exact nearest-rank values, so small samples (where a barber's first timed
+# services decide their planned length) are never approximated.
+#
+# After that the P-square algorithm (Jain & Chlamtac, 1985) takes over: five
+# markers track the minimum, p/2, p, (1+p)/2 quantiles and the maximum,
+# started from the sorted sample at those ranks. Each new observation shifts
+# the marker positions, and markers that drift from their desired position
+# move one step along a parabola through their neighbours. Every update is
+# O(1) and the state is 15 numbers, whatever the number of observations.
+#
+# State is plain lists and numbers so it can be stored in JSON checkpoints.
+
+import bisect
+import math
+from typing import List, Optional
+
+EXACT_SAMPLES = 50
+
+
+class P2Quantile:
+    """Streaming estimate of the p-quantile of the values added so far"""
+
+    def __init__(self, p: float, state: Optional[list] = None):
+        self.p = p
+        # Marker heights, actual positions and desired positions; until
+        # EXACT_SAMPLES values were seen, heights holds them sorted and
+        # positions is empty
+        self.heights: List[float]
+        self.positions: List[float]
+        self.desired: List[float]
+        self.heights, self.positions, self.desired = state if state is not None else ([], [], [])
+
+    def to_state(self) -> list:
+        return [self.heights, self.positions, self.desired]
+
+    def add(self, value: float):
+        heights = self.heights
+        if not self.positions:
+            bisect.insort(heights, value)
+            if len(heights) == EXACT_SAMPLES:
+                self._start_markers()
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+        positions, desired, p = self.positions, self.desired, self.p
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i, step in enumerate((0.0, p / 2, p, (1 + p) / 2, 1.0)):
+            desired[i] += step
+
+        for i in (1, 2, 3):
+            drift = desired[i] - positions[i]
+            if (drift >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (drift <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if drift > 0 else -1
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = height
+                positions[i] += d
+
+    def _start_markers(self):
+        """Switch from the sorted sample to the five P-square markers"""
+        p, last = self.p, len(self.heights) - 1
+        self.desired = [0.0, p / 2 * last, p * last, (1 + p) / 2 * last, float(last)]
+        self.positions = [float(round(d)) for d in self.desired]
+        self.heights = [self.heights[int(n)] for n in self.positions]
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self) -> Optional[float]:
+        if not self.heights:
+            return None
+        if not self.positions:
+            # Exact (nearest-rank) quantile of the values seen so far
+            return self.heights[max(0, math.ceil(self.p * len(self.heights)) - 1)]
+        return self.heights[2]
+
+
+class DurationStats:
+    """Count, running mean, median and 90th percentile of a stream of durations"""
+
+    def __init__(self, state: Optional[dict] = None):
+        state = state or {}
+        self.count: int = state.get('count', 0)
+        self.mean: float = state.get('mean', 0.0)
+        self._p50 = P2Quantile(0.5, state.get('p50'))
+        self._p90 = P2Quantile(0.9, state.get('p90'))
+
+    def add(self, minutes: float):
+        self.count += 1
+        self.mean += (minutes - self.mean) / self.count
+        self._p50.add(minutes)
+        self._p90.add(minutes)
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self._p50.value()
+
+    @property
+    def p90(self) -> Optional[float]:
+        return self._p90.value()
+
+    def to_state(self) -> dict:
+        return {'count': self.count, 'mean': self.mean,
+                'p50': self._p50.to_state(), 'p90': self._p90.to_state()}
@@ -0,0 +1,175 @@
+# ============================================================================
+# TEXT INDEX - Inverted index with BM25 ranking and prefix terms
+# ============================================================================
+#
+# Postings are maintained per record like RecentIndex, so adding a feedback
+# touches only its own few terms. A keyword looks up one postings entry; a
+# prefix ("fad*") bisects a sorted vocabulary and merges the matching terms.
+# Scores are BM25 (rare terms and short texts rank first).
+#
+# A term's postings are grouped by (term frequency, text length): every record
+# in a group has the same BM25 score, so scoring a term costs one formula per
+# group plus a C-level dict.fromkeys, not Python work per matching record.
+# Scores are cached per term until the index changes, which makes repeated
+# searches during UI reruns nearly free.
+
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+_TOKEN = re.compile(r"\w+")
+_QUERY_TERM = re.compile(r"(\w+)(\*?)")
+
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+CACHE_SIZE = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; e-mail addresses split at '@' and '.'"""
+    return _TOKEN.findall(text.lower())
+
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """Query terms as (term, is_prefix); a trailing '*' marks a prefix term"""
+    return [(term, bool(star)) for term, star in _QUERY_TERM.findall(query.lower())]
+
+
+class TextIndex:
+    """Secondary full-text index over one text field of a collection.
+
+    text_func maps a record to its searchable text (None skips the record).
+    Like RecentIndex it is unbuilt until the first rebuild(), and add()
+    re-indexes a record only when its text changed.
+    """
+
+    def __init__(self, text_func: Callable[[object], Optional[str]]):
+        self.text_func = text_func
+        # term -> {(term frequency, text length): record ids}
+        self._postings: Dict[str, Dict[Tuple[int, int], Set[str]]] = {}
+        # term -> number of records containing it
+        self._df: Dict[str, int] = {}
+        # Sorted vocabulary for prefix lookups
+        self._terms: List[str] = []
+        # record_id -> indexed text
+        self._docs: Dict[str, str] = {}
+        self._total_length = 0
+        self._cache: Dict[Tuple[str, bool], Dict[str, float]] = {}
+        self.built = False
+
+    def rebuild(self, records: Dict[str, object]):
+        self.invalidate()
+        for record_id, record in records.items():
+            self._insert(record_id, self.text_func(record))
+        self._terms = sorted(self._postings)
+        self.built = True
+
+    def invalidate(self):
+        self._postings, self._df, self._terms, self._docs = {}, {}, [], {}
+        self._total_length = 0
+        self._cache = {}
+        self.built = False
+
+    def _insert(self, record_id: str, text: Optional[str]) -> List[str]:
+        """Add postings for text, returning terms that are new to the vocabulary"""
+        if not text:
+            return []
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        length, new_terms = len(tokens), []
+        for term, frequency in Counter(tokens).items():
+            groups = self._postings.get(term)
+            if groups is None:
+                groups = self._postings[term] = {}
+                new_terms.append(term)
+            group = groups.get((frequency, length))
+            if group is None:
+                group = groups[(frequency, length)] = set()
+            group.add(record_id)
+            self._df[term] = self._df.get(term, 0) + 1
+        self._docs[record_id] = text
+        self._total_length += length
+        return new_terms
+
+    def add(self, record_id: str, record):
+        """Index a new record, or re-index one whose text changed"""
+        if not self.built:
+            return
+        text = self.text_func(record)
+        old = self._docs.get(record_id)
+        if old is not None and old == text:
+            return
+        if old is not None:
+            self.remove(record_id)
+        new_terms = self._insert(record_id, text)
+        for term in new_terms:
+            insort(self._terms, term)
+        if record_id in self._docs:
+            self._cache.clear()
+
+    def remove(self, record_id: str):
+        text = self._docs.pop(record_id, None)
+        if text is None:
+            return
+        tokens = tokenize(text)
+        self._total_length -= len(tokens)
+        for term, frequency in Counter(tokens).items():
+            groups = self._postings[term]
+            key = (frequency, len(tokens))
+            groups[key].discard(record_id)
+            if not groups[key]:
+                del groups[key]
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._postings[term], self._df[term]
+                del self._terms[bisect_left(self._terms, term)]
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def expand(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with prefix"""
+        terms = self._terms
+        index = bisect_left(terms, prefix)
+        matches = []
+        while index < len(terms) and terms[index].startswith(prefix):
+            matches.append(terms[index])
+            index += 1
+        return matches
+
+    def scores(self, term: str, prefix: bool = False) -> Dict[str, float]:
+        """BM25 score of every record containing term (best expansion for a prefix).
+
+        The returned dict is shared with the cache; do not modify it.
+        """
+        cached = self._cache.get((term, prefix))
+        if cached is not None:
+            return cached
+        count = len(self._docs)
+        if not count:
+            return {}
+        average_length = self._total_length / count
+        scored_groups = []
+        for match in (self.expand(term) if prefix else [term]):
+            groups = self._postings.get(match)
+            if not groups:
+                continue
+            df = self._df[match]
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for (frequency, length), record_ids in groups.items():
+                norm = K1 * (1 - B + B * length / average_length)
+                scored_groups.append((idf * frequency * (K1 + 1) / (frequency + norm), record_ids))
+        # Ascending, so a record in several prefix expansions keeps its best score
+        scored_groups.sort(key=lambda group: group[0])
+        result: Dict[str, float] = {}
+        for score, record_ids in scored_groups:
+            result.update(dict.fromkeys(record_ids, score))
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[(term, prefix)] = result
+        return result